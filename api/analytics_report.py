@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Player economy and chat analytics from a firestore_transfer.py export
+
+Reads the players and chat collections of an export directory in chunks of
+column arrays and aggregates them with NumPy: stat distributions,
+percentiles, the Gini coefficient of money, activity by hour of day, chat
+volume by hour and day, and the top players and chatters. Only per-player
+numbers (8 bytes per stat) and per-sender message counts are kept, so
+millions of documents fit in little memory.
+
+    python firestore_transfer.py export backup/ --collections players chat_buckets messages
+    python analytics_report.py backup/ --output report.html
+    python analytics_report.py backup/ --json > report.json
+
+Uses NumPy, a requirement of the server (movement validation and entity
+simulation) as well.
+"""
+import os
+import sys
+import html
+import json
+import time
+import argparse
+import datetime
+
+import numpy as np
+
+import serialization
+import firestore_transfer
+
+STATS = ('fishCount', 'monsterKills', 'money')
+PERCENTILES = (10, 25, 50, 75, 90, 99)
+HISTOGRAM_BINS = 20
+TOP_COUNT = 10
+DEFAULT_CHUNK_SIZE = 100000
+
+
+# ---- Reading ----
+
+def part_paths(directory, collection):
+    """Part files of a collection in an export directory ([] if it was not exported)"""
+    with open(os.path.join(directory, firestore_transfer.MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    bounds = manifest['collections'].get(collection, [])
+    return manifest['format'], [
+        os.path.join(directory, firestore_transfer.part_name(collection, index, manifest['format'], manifest['compressed']))
+        for index in range(max(len(bounds) - 1, 0))
+    ]
+
+
+def iter_columns(directory, collection, fields, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield chunks of a collection as {'id': [...], field: [...]} lists (None for missing values)
+
+    Columnar exports are read column by column without building documents.
+    """
+    fmt, paths = part_paths(directory, collection)
+    chunk = {field: [] for field in ('id',) + tuple(fields)}
+    for path in paths:
+        with firestore_transfer.open_part(path, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = serialization.loads(line)
+                if fmt == 'ndjson':
+                    chunk['id'].append(record['id'])
+                    for field in fields:
+                        chunk[field].append(record['data'].get(field))
+                else:
+                    rows = len(record['ids'])
+                    chunk['id'].extend(record['ids'])
+                    for field in fields:
+                        values = record['columns'].get(field)
+                        chunk[field].extend(values if values is not None else [None] * rows)
+                if len(chunk['id']) >= chunk_size:
+                    yield chunk
+                    chunk = {field: [] for field in chunk}
+    if chunk['id']:
+        yield chunk
+
+
+def to_float(values):
+    """Column of numbers, numeric strings, tagged timestamps or None -> float64 array (NaN when missing)"""
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        pass
+
+    def convert(value):
+        if isinstance(value, dict) and '$timestamp' in value:
+            return datetime.datetime.fromisoformat(value['$timestamp']).timestamp()
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return np.nan
+    return np.fromiter((convert(value) for value in values), dtype=np.float64, count=len(values))
+
+
+def iter_messages(directory, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield (sender IDs, timestamps) chunks of every chat message (buckets and legacy collection)"""
+    for chunk in iter_columns(directory, 'chat_buckets', ('messages',), max(1, chunk_size // 500)):
+        records = [record for bucket in chunk['messages'] if bucket for record in bucket]
+        if records:
+            yield [record['s'] for record in records], to_float([record['t'] for record in records])
+    for chunk in iter_columns(directory, 'messages', ('sender_id', 'timestamp'), chunk_size):
+        yield chunk['sender_id'], to_float(chunk['timestamp'])
+
+
+# ---- Statistics ----
+
+def gini(values):
+    """Gini coefficient of non-negative values (0: all equal, 1: one holds everything)"""
+    values = np.sort(values[np.isfinite(values)].clip(min=0))
+    total = values.sum()
+    if not len(values) or total == 0:
+        return 0.0
+    ranks = np.arange(1, len(values) + 1)
+    return float(2 * np.dot(ranks, values) / (len(values) * total) - (len(values) + 1) / len(values))
+
+
+def distribution(values):
+    """Summary, percentiles and histogram of the finite values of an array"""
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return {'count': 0}
+    counts, edges = np.histogram(values, bins=HISTOGRAM_BINS)
+    return {
+        'count': int(len(values)),
+        'sum': float(values.sum()),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'mean': float(values.mean()),
+        'std': float(values.std()),
+        'percentiles': dict(zip((f'p{p}' for p in PERCENTILES), np.percentile(values, PERCENTILES).tolist())),
+        'histogram': {'edges': edges.tolist(), 'counts': counts.tolist()},
+        'gini': gini(values)
+    }
+
+
+class TopK:
+    """Largest values seen across chunks, kept to k entries"""
+
+    def __init__(self, k=TOP_COUNT):
+        self.k = k
+        self.values = np.empty(0)
+        self.keys = []
+
+    def add(self, values, keys):
+        values = np.where(np.isfinite(values), values, -np.inf)
+        if len(values) > self.k:
+            index = np.argpartition(values, -self.k)[-self.k:]
+            values, keys = values[index], [keys[i] for i in index]
+        values = np.concatenate([self.values, values])
+        keys = self.keys + list(keys)
+        order = np.argsort(-values, kind='stable')[:self.k]
+        self.values, self.keys = values[order], [keys[i] for i in order]
+
+    def items(self):
+        return [(key, float(value)) for key, value in zip(self.keys, self.values) if np.isfinite(value)]
+
+
+def hour_histogram(timestamps):
+    """Counts per UTC hour of day"""
+    timestamps = timestamps[np.isfinite(timestamps)]
+    return np.bincount(((timestamps % 86400) // 3600).astype(np.int64), minlength=24)
+
+
+# ---- Report ----
+
+def build_report(directory, chunk_size=DEFAULT_CHUNK_SIZE):
+    start = time.perf_counter()
+
+    # Chat: per-sender counts with integer codes, so memory grows with senders, not messages
+    sender_codes = {}
+    sender_counts = np.zeros(0, dtype=np.int64)
+    chat_by_hour = np.zeros(24, dtype=np.int64)
+    chat_by_day = {}
+    messages = 0
+    first_message, last_message = np.inf, -np.inf
+    for senders, timestamps in iter_messages(directory, chunk_size):
+        # Only the chunk's distinct senders go through the dictionary
+        unique_senders, inverse = np.unique(np.array(senders, dtype=object).astype(str), return_inverse=True)
+        codes = np.array([sender_codes.setdefault(sender, len(sender_codes)) for sender in unique_senders.tolist()],
+                         dtype=np.int64)
+        chunk_counts = np.bincount(codes[inverse.ravel()], minlength=len(sender_codes))
+        chunk_counts[:len(sender_counts)] += sender_counts
+        sender_counts = chunk_counts
+        chat_by_hour += hour_histogram(timestamps)
+        finite = timestamps[np.isfinite(timestamps)]
+        if len(finite):
+            days, day_counts = np.unique((finite // 86400).astype(np.int64), return_counts=True)
+            for day, count in zip(days.tolist(), day_counts.tolist()):
+                chat_by_day[day] = chat_by_day.get(day, 0) + count
+            first_message = min(first_message, float(finite.min()))
+            last_message = max(last_message, float(finite.max()))
+        messages += len(senders)
+
+    top_chatter_codes = set(np.argsort(-sender_counts, kind='stable')[:TOP_COUNT].tolist())
+    top_chatters = sorted(
+        (sender for sender, code in sender_codes.items() if code in top_chatter_codes),
+        key=lambda sender: -sender_counts[sender_codes[sender]]
+    )
+
+    # Players: one float64 array per stat
+    columns = {stat: [] for stat in STATS}
+    last_updates = []
+    active = 0
+    top = {stat: TopK() for stat in STATS}
+    names = {}
+    wanted_names = set(top_chatters)
+    for chunk in iter_columns(directory, 'players', STATS + ('name', 'active', 'last_update'), chunk_size):
+        for stat in STATS:
+            values = to_float(chunk[stat])
+            columns[stat].append(values)
+            top[stat].add(values, list(zip(chunk['id'], chunk['name'])))
+        last_updates.append(to_float(chunk['last_update']))
+        active += sum(1 for value in chunk['active'] if value is True)
+        for player_id, name in zip(chunk['id'], chunk['name']):
+            if player_id in wanted_names:
+                names[player_id] = name
+    stats = {stat: np.concatenate(parts) if parts else np.empty(0) for stat, parts in columns.items()}
+    last_updates = np.concatenate(last_updates) if last_updates else np.empty(0)
+
+    return {
+        'generated_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'source': os.path.abspath(directory),
+        'players': {
+            'count': int(len(last_updates)),
+            'active': active,
+            'stats': {stat: distribution(values) for stat, values in stats.items()},
+            'last_update_by_hour': hour_histogram(last_updates).tolist(),
+            'top': {
+                stat: [{'id': player_id, 'name': name, 'value': value} for (player_id, name), value in top[stat].items()]
+                for stat in STATS
+            }
+        },
+        'chat': {
+            'messages': messages,
+            'senders': len(sender_codes),
+            'first_message': first_message if messages else None,
+            'last_message': last_message if messages else None,
+            'by_hour': chat_by_hour.tolist(),
+            'by_day': {
+                datetime.datetime.fromtimestamp(day * 86400, datetime.timezone.utc).strftime('%Y-%m-%d'): count
+                for day, count in sorted(chat_by_day.items())
+            },
+            'top_chatters': [
+                {
+                    'id': sender,
+                    'name': names.get(sender),
+                    'messages': int(sender_counts[sender_codes[sender]]),
+                    'share': float(sender_counts[sender_codes[sender]] / messages)
+                }
+                for sender in top_chatters
+            ]
+        },
+        'seconds': time.perf_counter() - start
+    }
+
+
+def _bars(title, labels, counts):
+    peak = max(counts) if counts and max(counts) else 1
+    rows = ''.join(
+        f"<tr><td>{html.escape(str(label))}</td><td class='n'>{count}</td>"
+        f"<td><div class='bar' style='width:{count / peak * 100:.1f}%'></div></td></tr>"
+        for label, count in zip(labels, counts)
+    )
+    return f"<h3>{html.escape(title)}</h3><table>{rows}</table>"
+
+
+def _table(title, header, rows):
+    head = ''.join(f"<th>{html.escape(str(cell))}</th>" for cell in header)
+    body = ''.join('<tr>' + ''.join(f"<td>{html.escape(str(cell))}</td>" for cell in row) + '</tr>' for row in rows)
+    return f"<h3>{html.escape(title)}</h3><table><tr>{head}</tr>{body}</table>"
+
+
+def render_html(report):
+    """Self-contained HTML page of a report"""
+    players, chat = report['players'], report['chat']
+    sections = [f"<h1>Game analytics</h1><p>{players['count']} players ({players['active']} active), "
+                f"{chat['messages']} chat messages from {chat['senders']} senders. "
+                f"Generated {html.escape(report['generated_at'])} in {report['seconds']:.2f}s.</p>", "<h2>Economy</h2>"]
+    for stat, summary in players['stats'].items():
+        if not summary['count']:
+            continue
+        sections.append(_table(
+            stat, ['count', 'mean', 'std', 'min', 'max'] + list(summary['percentiles']) + ['gini'],
+            [[summary['count'], f"{summary['mean']:.1f}", f"{summary['std']:.1f}", summary['min'], summary['max']]
+             + [f"{value:.1f}" for value in summary['percentiles'].values()] + [f"{summary['gini']:.3f}"]]
+        ))
+        edges = summary['histogram']['edges']
+        sections.append(_bars(f"{stat} distribution", [f"{low:.0f} - {high:.0f}" for low, high in zip(edges, edges[1:])],
+                              summary['histogram']['counts']))
+        sections.append(_table(f"Top {stat}", ['name', 'id', stat],
+                               [[entry['name'], entry['id'], entry['value']] for entry in players['top'][stat]]))
+    sections.append("<h2>Activity</h2>")
+    sections.append(_bars("Players by hour of last update (UTC)", [f"{hour:02d}:00" for hour in range(24)],
+                          players['last_update_by_hour']))
+    sections.append(_bars("Chat messages by hour (UTC)", [f"{hour:02d}:00" for hour in range(24)], chat['by_hour']))
+    sections.append(_bars("Chat messages by day", list(chat['by_day']), list(chat['by_day'].values())))
+    sections.append(_table("Top chatters", ['name', 'id', 'messages', 'share'],
+                           [[entry['name'], entry['id'], entry['messages'], f"{entry['share'] * 100:.1f}%"]
+                            for entry in chat['top_chatters']]))
+    style = ("body{font-family:sans-serif;margin:2em;color:#222}table{border-collapse:collapse;margin-bottom:1em}"
+             "td,th{padding:2px 8px;text-align:left}td.n{text-align:right}"
+             ".bar{background:#3a7bd5;height:10px;min-width:1px;width:0}td:last-child{width:300px}")
+    return (f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Game analytics</title>"
+            f"<style>{style}</style></head><body>{''.join(sections)}</body></html>")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Player economy and chat analytics from a firestore_transfer.py export')
+    parser.add_argument('directory', help='Export directory (python firestore_transfer.py export <directory>)')
+    parser.add_argument('--output', help='Write the report to this file (.html for an HTML page, otherwise JSON)')
+    parser.add_argument('--json', action='store_true', help='Print the JSON report')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Documents per processed chunk')
+    args = parser.parse_args()
+
+    try:
+        report = build_report(args.directory, args.chunk_size)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(render_html(report) if args.output.endswith('.html') else json.dumps(report, indent=2))
+    if args.json or not args.output:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Report of {report['players']['count']} players and {report['chat']['messages']} messages "
+              f"written to {args.output} ({report['seconds']:.2f}s)")
@@ -1,14 +1,37 @@
 import os
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify
 from flask_socketio import SocketIO, emit
 import json
+import math
 import logging
 import time
 from datetime import datetime
 import firebase_admin
-from firebase_admin import credentials, firestore, auth as firebase_auth
+from firebase_admin import credentials, firestore
+from google.api_core import exceptions as google_exceptions
 import firestore_models  # Import our new Firestore models
+import worldgen  # Deterministic procedural islands (mirrors src/world/islands.js)
+import world_sync
+import join_snapshot
+import serialization
+import static_assets
+import auth_cache
+import presence
+import idle_sweeper
+import firestore_accounting
+import metrics
+import profiler
+import journal
+import chat_pipeline
+import chat_storage
+import island_import
+import movement_recording
+import movement_validation
+import entity_simulation
+import response_cache
+import inventory
+import sharding
 from collections import defaultdict
 import mimetypes
 
@@ -41,18 +64,269 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'ship_game_secret_key')
 firebase_cred_path = os.environ.get('FIREBASE_CREDENTIALS', 'firebasekey.json')
 cred = credentials.Certificate(firebase_cred_path)
 firebase_app = firebase_admin.initialize_app(cred)
-db = firestore.client()
+
+# Every Firestore operation is attributed to the Socket.IO event, HTTP route
+# or background task that caused it (see /api/admin/firestore_ops). Optional
+# per-call budgets, e.g. FIRESTORE_BUDGETS='{"socket:player_update": {"read": 0}}'
+firestore_ops = firestore_accounting.FirestoreAccounting(
+    budgets=json.loads(os.environ.get('FIRESTORE_BUDGETS', '{}'))
+)
+firestore_ops.init_app(app)
+db = firestore_accounting.InstrumentedClient(firestore.client(), firestore_ops)
 
 # Initialize our Firestore models with the Firestore client
 firestore_models.init_firestore(db)
 
 # Set up Socket.IO
-socketio = SocketIO(app, cors_allowed_origins=os.environ.get('SOCKETIO_CORS_ALLOWED_ORIGINS', '*'))
+# (the serialization module lets handlers emit pre-serialized RawJSON sections)
+socketio = SocketIO(app, cors_allowed_origins=os.environ.get('SOCKETIO_CORS_ALLOWED_ORIGINS', '*'), json=serialization)
+
+# Event rates, latency histograms and cache hit counts on /metrics
+server_metrics = metrics.ServerMetrics()
+server_metrics.init_app(app)
+server_metrics.instrument_socketio(socketio)
+
+# player_update arrives many times per second per player: its payload is only
+# logged at DEBUG level, one update in UPDATE_LOG_SAMPLE_EVERY
+update_log = metrics.LogSampler(logger, every=int(os.environ.get('UPDATE_LOG_SAMPLE_EVERY', 100)))
+
+# Firebase ID token verification: verified tokens are cached until they expire
+# and signing keys are prefetched and refreshed in the background
+auth_verifier = auth_cache.AuthVerifier(project_id=getattr(firebase_app, 'project_id', None))
+
+# Socket sessions, disconnect grace period and batched presence writes
+presence_manager = presence.PresenceManager(on_expired=lambda player_ids: expire_players(player_ids))
+presence_manager.tick = firestore_ops.scoped('task:presence_tick', presence_manager.tick)
+
+# Players with no update for IDLE_TIMEOUT seconds are disconnected (half-open
+# connections would otherwise stay in every broadcast forever)
+IDLE_TIMEOUT = float(os.environ.get('IDLE_TIMEOUT', idle_sweeper.DEFAULT_IDLE_TIMEOUT))
+idle_players = idle_sweeper.IdleSweeper(
+    last_seen=lambda player_id: player_last_seen(player_id),
+    on_idle=lambda player_ids: disconnect_idle_players(player_ids),
+    timeout=IDLE_TIMEOUT
+)
+
+# Background tasks start with the first connection. Set BACKGROUND_TASKS=0 to
+# drive them manually (benchmarks call presence_manager.tick() themselves)
+BACKGROUND_TASKS_ENABLED = os.environ.get('BACKGROUND_TASKS', '1') != '0'
+background_tasks_started = False
+
+def start_background_tasks():
+    """Start the periodic server tasks once"""
+    global background_tasks_started
+    if background_tasks_started or not BACKGROUND_TASKS_ENABLED:
+        return
+    background_tasks_started = True
+    
+    auth_verifier.start(socketio.start_background_task, socketio.sleep)
+    socketio.start_background_task(presence_manager.run, socketio.sleep)
+    socketio.start_background_task(idle_players.run, socketio.sleep)
+    socketio.start_background_task(journal_replayer.run, socketio.sleep)
+    socketio.start_background_task(chat_archiver.run, socketio.sleep)
+    socketio.start_background_task(movement_validator.run, socketio.sleep, MOVEMENT_TICK)
+    socketio.start_background_task(entity_sim.run, socketio.sleep)
+    if movement_recorder is not None:
+        socketio.start_background_task(movement_recorder.run, socketio.sleep)
+    if shard_map.sharded:
+        socketio.start_background_task(border_sync.run, socketio.sleep)
 
 # Keep a session cache for quick access
 players = {}
 islands = {}
 
+# Spatial indexes and per-client region streaming state
+islands_index = world_sync.SpatialIndex()
+players_index = world_sync.SpatialIndex()
+region_sync = world_sync.WorldSync(islands_index, players_index)
+
+# The ocean can be split between shard processes, each running only the
+# players, broadcasts and entities of its own regions (see sharding.py).
+# SHARDS lists every shard as id=url (the URL clients are handed over to),
+# e.g. SHARDS='a=http://10.0.0.1:5001,b=http://10.0.0.2:5001' with SHARD_ID=a.
+# Without SHARDS this process owns the whole ocean.
+shard_map = sharding.ShardMap.from_spec(
+    os.environ.get('SHARDS', ''),
+    os.environ.get('SHARD_ID', 'local'),
+    region_chunks=int(os.environ.get('SHARD_REGION_CHUNKS', sharding.REGION_CHUNKS)),
+    overlap_chunks=int(os.environ.get('SHARD_OVERLAP_CHUNKS', sharding.OVERLAP_CHUNKS))
+)
+# Shards trust each other's handoff tickets and border messages by SHARD_SECRET,
+# so it has no default: a sharded process does not start without one
+SHARD_SECRET = os.environ.get('SHARD_SECRET', '')
+if shard_map.sharded and not SHARD_SECRET:
+    raise ValueError("SHARD_SECRET must be set when SHARDS lists more than one shard")
+handoff_tickets = sharding.HandoffTickets(SHARD_SECRET)
+border_sync = sharding.BorderSync(
+    shard_map,
+    sharding.HttpTransport(shard_map, SHARD_SECRET),
+    on_ghosts=lambda states: show_ghosts(states),
+    on_ghosts_removed=lambda player_ids: hide_ghosts(player_ids),
+    is_local=presence_manager.is_online
+)
+border_sync.tick = firestore_ops.scoped('task:border_sync', border_sync.tick)
+
+# player_update positions are validated in batches every MOVEMENT_TICK seconds
+# (speed per mode, teleports, world bounds) and applied by apply_player_moves;
+# e.g. MOVEMENT_MAX_SPEEDS='{"boat": 50, "character": 20}' in units per second
+MOVEMENT_TICK = float(os.environ.get('MOVEMENT_TICK', movement_validation.MOVEMENT_TICK))
+movement_validator = movement_validation.MovementValidator(
+    on_validated=lambda verdicts: apply_player_moves(verdicts),
+    max_speeds=json.loads(os.environ.get('MOVEMENT_MAX_SPEEDS', 'null')),
+    teleport_distance=float(os.environ.get('MOVEMENT_TELEPORT_DISTANCE', movement_validation.TELEPORT_DISTANCE)),
+    extent=float(os.environ.get('WORLD_EXTENT', movement_validation.WORLD_EXTENT))
+)
+movement_validator.tick = firestore_ops.scoped('task:movement_tick', movement_validator.tick)
+
+# Sea monsters, fish schools and pickups are simulated here on a fixed timestep
+# in the chunks around players, and each chunk's state is sent to the
+# 'entities:<chunk>' room its nearby clients are in (see update_entity_rooms).
+# ENTITY_SEED picks the deterministic spawns.
+ENTITY_ROOM_PREFIX = 'entities:'
+entity_sim = entity_simulation.EntitySimulation(
+    players=movement_validator.snapshot,
+    on_replicate=lambda payloads: publish_entities(payloads),
+    seed=int(os.environ.get('ENTITY_SEED', 0)),
+    owns_chunk=shard_map.owns_chunk if shard_map.sharded else None
+)
+entity_sim.tick = firestore_ops.scoped('task:entity_tick', entity_sim.tick)
+
+# Inventories are kept on the server and synced with versioned item deltas
+# (see handle_inventory_update); changes are journaled and merged into
+# Firestore item by item by the replayer
+inventories = inventory.InventoryManager(firestore_models.Inventory.get)
+
+# Accepted player_update frames are recorded for replay when MOVEMENT_RECORDING_DIR
+# is set (see movement_replay.py); segments older than the retention are deleted
+MOVEMENT_RECORDING_DIR = os.environ.get('MOVEMENT_RECORDING_DIR')
+movement_recorder = movement_recording.MovementRecorder(
+    MOVEMENT_RECORDING_DIR,
+    retention_hours=float(os.environ.get('MOVEMENT_RECORDING_RETENTION_HOURS', movement_recording.DEFAULT_RETENTION_HOURS))
+) if MOVEMENT_RECORDING_DIR else None
+
+# Chat history lives in hourly bucket documents; buckets older than the
+# retention period are moved to compressed files in CHAT_ARCHIVE_DIR
+chat_store = chat_storage.ChatStore()
+chat_archiver = chat_storage.ChatArchiver(
+    chat_store,
+    os.environ.get(
+        'CHAT_ARCHIVE_DIR',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), '.chat_archive')
+    ),
+    retention_hours=float(os.environ.get('CHAT_RETENTION_HOURS', chat_storage.DEFAULT_RETENTION_HOURS))
+)
+chat_archiver.archive = firestore_ops.scoped('task:chat_archive', chat_archiver.archive)
+
+# Pre-serialized leaderboard and chat history shared by every welcome payload
+join_snapshots = join_snapshot.JoinSnapshotCache(
+    leaderboard_loader=firestore_models.Player.get_combined_leaderboard,
+    chat_history_loader=lambda: chat_store.recent(limit=join_snapshot.CHAT_HISTORY_LIMIT)
+)
+
+# Encoded (and gzipped) bodies of the REST read endpoints, rebuilt only after
+# the data behind them changed and revalidated with ETags. A CDN may serve them
+# for a few seconds, then stale while it refetches.
+api_responses = response_cache.ResponseCache()
+PLAYERS_CACHE_CONTROL = response_cache.cache_control(1, 5)
+ISLANDS_CACHE_CONTROL = response_cache.cache_control(30, 300)
+LEADERBOARD_CACHE_CONTROL = response_cache.cache_control(10, 60)
+
+# Stat changes, chat messages and inventory changes are appended to a local journal first and
+# applied to Firestore in batches by a background replayer (see apply_journal)
+JOURNAL_DIR = os.environ.get(
+    'JOURNAL_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.journal')
+)
+action_journal = journal.Journal(
+    JOURNAL_DIR,
+    fsync=os.environ.get('JOURNAL_FSYNC', 'interval'),
+    fsync_interval=float(os.environ.get('JOURNAL_FSYNC_INTERVAL', journal.DEFAULT_FSYNC_INTERVAL))
+)
+# A record Firestore rejects as invalid, or an update of a deleted player, never
+# goes through; everything else (outages, timeouts) is retried
+journal_replayer = journal.JournalReplayer(
+    action_journal,
+    lambda records: apply_journal(records),
+    permanent_errors=journal.PERMANENT_ERRORS + (google_exceptions.InvalidArgument, google_exceptions.NotFound),
+    sequenced=True
+)
+journal_replayer.replay = firestore_ops.scoped('task:journal_replay', journal_replayer.replay)
+
+def replay_journal(replay=journal_replayer.replay):
+    """Replay the journal, then drop the inventories of expired players that are now written"""
+    applied = replay()
+    inventories.evict(action_journal.checkpoint)
+    return applied
+journal_replayer.replay = replay_journal
+
+# Chat messages get local IDs, are broadcast at once and persisted by the replayer
+chat = chat_pipeline.ChatPipeline(
+    action_journal,
+    chat_store,
+    sender_info=lambda player_id: players.get(player_id),
+    deliver=lambda message: deliver_chat_message(message),
+    registry=server_metrics.registry
+)
+
+def journal_stat_change(player_id, **fields):
+    """Record new stat values (absolute, so replaying them twice is harmless)"""
+    action_journal.append({'type': 'stats', 'player_id': player_id, 'fields': fields})
+
+def journal_inventory_change(delta):
+    """Record new item counts (absolute, like stats)"""
+    seq = action_journal.append({'type': 'inventory', 'player_id': delta.player_id,
+                                 'version': delta.version, 'items': delta.items})
+    inventories.journaled(delta, seq)
+
+# Player ID -> last journal record whose stats and inventory hand_off wrote to
+# Firestore. Those records are not replayed: by then the player may have newer
+# values on another shard. Rebuilt from the pending handoff records on startup.
+handed_off_through = {
+    record['player_id']: record['covers']
+    for _, record in action_journal.read() if record['type'] == 'handoff'
+}
+
+def journal_handoff(player_id, covers):
+    """Record that hand_off wrote a player's stats and inventory as of journal record covers"""
+    action_journal.append({'type': 'handoff', 'player_id': player_id, 'covers': covers})
+    handed_off_through[player_id] = max(handed_off_through.get(player_id, 0), covers)
+
+def apply_journal(records):
+    """Apply a batch of (seq, record) journal pairs to Firestore with batched writes"""
+    stats_by_player = {}
+    messages_by_id = {}
+    inventories_by_player = {}
+    for seq, record in records:
+        if record['type'] in ('stats', 'inventory') and seq <= handed_off_through.get(record['player_id'], 0):
+            # Superseded by what hand_off wrote
+            continue
+        if record['type'] == 'handoff':
+            # Every record it covers is behind us
+            if handed_off_through.get(record['player_id']) == record['covers']:
+                del handed_off_through[record['player_id']]
+        elif record['type'] == 'stats':
+            # Later values of the same player win
+            stats_by_player.setdefault(record['player_id'], {}).update(record['fields'])
+        elif record['type'] == 'chat':
+            messages_by_id[record['id']] = record['data']
+        elif record['type'] == 'inventory':
+            # All changes of a player in the batch become one write
+            version, items = inventories_by_player.get(record['player_id'], (0, {}))
+            inventories_by_player[record['player_id']] = (max(version, record['version']), {**items, **record['items']})
+        else:
+            logger.warning(f"Skipping unknown journal record type: {record['type']}")
+    
+    if messages_by_id:
+        chat.persist(messages_by_id)
+    if inventories_by_player:
+        firestore_models.Inventory.bulk_merge(inventories_by_player)
+    if stats_by_player:
+        firestore_models.Player.bulk_update(stats_by_player)
+        # One leaderboard rebuild per batch of stat changes instead of one per action
+        join_snapshots.invalidate('leaderboard')
+        api_responses.invalidate('leaderboard')
+        serialization.broadcast(socketio.server, 'leaderboard_update', join_snapshots.get('leaderboard'))
+
 # Add this near your other global variables
 last_db_update = defaultdict(float)  # Track last database update time for each player
 DB_UPDATE_INTERVAL = 5.0  # seconds between database updates
@@ -66,13 +340,104 @@ mimetypes.add_type('model/gltf+json', '.gltf')
 STATIC_FILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
 os.makedirs(STATIC_FILES_DIR, exist_ok=True)
 
+# Precompressed variants are written here (outside the served directory)
+STATIC_CACHE_DIR = os.environ.get(
+    'STATIC_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.static_cache')
+)
+
+# Build the static manifest (content hashes, gzip/brotli variants) on startup
+static_files = static_assets.AssetStore(STATIC_FILES_DIR, STATIC_CACHE_DIR)
+static_files.rebuild()
+
+def cache_counts():
+    """(hits, misses) of every server-side cache"""
+    counts = {
+        'world_chunks': worldgen.chunk_cache.stats(),
+        'encoded_payloads': serialization.encoded_payloads.stats(),
+        'static_hot_files': static_files.hot_files.stats()
+    }
+    counts = {name: (stats['hits'], stats['misses']) for name, stats in counts.items()}
+    for section, stats in join_snapshots.stats().items():
+        counts[f'join_snapshot_{section}'] = (stats['hits'], stats['builds'])
+    auth = auth_verifier.stats
+    counts['auth_tokens'] = (auth['hits'] + auth['negative_hits'], auth['local'] + auth['remote'] + auth['failures'])
+    for key, stats in api_responses.stats().items():
+        counts[f'api_{key}'] = (stats['hits'], stats['builds'])
+    return counts
+
+server_metrics.registry.gauge_callback(
+    'socketio_connected_sockets', 'Connected Engine.IO sockets',
+    lambda: len(socketio.server.eio.sockets))
+server_metrics.registry.gauge_callback(
+    'game_active_players', 'Players currently marked active',
+    lambda: sum(1 for player in players.values() if player.get('active')))
+server_metrics.registry.counter_callback(
+    'cache_hits_total', 'Cache hits', lambda: {(name,): hits for name, (hits, _) in cache_counts().items()}, ('cache',))
+server_metrics.registry.counter_callback(
+    'cache_misses_total', 'Cache misses (loads, builds or verifications)',
+    lambda: {(name,): misses for name, (_, misses) in cache_counts().items()}, ('cache',))
+server_metrics.registry.gauge_callback(
+    'cache_hit_ratio', 'Cache hits over lookups since startup',
+    lambda: {(name,): hits / (hits + misses) for name, (hits, misses) in cache_counts().items() if hits + misses},
+    ('cache',))
+server_metrics.registry.gauge_callback(
+    'journal_pending_records', 'Journaled stat changes, chat messages and inventory changes not yet in Firestore',
+    lambda: action_journal.pending())
+server_metrics.registry.counter_callback(
+    'journal_events_total', 'Journal replay batches, failed batches, retries and quarantined records',
+    lambda: {(event,): journal_replayer.stats[event]
+             for event in ('batches', 'replayed', 'failed_batches', 'retries', 'quarantined')},
+    ('event',))
+server_metrics.registry.counter_callback(
+    'movement_updates_total', 'Validated player_update positions by result',
+    lambda: {(result,): movement_validator.stats[result]
+             for result in (movement_validation.ACCEPTED, movement_validation.CLAMPED,
+                            movement_validation.REJECTED, 'malformed')},
+    ('result',))
+server_metrics.registry.counter_callback(
+    'movement_violations_total', 'player_update positions that were clamped or rejected, by reason',
+    lambda: {(reason,): movement_validator.stats[reason] for reason in ('speed', 'teleport', 'bounds')},
+    ('reason',))
+server_metrics.registry.gauge_callback(
+    'game_entities', 'Simulated entities by kind',
+    lambda: {(kind,): entity_sim.count(code) for code, kind in enumerate(entity_simulation.KINDS)},
+    ('kind',))
+server_metrics.registry.counter_callback(
+    'entity_events_total', 'Entity simulation events (spawns, interactions, dropped ticks)',
+    lambda: {(event,): entity_sim.stats[event]
+             for event in ('spawned', 'respawned', 'chunks_spawned', 'chunks_despawned', 'monster_hits',
+                           'monsters_killed', 'collected', 'fish_caught', 'invalid_hits', 'invalid_collects',
+                           'dropped_ticks')},
+    ('event',))
+server_metrics.registry.counter_callback(
+    'inventory_events_total', 'Inventory changes, rejected changes, full resyncs, loads and evictions',
+    lambda: {(event,): inventories.stats[event] for event in ('changes', 'rejected', 'full_syncs', 'loads', 'evictions')},
+    ('event',))
+server_metrics.registry.gauge_callback(
+    'shard_ghost_players', 'Players of neighbouring shards shown near our borders',
+    lambda: border_sync.ghost_count())
+server_metrics.registry.counter_callback(
+    'shard_events_total', 'Handoffs and border messages between shards',
+    lambda: {
+        **{(f'handoffs_{event}',): handoff_tickets.stats[event] for event in ('issued', 'redeemed', 'rejected')},
+        **{(f'border_{event}',): border_sync.stats[event] for event in ('sent', 'received', 'send_errors')},
+        **{(event,): border_sync.stats[event] for event in ('ghosts_removed', 'ghosts_expired')}
+    },
+    ('event',))
+server_metrics.registry.counter_callback(
+    'firestore_operations_total', 'Firestore operations by handler (see /api/admin/firestore_ops)',
+    lambda: {(handler, kind): count for handler, stats in firestore_ops.stats().items() for kind, count in stats['ops'].items()},
+    ('handler', 'kind'))
+
 # Load data from Firestore on startup
 def load_data_from_firestore():
     # Load players
     db_players = firestore_models.Player.get_all()
     for player in db_players:
-        # Set all players to inactive on server start
-        if player.get('active', False):
+        # Set all players to inactive on server start (only our own when sharded:
+        # the other shards' players are still connected there)
+        if player.get('active', False) and (not shard_map.sharded or player.get('shard') in (None, shard_map.shard_id)):
             firestore_models.Player.update(player['id'], active=False)
             player['active'] = False
         players[player['id']] = player
@@ -81,76 +446,90 @@ def load_data_from_firestore():
     db_islands = firestore_models.Island.get_all()
     for island in db_islands:
         islands[island['id']] = island
+        islands_index.upsert(island['id'], island)
     
     logger.info(f"Loaded {len(players)} players and {len(islands)} islands from Firestore")
+    
+    # Build the shared welcome payload sections before the first join
+    join_snapshots.warm()
 
 # Call the function during app startup
-load_data_from_firestore()
+with firestore_ops.scope('startup'):
+    # Records left over from a crash must reach Firestore before it is loaded
+    replayed = journal_replayer.replay()
+    if replayed:
+        logger.info(f"Replayed {replayed} journal records into Firestore")
+    load_data_from_firestore()
 
 # Add this new function for token verification
 def verify_firebase_token(token):
     """Verify Firebase token and return the UID if valid"""
-    try:
-        if not token:
-            logger.warning("No token provided for verification")
-            return None
-            
-        logger.info("Attempting to verify Firebase token")
-        
-        # Verify the token
-        decoded_token = firebase_auth.verify_id_token(token)
-        
-        # Get user UID from the token
-        uid = decoded_token['uid']
-        logger.info(f"Successfully verified Firebase token for user: {uid}")
-        return uid
-    except Exception as e:
-        logger.error(f"Error verifying Firebase token: {e}")
-        logger.exception("Token verification exception details:")  # This logs the full stack trace
+    if not token:
+        logger.warning("No token provided for verification")
         return None
+    
+    # Cached per token hash; failures are logged (without stack trace) by the verifier
+    return auth_verifier.verify(token)
 
 # Socket.IO event handlers
 @socketio.on('connect')
 def handle_connect():
     logger.info(f"Client connected: {request.sid}")
+    start_background_tasks()
 
 @socketio.on('disconnect')
 def handle_disconnect():
     logger.info(f"Client disconnected: {request.sid}")
     
-    # Look up the player ID from socket session
+    # Stop streaming the world to this client
+    region_sync.leave(request.sid)
+    
+    # The disconnect takes effect after a grace period (see expire_players), so
+    # a quick reconnect costs no writes and no broadcasts. Sockets that never
+    # joined fall back to the legacy socket-ID-as-player-ID mapping.
+    legacy_player_id = request.sid if request.sid in players else None
+    presence_manager.disconnect(request.sid, legacy_player_id=legacy_player_id)
+
+def expire_players(player_ids):
+    """Apply disconnects whose grace period ended (already marked inactive in Firestore)"""
+    for player_id in player_ids:
+        if player_id in players:
+            players[player_id]['active'] = False
+            players[player_id]['last_update'] = time.time()
+        players_index.remove(player_id)
+        movement_validator.untrack(player_id)
+        idle_players.untrack(player_id)
+        last_db_update.pop(player_id, None)
+        border_sync.withdraw(player_id)
+    # Dropped from memory once their journaled changes are in Firestore
+    inventories.expire(player_ids)
+    inventories.evict(action_journal.checkpoint)
+    api_responses.invalidate('players')
+    
+    # One coalesced notification per tick instead of one per player
+    serialization.broadcast(socketio.server, 'players_disconnected', {'ids': player_ids})
+
+def player_last_seen(player_id):
+    """Time of the last update from an active player (None if not active)"""
+    player = players.get(player_id)
+    if player is None or not player.get('active'):
+        return None
+    # Players read back from Firestore have string timestamps
     try:
-        session_ref = db.collection('socket_sessions').document(request.sid)
-        session = session_ref.get()
-        
-        if session.exists:
-            session_data = session.to_dict()
-            player_id = session_data.get('player_id')
-            
-            # If this was a player, mark them as inactive
-            if player_id and player_id in players:
-                # Update player in Firestore and cache
-                firestore_models.Player.update(player_id, active=False, last_update=time.time())
-                if player_id in players:
-                    players[player_id]['active'] = False
-                    
-                    # Broadcast that the player disconnected
-                    emit('player_disconnected', {'id': player_id}, broadcast=True)
-            
-            # Delete the session mapping
-            session_ref.delete()
-        else:
-            # Legacy fallback - directly use socket ID as player ID
-            player_id = request.sid
-            if player_id in players:
-                # Update player in Firestore and cache
-                firestore_models.Player.update(player_id, active=False, last_update=time.time())
-                players[player_id]['active'] = False
-                
-                # Broadcast that the player disconnected
-                emit('player_disconnected', {'id': player_id}, broadcast=True)
-    except Exception as e:
-        logger.error(f"Error handling disconnect: {e}")
+        return float(player.get('last_update'))
+    except (TypeError, ValueError):
+        return None
+
+def disconnect_idle_players(player_ids):
+    """Drop the sockets of idle players and mark them inactive without a grace period"""
+    for player_id in player_ids:
+        for sid in presence_manager.sids_for(player_id):
+            # Runs handle_disconnect, which starts the usual disconnect
+            socketio.server.disconnect(sid)
+    
+    # Expired (written and broadcast in bulk) on the next presence tick
+    presence_manager.expire(player_ids)
+    logger.info(f"Disconnected {len(player_ids)} idle players")
 
 @socketio.on('player_join')
 def handle_player_join(data):
@@ -178,25 +557,36 @@ def handle_player_join(data):
         else:
             logger.warning(f"Firebase token verification failed. Using socket ID instead.")
     
+    # A player handed over by another shard brings its identity and position in a
+    # signed ticket (only shards issue tickets, so only a sharded process takes them)
+    handoff = None
+    if shard_map.sharded and data.get('handoffTicket'):
+        handoff = handoff_tickets.redeem(data['handoffTicket'], shard_map.shard_id)
+    if handoff is not None:
+        player_id, handed_over = handoff
+        border_sync.forget(player_id)
+        # Read again from Firestore on first use (the old shard wrote it)
+        inventories.release(player_id)
+    
     logger.info(f"New player joined: {player_id}")
     logger.info(f"Name: {data.get('name', 'Unknown')}")
     
-    # Check if this player already exists in the database
-    existing_player = firestore_models.Player.get(player_id)
+    # Check if this player already exists (every known player is cached on startup)
+    if handoff is not None:
+        # Stats come from Firestore, never from the ticket
+        stored_player = firestore_models.Player.get(player_id)
+        existing_player = {**stored_player, **{
+            field: handed_over[field] for field in sharding.HANDOFF_FIELDS if field in handed_over
+        }} if stored_player else None
+    else:
+        existing_player = players.get(player_id) or firestore_models.Player.get(player_id)
     
     if existing_player:
         # Update the existing player's active status and socket ID
         logger.info(f"Existing player reconnected: {player_id}")
         
-        # Store the socket ID mapping for this player
-        session_mapping = {
-            'player_id': player_id,
-            'socket_id': request.sid,
-            'last_update': time.time()
-        }
-        
-        # Store mapping in a new collection
-        db.collection('socket_sessions').document(request.sid).set(session_mapping)
+        # Store the socket ID mapping (written to socket_sessions in the next presence batch)
+        resumed = presence_manager.register(request.sid, player_id)
         
         # Update player data
         player_data = {
@@ -206,9 +596,15 @@ def handle_player_join(data):
             'rotation': data.get('rotation', existing_player.get('rotation')),
             'mode': data.get('mode', existing_player.get('mode'))
         }
+        if shard_map.sharded:
+            player_data['shard'] = shard_map.shard_id
         
-        # Update in Firestore
-        firestore_models.Player.update(player_id, **player_data)
+        # Update in Firestore, unless this is a reconnect within the grace
+        # period (still active there; position is saved by player_update)
+        if handoff is not None:
+            firestore_models.Player.merge(player_id, **player_data)
+        elif not resumed:
+            firestore_models.Player.update(player_id, **player_data)
         
         # Update cache
         players[player_id] = {**existing_player, **player_data}
@@ -227,196 +623,386 @@ def handle_player_join(data):
             'active': True,  # Mark as active when they join
             'firebase_uid': claimed_firebase_uid if verified_uid else None
         }
+        if shard_map.sharded:
+            player_data['shard'] = shard_map.shard_id
         
         # Create player in Firestore and cache the result
         player = firestore_models.Player.create(player_id, **player_data)
         players[player_id] = player
         
         # Store the socket ID mapping
-        session_mapping = {
-            'player_id': player_id,
-            'socket_id': request.sid,
-            'last_update': time.time()
-        }
-        db.collection('socket_sessions').document(request.sid).set(session_mapping)
+        presence_manager.register(request.sid, player_id)
     
-    # Broadcast to all clients that a new player joined
-    emit('player_joined', players[player_id], broadcast=True)
+    # Movement is validated from the join position on (clamped to the world bounds)
+    players[player_id]['position'] = movement_validator.track(
+        player_id, players[player_id]['position'], players[player_id].get('mode'))
     
-    # Send existing ACTIVE players to the new player
-    active_players = [p for p in players.values() if p.get('active', False)]
-    emit('all_players', active_players)
+    # Joined a shard that does not own the spawn point: go straight to the one that does
+    if not shard_map.owns(players[player_id]['position']):
+        hand_off(player_id)
+        return
+    
+    # Index the player so other clients can find it by region
+    players_index.upsert(player_id, players[player_id])
+    api_responses.invalidate('players')
+    if shard_map.sharded:
+        border_sync.publish(player_id, sharding.ghost_state(player_id, players[player_id]))
     
-    # Send all islands to the new player
-    emit('all_islands', list(islands.values()))
+    # Disconnect the player if it stops sending updates
+    idle_players.track(player_id)
     
-    # Send recent messages to the new player
-    recent_messages = firestore_models.Message.get_recent_messages(limit=20)
-    emit('chat_history', recent_messages)
+    # Broadcast to all clients that a new player joined
+    broadcast('player_joined', players[player_id])
     
-    # Send leaderboard data to the new player
-    emit('leaderboard_update', firestore_models.Player.get_combined_leaderboard())
+    # Send everything the new player needs in one emit: the region around the
+    # spawn point plus the pre-serialized leaderboard and chat history
+    emit('welcome', {
+        'id': player_id,
+        'player': players[player_id],
+        'region': region_sync.join(request.sid, player_id, players[player_id]['position']),
+        **join_snapshots.sections()
+    })
+    
+    # Outer rings are streamed in size-capped batches as the player moves
+    stream_world_region(request.sid)
+    
+    # Simulated entities around the player arrive with the next replication
+    update_entity_rooms(request.sid, players[player_id]['position'])
 
 @socketio.on('player_update')
 def handle_player_update(data):
-    logger.info(f"Player update data: {data}")
+    if update_log.sample():
+        logger.debug("Player update data (sampled): %s", data)
     socket_id = request.sid
     
-    # Find the player ID associated with this socket
-    try:
-        session_ref = db.collection('socket_sessions').document(socket_id)
-        session = session_ref.get()
-        
-        if session.exists:
-            player_id = session.to_dict().get('player_id')
-        else:
-            # Legacy fallback
-            player_id = socket_id
-    except Exception as e:
-        logger.error(f"Error finding player for socket {socket_id}: {e}")
-        return
+    # Find the player ID associated with this socket (kept in memory by presence)
+    player_id = presence_manager.player_for(socket_id) or socket_id  # Legacy fallback
     
     # Ensure player exists
     if player_id not in players:
         return
     
     current_time = time.time()
-    
-    # Update in-memory cache immediately
-    for key, value in data.items():
-        if key in ['position', 'rotation', 'mode']:
-            players[player_id][key] = value
-    
     players[player_id]['last_update'] = current_time
     
-    # Throttle database updates (only update every DB_UPDATE_INTERVAL seconds)
-    if current_time - last_db_update[player_id] > DB_UPDATE_INTERVAL:
-        last_db_update[player_id] = current_time
+    # The move is only staged here: the next movement tick validates every
+    # staged move at once and applies them (see apply_player_moves)
+    rotation = data.get('rotation')
+    movement_validator.propose(
+        player_id,
+        data.get('position', players[player_id]['position']),
+        data.get('mode'),
+        payload=(socket_id, rotation if isinstance(rotation, (int, float)) else None),
+        now=current_time
+    )
+
+def apply_player_moves(verdicts):
+    """Apply one movement tick's validated player_update frames"""
+    current_time = time.time()
+    # /api/players is rebuilt at most once per movement tick
+    api_responses.invalidate('players')
+    for verdict in verdicts:
+        player_id = verdict.player_id
+        player = players.get(player_id)
+        if player is None:
+            continue
+        socket_id, rotation = verdict.payload
         
-        # Only update necessary fields in Firestore
-        update_data = {
-            'position': players[player_id]['position'],
-            'rotation': players[player_id]['rotation'],
-            'mode': players[player_id]['mode'],
-            'last_update': current_time
-        }
+        # Clamped and rejected moves put the client back in sync
+        if verdict.status != movement_validation.ACCEPTED:
+            socketio.emit('position_corrected', {
+                'position': verdict.position,
+                'mode': verdict.mode,
+                'reason': verdict.status
+            }, to=socket_id)
+            if verdict.status == movement_validation.REJECTED:
+                continue
+        
+        # Update in-memory cache
+        player['position'] = verdict.position
+        if verdict.mode is not None:
+            player['mode'] = verdict.mode
+        if rotation is not None:
+            player['rotation'] = rotation
+        if movement_recorder is not None:
+            movement_recorder.record(player_id, player, current_time)
         
-        firestore_models.Player.update(player_id, **update_data)
+        # Sailing out of this shard's regions hands the player over to their owner;
+        # near a border, the neighbouring shards are kept informed
+        if shard_map.sharded:
+            if not shard_map.owns(player['position']):
+                hand_off(player_id)
+                continue
+            border_sync.publish(player_id, sharding.ghost_state(player_id, player))
+        
+        # Players crossing into a new chunk are announced again so clients that
+        # streamed that chunk earlier learn about them (clients dedupe by id)
+        if players_index.upsert(player_id, player):
+            serialization.broadcast(socketio.server, 'player_joined', player, skip_sid=socket_id)
+            update_entity_rooms(socket_id, player['position'])
+        
+        # Throttle database updates (only update every DB_UPDATE_INTERVAL seconds)
+        if current_time - last_db_update[player_id] > DB_UPDATE_INTERVAL:
+            last_db_update[player_id] = current_time
+            
+            # Only update necessary fields in Firestore
+            update_data = {
+                'position': player['position'],
+                'rotation': player['rotation'],
+                'mode': player['mode'],
+                'last_update': current_time
+            }
+            
+            firestore_models.Player.update(player_id, **update_data)
+        
+        # Broadcast update to all other clients
+        serialization.broadcast(socketio.server, 'player_moved', {
+            'id': player_id,
+            'position': player['position'],
+            'rotation': player['rotation'],
+            'mode': player['mode']
+        }, skip_sid=socket_id)
+        
+        # Continue streaming the world around the player
+        evicted = region_sync.move(socket_id, player['position'])
+        if evicted:
+            socketio.emit('world_region_evicted', {'chunks': evicted}, to=socket_id)
+        stream_world_region(socket_id)
+
+def hand_off(player_id):
+    """Hand a player over to the shard that owns its position"""
+    player = players[player_id]
+    target = shard_map.owner(player['position'])
+    
+    # The target reads the stats and inventory from Firestore, so they are
+    # written now rather than by the next journal replay (if this fails, the
+    # player stays here and the next move tries again). The player's journal
+    # records up to now are covered by this write and are not replayed.
+    covers = action_journal.next_seq - 1
+    firestore_models.Player.merge(player_id, **{stat: player.get(stat, 0) for stat in ('fishCount', 'monsterKills', 'money')})
+    released = inventories.release(player_id)
+    if released is not None:
+        firestore_models.Inventory.put(player_id, released['version'], released['items'])
+    journal_handoff(player_id, covers)
+    players.pop(player_id)
+    ticket = handoff_tickets.issue(target, player_id, {field: player.get(field) for field in sharding.HANDOFF_FIELDS})
     
-    # Broadcast update to all other clients
-    emit('player_moved', {
+    # The client joins the target with the ticket; its sockets here no longer
+    # stand for the player (no grace period, no inactive write)
+    for sid in presence_manager.sids_for(player_id):
+        socketio.emit('shard_handoff', {'shard': target, 'url': shard_map.url(target), 'ticket': ticket}, to=sid)
+        presence_manager.release(sid)
+        region_sync.leave(sid)
+    movement_validator.untrack(player_id)
+    idle_players.untrack(player_id)
+    last_db_update.pop(player_id, None)
+    api_responses.invalidate('players')
+    
+    # Our clients keep seeing the player as a ghost of the target shard, which
+    # refreshes it while the player is near our regions
+    border_sync.withdraw(player_id, keep=target)
+    border_sync.receive({'from': target, 'players': {player_id: sharding.ghost_state(player_id, player)}})
+
+def show_ghosts(states):
+    """Show players of neighbouring shards that are near our regions to our clients"""
+    for player_id, state in states.items():
+        # Indexed like our own players, so region streaming includes them
+        if players_index.upsert(player_id, state):
+            serialization.broadcast(socketio.server, 'player_joined', state)
+        else:
+            serialization.broadcast(socketio.server, 'player_moved', {
+                'id': player_id,
+                'position': state['position'],
+                'rotation': state['rotation'],
+                'mode': state['mode']
+            })
+
+def hide_ghosts(player_ids):
+    """Remove players of neighbouring shards that left our border zone"""
+    for player_id in player_ids:
+        players_index.remove(player_id)
+    serialization.broadcast(socketio.server, 'players_disconnected', {'ids': player_ids})
+
+@socketio.on('heartbeat')
+def handle_heartbeat():
+    # Keeps a player that is not moving from being disconnected as idle
+    player_id = presence_manager.player_for(request.sid)
+    if player_id in players:
+        players[player_id]['last_update'] = time.time()
+
+def broadcast(event, data, include_self=True):
+    """Send an event to every connected client, encoding the payload only once"""
+    skip_sid = None if include_self else request.sid
+    serialization.broadcast(socketio.server, event, data, skip_sid=skip_sid)
+
+def stream_world_region(sid):
+    """Send the next pending batch of world chunks to a client, if any"""
+    batch = region_sync.next_batch(sid)
+    if batch:
+        socketio.emit('world_region', batch, to=sid)
+
+def update_entity_rooms(sid, position):
+    """Put a client in the entity rooms of the chunks around its position, leaving the others"""
+    wanted = {ENTITY_ROOM_PREFIX + key for key in entity_simulation.area_keys(position)}
+    current = {room for room in socketio.server.rooms(sid) if room.startswith(ENTITY_ROOM_PREFIX)}
+    for room in wanted - current:
+        socketio.server.enter_room(sid, room)
+    left = current - wanted
+    for room in left:
+        socketio.server.leave_room(sid, room)
+    if left:
+        # The client drops the entities of chunks it no longer receives
+        socketio.emit('entities_evicted', {'chunks': [room[len(ENTITY_ROOM_PREFIX):] for room in left]}, to=sid)
+
+def publish_entities(payloads):
+    """Send each chunk's replicated entity state to the clients around it"""
+    rooms = socketio.server.manager.rooms.get('/', {})
+    for key, payload in payloads.items():
+        room = ENTITY_ROOM_PREFIX + key
+        # Chunks stay spawned for a while after their last player left
+        if room in rooms:
+            serialization.broadcast(socketio.server, 'entities', payload, room=room)
+
+def credit_stat(player_id, stat, amount, achievement):
+    """Add to a player's stat, journal the new value and announce it"""
+    player = players[player_id]
+    player[stat] = (player.get(stat) or 0) + amount
+    api_responses.invalidate('players')
+    
+    # Journaled, Firestore is updated by the replayer
+    journal_stat_change(player_id, **{stat: player[stat]})
+    
+    # Broadcast achievement to all players
+    broadcast('player_achievement', {
         'id': player_id,
-        'position': players[player_id]['position'],
-        'rotation': players[player_id]['rotation'],
-        'mode': players[player_id]['mode']
-    }, broadcast=True, include_self=False)
+        'name': player['name'],
+        'achievement': achievement,
+        stat: player[stat]
+    })
 
 @socketio.on('player_action')
 def handle_player_action(data):
-    player_id = request.sid
-    action_type = data.get('type')
+    player_id = presence_manager.player_for(request.sid) or request.sid
     
     # Ensure player exists
-    if player_id not in players:
+    if player_id not in players or not isinstance(data, dict):
         return
     
-    if action_type == 'fish_caught':
-        # Increment fish count
-        if 'fishCount' not in players[player_id]:
-            players[player_id]['fishCount'] = 0
-        players[player_id]['fishCount'] += 1
-        
-        # Update player in Firestore
-        firestore_models.Player.update(player_id, 
-                                     fishCount=players[player_id]['fishCount'])
-        
-        # Broadcast achievement to all players
-        emit('player_achievement', {
-            'id': player_id,
-            'name': players[player_id]['name'],
-            'achievement': 'Caught a fish!',
-            'fishCount': players[player_id]['fishCount']
-        }, broadcast=True)
-        
-        # Update leaderboard
-        emit('leaderboard_update', 
-             firestore_models.Player.get_combined_leaderboard(), 
-             broadcast=True)
-    
-    elif action_type == 'monster_killed':
-        # Increment monster kills
-        if 'monsterKills' not in players[player_id]:
-            players[player_id]['monsterKills'] = 0
-        players[player_id]['monsterKills'] += 1
-        
-        # Update player in Firestore
-        firestore_models.Player.update(player_id, 
-                                     monsterKills=players[player_id]['monsterKills'])
-        
-        # Broadcast achievement to all players
-        emit('player_achievement', {
-            'id': player_id,
-            'name': players[player_id]['name'],
-            'achievement': 'Defeated a sea monster!',
-            'monsterKills': players[player_id]['monsterKills']
-        }, broadcast=True)
-        
-        # Update leaderboard
-        emit('leaderboard_update', 
-             firestore_models.Player.get_combined_leaderboard(), 
-             broadcast=True)
+    # Monster kills and money are only credited by entity_hit and entity_collect,
+    # which the server checks; other reported actions are ignored
+    if data.get('action') == 'fish_caught':
+        # The client plays the minigame; the fish comes from a school in reach
+        caught = entity_sim.fish(players[player_id]['position'])
+        if caught is None:
+            emit('fish_caught', {'caught': False})
+            return
+        school_id, fish_type = caught
+        credit_stat(player_id, 'fishCount', 1, f'Caught a {fish_type}!')
+        try:
+            delta = inventories.apply(player_id, {fish_type: 1})
+        except inventory.InvalidChange as e:
+            logger.info(f"Caught {fish_type} not added to the inventory of {player_id}: {e}")
+        else:
+            journal_inventory_change(delta)
+            publish_inventory_delta(player_id, delta)
+        emit('fish_caught', {'caught': True, 'id': school_id, 'type': fish_type})
+
+@socketio.on('entity_hit')
+def handle_entity_hit(data):
+    # A cannonball hit a simulated monster; the server checks the player is in reach
+    player_id = presence_manager.player_for(request.sid) or request.sid
+    if player_id not in players or not isinstance(data, dict):
+        return
+    result = entity_sim.hit(data.get('id'), players[player_id]['position'])
+    if result is None:
+        return
+    if result['killed']:
+        credit_stat(player_id, 'monsterKills', 1, 'Defeated a sea monster!')
+    emit('entity_hit', result)
+
+@socketio.on('entity_collect')
+def handle_entity_collect(data):
+    # Treasure and monster drops are worth money to the first player to reach them
+    player_id = presence_manager.player_for(request.sid) or request.sid
+    if player_id not in players or not isinstance(data, dict):
+        return
+    collected = entity_sim.collect(data.get('id'), players[player_id]['position'])
+    if collected is None:
+        return
+    pickup_type, value = collected
+    credit_stat(player_id, 'money', value, f'Found {value} coins of treasure!')
+    emit('entity_collected', {'id': data.get('id'), 'type': pickup_type, 'value': value})
+
+@socketio.on('inventory_update')
+def handle_inventory_update(data):
+    # Item changes made against version 'base'; only the changed counts travel
+    player_id = presence_manager.player_for(request.sid) or request.sid
+    if player_id not in players or not isinstance(data, dict):
+        return
+    try:
+        delta = inventories.apply(player_id, data.get('changes'))
+    except inventory.InvalidChange as e:
+        # Nothing changed; the client rolls back to the server's inventory
+        emit('inventory_full', {**inventories.snapshot(player_id), 'error': str(e)})
+        return
+    journal_inventory_change(delta)
     
-    elif action_type == 'money_earned':
-        amount = data.get('amount', 0)
-        
-        # Add money
-        if 'money' not in players[player_id]:
-            players[player_id]['money'] = 0
-        players[player_id]['money'] += amount
-        
-        # Update player in Firestore
-        firestore_models.Player.update(player_id, 
-                                     money=players[player_id]['money'])
-        
-        # Broadcast achievement to all players
-        emit('player_achievement', {
-            'id': player_id,
-            'name': players[player_id]['name'],
-            'achievement': f'Earned {amount} coins!',
-            'money': players[player_id]['money']
-        }, broadcast=True)
-        
-        # Update leaderboard
-        emit('leaderboard_update', 
-             firestore_models.Player.get_combined_leaderboard(), 
-             broadcast=True)
+    if data.get('base') == delta.base:
+        # The sender already applied the change and only needs the version
+        emit('inventory_ack', {'version': delta.version})
+    else:
+        emit('inventory_full', inventories.snapshot(player_id))
+    
+    # The player's other sockets (tabs) apply the delta if they hold the base
+    publish_inventory_delta(player_id, delta, skip_sid=request.sid)
+
+def publish_inventory_delta(player_id, delta, skip_sid=None):
+    """Send a Delta to the player's sockets (except skip_sid)"""
+    payload = {'base': delta.base, 'version': delta.version, 'items': delta.items}
+    for sid in presence_manager.sids_for(player_id):
+        if sid != skip_sid:
+            socketio.emit('inventory_delta', payload, to=sid)
+
+@socketio.on('inventory_sync')
+def handle_inventory_sync(data):
+    # Sent after (re)connecting with the version the client holds; a full
+    # inventory only goes out when it diverged
+    player_id = presence_manager.player_for(request.sid) or request.sid
+    if player_id not in players or not isinstance(data, dict):
+        return
+    if inventories.in_sync(player_id, data.get('version')):
+        emit('inventory_ack', {'version': data['version']})
+    else:
+        emit('inventory_full', inventories.snapshot(player_id))
 
 @socketio.on('chat_message')
 def handle_chat_message(data):
-    player_id = request.sid
-    content = data.get('content', '').strip()
+    received = time.perf_counter()
+    player_id = presence_manager.player_for(request.sid) or request.sid
     
-    # Validate message
-    if not content or len(content) > 500:
+    if player_id not in players or not isinstance(data, dict) or not isinstance(data.get('content'), str):
         return
     
-    # Create message in Firestore
-    message = firestore_models.Message.create(
-        player_id,
-        content,
-        message_type='global'
-    )
+    # Validated, journaled and broadcast without waiting for Firestore
+    chat.submit(player_id, data['content'], message_type='global', received=received)
+
+def deliver_chat_message(message):
+    """Broadcast a new chat message"""
+    # Keep the cached chat history for joining players current
+    join_snapshots.add_chat_message(message)
     
-    if message:
-        # Broadcast message to all clients
-        emit('chat_message', message, broadcast=True)
+    # Broadcast message to all clients
+    serialization.broadcast(socketio.server, 'chat_message', message)
 
 # API endpoints
 @app.route('/api/players', methods=['GET'])
 def get_players():
-    """Get all active players"""
-    active_players = [p for p in players.values() if p.get('active', False)]
-    return jsonify(active_players)
+    """Get all active players (cached until a player joins, moves, leaves or scores)"""
+    return api_responses.respond(
+        'players',
+        lambda: [p for p in players.values() if p.get('active', False)],
+        PLAYERS_CACHE_CONTROL
+    )
 
 @app.route('/api/players/<player_id>', methods=['GET'])
 def get_player(player_id):
@@ -428,20 +1014,38 @@ def get_player(player_id):
 
 @app.route('/api/islands', methods=['GET'])
 def get_islands():
-    """Get all islands"""
-    return jsonify(list(islands.values()))
+    """Get all islands (cached until islands are created)"""
+    return api_responses.respond('islands', lambda: list(islands.values()), ISLANDS_CACHE_CONTROL)
+
+@app.route('/api/world/chunk/<int(signed=True):chunk_x>/<int(signed=True):chunk_z>', methods=['GET'])
+def get_world_chunk(chunk_x, chunk_z):
+    """Get the procedurally generated islands of a chunk"""
+    return jsonify(worldgen.get_chunk(chunk_x, chunk_z))
+
+@app.route('/api/world/nearby', methods=['GET'])
+def get_world_nearby():
+    """Get procedural islands near a world position"""
+    try:
+        x = float(request.args['x'])
+        z = float(request.args['z'])
+        distance = min(float(request.args.get('distance', 500)), worldgen.CHUNK_SIZE * worldgen.MAX_VIEW_DISTANCE)
+    except (KeyError, ValueError):
+        return jsonify({'error': 'x and z are required numbers'}), 400
+
+    nearby = worldgen.islands_near(x, z, distance)
+    return jsonify([{**island, 'distance': d} for d, island in nearby])
 
 @app.route('/api/leaderboard', methods=['GET'])
 def get_leaderboard():
-    """Get the combined leaderboard"""
-    return jsonify(firestore_models.Player.get_combined_leaderboard())
+    """Get the combined leaderboard (the welcome payload's, rebuilt when journaled stats are applied)"""
+    return api_responses.respond('leaderboard', lambda: join_snapshots.get('leaderboard'), LEADERBOARD_CACHE_CONTROL)
 
 @app.route('/api/messages', methods=['GET'])
 def get_messages():
     """Get recent chat messages"""
     message_type = request.args.get('type', 'global')
     limit = int(request.args.get('limit', 50))
-    messages = firestore_models.Message.get_recent_messages(limit=limit, message_type=message_type)
+    messages = chat_store.recent(limit=limit, channel=message_type)
     return jsonify(messages)
 
 @app.route('/api/admin/create_island', methods=['POST'])
@@ -453,66 +1057,123 @@ def create_island():
     if not data or 'position' not in data:
         return jsonify({'error': 'Invalid island data'}), 400
     
-    # Generate island ID
-    island_id = f"island_{int(time.time())}"
+    # Generate island ID (unique even for islands created in the same second)
+    island_id = firestore_models.Island.new_id()
     
     # Create island in Firestore
     island = firestore_models.Island.create(island_id, **data)
     
     # Add to cache
     islands[island_id] = island
+    islands_index.upsert(island_id, island)
+    api_responses.invalidate('islands')
     
     # Broadcast to all clients
-    socketio.emit('island_created', island)
+    broadcast('island_created', island)
     
     return jsonify(island)
 
+@app.route('/api/admin/import_islands', methods=['POST'])
+def import_islands():
+    """
+    Admin endpoint to create many islands at once
+    Body: JSON array (or {"islands": [...]}) or NDJSON, one island per line.
+    Islands are validated first (any error rejects the import), written with
+    batched writes and announced with a single islands_created broadcast.
+    """
+    try:
+        records = island_import.parse(request.get_data(), request.content_type or '')
+        islands_by_id = island_import.prepare(records, firestore_models.Island.new_id)
+    except island_import.InvalidImport as e:
+        return jsonify({'error': str(e), 'errors': e.errors}), 400
+    
+    created = firestore_models.Island.bulk_create(islands_by_id)
+    
+    # Update the cache and the spatial index once for the whole import
+    islands.update(created)
+    chunks = islands_index.upsert_many(created)
+    api_responses.invalidate('islands')
+    
+    serialization.broadcast(socketio.server, 'islands_created', {'islands': list(created.values())})
+    logger.info(f"Imported {len(created)} islands into {chunks} chunks")
+    
+    return jsonify({'imported': len(created), 'ids': list(created)})
+
+@app.route(sharding.BORDER_PATH, methods=['POST'])
+def receive_border_update():
+    """Shard-to-shard: players of a neighbouring shard near our regions"""
+    if not shard_map.sharded:
+        return jsonify({'error': 'Sharding is not enabled'}), 404
+    if not sharding.authorized(request.headers.get(sharding.SECRET_HEADER), SHARD_SECRET):
+        return jsonify({'error': 'Forbidden'}), 403
+    border_sync.receive(request.get_json())
+    return '', 204
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Server metrics in the Prometheus text format"""
+    return server_metrics.render(), 200, {'Content-Type': metrics.CONTENT_TYPE}
+
+@app.route('/api/admin/profile', methods=['GET', 'POST'])
+def run_profiler():
+    """
+    Admin endpoint: sample every thread's stack for ?seconds= (default 10) at ?hz= (default 100)
+    Returns collapsed stacks for flamegraphs, prefixed with firestore/cpu/wait;
+    ?format=json returns a summary instead, ?idle=1 keeps stacks outside the handlers
+    """
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        hz = int(request.args.get('hz', profiler.DEFAULT_HZ))
+        if not math.isfinite(seconds):
+            raise ValueError(seconds)
+    except ValueError:
+        return jsonify({'error': 'seconds and hz must be numbers'}), 400
+    
+    result = profiler.profile(__file__, seconds, socketio.sleep, hz=hz, include_idle=request.args.get('idle') == '1')
+    if result is None:
+        return jsonify({'error': 'A profile is already running'}), 409
+    
+    if request.args.get('format') == 'json':
+        return jsonify(result.summary())
+    return result.collapsed(), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+
+@app.route('/api/admin/firestore_ops', methods=['GET'])
+def get_firestore_ops():
+    """Admin endpoint: Firestore operations and round-trip time per handler (?reset=1 clears them)"""
+    stats = firestore_ops.stats()
+    if request.args.get('reset') == '1':
+        firestore_ops.reset()
+    return jsonify(stats)
+
 # Serve static files
 @app.route('/files/<path:filename>')
 def serve_static_file(filename):
     """
     Serve static files from the static directory
     Access files via: http://localhost:5000/files/models/boat.glb
+    Append ?v=<content hash> (see /file-system-info) for an immutable, cache-forever URL
     """
-    try:
-        logger.info(f"Serving static file: {filename}")
-        response = send_from_directory(STATIC_FILES_DIR, filename)
-        
-        # Add CORS headers if needed
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        response.headers['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
-        
-        # Log the MIME type for debugging
-        logger.info(f"Serving {filename} with MIME type: {response.mimetype}")
-        
-        return response
-    except Exception as e:
-        logger.error(f"Error serving static file {filename}: {e}")
+    response = static_files.serve(filename)
+    if response is None:
         return jsonify({
             'success': False,
-            'error': f"File not found or error: {str(e)}"
+            'error': f"File not found: {filename}"
         }), 404
+    
+    # Add CORS headers if needed
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
+    
+    return response
 
 # Add an info endpoint to help with debugging file paths
 @app.route('/file-system-info')
 def file_system_info():
     """Return information about the static file system configuration"""
-    files = []
-    
-    # Walk through the static directory and list all files
-    for root, dirs, filenames in os.walk(STATIC_FILES_DIR):
-        for filename in filenames:
-            # Get relative path
-            rel_path = os.path.relpath(os.path.join(root, filename), STATIC_FILES_DIR)
-            files.append({
-                'path': rel_path,
-                'url': f"/files/{rel_path.replace(os.sep, '/')}",
-                'mime': mimetypes.guess_type(filename)[0]
-            })
-            
     return jsonify({
         'static_dir': STATIC_FILES_DIR,
-        'files': files,
+        'files': static_files.file_list(),
+        'hot_cache': static_files.hot_files.stats(),
         'mime_types': {
             '.glb': mimetypes.guess_type('model.glb')[0],
             '.gltf': mimetypes.guess_type('model.gltf')[0],
@@ -0,0 +1,194 @@
+import os
+import re
+import time
+import heapq
+import hashlib
+import logging
+import threading
+
+import requests
+from google.auth import jwt as google_jwt
+from firebase_admin import auth as firebase_auth
+
+logger = logging.getLogger(__name__)
+
+# Public keys used to sign Firebase ID tokens
+ID_TOKEN_CERT_URI = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+ID_TOKEN_ISSUER_PREFIX = 'https://securetoken.google.com/'
+
+# Refresh the keys when this fraction of their max-age has passed
+KEY_REFRESH_FRACTION = 0.8
+# Used when the response has no max-age, and as the retry delay after a failure
+DEFAULT_KEY_MAX_AGE = 3600
+KEY_RETRY_DELAY = 30
+
+# Failed verifications are remembered this long
+NEGATIVE_TTL = 30
+# Upper bound on cached tokens (earliest-expiring entries are dropped first)
+MAX_CACHED_TOKENS = 100000
+
+
+def token_key(token):
+    """Cache key for a token; raw tokens are never stored"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class PublicKeyStore:
+    """Firebase signing certificates, prefetched and refreshed in the background"""
+
+    def __init__(self, cert_url=ID_TOKEN_CERT_URI, timeout=10):
+        self.cert_url = cert_url
+        self.timeout = timeout
+        self.certs = {}
+        self.expires_at = 0
+        self.refreshes = 0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Fetch the certificates; returns seconds until the next refresh"""
+        try:
+            response = requests.get(self.cert_url, timeout=self.timeout)
+            response.raise_for_status()
+            certs = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"Failed to fetch Firebase signing keys: {e}")
+            return KEY_RETRY_DELAY
+
+        match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+        max_age = int(match.group(1)) if match else DEFAULT_KEY_MAX_AGE
+
+        with self._lock:
+            self.certs = certs
+            self.expires_at = time.time() + max_age
+            self.refreshes += 1
+
+        logger.debug(f"Fetched {len(certs)} Firebase signing keys (max-age {max_age}s)")
+        return max(KEY_RETRY_DELAY, max_age * KEY_REFRESH_FRACTION)
+
+    def get(self, kid):
+        """Get the certificate for a key ID, or None if unknown or expired"""
+        if time.time() >= self.expires_at:
+            return None
+        return self.certs.get(kid)
+
+    def run(self, sleep):
+        """Refresh loop for a background task"""
+        while True:
+            sleep(self.refresh())
+
+
+class TokenCache:
+    """Verification results keyed by token hash, evicted when they expire"""
+
+    def __init__(self, max_size=MAX_CACHED_TOKENS):
+        self.max_size = max_size
+        self._entries = {}
+        self._expiry = []
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        while self._expiry and (self._expiry[0][0] <= now or len(self._entries) > self.max_size):
+            expires_at, key = heapq.heappop(self._expiry)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == expires_at:
+                del self._entries[key]
+
+    def get(self, key):
+        """
+        Look up a token
+
+        :return: (True, uid) for a cached success, (True, None) for a cached
+                 failure, (False, None) if the token is not cached
+        """
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(key)
+        if entry is None or entry[1] <= now:
+            return False, None
+        return True, entry[0]
+
+    def put(self, key, uid, expires_at):
+        """Cache a result until expires_at"""
+        with self._lock:
+            self._entries[key] = (uid, expires_at)
+            heapq.heappush(self._expiry, (expires_at, key))
+            self._evict(time.time())
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class AuthVerifier:
+    """
+    Firebase ID token verification with caching
+
+    Tokens are verified locally against the prefetched public keys (falling
+    back to firebase_admin when a key is unknown, no project ID is configured,
+    or the auth emulator is used). Successful results are cached until the
+    token expires and failures for NEGATIVE_TTL seconds, so a reconnecting
+    client presenting the same token is not verified again.
+    """
+
+    def __init__(self, project_id=None, key_store=None, cache=None):
+        self.project_id = project_id
+        self.keys = key_store or PublicKeyStore()
+        self.cache = cache or TokenCache()
+        self.stats = {'hits': 0, 'negative_hits': 0, 'local': 0, 'remote': 0, 'failures': 0}
+
+    def start(self, spawn, sleep):
+        """Prefetch the signing keys and keep them fresh in a background task"""
+        if self._local_verification_enabled():
+            spawn(self.keys.run, sleep)
+
+    def _local_verification_enabled(self):
+        return bool(self.project_id) and not os.environ.get('FIREBASE_AUTH_EMULATOR_HOST')
+
+    def _verify_locally(self, token):
+        """Verify signature and Firebase claims; returns claims, or None if the key is not available"""
+        header = google_jwt.decode_header(token)
+        if header.get('alg') != 'RS256':
+            raise ValueError(f"Unexpected token algorithm: {header.get('alg')}")
+
+        cert = self.keys.get(header.get('kid'))
+        if cert is None:
+            return None
+
+        # Checks signature, expiry, issue time and audience
+        claims = google_jwt.decode(token, certs={header['kid']: cert}, audience=self.project_id)
+
+        if claims.get('iss') != ID_TOKEN_ISSUER_PREFIX + self.project_id:
+            raise ValueError(f"Unexpected token issuer: {claims.get('iss')}")
+        subject = claims.get('sub')
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise ValueError("Token has an invalid subject")
+
+        claims['uid'] = subject
+        return claims
+
+    def verify(self, token):
+        """Return the UID of a valid token, or None"""
+        if not token:
+            return None
+
+        key = token_key(token)
+        cached, uid = self.cache.get(key)
+        if cached:
+            self.stats['hits' if uid else 'negative_hits'] += 1
+            return uid
+
+        try:
+            claims = self._verify_locally(token) if self._local_verification_enabled() else None
+            if claims is not None:
+                self.stats['local'] += 1
+            else:
+                claims = firebase_auth.verify_id_token(token)
+                self.stats['remote'] += 1
+        except Exception as e:
+            self.stats['failures'] += 1
+            logger.warning(f"Firebase token verification failed: {e}")
+            self.cache.put(key, None, time.time() + NEGATIVE_TTL)
+            return None
+
+        self.cache.put(key, claims['uid'], float(claims.get('exp', time.time() + NEGATIVE_TTL)))
+        return claims['uid']
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+import json
+import time
+import random
+import argparse
+
+import socketio
+from socketio import packet as socketio_packet
+
+import serialization
+
+
+def make_server(recipients):
+    """Socket.IO server with fake connected clients whose transport discards packets"""
+    server = socketio.Server()
+    server.eio.send = lambda eio_sid, data: None
+    for i in range(recipients):
+        server.manager.connect(f'eio_{i}', '/')
+    return server
+
+
+def make_payloads():
+    """Representative broadcast payloads"""
+    color = {'r': 0.3, 'g': 0.6, 'b': 0.8}
+    leaderboard = {
+        category: [{'name': f'Sailor {i}', 'value': random.randint(0, 1000), 'color': color} for i in range(10)]
+        for category in ['fishCount', 'monsterKills', 'money']
+    }
+    islands = [
+        {
+            'id': f'island_{i}',
+            'position': {'x': random.uniform(-5000, 5000), 'y': 0, 'z': random.uniform(-5000, 5000)},
+            'radius': 50,
+            'type': 'default',
+            'created_at': str(time.time())
+        } for i in range(200)
+    ]
+    return {
+        'player_moved': {
+            'id': 'firebase_abcdefghijklmnop',
+            'position': {'x': 123.456, 'y': 0.5, 'z': -789.012},
+            'rotation': 1.5707963,
+            'mode': 'boat'
+        },
+        'leaderboard_update': leaderboard,
+        'islands': islands
+    }
+
+
+def cpu_per_call(fn, iterations):
+    """CPU seconds per call"""
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations
+
+
+def run(recipients, iterations):
+    server = make_server(recipients)
+    results = {'recipients': recipients, 'iterations': iterations, 'payloads': {}}
+
+    for name, payload in make_payloads().items():
+        row = {}
+
+        # What python-socketio does by default: encode once per recipient
+        socketio_packet.Packet.json = json
+        row['per_recipient_stdlib_ms'] = cpu_per_call(lambda: server.emit(name, payload), iterations) * 1000
+
+        socketio_packet.Packet.json = serialization
+        for encoder in serialization.ENCODERS:
+            serialization.set_encoder(encoder)
+            row[f'encode_once_{encoder}_ms'] = cpu_per_call(
+                lambda: serialization.broadcast(server, name, payload), iterations) * 1000
+
+        # Shared payload that was encoded earlier and is only spliced in
+        cached = serialization.RawJSON.encode(payload)
+        row['encode_once_cached_ms'] = cpu_per_call(
+            lambda: serialization.broadcast(server, name, cached), iterations) * 1000
+
+        row['encoded_bytes'] = len(serialization.dumps([name, payload]))
+        results['payloads'][name] = row
+
+    serialization.set_encoder(serialization.DEFAULT_ENCODER)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='CPU cost per broadcast with and without encode-once')
+    parser.add_argument('--recipients', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--json', action='store_true', help='Print machine-readable JSON only')
+    args = parser.parse_args()
+
+    results = run(args.recipients, args.iterations)
+    if args.json:
+        print(json.dumps(results))
+    else:
+        print(f"\n===== BROADCAST BENCHMARK ({results['recipients']} recipients) =====")
+        for name, row in results['payloads'].items():
+            print(f"\n{name} ({row['encoded_bytes']} bytes)")
+            for key, value in row.items():
+                if key.endswith('_ms'):
+                    print(f"  {key[:-3]:<28} {value:8.3f} ms CPU per broadcast")
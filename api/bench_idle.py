@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+import json
+import time
+import random
+import argparse
+
+import idle_sweeper
+
+
+def simulate(player_count, duration, idle_fraction, timeout):
+    """
+    Sweep cost with player_count tracked players over duration simulated seconds
+
+    Every second, active players send an update (only last_update changes);
+    idle players never do and are expired once the timeout passes. The
+    timer wheel is compared with a scan of every player per sweep.
+    """
+    start_time = 1_000_000.0
+    # Players joined at different times over the last timeout period
+    players = {
+        f'player_{i}': {'active': True, 'last_update': start_time - random.uniform(0, timeout)}
+        for i in range(player_count)
+    }
+    idle_ids = set(random.sample(sorted(players), int(player_count * idle_fraction)))
+    active_ids = [player_id for player_id in players if player_id not in idle_ids]
+
+    def last_seen(player_id):
+        player = players[player_id]
+        return player['last_update'] if player['active'] else None
+
+    expired = []
+    sweeper = idle_sweeper.IdleSweeper(
+        last_seen, expired.extend, timeout=timeout,
+        wheel=idle_sweeper.TimerWheel(now=start_time)
+    )
+
+    track_start = time.process_time()
+    for player_id in players:
+        sweeper.track(player_id, now=start_time)
+    track_seconds = time.process_time() - track_start
+
+    wheel_sweeps = []
+    scan_sweeps = []
+    for second in range(1, duration + 1):
+        now = start_time + second
+        for player_id in active_ids:
+            players[player_id]['last_update'] = now - random.random()
+
+        sweep_start = time.process_time()
+        sweeper.sweep(now)
+        wheel_sweeps.append(time.process_time() - sweep_start)
+
+        # Baseline: look at every player on every sweep
+        scan_start = time.process_time()
+        [player_id for player_id, player in players.items()
+         if player['active'] and now - player['last_update'] > timeout]
+        scan_sweeps.append(time.process_time() - scan_start)
+
+    assert set(expired) == idle_ids, "Timer wheel expired the wrong players"
+
+    return {
+        'players': player_count,
+        'idle_players': len(idle_ids),
+        'duration': duration,
+        'timeout': timeout,
+        'track_us_per_player': track_seconds / player_count * 1e6,
+        'wheel_sweep_mean_ms': sum(wheel_sweeps) / len(wheel_sweeps) * 1000,
+        'wheel_sweep_max_ms': max(wheel_sweeps) * 1000,
+        'scan_sweep_mean_ms': sum(scan_sweeps) / len(scan_sweeps) * 1000,
+        'scan_sweep_max_ms': max(scan_sweeps) * 1000,
+        'rescheduled': sweeper.stats['rescheduled'],
+        'expired': len(expired)
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Idle sweeper cost: timer wheel vs full scan')
+    parser.add_argument('--players', type=int, default=100000)
+    parser.add_argument('--duration', type=int, default=150, help='Simulated seconds')
+    parser.add_argument('--idle-fraction', type=float, default=0.05)
+    parser.add_argument('--timeout', type=float, default=idle_sweeper.DEFAULT_IDLE_TIMEOUT)
+    parser.add_argument('--json', action='store_true', help='Print machine-readable JSON only')
+    args = parser.parse_args()
+
+    results = simulate(args.players, args.duration, args.idle_fraction, args.timeout)
+    if args.json:
+        print(json.dumps(results))
+    else:
+        print(f"\n===== IDLE SWEEP BENCHMARK ({results['players']} players, {results['duration']}s) =====")
+        print(f"Track:        {results['track_us_per_player']:.2f} us per player")
+        print(f"Timer wheel:  {results['wheel_sweep_mean_ms']:.3f} ms mean, {results['wheel_sweep_max_ms']:.3f} ms max per sweep")
+        print(f"Full scan:    {results['scan_sweep_mean_ms']:.3f} ms mean, {results['scan_sweep_max_ms']:.3f} ms max per sweep")
+        print(f"Rescheduled:  {results['rescheduled']}, expired: {results['expired']}/{results['idle_players']}")
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+import io
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import contextlib
+
+# Presence ticks are not needed here, and their thread would keep the process alive
+os.environ['BACKGROUND_TASKS'] = '0'
+
+from fake_firestore import FakeFirestore, patch_firebase
+import chat_storage
+
+
+def seed_database(fake_db, num_players, num_messages, num_islands):
+    """Fill the fake Firestore with players, messages (legacy collection and chat buckets) and islands"""
+    for i in range(num_players):
+        fake_db.collection('players').document(f'firebase_uid_{i}').set({
+            'name': f'Sailor {i}',
+            'color': {'r': random.random(), 'g': random.random(), 'b': random.random()},
+            'position': {'x': random.uniform(-50000, 50000), 'y': 0, 'z': random.uniform(-50000, 50000)},
+            'rotation': 0,
+            'mode': 'boat',
+            'last_update': time.time(),
+            'fishCount': random.randint(0, 500),
+            'monsterKills': random.randint(0, 100),
+            'money': random.randint(0, 10000),
+            'active': False
+        })
+    buckets = {}
+    # One message per second up to now, moved back to the previous hour if they
+    # would straddle an hour boundary: chat reads then do not depend on the clock
+    first = time.time() - num_messages
+    current_hour = chat_storage.hour_key(time.time())
+    if chat_storage.hour_key(first) != current_hour and num_messages < chat_storage.BUCKET_SECONDS:
+        first = chat_storage.hour_start(current_hour) - num_messages
+    for i in range(num_messages):
+        message = {
+            'sender_id': f'firebase_uid_{random.randrange(max(num_players, 1))}',
+            'content': f'Ahoy {i}',
+            'timestamp': first + i,
+            'message_type': 'global'
+        }
+        fake_db.collection('messages').document(f'message_{i}').set(message)
+        hour = chat_storage.hour_key(message['timestamp'])
+        shard = 0
+        while len(buckets.get(chat_storage.bucket_id('global', hour, shard), [])) >= chat_storage.MAX_BUCKET_MESSAGES:
+            shard += 1
+        buckets.setdefault(chat_storage.bucket_id('global', hour, shard), []).append(
+            chat_storage.compact(f'message_{i}', message))
+    for bucket, records in buckets.items():
+        channel, hour, shard = chat_storage.parse_bucket_id(bucket)
+        fake_db.collection(chat_storage.BUCKETS_COLLECTION).document(bucket).set({
+            'channel': channel, 'hour': hour, 'shard': shard, 'messages': records
+        })
+    if buckets:
+        fake_db.collection(chat_storage.CHANNELS_COLLECTION).document('global').set({'buckets': sorted(buckets)})
+    for i in range(num_islands):
+        fake_db.collection('islands').document(f'island_{i}').set({
+            'position': {'x': random.uniform(-50000, 50000), 'y': 0, 'z': random.uniform(-50000, 50000)},
+            'radius': 50,
+            'type': 'default'
+        })
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def run(args):
+    fake_db = patch_firebase(FakeFirestore())
+    seed_database(fake_db, args.players, args.messages, args.islands)
+
+    # app.py loads everything from Firestore at import time
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as server
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # Tokens are "bench:<uid>"; real verification is out of scope here
+    server.verify_firebase_token = lambda token: token.split(':', 1)[1]
+
+    latencies = []
+    ops_per_join = []
+    clients = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(args.joins):
+            client = server.socketio.test_client(server.app)
+            clients.append(client)
+
+            if args.cold:
+                server.join_snapshots.invalidate('leaderboard')
+                server.join_snapshots.invalidate('chat_history')
+
+            # Half of the joins are reconnects of known players, half are new
+            uid = f'uid_{random.randrange(args.players)}' if i % 2 == 0 and args.players else f'new_{i}'
+            before = fake_db.snapshot_ops()
+            start = time.perf_counter()
+            client.emit('player_join', {
+                'name': f'Bench {i}',
+                'position': {'x': random.uniform(-1000, 1000), 'y': 0, 'z': random.uniform(-1000, 1000)},
+                'mode': 'boat',
+                'firebaseUid': uid,
+                'firebaseToken': f'bench:{uid}'
+            })
+            latencies.append(time.perf_counter() - start)
+            after = fake_db.snapshot_ops()
+            ops_per_join.append(sum(after.values()) - sum(before.values()))
+
+            client.get_received()
+
+    for client in clients:
+        client.disconnect()
+
+    return {
+        'joins': args.joins,
+        'cold': args.cold,
+        'players': args.players,
+        'messages': args.messages,
+        'islands': args.islands,
+        'latency_ms': {
+            'p50': percentile(latencies, 50) * 1000,
+            'p99': percentile(latencies, 99) * 1000,
+            'max': max(latencies) * 1000
+        },
+        'firestore_ops_per_join': {
+            'mean': sum(ops_per_join) / len(ops_per_join),
+            'max': max(ops_per_join)
+        },
+        'snapshot_cache': server.join_snapshots.stats()
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark player_join latency and Firestore ops')
+    parser.add_argument('--players', type=int, default=2000)
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--islands', type=int, default=2000)
+    parser.add_argument('--joins', type=int, default=300)
+    parser.add_argument('--cold', action='store_true', help='Invalidate the join snapshot before every join')
+    parser.add_argument('--json', action='store_true', help='Print machine-readable JSON only')
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.json:
+        print(json.dumps(results))
+    else:
+        print("\n===== JOIN BENCHMARK =====")
+        print(f"Joins: {results['joins']} ({'cold' if results['cold'] else 'warm'} snapshot cache)")
+        print(f"Latency p50: {results['latency_ms']['p50']:.2f} ms, p99: {results['latency_ms']['p99']:.2f} ms")
+        print(f"Firestore ops per join: {results['firestore_ops_per_join']['mean']:.1f} "
+              f"(max {results['firestore_ops_per_join']['max']})")
+        print(f"Snapshot cache: {results['snapshot_cache']}")
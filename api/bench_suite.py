@@ -0,0 +1,612 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for firestore_models and the Socket.IO handlers
+
+Every benchmark runs against the in-memory Firestore (optionally with
+injected round-trip latency) and reports wall time and Firestore operations
+per call. Results can be saved as a JSON baseline and later runs compared
+against it; more Firestore operations per call, or a p50 slower than the
+tolerance allows, is reported as a regression (exit status 1).
+
+    python bench_suite.py --save-baseline bench_baseline.json
+    python bench_suite.py --compare bench_baseline.json
+    python bench_suite.py --latency-ms 20 --filter handler.
+"""
+import gc
+import io
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import contextlib
+
+# Presence ticks and idle sweeps are driven by the benchmarks themselves
+os.environ['BACKGROUND_TASKS'] = '0'
+
+import flask
+
+from fake_firestore import FakeFirestore, patch_firebase
+from bench_join import seed_database, percentile
+
+OP_KINDS = ('read', 'write', 'query', 'batch_commit')
+
+# p50 changes smaller than this are noise, whatever the tolerance
+MIN_LATENCY_DELTA_MS = 0.05
+
+BENCHMARKS = {}
+
+
+def benchmark(name, iterations=None):
+    """
+    Register a benchmark
+
+    The decorated function receives the BenchContext and returns either
+    op(i) or a (prepare, op) pair; prepare(i) runs outside the timed region
+    and its return value is passed to op.
+    """
+    def register(fn):
+        BENCHMARKS[name] = (fn, iterations)
+        return fn
+    return register
+
+
+class BenchContext:
+    """The server module, the fake Firestore and helpers to call handlers"""
+
+    def __init__(self, server, fake_db, num_players):
+        self.server = server
+        self.db = fake_db
+        self.models = server.firestore_models
+        self.num_players = num_players
+        self.rng = random.Random(1)
+        self.sids = []
+        self.http = server.app.test_client()
+
+    @staticmethod
+    def _send_packet(eio_sid, pkt):
+        # Encode like the real transport would, then drop the packet
+        pkt.encode()
+
+    def connect(self):
+        """Connect a test client and return its Socket.IO session ID"""
+        sio = self.server.socketio
+        client = sio.test_client(self.server.app)
+        # The test client decodes and queues every packet for every client,
+        # which would make broadcasts grow more expensive as a run goes on
+        sio.server._send_packet = self._send_packet
+        sid = sio.server.manager.sid_from_eio_sid(client.eio_sid, '/')
+        self.sids.append(sid)
+        return sid
+
+    def drop(self, sid):
+        """Remove a socket from the server without running handlers"""
+        manager = self.server.socketio.server.manager
+        if manager.is_connected(sid, '/'):
+            manager.disconnect(sid, '/')
+
+    def cleanup(self):
+        """Drop every socket connected by the last benchmark, so each starts with the same audience"""
+        for sid in self.sids:
+            self.drop(sid)
+        self.sids = []
+
+    def call(self, handler, sid, *args):
+        """Invoke an event handler directly, as if sent by the socket"""
+        with self.server.app.test_request_context('/socket.io'):
+            flask.request.sid = sid
+            flask.request.namespace = '/'
+            return handler(*args)
+
+    def get(self, path, **headers):
+        """GET a REST endpoint"""
+        return self.http.get(path, headers=headers)
+
+    def join(self, name='Bench'):
+        """Connect and join a new (socket-ID) player; returns its sid"""
+        sid = self.connect()
+        self.call(self.server.handle_player_join, sid, {'name': name, 'position': self.position()})
+        return sid
+
+    def position(self):
+        return {'x': self.rng.uniform(-1000, 1000), 'y': 0, 'z': self.rng.uniform(-1000, 1000)}
+
+    def step(self, player_id):
+        """A position within a boat's reach of a player's current one (passes movement validation)"""
+        position = self.server.players[player_id]['position']
+        return {'x': position['x'] + self.rng.uniform(-2, 2), 'y': 0, 'z': position['z'] + self.rng.uniform(-2, 2)}
+
+    def existing_player_id(self):
+        return f'firebase_uid_{self.rng.randrange(self.num_players)}'
+
+
+# ---- firestore_models ----
+
+@benchmark('model.Player.get')
+def bench_player_get(ctx):
+    return lambda i: ctx.models.Player.get(ctx.existing_player_id())
+
+
+@benchmark('model.Player.create')
+def bench_player_create(ctx):
+    return lambda i: ctx.models.Player.create(f'bench_created_{i}', name=f'Created {i}')
+
+
+@benchmark('model.Player.update')
+def bench_player_update(ctx):
+    return lambda i: ctx.models.Player.update(ctx.existing_player_id(), position=ctx.position())
+
+
+@benchmark('model.Player.bulk_update_50', iterations=50)
+def bench_player_bulk_update(ctx):
+    def prepare(i):
+        return {f'firebase_uid_{(i * 50 + j) % ctx.num_players}': {'active': False} for j in range(50)}
+    return prepare, lambda updates: ctx.models.Player.bulk_update(updates)
+
+
+@benchmark('model.Player.get_all', iterations=20)
+def bench_player_get_all(ctx):
+    return lambda i: ctx.models.Player.get_all()
+
+
+@benchmark('model.Player.get_active_players', iterations=50)
+def bench_player_get_active(ctx):
+    return lambda i: ctx.models.Player.get_active_players()
+
+
+@benchmark('model.Player.get_leaderboard', iterations=50)
+def bench_player_get_leaderboard(ctx):
+    return lambda i: ctx.models.Player.get_leaderboard('fishCount')
+
+
+@benchmark('model.Player.get_combined_leaderboard', iterations=50)
+def bench_player_get_combined_leaderboard(ctx):
+    return lambda i: ctx.models.Player.get_combined_leaderboard()
+
+
+@benchmark('model.Island.get')
+def bench_island_get(ctx):
+    return lambda i: ctx.models.Island.get(f'island_{i % 100}')
+
+
+@benchmark('model.Island.create')
+def bench_island_create(ctx):
+    return lambda i: ctx.models.Island.create(f'bench_island_{i}', position=ctx.position())
+
+
+@benchmark('model.Island.get_all', iterations=20)
+def bench_island_get_all(ctx):
+    return lambda i: ctx.models.Island.get_all()
+
+
+@benchmark('model.Message.create')
+def bench_message_create(ctx):
+    return lambda i: ctx.models.Message.create(ctx.existing_player_id(), f'Bench message {i}')
+
+
+@benchmark('model.Message.get_recent_messages', iterations=50)
+def bench_message_get_recent(ctx):
+    return lambda i: ctx.models.Message.get_recent_messages(limit=50)
+
+
+@benchmark('model.ChatStore.recent', iterations=50)
+def bench_chat_store_recent(ctx):
+    return lambda i: ctx.server.chat_store.recent(limit=50)
+
+
+@benchmark('model.write_in_batches_100', iterations=50)
+def bench_write_in_batches(ctx):
+    collection = ctx.db.collection('bench_batches')
+
+    def prepare(i):
+        return [('set', collection.document(f'doc_{i}_{j}'), {'value': j}) for j in range(100)]
+    return prepare, lambda operations: ctx.models.write_in_batches(operations)
+
+
+# ---- REST endpoints ----
+
+@benchmark('http.players', iterations=200)
+def bench_http_players(ctx):
+    for _ in range(50):
+        ctx.join()
+    return lambda i: ctx.get('/api/players', **{'Accept-Encoding': 'gzip'})
+
+
+@benchmark('http.players.not_modified', iterations=200)
+def bench_http_players_not_modified(ctx):
+    for _ in range(50):
+        ctx.join()
+    etag = ctx.get('/api/players').headers['ETag']
+    return lambda i: ctx.get('/api/players', **{'If-None-Match': etag})
+
+
+@benchmark('http.islands', iterations=200)
+def bench_http_islands(ctx):
+    return lambda i: ctx.get('/api/islands', **{'Accept-Encoding': 'gzip'})
+
+
+@benchmark('http.leaderboard', iterations=200)
+def bench_http_leaderboard(ctx):
+    return lambda i: ctx.get('/api/leaderboard', **{'Accept-Encoding': 'gzip'})
+
+
+@benchmark('http.leaderboard.rebuild', iterations=50)
+def bench_http_leaderboard_rebuild(ctx):
+    # After journaled stat changes were applied: queried, encoded and gzipped again
+    def prepare(i):
+        ctx.server.join_snapshots.invalidate('leaderboard')
+        ctx.server.api_responses.invalidate('leaderboard')
+        return None
+    return prepare, lambda _: ctx.get('/api/leaderboard', **{'Accept-Encoding': 'gzip'})
+
+
+# ---- Socket.IO handlers ----
+
+@benchmark('handler.player_join.new')
+def bench_join_new(ctx):
+    def prepare(i):
+        return ctx.connect()
+    return prepare, lambda sid: ctx.call(
+        ctx.server.handle_player_join, sid, {'name': 'Bench', 'position': ctx.position()})
+
+
+@benchmark('handler.player_join.returning')
+def bench_join_returning(ctx):
+    def prepare(i):
+        uid = f'uid_{(i * 7) % ctx.num_players}'
+        return ctx.connect(), uid
+    return prepare, lambda args: ctx.call(ctx.server.handle_player_join, args[0], {
+        'name': 'Bench',
+        'position': ctx.position(),
+        'firebaseUid': args[1],
+        'firebaseToken': f'bench:{args[1]}'
+    })
+
+
+@benchmark('handler.player_update')
+def bench_update_throttled(ctx):
+    sid = ctx.join()
+    # The handler only stages the move for the next movement tick
+    return lambda i: ctx.call(ctx.server.handle_player_update, sid, {
+        'position': ctx.step(sid), 'rotation': 0.5, 'mode': 'boat'})
+
+
+@benchmark('handler.player_update.db_write')
+def bench_update_write(ctx):
+    sid = ctx.join()
+
+    def prepare(i):
+        ctx.server.last_db_update[sid] = 0
+        return sid
+
+    def op(sid):
+        # Staged, then validated and applied (with the throttled write) by the tick
+        ctx.call(ctx.server.handle_player_update, sid, {'position': ctx.step(sid), 'rotation': 0.5, 'mode': 'boat'})
+        ctx.server.movement_validator.tick()
+    return prepare, op
+
+
+@benchmark('handler.player_action')
+def bench_player_action(ctx):
+    sid = ctx.join()
+    return lambda i: ctx.call(ctx.server.handle_player_action, sid, {'action': 'fish_caught'})
+
+
+@benchmark('handler.chat_message')
+def bench_chat_message(ctx):
+    sid = ctx.join()
+    return lambda i: ctx.call(ctx.server.handle_chat_message, sid, {'content': f'Ahoy {i}'})
+
+
+@benchmark('handler.heartbeat')
+def bench_heartbeat(ctx):
+    sid = ctx.join()
+    return lambda i: ctx.call(ctx.server.handle_heartbeat, sid)
+
+
+@benchmark('handler.inventory_update')
+def bench_inventory_update(ctx):
+    # One catch added to a 500-item inventory (answered with an ack)
+    sid = ctx.join()
+    player_id = ctx.server.presence_manager.player_for(sid) or sid
+    for start in range(0, 500, ctx.server.inventory.MAX_CHANGES):
+        ctx.server.inventories.apply(player_id, {f'Item {j}': 1 for j in range(start, start + ctx.server.inventory.MAX_CHANGES)})
+    return lambda i: ctx.call(ctx.server.handle_inventory_update, sid, {
+        'base': ctx.server.inventories.version(player_id), 'changes': {f'Item {i % 500}': 1}
+    })
+
+
+@benchmark('handler.disconnect')
+def bench_disconnect(ctx):
+    def prepare(i):
+        return ctx.join()
+    return prepare, lambda sid: ctx.call(ctx.server.handle_disconnect, sid)
+
+
+@benchmark('task.presence_tick_50', iterations=20)
+def bench_presence_tick(ctx):
+    def prepare(i):
+        for _ in range(50):
+            sid = ctx.join()
+            ctx.call(ctx.server.handle_disconnect, sid)
+            ctx.drop(sid)
+        return time.time() + ctx.server.presence_manager.grace_period + 1
+    return prepare, lambda now: ctx.server.presence_manager.tick(now)
+
+
+@benchmark('task.movement_tick_50', iterations=50)
+def bench_movement_tick(ctx):
+    sids = [ctx.join() for _ in range(50)]
+    # Within DB_UPDATE_INTERVAL of the last write: validation, memory and broadcasts only
+    for sid in sids:
+        ctx.server.last_db_update[sid] = time.time() + 3600
+
+    def prepare(i):
+        for sid in sids:
+            ctx.call(ctx.server.handle_player_update, sid, {'position': ctx.step(sid), 'rotation': 0.5, 'mode': 'boat'})
+        return None
+    return prepare, lambda _: ctx.server.movement_validator.tick()
+
+
+@benchmark('task.movement_validate_10k', iterations=20)
+def bench_movement_validate(ctx):
+    # The vectorized pass alone, for 10k players moving at once: mostly
+    # accepted, some too fast, some teleporting, some outside the world
+    validator = ctx.server.movement_validation.MovementValidator()
+    rng = random.Random(2)
+    start = time.time()
+    for j in range(10000):
+        # Every 100th player is at the top of the world and keeps climbing
+        y = validator.high[1] if j % 100 == 0 else 0
+        validator.track(f'bench_mover_{j}', {'x': rng.uniform(-1000, 1000), 'y': y, 'z': rng.uniform(-1000, 1000)},
+                        'boat', now=start)
+
+    def prepare(i):
+        now = start + (i + 4) * 0.05
+        for j in range(10000):
+            position = validator.position(f'bench_mover_{j}')
+            reach = rng.choice((1.0, 1.0, 1.0, 10.0, 1000.0))
+            position['x'] += rng.uniform(-reach, reach)
+            position['z'] += rng.uniform(-reach, reach)
+            position['y'] += 1.0 if j % 100 == 0 else 0.0
+            validator.propose(f'bench_mover_{j}', position, 'boat', now=now)
+        return None
+    return prepare, lambda _: validator.validate()
+
+
+def entity_simulation_50k(ctx, **kwargs):
+    """A simulation with ~50k entities: 930 players three chunks apart, 54 entities around each"""
+    rng = random.Random(3)
+    size = ctx.server.worldgen.CHUNK_SIZE
+    player_ids = [f'bench_sailor_{j}' for j in range(930)]
+    positions = []
+    for j in range(len(player_ids)):
+        positions += [(j % 31 * 3 + rng.random()) * size, 0.0, (j // 31 * 3 + rng.random()) * size]
+    simulation = ctx.server.entity_simulation.EntitySimulation(lambda: (player_ids, positions), seed=3, **kwargs)
+    simulation.step(time.time())
+    return simulation
+
+
+@benchmark('task.entity_step_50k', iterations=50)
+def bench_entity_step(ctx):
+    # One fixed timestep of every entity (monster AI, fish drift, movement), without replication
+    simulation = entity_simulation_50k(ctx, replicate_every=0)
+    return lambda _: simulation.step()
+
+
+@benchmark('task.entity_replicate_50k', iterations=20)
+def bench_entity_replicate(ctx):
+    # The per-chunk payloads of ~50k entities in 8370 chunks
+    simulation = entity_simulation_50k(ctx, replicate_every=0)
+    return lambda _: simulation.replicate()
+
+
+@benchmark('task.journal_replay_50', iterations=50)
+def bench_journal_replay(ctx):
+    def prepare(i):
+        for j in range(25):
+            player_id = ctx.existing_player_id()
+            ctx.server.journal_stat_change(player_id, fishCount=i + j)
+            ctx.server.action_journal.append({'type': 'chat', 'id': f'bench_replay_{i}_{j}', 'data': {
+                'sender_id': player_id, 'content': f'Replay {j}', 'timestamp': time.time(), 'message_type': 'global'
+            }})
+        return None
+    return prepare, lambda _: ctx.server.journal_replayer.replay()
+
+
+def calibrate(rounds=5):
+    """
+    Milliseconds for a fixed pure-Python workload (best of several rounds)
+
+    Baseline timings are scaled by the ratio of calibrations, so a baseline
+    recorded on a faster or less busy machine does not flag everything.
+    """
+    document = {'id': 'calibration', 'position': {'x': 1.5, 'y': 0, 'z': -2.5}, 'tags': list(range(20))}
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for i in range(2000):
+            copy = json.loads(json.dumps(document))
+            copy['position']['x'] += i
+            sorted(copy['tags'], reverse=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_benchmark(ctx, name, fn, iterations, rounds=1):
+    """Time a benchmark and count Firestore operations per call"""
+    setup = fn(ctx)
+    prepare, op = setup if isinstance(setup, tuple) else (lambda i: i, setup)
+
+    # Warm caches and lazily built state
+    for i in range(min(3, iterations)):
+        op(prepare(-1 - i))
+
+    # Rounds are timed separately and the fastest one is kept: slow rounds
+    # are the machine's noise, not the code's. GC is off while timing, as in timeit.
+    best = None
+    ops = {kind: 0 for kind in OP_KINDS}
+    latency_before = ctx.db.latency_seconds
+    for round_index in range(rounds):
+        timings = []
+        gc.collect()
+        gc.disable()
+        try:
+            for i in range(iterations):
+                args = prepare(round_index * iterations + i)
+                before = ctx.db.snapshot_ops()
+                start = time.perf_counter()
+                op(args)
+                timings.append(time.perf_counter() - start)
+                after = ctx.db.snapshot_ops()
+                for kind in OP_KINDS:
+                    ops[kind] += after.get(kind, 0) - before.get(kind, 0)
+        finally:
+            gc.enable()
+        if best is None or percentile(timings, 50) < percentile(best, 50):
+            best = timings
+
+    calls = iterations * rounds
+    return {
+        'iterations': iterations,
+        'rounds': rounds,
+        'wall_ms': {
+            'mean': sum(best) / len(best) * 1000,
+            'p50': percentile(best, 50) * 1000,
+            'p99': percentile(best, 99) * 1000
+        },
+        'ops_per_call': {kind: count / calls for kind, count in ops.items()},
+        'injected_latency_ms_per_call': (ctx.db.latency_seconds - latency_before) / calls * 1000
+    }
+
+
+def run(args):
+    random.seed(args.seed)
+    latency = args.latency_ms / 1000
+    fake_db = patch_firebase(FakeFirestore())
+    seed_database(fake_db, args.players, args.messages, args.islands)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # app.py loads everything from Firestore at import time
+        import app as server
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # Tokens are "bench:<uid>"; real verification is out of scope here
+    server.verify_firebase_token = lambda token: token.split(':', 1)[1]
+
+    # Latency only applies to the benchmarks, not to seeding and startup
+    fake_db.latency = latency
+    fake_db.jitter = args.jitter
+    ctx = BenchContext(server, fake_db, args.players)
+
+    calibration_ms = calibrate()
+    results = {}
+    for name, (fn, iterations) in BENCHMARKS.items():
+        if args.filter and args.filter not in name:
+            continue
+        count = min(iterations or args.iterations, args.iterations)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[name] = run_benchmark(ctx, name, fn, count, args.rounds)
+            ctx.cleanup()
+
+    return {
+        'config': {
+            'iterations': args.iterations,
+            'rounds': args.rounds,
+            'latency_ms': args.latency_ms,
+            'jitter': args.jitter,
+            'players': args.players,
+            'messages': args.messages,
+            'islands': args.islands,
+            'seed': args.seed
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'json_encoder': server.serialization.get_encoder(),
+            'calibration_ms': calibration_ms
+        },
+        'benchmarks': results
+    }
+
+
+def compare(results, baseline, tolerance):
+    """List regressions of results against a baseline"""
+    regressions = []
+    baseline_calibration = baseline['environment'].get('calibration_ms')
+    speed = results['environment']['calibration_ms'] / baseline_calibration if baseline_calibration else 1.0
+    for name, result in results['benchmarks'].items():
+        base = baseline['benchmarks'].get(name)
+        if base is None:
+            continue
+
+        for kind in OP_KINDS:
+            current = result['ops_per_call'].get(kind, 0)
+            previous = base['ops_per_call'].get(kind, 0)
+            if current > previous + 1e-9:
+                regressions.append(f"{name}: {kind} per call {previous:g} -> {current:g}")
+
+        current = result['wall_ms']['p50']
+        previous = base['wall_ms']['p50'] * speed
+        if current > previous * (1 + tolerance) and current - previous > MIN_LATENCY_DELTA_MS:
+            regressions.append(f"{name}: p50 {previous:.3f} ms -> {current:.3f} ms (+{(current / previous - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_report(results):
+    config = results['config']
+    print(f"\n===== BENCHMARK SUITE (latency {config['latency_ms']} ms per round trip) =====")
+    print(f"{'benchmark':<44}{'p50 ms':>10}{'p99 ms':>10}{'reads':>8}{'writes':>8}{'queries':>9}{'batches':>9}")
+    for name, result in results['benchmarks'].items():
+        ops = result['ops_per_call']
+        print(f"{name:<44}{result['wall_ms']['p50']:>10.3f}{result['wall_ms']['p99']:>10.3f}"
+              f"{ops['read']:>8.2f}{ops['write']:>8.2f}{ops['query']:>9.2f}{ops['batch_commit']:>9.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark firestore_models and Socket.IO handlers')
+    parser.add_argument('--iterations', type=int, default=200, help='Upper bound on calls per benchmark')
+    parser.add_argument('--rounds', type=int, default=3, help='Timed rounds per benchmark; the fastest is kept')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Injected Firestore latency per round trip')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random extra latency as a fraction')
+    parser.add_argument('--players', type=int, default=500)
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--islands', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--filter', help='Only run benchmarks whose name contains this')
+    parser.add_argument('--save-baseline', metavar='PATH', help='Write the results as a baseline')
+    parser.add_argument('--compare', metavar='PATH', help='Compare against a baseline, exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed p50 slowdown as a fraction')
+    parser.add_argument('--json', action='store_true', help='Print machine-readable JSON only')
+    args = parser.parse_args()
+
+    results = run(args)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['config'] != results['config']:
+            print(f"Warning: baseline was recorded with {baseline['config']}", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        results['regressions'] = regressions
+
+    if args.json:
+        print(json.dumps(results))
+    else:
+        print_report(results)
+        if args.compare:
+            print(f"\n{len(regressions)} regressions against {args.compare}")
+            for regression in regressions:
+                print(f"  {regression}")
+
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,127 @@
+import os
+import time
+import threading
+from collections import Counter
+
+import firestore_models
+
+# Seconds from sending a message until it is in Firestore (replay interval and batching)
+PERSISTENCE_LAG_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+MAX_MESSAGE_LENGTH = 500
+
+
+class MessageIdGenerator:
+    """
+    Locally assigned, monotonic, sortable message IDs and timestamps
+
+    An ID is the millisecond timestamp (12 hex digits), a sequence number
+    within that millisecond (4 hex digits) and a per-process node suffix, so
+    IDs sort in send order as strings and never collide across servers.
+    Timestamps never go backwards, even if the wall clock does.
+    """
+
+    def __init__(self, node=None, clock=time.time):
+        self.node = node or os.urandom(3).hex()
+        self.clock = clock
+        self._last_ms = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def next(self):
+        """:return: (message ID, timestamp in seconds)"""
+        now_ms = int(self.clock() * 1000)
+        with self._lock:
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = 0
+            else:
+                self._sequence += 1
+                if self._sequence > 0xffff:
+                    # Borrow the next millisecond
+                    self._last_ms += 1
+                    self._sequence = 0
+            ms, sequence = self._last_ms, self._sequence
+        return f"{ms:012x}{sequence:04x}{self.node}", ms / 1000
+
+
+class ChatPipeline:
+    """
+    Chat messages are broadcast right away and persisted later in batches
+
+    submit() assigns the ID and timestamp locally, takes the sender's name and
+    color from the in-memory player cache, appends the message to the action
+    journal and hands it to deliver(message) (the broadcast) without any
+    Firestore round trip. The journal replayer later calls persist() with
+    many messages at once, which appends them to the chat store
+    (chat_storage.ChatStore) with batched writes. The sender's name and color
+    are journaled with the message, so a replay writes identical records.
+
+    Delivery latency (receipt to broadcast sent) and persistence lag (message
+    timestamp to batch written) are recorded as histograms when a metrics
+    registry is given.
+    """
+
+    def __init__(self, journal, store, sender_info, deliver, registry=None, ids=None):
+        self.journal = journal
+        self.store = store
+        self.sender_info = sender_info
+        self.deliver = deliver
+        self.ids = ids or MessageIdGenerator()
+        self.stats = Counter()
+        self.delivery_seconds = None
+        self.persistence_lag_seconds = None
+        if registry is not None:
+            self.delivery_seconds = registry.histogram(
+                'chat_delivery_seconds', 'Time from receiving a chat message to broadcasting it')
+            self.persistence_lag_seconds = registry.histogram(
+                'chat_persistence_lag_seconds', 'Time from sending a chat message to writing it to Firestore',
+                buckets=PERSISTENCE_LAG_BUCKETS)
+
+    def submit(self, sender_id, content, message_type='global', received=None):
+        """
+        Accept, journal and broadcast a message
+
+        :param received: perf_counter() when the message arrived, for the delivery latency
+        :return: The broadcast message, or None if it was rejected
+        """
+        received = time.perf_counter() if received is None else received
+        content = content.strip()
+        if not content or len(content) > MAX_MESSAGE_LENGTH:
+            self.stats['rejected'] += 1
+            return None
+
+        message_id, timestamp = self.ids.next()
+        data = {
+            'sender_id': sender_id,
+            'content': content,
+            'timestamp': timestamp,
+            'message_type': message_type
+        }
+        sender = self.sender_info(sender_id)
+        if sender:
+            data['sender_name'] = sender.get('name', 'Unknown')
+            data['sender_color'] = sender.get('color')
+        self.journal.append({'type': 'chat', 'id': message_id, 'data': data})
+
+        # Same shape as firestore_models.Message.get
+        message = {**data, 'id': message_id, 'timestamp': firestore_models.serialize_timestamp(timestamp)}
+
+        self.deliver(message)
+        self.stats['delivered'] += 1
+        if self.delivery_seconds is not None:
+            self.delivery_seconds.observe(time.perf_counter() - received)
+        return message
+
+    def persist(self, messages_by_id):
+        """Write journaled messages (message ID -> data) to the chat store in batches"""
+        if not messages_by_id:
+            return 0
+        written = self.store.append(messages_by_id)
+        self.stats['persisted'] += written
+        self.stats['batches'] += 1
+        now = time.time()
+        if self.persistence_lag_seconds is not None:
+            for data in messages_by_id.values():
+                self.persistence_lag_seconds.observe(max(0.0, now - data['timestamp']))
+        return written
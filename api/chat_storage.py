@@ -0,0 +1,288 @@
+import os
+import gzip
+import json
+import time
+import calendar
+import logging
+import threading
+from collections import Counter, defaultdict
+
+from firebase_admin import firestore
+
+import firestore_models
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_COLLECTION = 'chat_buckets'
+# One document per channel listing its bucket IDs, so history needs no query
+CHANNELS_COLLECTION = 'chat_channels'
+
+# Messages of a channel are grouped per hour (UTC)...
+BUCKET_SECONDS = 3600
+# ...in shards of at most this many messages (Firestore documents are capped at 1 MiB)
+MAX_BUCKET_MESSAGES = 500
+
+# Buckets older than this are moved to archive files
+DEFAULT_RETENTION_HOURS = 24 * 7
+# Seconds between archiver runs
+ARCHIVE_INTERVAL = 3600.0
+
+DEFAULT_SENDER_COLOR = {'r': 0.5, 'g': 0.5, 'b': 0.5}
+
+
+def hour_key(timestamp):
+    """UTC hour of a timestamp, as sortable text (YYYYMMDDHH)"""
+    return time.strftime('%Y%m%d%H', time.gmtime(timestamp))
+
+
+def bucket_id(channel, hour, shard):
+    return f"{channel}_{hour}_{shard:02d}"
+
+
+def parse_bucket_id(bucket):
+    """:return: (channel, hour key, shard)"""
+    channel, hour, shard = bucket.rsplit('_', 2)
+    return channel, hour, int(shard)
+
+
+def hour_start(hour):
+    """Start of a YYYYMMDDHH hour as a UNIX timestamp"""
+    return float(calendar.timegm(time.strptime(hour, '%Y%m%d%H')))
+
+
+def compact(message_id, data):
+    """Compact record stored in a bucket's messages array"""
+    record = {'i': message_id, 's': data['sender_id'], 'c': data['content'], 't': data['timestamp']}
+    if data.get('sender_name') is not None:
+        record['n'] = data['sender_name']
+    if data.get('sender_color') is not None:
+        record['k'] = data['sender_color']
+    return record
+
+
+def expand(record, channel):
+    """Message dictionary (same shape as firestore_models.Message.get) from a compact record"""
+    return {
+        'id': record['i'],
+        'sender_id': record['s'],
+        'content': record['c'],
+        'timestamp': firestore_models.serialize_timestamp(record['t']),
+        'message_type': channel,
+        'sender_name': record.get('n', 'Unknown'),
+        'sender_color': record.get('k', DEFAULT_SENDER_COLOR)
+    }
+
+
+class ChatStore:
+    """
+    Chat history in per-channel, per-hour bucket documents
+
+    A bucket document holds an array of compact message records and is
+    appended to with ArrayUnion, so writing the same message again (a
+    journal replay) changes nothing. When a bucket reaches
+    MAX_BUCKET_MESSAGES the next shard of the hour is started. Each channel
+    has an index document listing its buckets: recent history is the index
+    plus one batched read of the newest buckets, whatever the total size.
+
+    The store remembers the current shard and size of each bucket it wrote;
+    after a restart it reads the index and the newest shard once per channel
+    and hour.
+    """
+
+    def __init__(self, max_bucket_messages=MAX_BUCKET_MESSAGES):
+        self.max_bucket_messages = max_bucket_messages
+        # (channel, hour) -> [shard, messages in it]
+        self._shards = {}
+        # channel -> bucket IDs known to be in the index
+        self._indexed = defaultdict(set)
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    @staticmethod
+    def buckets():
+        return firestore_models.db.collection(BUCKETS_COLLECTION)
+
+    @staticmethod
+    def channels():
+        return firestore_models.db.collection(CHANNELS_COLLECTION)
+
+    def bucket_ids(self, channel):
+        """IDs of a channel's buckets, oldest first"""
+        snapshot = self.channels().document(channel).get()
+        buckets = snapshot.to_dict().get('buckets', []) if snapshot.exists else []
+        return sorted(buckets)
+
+    def _current_shard(self, channel, hour):
+        """[shard, size] of the bucket that receives the next message of a channel and hour"""
+        state = self._shards.get((channel, hour))
+        if state is not None:
+            return state
+
+        # Cold start: continue the newest shard of this hour, if any
+        shards = [parse_bucket_id(b)[2] for b in self.bucket_ids(channel) if parse_bucket_id(b)[1] == hour]
+        self._indexed[channel].update(bucket_id(channel, hour, shard) for shard in shards)
+        state = [0, 0]
+        if shards:
+            state[0] = max(shards)
+            snapshot = self.buckets().document(bucket_id(channel, hour, state[0])).get()
+            if snapshot.exists:
+                state[1] = len(snapshot.to_dict().get('messages', []))
+        self._shards[(channel, hour)] = state
+        self.stats['cold_starts'] += 1
+        return state
+
+    def append(self, messages_by_id):
+        """
+        Append messages (message ID -> data with sender_id, content, timestamp, message_type)
+
+        :return: Number of messages written
+        """
+        records_by_bucket = defaultdict(list)
+        new_buckets = defaultdict(list)
+        with self._lock:
+            for message_id, data in sorted(messages_by_id.items(), key=lambda item: item[1]['timestamp']):
+                channel = data.get('message_type', 'global')
+                hour = hour_key(data['timestamp'])
+                state = self._current_shard(channel, hour)
+                if state[1] >= self.max_bucket_messages:
+                    state[0] += 1
+                    state[1] = 0
+                bucket = bucket_id(channel, hour, state[0])
+                state[1] += 1
+                records_by_bucket[bucket].append(compact(message_id, data))
+                if bucket not in self._indexed[channel]:
+                    self._indexed[channel].add(bucket)
+                    new_buckets[channel].append(bucket)
+
+        operations = []
+        for bucket, records in records_by_bucket.items():
+            channel, hour, shard = parse_bucket_id(bucket)
+            operations.append(('merge', self.buckets().document(bucket), {
+                'channel': channel,
+                'hour': hour,
+                'shard': shard,
+                'messages': firestore.ArrayUnion(records)
+            }))
+        for channel, buckets in new_buckets.items():
+            operations.append(('merge', self.channels().document(channel), {'buckets': firestore.ArrayUnion(buckets)}))
+
+        try:
+            firestore_models.write_in_batches(operations)
+        except Exception:
+            # The writes may not have happened; re-read the index next time
+            with self._lock:
+                for channel, buckets in new_buckets.items():
+                    self._indexed[channel].difference_update(buckets)
+            raise
+        self.stats['messages'] += len(messages_by_id)
+        self.stats['bucket_writes'] += len(records_by_bucket)
+        return len(messages_by_id)
+
+    def recent(self, limit=50, channel='global'):
+        """
+        Most recent messages of a channel, in chronological order
+
+        Reads the channel index and then the newest buckets (one batched read,
+        more only if they hold fewer than limit messages).
+        """
+        bucket_ids = self.bucket_ids(channel)
+        records = {}
+        fetch = 2
+        while bucket_ids and len(records) < limit:
+            batch, bucket_ids = bucket_ids[-fetch:], bucket_ids[:-fetch]
+            references = [self.buckets().document(bucket) for bucket in batch]
+            for snapshot in firestore_models.db.get_all(references):
+                if snapshot.exists:
+                    for record in snapshot.to_dict().get('messages', []):
+                        # A replayed message may sit in two shards; keep one
+                        records[record['i']] = record
+            fetch *= 2
+
+        newest = sorted(records.values(), key=lambda record: (record['t'], record['i']))[-limit:]
+        return [expand(record, channel) for record in newest]
+
+
+class ChatArchiver:
+    """
+    Moves chat buckets older than the retention period to archive files
+
+    Each hour of a channel is written to one gzip-compressed JSON file,
+    archive_dir/<channel>/<YYYYMMDDHH>.json.gz, with its messages in
+    chronological order. Files are written atomically and merged with an
+    existing file, so an archiver run that fails halfway can simply run
+    again. Archived buckets are then deleted and removed from the channel
+    index with batched writes.
+    """
+
+    def __init__(self, store, archive_dir, retention_hours=DEFAULT_RETENTION_HOURS):
+        self.store = store
+        self.archive_dir = archive_dir
+        self.retention_hours = retention_hours
+        self.stats = Counter()
+
+    def archive_path(self, channel, hour):
+        return os.path.join(self.archive_dir, channel, f"{hour}.json.gz")
+
+    def _write_archive(self, channel, hour, records):
+        path = self.archive_path(channel, hour)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        messages = {record['i']: record for record in records}
+        if os.path.exists(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for record in json.load(f)['messages']:
+                    messages.setdefault(record['i'], record)
+
+        temporary = path + '.tmp'
+        with gzip.open(temporary, 'wt', encoding='utf-8') as f:
+            json.dump({
+                'channel': channel,
+                'hour': hour,
+                'messages': sorted(messages.values(), key=lambda record: (record['t'], record['i']))
+            }, f, separators=(',', ':'))
+        os.replace(temporary, path)
+        return len(messages)
+
+    def archive(self, now=None):
+        """
+        Archive every bucket whose hour ended before the retention cutoff
+
+        :return: Number of buckets archived
+        """
+        now = time.time() if now is None else now
+        cutoff = now - self.retention_hours * 3600
+        archived = 0
+        for channel_snapshot in self.store.channels().stream():
+            channel = channel_snapshot.id
+            expired = [
+                bucket for bucket in sorted(channel_snapshot.to_dict().get('buckets', []))
+                if hour_start(parse_bucket_id(bucket)[1]) + BUCKET_SECONDS <= cutoff
+            ]
+            if not expired:
+                continue
+
+            references = [self.store.buckets().document(bucket) for bucket in expired]
+            records_by_hour = defaultdict(list)
+            for snapshot in firestore_models.db.get_all(references):
+                if snapshot.exists:
+                    records_by_hour[parse_bucket_id(snapshot.id)[1]].extend(snapshot.to_dict().get('messages', []))
+            for hour, records in records_by_hour.items():
+                self.stats['messages'] += self._write_archive(channel, hour, records)
+
+            operations = [('delete', reference, None) for reference in references]
+            operations.append(('merge', self.store.channels().document(channel), {'buckets': firestore.ArrayRemove(expired)}))
+            firestore_models.write_in_batches(operations)
+            archived += len(expired)
+            logger.info(f"Archived {len(expired)} chat buckets of channel {channel}")
+
+        self.stats['buckets'] += archived
+        self.stats['runs'] += 1
+        return archived
+
+    def run(self, sleep):
+        """Archive loop for a background task"""
+        while True:
+            try:
+                self.archive()
+            except Exception as e:
+                logger.error(f"Error archiving chat buckets: {e}")
+            sleep(ARCHIVE_INTERVAL)
@@ -90,7 +90,36 @@ def print_player_info():
         for player in players[:5]:  # Just show first 5
             print(f"ID: {player.id}, Name: {player.name}, Active: {player.active}")
 
+def check_firebase_sender():
+    """A message from a Firebase-authenticated player is broadcast with its name and color"""
+    print("\n=== FIREBASE SENDER ===")
+    os.environ['BACKGROUND_TASKS'] = '0'
+    from fake_firestore import FakeFirestore, patch_firebase
+    patch_firebase(FakeFirestore())
+    import app as server
+
+    # Accept one token for one UID, as Firebase would
+    server.verify_firebase_token = lambda token: 'captain-uid' if token == 'captain-token' else None
+    client = server.socketio.test_client(server.app)
+    client.emit('player_join', {'name': 'Captain Jack', 'color': {'r': 1, 'g': 0, 'b': 0},
+                                'firebaseToken': 'captain-token', 'firebaseUid': 'captain-uid'})
+    client.get_received()
+    client.emit('chat_message', {'content': 'Ahoy from Firebase'})
+    messages = [packet['args'][0] for packet in client.get_received() if packet['name'] == 'chat_message']
+    client.disconnect()
+
+    ok = len(messages) == 1
+    message = messages[0] if ok else {}
+    print(f"Broadcast: {message}")
+    ok = ok and message.get('sender_id') == 'firebase_captain-uid' and message.get('sender_name') == 'Captain Jack' \
+        and message.get('sender_color') == {'r': 1, 'g': 0, 'b': 0}
+    print("OK: sender resolved from the player cache" if ok else "FAIL: sender not resolved")
+    return ok
+
 if __name__ == "__main__":
+    if not check_firebase_sender():
+        raise SystemExit(1)
+
     app = setup_app()
     with app.app_context():
         print("\n===== CHAT FEATURE TEST =====")
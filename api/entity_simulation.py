@@ -0,0 +1,655 @@
+import math
+import time
+import heapq
+import logging
+import threading
+from collections import Counter
+
+import numpy as np
+
+import worldgen
+
+logger = logging.getLogger(__name__)
+
+# Fixed simulation timestep; every REPLICATE_EVERY-th tick the state is replicated
+TICK_SECONDS = 0.1
+REPLICATE_EVERY = 2
+# Ticks simulated at most per wakeup when the loop falls behind (the rest is dropped)
+MAX_CATCH_UP_TICKS = 5
+# Chunks within this Chebyshev distance of a player are spawned, simulated and
+# replicated to it (1 = 3x3 chunks)
+ENTITY_RADIUS = 1
+# Seconds a chunk stays spawned after the last player left its area
+DESPAWN_AFTER = 30.0
+
+# Entity kinds
+MONSTER = 0
+FISH_SCHOOL = 1
+PICKUP = 2
+KINDS = ('monster', 'fish_school', 'pickup')
+# Deterministic spawn slots per chunk and kind
+SLOTS_PER_CHUNK = {MONSTER: 2, FISH_SCHOOL: 3, PICKUP: 1}
+ID_PREFIXES = {MONSTER: 'm', FISH_SCHOOL: 'f', PICKUP: 't'}
+# Seconds until a killed monster, emptied school or collected treasure comes back
+RESPAWN_SECONDS = {MONSTER: 300.0, FISH_SCHOOL: 300.0, PICKUP: 900.0}
+# Entities are kept this far inside their chunk
+CHUNK_MARGIN = 20.0
+
+# Types per kind, as in src/entities/seaMonsters.js, src/gameplay/fishing.js
+# and src/world/treasure.js. Monster health is in cannonball hits.
+MONSTER_TYPES = ('yellowBeast', 'kraken', 'seaSerpent', 'phantomJellyfish')
+MONSTER_WEIGHTS = (0.4, 0.2, 0.2, 0.2)
+MONSTER_HEALTH = (3, 6, 4, 3)
+FISH_TYPES = ('Anchovy', 'Cod', 'Salmon', 'Tuna', 'Swordfish', 'Shark', 'Golden Fish')
+FISH_WEIGHTS = (0.3, 0.25, 0.2, 0.15, 0.07, 0.02, 0.01)
+FISH_PER_SCHOOL = (5, 20)
+PICKUP_TYPES = ('chest', 'jewel', 'coin', 'monsterScale')
+PICKUP_VALUES = (500, 200, 50, 5)
+# Treasure spawned in chunks (monster scales are only dropped by monsters)
+TREASURE_WEIGHTS = (0.1, 0.3, 0.6, 0.0)
+MONSTER_DROP = PICKUP_TYPES.index('monsterScale')
+# Seconds a dropped monster scale floats before it sinks
+DROP_LIFETIME = 60.0
+TYPE_NAMES = (MONSTER_TYPES, FISH_TYPES, PICKUP_TYPES)
+# Order of the values of each replicated entity
+ENTITY_FIELDS = ('id', 'kind', 'type', 'x', 'y', 'z', 'heading', 'state', 'value')
+
+# Monster behaviour (units and seconds; the client moves monsters 0.3 units per frame)
+LURKING = 0
+HUNTING = 1
+ATTACKING = 2
+DIVING = 3
+STATES = ('lurking', 'hunting', 'attacking', 'diving')
+MONSTER_SPEED = 18.0
+HUNT_SPEED_FACTOR = 1.5
+ATTACK_SPEED_FACTOR = 2.0
+VERTICAL_SPEED = 8.0
+MONSTER_DEPTH = -20.0
+DETECTION_RANGE = 200.0
+ATTACK_RANGE = 50.0
+HIT_RANGE = 15.0
+HIT_COOLDOWN = 1.5
+HUNT_TIME = 10.0
+SURFACE_TIME = 10.0
+# Per tick: chance that a lurking monster near a player starts hunting, and
+# per second: chance that a wandering entity picks a new heading
+HUNT_CHANCE = 0.2
+WANDER_CHANCE = 0.5
+FISH_SPEED = 2.0
+# Players considered per neighbouring cell when looking for a monster's target
+MAX_CANDIDATES = 4
+
+# Player reach for interactions (generous: positions are up to a tick old)
+HIT_DISTANCE = 150.0
+COLLECT_DISTANCE = 15.0
+FISHING_DISTANCE = 40.0
+
+# Chunk coordinates are packed into one non-negative integer
+_CHUNK_OFFSET = 1 << 20
+_CHUNK_BITS = 21
+
+_FIELDS = (
+    ('chunk', np.int64), ('cx', np.int64), ('cz', np.int64), ('kind', np.int8), ('type', np.int8),
+    ('slot', np.int32), ('generation', np.int32), ('x', np.float64), ('y', np.float64), ('z', np.float64),
+    ('vx', np.float64), ('vz', np.float64), ('state', np.int8), ('timer', np.float64), ('health', np.int32),
+    ('value', np.int32), ('expires', np.float64), ('cooldown', np.float64), ('alive', np.bool_)
+)
+
+
+# splitmix64 constants, for random numbers derived from spawn slot keys
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+_U64_MASK = (1 << 64) - 1
+
+
+def chunk_code(cx, cz):
+    """Pack chunk coordinates (ints or integer arrays) into one integer; codes sort like (cx, cz)"""
+    return ((cx + _CHUNK_OFFSET) << _CHUNK_BITS) | (cz + _CHUNK_OFFSET)
+
+
+def chunk_coords(code):
+    """Unpack chunk codes (an int or an integer array) into (cx, cz)"""
+    return (code >> _CHUNK_BITS) - _CHUNK_OFFSET, (code & ((1 << _CHUNK_BITS) - 1)) - _CHUNK_OFFSET
+
+
+def area_codes(x, z, radius=ENTITY_RADIUS):
+    """Sorted unique codes of the chunks within radius of any of the positions"""
+    cx = np.floor(np.asarray(x) / worldgen.CHUNK_SIZE).astype(np.int64)
+    cz = np.floor(np.asarray(z) / worldgen.CHUNK_SIZE).astype(np.int64)
+    cx, cz = chunk_coords(np.unique(chunk_code(cx, cz)))
+    offsets = np.arange(-radius, radius + 1)
+    dx, dz = np.repeat(offsets, len(offsets)), np.tile(offsets, len(offsets))
+    return np.unique(chunk_code((cx[:, None] + dx).ravel(), (cz[:, None] + dz).ravel()))
+
+
+def area_keys(position, radius=ENTITY_RADIUS):
+    """Keys of the chunks within radius of a position (whose entities are replicated to a player there)"""
+    cx, cz = worldgen.get_chunk_coords(position.get('x') or 0, position.get('z') or 0)
+    return {worldgen.get_chunk_key(cx + dx, cz + dz)
+            for dx in range(-radius, radius + 1) for dz in range(-radius, radius + 1)}
+
+
+def _mix(values):
+    values = values + _GOLDEN
+    values = (values ^ (values >> np.uint64(30))) * _MIX1
+    values = (values ^ (values >> np.uint64(27))) * _MIX2
+    return values ^ (values >> np.uint64(31))
+
+
+def _uniform(keys, stream):
+    """Uniform numbers in [0, 1), one per key and stream, that depend only on both"""
+    return (_mix(keys ^ np.uint64(stream)) >> np.uint64(11)) * (1.0 / (1 << 53))
+
+
+def _weighted(keys, stream, weights):
+    """Indexes into weights, drawn with those probabilities"""
+    cumulative = np.cumsum(weights)
+    picks = np.searchsorted(cumulative, _uniform(keys, stream) * cumulative[-1], side='right')
+    return np.minimum(picks, len(weights) - 1)
+
+
+class EntitySimulation:
+    """
+    Server-authoritative sea monsters, fish schools and pickups
+
+    Entities live in the ocean chunks around active players. When a chunk
+    comes into a player's area it is spawned: each of its spawn slots gets an
+    entity whose type, position and heading are derived from a hash of the
+    world seed, the chunk, the slot and a respawn generation, so every server
+    and every restart spawns the same world. Chunks nobody has been near for
+    DESPAWN_AFTER seconds are despawned. Killed monsters, emptied fish schools
+    and collected treasure come back after RESPAWN_SECONDS.
+
+    Entity state is stored column-wise in NumPy arrays (one row per entity,
+    freed rows are reused), and step() advances every entity by one fixed
+    timestep with vectorized operations: monster behaviour (lurking, hunting
+    the nearest player, attacking at the surface, diving), fish school drift
+    and pickup expiry. Entities stay inside their chunk.
+
+    Every replicate_every ticks (0: never), on_replicate(payloads) is called
+    with one payload per spawned chunk (see replicate()). players() returns
+    (player IDs, flat x/y/z positions), with None IDs for unused entries.
+    owns_chunk(cx, cz), given chunk coordinate arrays, returns a mask of the
+    chunks this simulation may spawn (None: all of them).
+    """
+
+    def __init__(self, players, on_replicate=None, seed=0, tick_seconds=TICK_SECONDS,
+                 replicate_every=REPLICATE_EVERY, capacity=1024, owns_chunk=None, clock=time.time):
+        self.players = players
+        self.owns_chunk = owns_chunk
+        self.on_replicate = on_replicate
+        self.replicate_every = replicate_every
+        self.seed = seed
+        self.tick_seconds = tick_seconds
+        self.clock = clock
+        self.stats = Counter()
+        self.tick_count = 0
+        self.time = None
+        self._lock = threading.RLock()
+        self._seed_key = _mix(np.array([seed & _U64_MASK], dtype=np.uint64))
+
+        self._capacity = 0
+        self._size = 0
+        self._free = []
+        self.ids = []
+        self._index = {}
+        self._grow(capacity)
+
+        # Spawned chunks (sorted codes), when a player was last near each and their keys
+        self._chunk_codes = np.empty(0, dtype=np.int64)
+        self._chunk_seen = np.empty(0, dtype=np.float64)
+        self._chunk_keys = {}
+        # Depleted spawn slots: entity ID -> respawn time, and a heap of
+        # (respawn time, entity ID, chunk code, kind, slot, generation)
+        self._depleted = {}
+        self._respawns = []
+        self._drops = 0
+        self._hits = []
+
+    def _grow(self, capacity):
+        for name, dtype in _FIELDS:
+            column = np.zeros(capacity, dtype=dtype)
+            if self._capacity:
+                column[:self._capacity] = getattr(self, name)
+            setattr(self, name, column)
+        self.ids.extend([None] * (capacity - self._capacity))
+        self._capacity = capacity
+
+    def __len__(self):
+        return len(self._index)
+
+    def count(self, kind):
+        """Number of live entities of a kind"""
+        return int(np.count_nonzero(self.alive[:self._size] & (self.kind[:self._size] == kind)))
+
+    def _allocate(self, entity_ids):
+        """Rows for new entities (reusing freed rows first), registered under their IDs"""
+        reused = self._free[-len(entity_ids):] if entity_ids else []
+        del self._free[len(self._free) - len(reused):]
+        added = len(entity_ids) - len(reused)
+        while self._size + added > self._capacity:
+            self._grow(self._capacity * 2)
+        index = np.array(reused + list(range(self._size, self._size + added)), dtype=np.int64)
+        self._size += added
+        for row, entity_id in zip(index.tolist(), entity_ids):
+            self.ids[row] = entity_id
+            self._index[entity_id] = row
+        self.state[index], self.timer[index], self.cooldown[index] = LURKING, 0.0, 0.0
+        self.expires[index] = math.inf
+        self.alive[index] = True
+        self.stats['spawned'] += len(entity_ids)
+        return index
+
+    def _remove(self, indexes):
+        for index in indexes:
+            del self._index[self.ids[index]]
+            self.ids[index] = None
+        self.alive[indexes] = False
+        self._free.extend(indexes)
+
+    def _spawn(self, codes, kinds, slots, generations):
+        """Spawn the entities of spawn slots (parallel arrays), derived only from the seed, slot and generation"""
+        cx, cz = chunk_coords(codes)
+        entity_ids = [f"{ID_PREFIXES[kind]}{x},{z}:{slot}"
+                      for kind, x, z, slot in zip(kinds.tolist(), cx.tolist(), cz.tolist(), slots.tolist())]
+        index = self._allocate(entity_ids)
+        keys = self._seed_key
+        for column in (codes, kinds, slots, generations):
+            keys = _mix(keys ^ column.astype(np.uint64))
+
+        span = worldgen.CHUNK_SIZE - 2 * CHUNK_MARGIN
+        self.chunk[index], self.cx[index], self.cz[index] = codes, cx, cz
+        self.kind[index], self.slot[index], self.generation[index] = kinds, slots, generations
+        self.x[index] = cx * worldgen.CHUNK_SIZE + CHUNK_MARGIN + _uniform(keys, 1) * span
+        self.z[index] = cz * worldgen.CHUNK_SIZE + CHUNK_MARGIN + _uniform(keys, 2) * span
+        monster, fish = kinds == MONSTER, kinds == FISH_SCHOOL
+        types = np.where(monster, _weighted(keys, 3, MONSTER_WEIGHTS),
+                         np.where(fish, _weighted(keys, 3, FISH_WEIGHTS), _weighted(keys, 3, TREASURE_WEIGHTS)))
+        self.type[index] = types
+        self.y[index] = np.where(monster, MONSTER_DEPTH, np.where(fish, 0.0, 0.5))
+        self.health[index] = np.where(monster, np.take(MONSTER_HEALTH, types, mode='clip'), 0)
+        school_size = FISH_PER_SCHOOL[0] + (_uniform(keys, 4) * (FISH_PER_SCHOOL[1] - FISH_PER_SCHOOL[0] + 1)).astype(np.int32)
+        self.value[index] = np.where(fish, school_size, np.where(monster, 0, np.take(PICKUP_VALUES, types, mode='clip')))
+        heading = _uniform(keys, 5) * 2 * math.pi
+        speed = np.where(monster, MONSTER_SPEED, np.where(fish, FISH_SPEED, 0.0))
+        self.vx[index], self.vz[index] = np.sin(heading) * speed, np.cos(heading) * speed
+        return index
+
+    def _spawn_chunks(self, codes, now):
+        """Spawn every slot of new chunks, except depleted slots still waiting to respawn"""
+        slots_per_chunk = sum(SLOTS_PER_CHUNK.values())
+        kinds = np.concatenate([np.full(count, kind, dtype=np.int64) for kind, count in SLOTS_PER_CHUNK.items()])
+        slots = np.concatenate([np.arange(count, dtype=np.int64) for count in SLOTS_PER_CHUNK.values()])
+        codes = np.repeat(codes, slots_per_chunk)
+        kinds, slots = np.tile(kinds, len(codes) // slots_per_chunk), np.tile(slots, len(codes) // slots_per_chunk)
+        generations = np.zeros(len(codes), dtype=np.int64)
+        if self._depleted:
+            cx, cz = chunk_coords(codes)
+            waiting = np.fromiter(
+                (self._depleted.get(f"{ID_PREFIXES[kind]}{x},{z}:{slot}", 0) > now
+                 for kind, x, z, slot in zip(kinds.tolist(), cx.tolist(), cz.tolist(), slots.tolist())),
+                dtype=bool, count=len(codes))
+            codes, kinds, slots, generations = codes[~waiting], kinds[~waiting], slots[~waiting], generations[~waiting]
+        self._spawn(codes, kinds, slots, generations)
+
+    def _deplete(self, index, now):
+        """Remove a slot entity until its respawn time (dropped pickups are just removed)"""
+        entity_id = self.ids[index]
+        kind = int(self.kind[index])
+        if self.slot[index] >= 0:
+            respawn_at = now + RESPAWN_SECONDS[kind]
+            self._depleted[entity_id] = respawn_at
+            heapq.heappush(self._respawns, (respawn_at, entity_id, int(self.chunk[index]), kind,
+                                            int(self.slot[index]), int(self.generation[index]) + 1))
+        self._remove([index])
+
+    def _update_chunks(self, player_x, player_z, now):
+        """Spawn chunks that came into a player's area, despawn those left alone long enough"""
+        active = area_codes(player_x, player_z) if len(player_x) else np.empty(0, dtype=np.int64)
+        if self.owns_chunk is not None and len(active):
+            active = active[self.owns_chunk(*chunk_coords(active))]
+        known = np.isin(active, self._chunk_codes, assume_unique=True)
+        self._chunk_seen[np.isin(self._chunk_codes, active, assume_unique=True)] = now
+
+        stale = self._chunk_seen < now - DESPAWN_AFTER
+        if stale.any():
+            in_stale = np.isin(self.chunk[:self._size], self._chunk_codes[stale]) & self.alive[:self._size]
+            self._remove(np.flatnonzero(in_stale).tolist())
+            for code in self._chunk_codes[stale].tolist():
+                del self._chunk_keys[code]
+            self.stats['chunks_despawned'] += int(np.count_nonzero(stale))
+            self._chunk_codes = self._chunk_codes[~stale]
+            self._chunk_seen = self._chunk_seen[~stale]
+
+        new = active[~known]
+        if len(new):
+            self._spawn_chunks(new, now)
+            cx, cz = chunk_coords(new)
+            for code, x, z in zip(new.tolist(), cx.tolist(), cz.tolist()):
+                self._chunk_keys[code] = worldgen.get_chunk_key(x, z)
+            codes = np.concatenate([self._chunk_codes, new])
+            seen = np.concatenate([self._chunk_seen, np.full(len(new), now)])
+            order = np.argsort(codes)
+            self._chunk_codes, self._chunk_seen = codes[order], seen[order]
+            self.stats['chunks_spawned'] += len(new)
+
+    def _respawn_due(self, now):
+        due = []
+        while self._respawns and self._respawns[0][0] <= now:
+            respawn_at, entity_id, code, kind, slot, generation = heapq.heappop(self._respawns)
+            if self._depleted.get(entity_id) != respawn_at:
+                continue
+            del self._depleted[entity_id]
+            if code in self._chunk_keys and entity_id not in self._index:
+                due.append((code, kind, slot, generation))
+        if due:
+            self._spawn(*(np.array(column, dtype=np.int64) for column in zip(*due)))
+            self.stats['respawned'] += len(due)
+
+    @staticmethod
+    def _nearest(player_x, player_z, x, z, radius):
+        """
+        Index of the nearest player within radius of each point (or -1) and its distance
+
+        Players are bucketed into cells of the radius; each point looks at up
+        to MAX_CANDIDATES players in each of the 3x3 cells around it. Points
+        are processed in cell order, which keeps the binary searches local.
+        """
+        nearest = np.full(len(x), -1, dtype=np.int64)
+        best = np.full(len(x), radius * radius)
+        if not len(player_x) or not len(x):
+            return nearest, np.sqrt(best)
+        player_cells = chunk_code(np.floor(player_x / radius).astype(np.int64),
+                                  np.floor(player_z / radius).astype(np.int64))
+        players = np.argsort(player_cells)
+        player_cells = player_cells[players]
+        cell_x, cell_z = np.floor(x / radius).astype(np.int64), np.floor(z / radius).astype(np.int64)
+        points = np.argsort(chunk_code(cell_x, cell_z))
+        x, z, cell_x, cell_z = x[points], z[points], cell_x[points], cell_z[points]
+        sorted_nearest, sorted_best = nearest.copy(), best.copy()
+        for dx in (-1, 0, 1):
+            for dz in (-1, 0, 1):
+                cells = chunk_code(cell_x + dx, cell_z + dz)
+                start = np.searchsorted(player_cells, cells, side='left')
+                end = np.searchsorted(player_cells, cells, side='right')
+                for k in range(MAX_CANDIDATES):
+                    present = start + k < end
+                    if not present.any():
+                        break
+                    candidate = players[np.minimum(start + k, len(players) - 1)]
+                    distance = (player_x[candidate] - x) ** 2 + (player_z[candidate] - z) ** 2
+                    closer = present & (distance < sorted_best)
+                    sorted_best = np.where(closer, distance, sorted_best)
+                    sorted_nearest = np.where(closer, candidate, sorted_nearest)
+        nearest[points], best[points] = sorted_nearest, sorted_best
+        return nearest, np.sqrt(best)
+
+    def _step_monsters(self, player_ids, player_x, player_z, rng, dt):
+        monsters = np.flatnonzero(self.alive[:self._size] & (self.kind[:self._size] == MONSTER))
+        if not len(monsters):
+            return
+        x, y, z = self.x[monsters], self.y[monsters], self.z[monsters]
+        target, distance = self._nearest(player_x, player_z, x, z, DETECTION_RANGE)
+        has_target = target >= 0
+        state = self.state[monsters]
+        timer = self.timer[monsters] - dt
+        roll = rng.random(len(monsters))
+
+        # State transitions
+        lurking, hunting, attacking, diving = (state == LURKING), (state == HUNTING), (state == ATTACKING), (state == DIVING)
+        start_hunt = lurking & has_target & (roll < HUNT_CHANCE)
+        surface = hunting & has_target & (distance < ATTACK_RANGE)
+        give_up = hunting & ~surface & (~has_target | (timer <= 0))
+        dive = attacking & (~has_target | (timer <= 0))
+        resume = diving & (y <= MONSTER_DEPTH + 0.5)
+        state = np.where(start_hunt, HUNTING, state)
+        state = np.where(surface, ATTACKING, state)
+        state = np.where(give_up | resume, LURKING, state)
+        state = np.where(dive, DIVING, state).astype(np.int8)
+        timer = np.where(start_hunt, HUNT_TIME, timer)
+        timer = np.where(surface, SURFACE_TIME, timer)
+
+        # Hunting and attacking monsters head for their target, the others wander
+        chasing = ((state == HUNTING) | (state == ATTACKING)) & has_target
+        if chasing.any():
+            to_x = np.where(chasing, player_x[np.maximum(target, 0)] - x, 0.0)
+            to_z = np.where(chasing, player_z[np.maximum(target, 0)] - z, 0.0)
+        else:
+            to_x = to_z = np.zeros(len(monsters))
+        length = np.maximum(np.hypot(to_x, to_z), 1e-9)
+        speed = MONSTER_SPEED * np.where(state == ATTACKING, ATTACK_SPEED_FACTOR, HUNT_SPEED_FACTOR)
+        vx = np.where(chasing, to_x / length * speed, self.vx[monsters])
+        vz = np.where(chasing, to_z / length * speed, self.vz[monsters])
+        turn = ~chasing & (rng.random(len(monsters)) < WANDER_CHANCE * dt)
+        heading = rng.uniform(0, 2 * math.pi, len(monsters))
+        vx = np.where(turn, np.sin(heading) * MONSTER_SPEED, vx)
+        vz = np.where(turn, np.cos(heading) * MONSTER_SPEED, vz)
+        # Back to wandering speed after a chase
+        wander_speed = np.maximum(np.hypot(vx, vz), 1e-9)
+        slow_down = ~chasing & (wander_speed > MONSTER_SPEED)
+        vx = np.where(slow_down, vx / wander_speed * MONSTER_SPEED, vx)
+        vz = np.where(slow_down, vz / wander_speed * MONSTER_SPEED, vz)
+
+        # Attacking monsters rise to the surface, the others keep to their depth
+        target_y = np.where(state == ATTACKING, 0.0, MONSTER_DEPTH)
+        y = y + np.clip(target_y - y, -VERTICAL_SPEED * dt, VERTICAL_SPEED * dt)
+
+        # Surfaced monsters close to their target hit it (once per cooldown)
+        hit = (state == ATTACKING) & has_target & (distance < HIT_RANGE) & (self.cooldown[monsters] <= self.time)
+        if hit.any():
+            for index, player in zip(monsters[hit].tolist(), target[hit].tolist()):
+                self._hits.append((int(self.chunk[index]), self.ids[index], player_ids[player]))
+            self.cooldown[monsters[hit]] = self.time + HIT_COOLDOWN
+            self.stats['monster_hits'] += int(np.count_nonzero(hit))
+
+        self.state[monsters], self.timer[monsters] = state, timer
+        self.vx[monsters], self.vz[monsters], self.y[monsters] = vx, vz, y
+
+    def _step_fish(self, rng, dt):
+        schools = np.flatnonzero(self.alive[:self._size] & (self.kind[:self._size] == FISH_SCHOOL))
+        if not len(schools):
+            return
+        turn = rng.random(len(schools)) < WANDER_CHANCE * dt
+        heading = rng.uniform(0, 2 * math.pi, len(schools))
+        self.vx[schools] = np.where(turn, np.sin(heading) * FISH_SPEED, self.vx[schools])
+        self.vz[schools] = np.where(turn, np.cos(heading) * FISH_SPEED, self.vz[schools])
+
+    def _move(self, dt):
+        """Integrate velocities, keeping entities inside their chunk (they bounce off the edges)"""
+        size = self._size
+        alive = self.alive[:size]
+        for axis, velocity, chunk in ((self.x, self.vx, self.cx), (self.z, self.vz, self.cz)):
+            low = chunk[:size] * worldgen.CHUNK_SIZE + CHUNK_MARGIN
+            high = low + worldgen.CHUNK_SIZE - 2 * CHUNK_MARGIN
+            moved = axis[:size] + velocity[:size] * dt
+            outside = alive & ((moved < low) | (moved > high))
+            velocity[:size] = np.where(outside, -velocity[:size], velocity[:size])
+            axis[:size] = np.where(alive, np.clip(moved, low, high), axis[:size])
+
+    def step(self, now=None):
+        """Advance the simulation by one fixed timestep (the first step starts the clock at now)"""
+        with self._lock:
+            dt = self.tick_seconds
+            self.time = (self.clock() if now is None else now) if self.time is None else self.time + dt
+            now = self.time
+            player_ids, positions = self.players()
+            positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+            present = np.fromiter((player_id is not None for player_id in player_ids), dtype=bool, count=len(player_ids))
+            player_ids = [player_id for player_id in player_ids if player_id is not None]
+            player_x, player_z = positions[present, 0], positions[present, 2]
+
+            self._update_chunks(player_x, player_z, now)
+            self._respawn_due(now)
+            expired = self.alive[:self._size] & (self.expires[:self._size] <= now)
+            if expired.any():
+                self._remove(np.flatnonzero(expired).tolist())
+
+            rng = np.random.default_rng([self.seed & _U64_MASK, self.tick_count])
+            self._step_monsters(player_ids, player_x, player_z, rng, dt)
+            self._step_fish(rng, dt)
+            self._move(dt)
+
+            self.tick_count += 1
+            self.stats['ticks'] += 1
+            replicating = self.replicate_every and self.tick_count % self.replicate_every == 0
+            payloads = self.replicate() if replicating else None
+        if payloads and self.on_replicate is not None:
+            self.on_replicate(payloads)
+
+    def replicate(self):
+        """
+        State of every spawned chunk, for the clients in its area
+
+        :return: Dictionary of chunk key -> {chunk, tick, entities, hits}.
+            entities holds one tuple per entity with the ENTITY_FIELDS (kind,
+            type and state are indexes into KINDS, TYPE_NAMES[kind] and
+            STATES; value is the fish left in a school or a pickup's money);
+            hits are [monster ID, player ID] of monster attacks since the
+            last replication.
+        """
+        with self._lock:
+            alive = np.flatnonzero(self.alive[:self._size])
+            order = alive[np.argsort(self.chunk[alive], kind='stable')]
+            codes = self.chunk[order]
+            rows = list(zip(
+                [self.ids[index] for index in order.tolist()],
+                self.kind[order].tolist(),
+                self.type[order].tolist(),
+                np.round(self.x[order], 1).tolist(),
+                np.round(self.y[order], 1).tolist(),
+                np.round(self.z[order], 1).tolist(),
+                np.round(np.arctan2(self.vx[order], self.vz[order]), 2).tolist(),
+                self.state[order].tolist(),
+                self.value[order].tolist()
+            ))
+            hits = {}
+            for code, monster_id, player_id in self._hits:
+                hits.setdefault(code, []).append([monster_id, player_id])
+            self._hits = []
+
+            # Rows of each chunk are the range between its first and the next chunk's first row
+            chunk_codes = self._chunk_codes
+            starts = np.searchsorted(codes, chunk_codes, side='left').tolist()
+            ends = np.searchsorted(codes, chunk_codes, side='right').tolist()
+            payloads = {}
+            for code, start, end in zip(chunk_codes.tolist(), starts, ends):
+                key = self._chunk_keys[code]
+                payloads[key] = {'chunk': key, 'tick': self.tick_count, 'entities': rows[start:end],
+                                 'hits': hits.get(code, [])}
+            self.stats['replications'] += 1
+            return payloads
+
+    def _reachable(self, entity_id, kind, position, reach):
+        index = self._index.get(entity_id)
+        if index is None or self.kind[index] != kind or not isinstance(position, dict):
+            return None
+        if math.hypot(self.x[index] - (position.get('x') or 0), self.z[index] - (position.get('z') or 0)) > reach:
+            return None
+        return index
+
+    def hit(self, entity_id, position, now=None):
+        """
+        A cannonball from a player at position hit a monster
+
+        :return: None if the hit is not possible, else {'id', 'type',
+            'health', 'killed', 'drop'} (drop: ID of the dropped pickup)
+        """
+        with self._lock:
+            now = (self.time or self.clock()) if now is None else now
+            index = self._reachable(entity_id, MONSTER, position, HIT_DISTANCE)
+            if index is None:
+                self.stats['invalid_hits'] += 1
+                return None
+            self.health[index] -= 1
+            result = {
+                'id': entity_id,
+                'type': MONSTER_TYPES[self.type[index]],
+                'health': int(self.health[index]),
+                'killed': False,
+                'drop': None
+            }
+            if self.health[index] > 0:
+                # A hit monster turns on its attacker
+                self.state[index], self.timer[index] = HUNTING, HUNT_TIME
+                return result
+
+            code, x, z = int(self.chunk[index]), float(self.x[index]), float(self.z[index])
+            self._deplete(index, now)
+            cx, cz = chunk_coords(code)
+            drop_id = f"d{cx},{cz}:{self._drops}"
+            self._drops += 1
+            drop = self._allocate([drop_id])
+            self.chunk[drop], self.cx[drop], self.cz[drop] = code, cx, cz
+            self.kind[drop], self.type[drop], self.slot[drop], self.generation[drop] = PICKUP, MONSTER_DROP, -1, 0
+            self.x[drop], self.y[drop], self.z[drop], self.vx[drop], self.vz[drop] = x, 0.5, z, 0.0, 0.0
+            self.health[drop], self.value[drop] = 0, PICKUP_VALUES[MONSTER_DROP]
+            self.expires[drop] = now + DROP_LIFETIME
+            self.stats['monsters_killed'] += 1
+            result.update(killed=True, drop=drop_id)
+            return result
+
+    def collect(self, entity_id, position, now=None):
+        """
+        A player at position picks up a pickup
+
+        :return: (pickup type, money value), or None if it cannot be collected
+        """
+        with self._lock:
+            now = (self.time or self.clock()) if now is None else now
+            index = self._reachable(entity_id, PICKUP, position, COLLECT_DISTANCE)
+            if index is None:
+                self.stats['invalid_collects'] += 1
+                return None
+            collected = PICKUP_TYPES[self.type[index]], int(self.value[index])
+            self._deplete(index, now)
+            self.stats['collected'] += 1
+            return collected
+
+    def fish(self, position, now=None):
+        """
+        Take one fish from the nearest school within FISHING_DISTANCE of a position
+
+        :return: (school ID, fish type), or None if no school is in reach
+        """
+        if not isinstance(position, dict):
+            return None
+        with self._lock:
+            now = (self.time or self.clock()) if now is None else now
+            size = self._size
+            distance = np.hypot(self.x[:size] - (position.get('x') or 0), self.z[:size] - (position.get('z') or 0))
+            distance[~self.alive[:size] | (self.kind[:size] != FISH_SCHOOL)] = np.inf
+            if not size or distance.min() > FISHING_DISTANCE:
+                return None
+            index = int(np.argmin(distance))
+            caught = self.ids[index], FISH_TYPES[self.type[index]]
+            self.value[index] -= 1
+            if self.value[index] <= 0:
+                self._deplete(index, now)
+            self.stats['fish_caught'] += 1
+            return caught
+
+    def tick(self, now=None):
+        """Run the fixed timesteps due by now (at most MAX_CATCH_UP_TICKS)"""
+        now = self.clock() if now is None else now
+        if self.time is None:
+            self.step(now)
+            return 1
+        due = int((now - self.time) / self.tick_seconds)
+        if due > MAX_CATCH_UP_TICKS:
+            # Fell too far behind: skip ahead instead of simulating a burst
+            self.stats['dropped_ticks'] += due - MAX_CATCH_UP_TICKS
+            self.time += (due - MAX_CATCH_UP_TICKS) * self.tick_seconds
+            due = MAX_CATCH_UP_TICKS
+        for _ in range(due):
+            self.step()
+        return due
+
+    def run(self, sleep):
+        """Fixed-timestep loop for a background task"""
+        while True:
+            sleep(self.tick_seconds)
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Error in entity simulation tick: {e}")
@@ -0,0 +1,412 @@
+import os
+import copy
+import time
+import uuid
+import random
+import tempfile
+import threading
+from collections import Counter
+
+from google.api_core import exceptions as google_exceptions
+from google.cloud.firestore_v1 import DELETE_FIELD
+
+
+class NotFound(google_exceptions.NotFound):
+    """Raised when updating a document that does not exist (as Firestore does)"""
+
+
+def _get_field(data, field):
+    """Read a possibly dotted field path from a document"""
+    value = data
+    for part in field.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _matches(data, field, op, value):
+    """Evaluate a single where() filter"""
+    current = _get_field(data, field)
+    if op == '==':
+        return current == value
+    if op == '!=':
+        return current is not None and current != value
+    if op == 'in':
+        return current in value
+    if op == 'not-in':
+        return current is not None and current not in value
+    if op == 'array-contains':
+        return isinstance(current, list) and value in current
+    if current is None:
+        return False
+    try:
+        if op == '<':
+            return current < value
+        if op == '<=':
+            return current <= value
+        if op == '>':
+            return current > value
+        if op == '>=':
+            return current >= value
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported operator: {op}")
+
+
+def _transform(current, value):
+    """Apply ArrayUnion/ArrayRemove sentinels (matched by name, like the real client's transforms)"""
+    kind = type(value).__name__
+    if kind == 'ArrayUnion':
+        result = list(current) if isinstance(current, list) else []
+        for item in value.values:
+            if item not in result:
+                result.append(copy.deepcopy(item))
+        return result
+    if kind == 'ArrayRemove':
+        if not isinstance(current, list):
+            return []
+        return [item for item in current if item not in value.values]
+    return copy.deepcopy(value)
+
+
+def _merge(document, data):
+    """set(merge=True): nested maps are merged field by field, like the real client"""
+    merged = dict(document)
+    for field, value in data.items():
+        if value is DELETE_FIELD:
+            merged.pop(field, None)
+        elif isinstance(value, dict) and isinstance(merged.get(field), dict):
+            merged[field] = _merge(merged[field], value)
+        else:
+            merged[field] = _transform(merged.get(field), value)
+    return merged
+
+
+class FakeSnapshot:
+    """Document snapshot"""
+
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return _get_field(self._data or {}, field)
+
+
+class FakeDocumentReference:
+    """Document reference"""
+
+    def __init__(self, collection, document_id):
+        self.parent = collection
+        self.id = document_id
+
+    @property
+    def _store(self):
+        return self.parent._store
+
+    def get(self):
+        client = self.parent._client
+        client._round_trip('get')
+        client._record('read')
+        with client._lock:
+            data = self._store.get(self.id)
+            return FakeSnapshot(self, copy.deepcopy(data) if data is not None else None)
+
+    def set(self, data, merge=False):
+        client = self.parent._client
+        client._round_trip('write')
+        client._record('write')
+        client._apply_set(self, data, merge)
+
+    def update(self, updates):
+        client = self.parent._client
+        client._round_trip('write')
+        client._record('write')
+        client._apply_update(self, updates)
+
+    def delete(self):
+        client = self.parent._client
+        client._round_trip('write')
+        client._record('write')
+        client._apply_delete(self)
+
+
+class FakeQuery:
+    """Query over a collection supporting where, order_by, limit and cursors (start/end at/after/before)"""
+
+    def __init__(self, collection, filters=(), orders=(), limit_count=None, start=None, end=None):
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit_count
+        # Cursors: (field values, inclusive)
+        self._start = start
+        self._end = end
+
+    def _copy(self, **changes):
+        options = {
+            'filters': self._filters,
+            'orders': self._orders,
+            'limit_count': self._limit,
+            'start': self._start,
+            'end': self._end
+        }
+        options.update(changes)
+        return FakeQuery(self._collection, **options)
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction='ASCENDING'):
+        return self._copy(orders=self._orders + ((field, direction),))
+
+    def limit(self, count):
+        return self._copy(limit_count=count)
+
+    @staticmethod
+    def _cursor(document_fields, inclusive):
+        """Cursor from a snapshot or a dictionary of the ordered fields ('__name__' is the document ID)"""
+        if isinstance(document_fields, FakeSnapshot):
+            data = dict(document_fields.to_dict() or {}, __name__=document_fields.id)
+        else:
+            data = dict(document_fields)
+        return data, inclusive
+
+    def start_at(self, document_fields):
+        return self._copy(start=self._cursor(document_fields, True))
+
+    def start_after(self, document_fields):
+        return self._copy(start=self._cursor(document_fields, False))
+
+    def end_at(self, document_fields):
+        return self._copy(end=self._cursor(document_fields, True))
+
+    def end_before(self, document_fields):
+        return self._copy(end=self._cursor(document_fields, False))
+
+    def _compare(self, document_id, data, cursor):
+        """-1, 0 or 1 as a document sorts before, at or after a cursor in this query's order"""
+        values, _ = cursor
+        orders = self._orders or (('__name__', 'ASCENDING'),)
+        for field, direction in orders:
+            if field not in values and _get_field(values, field) is None:
+                break
+            mine = document_id if field == '__name__' else _get_field(data, field)
+            theirs = values['__name__'] if field == '__name__' else _get_field(values, field)
+            if mine != theirs:
+                result = -1 if mine < theirs else 1
+                return -result if direction == 'DESCENDING' else result
+        return 0
+
+    def _run(self):
+        with self._collection._client._lock:
+            items = [
+                (document_id, copy.deepcopy(data))
+                for document_id, data in self._collection._store.items()
+                if all(_matches(data, f, op, v) for f, op, v in self._filters)
+            ]
+
+        # Firestore excludes documents missing an ordered field
+        for field, _ in self._orders:
+            if field != '__name__':
+                items = [item for item in items if _get_field(item[1], field) is not None]
+
+        for field, direction in reversed(self._orders):
+            reverse = direction == 'DESCENDING'
+            items.sort(
+                key=lambda item, f=field: item[0] if f == '__name__' else _get_field(item[1], f),
+                reverse=reverse
+            )
+        if not self._orders:
+            items.sort(key=lambda item: item[0])
+
+        if self._start is not None:
+            lowest = 0 if self._start[1] else 1
+            items = [item for item in items if self._compare(*item, self._start) >= lowest]
+        if self._end is not None:
+            highest = 0 if self._end[1] else -1
+            items = [item for item in items if self._compare(*item, self._end) <= highest]
+
+        if self._limit is not None:
+            items = items[:self._limit]
+        return items
+
+    def stream(self):
+        client = self._collection._client
+        client._round_trip('query')
+        client._record('query')
+        items = self._run()
+        client._record('read', max(len(items), 1))
+        for document_id, data in items:
+            yield FakeSnapshot(self._collection.document(document_id), data)
+
+    def get(self):
+        return list(self.stream())
+
+
+class FakeCollectionReference(FakeQuery):
+    """Collection reference"""
+
+    def __init__(self, client, name):
+        self._client = client
+        self.id = name
+        super().__init__(self)
+
+    @property
+    def _store(self):
+        return self._client._data.setdefault(self.id, {})
+
+    def document(self, document_id=None):
+        return FakeDocumentReference(self, document_id or uuid.uuid4().hex[:20])
+
+    def add(self, data):
+        reference = self.document()
+        reference.set(data)
+        return None, reference
+
+
+class FakeWriteBatch:
+    """WriteBatch applying all queued writes in a single commit"""
+
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, data, merge=False):
+        self._writes.append(('set', reference, data, merge))
+
+    def update(self, reference, updates):
+        self._writes.append(('update', reference, updates, None))
+
+    def delete(self, reference):
+        self._writes.append(('delete', reference, None, None))
+
+    def commit(self):
+        if len(self._writes) > 500:
+            raise ValueError("A write batch can contain at most 500 operations")
+        self._client._round_trip('commit')
+        self._client._record('batch_commit')
+        self._client._record('write', len(self._writes))
+        for kind, reference, data, merge in self._writes:
+            if kind == 'set':
+                self._client._apply_set(reference, data, merge)
+            elif kind == 'update':
+                self._client._apply_update(reference, data)
+            else:
+                self._client._apply_delete(reference)
+        self._writes = []
+
+    def __len__(self):
+        return len(self._writes)
+
+
+class FakeFirestore:
+    """
+    In-memory stand-in for the Firestore client used by firestore_models
+
+    Every round trip is counted in `ops`: document reads (each streamed
+    document counts as one read, like Firestore billing), writes, queries and
+    batch commits.
+
+    Network latency can be injected per round trip: `latency` is either a
+    number of seconds for every round trip or a dictionary of round-trip kind
+    ('get', 'write', 'query', 'commit') -> seconds, and `jitter` adds up to
+    that fraction of the latency at random.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0):
+        self._data = {}
+        self._lock = threading.RLock()
+        self.ops = Counter()
+        self.latency = latency
+        self.jitter = jitter
+        self.latency_seconds = 0.0
+
+    def _record(self, kind, count=1):
+        self.ops[kind] += count
+
+    def _round_trip(self, kind):
+        """Wait for the injected latency of one round trip"""
+        delay = self.latency.get(kind, 0.0) if isinstance(self.latency, dict) else self.latency
+        if delay > 0:
+            delay *= 1 + random.random() * self.jitter
+            self.latency_seconds += delay
+            time.sleep(delay)
+
+    def _apply_set(self, reference, data, merge):
+        with self._lock:
+            store = reference._store
+            document = store.get(reference.id, {}) if merge else {}
+            store[reference.id] = _merge(document, data) if merge else {
+                field: _transform(None, value) for field, value in data.items()
+            }
+
+    def _apply_update(self, reference, updates):
+        with self._lock:
+            store = reference._store
+            if reference.id not in store:
+                raise NotFound(f"No document to update: {reference.parent.id}/{reference.id}")
+            for field, value in updates.items():
+                target = store[reference.id]
+                parts = field.split('.')
+                for part in parts[:-1]:
+                    target = target.setdefault(part, {})
+                target[parts[-1]] = _transform(target.get(parts[-1]), value)
+
+    def _apply_delete(self, reference):
+        with self._lock:
+            reference._store.pop(reference.id, None)
+
+    def collection(self, name):
+        return FakeCollectionReference(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def get_all(self, references):
+        """Read many documents in one round trip (missing documents are returned as not existing)"""
+        references = list(references)
+        self._round_trip('get')
+        self._record('read', len(references))
+        with self._lock:
+            snapshots = [
+                FakeSnapshot(reference, copy.deepcopy(reference._store.get(reference.id)))
+                for reference in references
+            ]
+        yield from snapshots
+
+    def reset_ops(self):
+        """Reset the operation counters"""
+        self.ops = Counter()
+
+    def snapshot_ops(self):
+        """Return a copy of the operation counters"""
+        return dict(self.ops)
+
+
+def patch_firebase(fake_db):
+    """
+    Make firebase_admin hand out the fake client instead of connecting
+
+    Must be called before importing app.py, which initializes Firebase at
+    import time. Unless JOURNAL_DIR is set, app.py journals to a temporary
+    directory, so records meant for the fake are never replayed into a real
+    Firestore.
+    """
+    os.environ.setdefault('JOURNAL_DIR', tempfile.mkdtemp(prefix='fake_firestore_journal_'))
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    credentials.Certificate = lambda *args, **kwargs: None
+    firebase_admin.initialize_app = lambda *args, **kwargs: None
+    firestore.client = lambda *args, **kwargs: fake_db
+    return fake_db
@@ -0,0 +1,313 @@
+import time
+import logging
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+import flask
+
+logger = logging.getLogger(__name__)
+
+# Document gets, document writes (also inside batches), queries, documents
+# returned by queries, and batch commits
+OP_KINDS = ('read', 'write', 'query', 'streamed', 'batch_commit')
+
+# Operations outside any handler or scope (e.g. in a thread without one)
+UNTAGGED = 'untagged'
+
+# Seconds between two over-budget warnings for the same handler
+BUDGET_LOG_INTERVAL = 60.0
+
+
+class FirestoreAccounting:
+    """
+    Firestore operations and round-trip time per handler
+
+    Every operation made through an InstrumentedClient is attributed to the
+    handler that caused it: the Socket.IO event ('socket:player_join') or the
+    HTTP route ('http:/api/players/<player_id>') of the current request, or a
+    named scope for work outside requests ('task:presence_tick'). A handler
+    call ends when its request context is torn down (or its scope exits);
+    the call's operations are then added to the handler's totals and checked
+    against the handler's budget, if it has one.
+
+    Budgets are maximum operations per call, e.g.
+    {'socket:player_update': {'read': 0, 'write': 1}}. Calls over budget are
+    counted and logged, at most once per BUDGET_LOG_INTERVAL per handler.
+    """
+
+    def __init__(self, budgets=None):
+        self.budgets = {handler: dict(limits) for handler, limits in (budgets or {}).items()}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._last_warning = {}
+        self.reset()
+
+    def init_app(self, app):
+        """End a handler call whenever a Flask request context (HTTP or Socket.IO event) is torn down"""
+        app.teardown_request(lambda exc: self._end_request())
+
+    def reset(self):
+        """Clear all totals"""
+        with self._lock:
+            self._calls = Counter()
+            self._ops = defaultdict(Counter)
+            self._max_ops = defaultdict(Counter)
+            self._seconds = defaultdict(Counter)
+            self._over_budget = Counter()
+
+    def set_budget(self, handler, **limits):
+        """Set the maximum operations per call of a handler (e.g. read=1, query=0)"""
+        unknown = set(limits) - set(OP_KINDS)
+        if unknown:
+            raise ValueError(f"Unknown operation kinds: {', '.join(sorted(unknown))}")
+        self.budgets[handler] = limits
+
+    @staticmethod
+    def request_handler():
+        """Name of the Socket.IO event or HTTP route of the current request"""
+        event = getattr(flask.request, 'event', None)
+        if event:
+            return f"socket:{event['message']}"
+        rule = flask.request.url_rule
+        return f"http:{rule.rule if rule is not None else 'unmatched'}"
+
+    def _current_call(self):
+        """The (handler, operation counts) of the call in progress, or None"""
+        scopes = getattr(self._local, 'scopes', None)
+        if scopes:
+            return scopes[-1]
+        if flask.has_request_context():
+            call = getattr(flask.request, '_firestore_call', None)
+            if call is None:
+                call = (self.request_handler(), Counter())
+                flask.request._firestore_call = call
+            return call
+        return None
+
+    @contextmanager
+    def scope(self, handler):
+        """Attribute the operations of a block to handler, as one call"""
+        call = (handler, Counter())
+        scopes = self._local.__dict__.setdefault('scopes', [])
+        scopes.append(call)
+        try:
+            yield
+        finally:
+            scopes.pop()
+            self._end_call(call)
+
+    def scoped(self, handler, fn):
+        """Wrap fn so each invocation is one call of handler"""
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.scope(handler):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def record(self, kind, count=1, seconds=0.0, call=None):
+        """Record operations (and their round-trip time) for the current call"""
+        call = call or self._current_call()
+        if call is None:
+            with self._lock:
+                self._ops[UNTAGGED][kind] += count
+                self._seconds[UNTAGGED][kind] += seconds
+            return
+        handler, ops = call
+        ops[kind] += count
+        if seconds:
+            ops[f'{kind}_seconds'] += seconds
+
+    def _end_request(self):
+        call = getattr(flask.request, '_firestore_call', None)
+        if call is None:
+            # A call without Firestore operations still counts as a call
+            call = (self.request_handler(), Counter())
+        self._end_call(call)
+
+    def _end_call(self, call):
+        handler, ops = call
+        with self._lock:
+            self._calls[handler] += 1
+            for kind in OP_KINDS:
+                count = ops[kind]
+                self._ops[handler][kind] += count
+                self._seconds[handler][kind] += ops[f'{kind}_seconds']
+                if count > self._max_ops[handler][kind]:
+                    self._max_ops[handler][kind] = count
+
+        budget = self.budgets.get(handler)
+        if not budget:
+            return
+        exceeded = {kind: ops[kind] for kind, limit in budget.items() if ops[kind] > limit}
+        if not exceeded:
+            return
+        with self._lock:
+            self._over_budget[handler] += 1
+            now = time.monotonic()
+            if now - self._last_warning.get(handler, float('-inf')) < BUDGET_LOG_INTERVAL:
+                return
+            self._last_warning[handler] = now
+            over_budget = self._over_budget[handler]
+        details = ', '.join(f"{kind} {count} > {budget[kind]}" for kind, count in exceeded.items())
+        logger.warning(f"Firestore budget exceeded by {handler}: {details} ({over_budget} calls over budget so far)")
+
+    def stats(self):
+        """Totals, per-call averages and round-trip time per handler, most operations first"""
+        with self._lock:
+            handlers = set(self._calls) | set(self._ops)
+            report = {}
+            for handler in handlers:
+                calls = self._calls[handler]
+                ops = {kind: self._ops[handler][kind] for kind in OP_KINDS}
+                seconds = sum(self._seconds[handler].values())
+                report[handler] = {
+                    'calls': calls,
+                    'ops': ops,
+                    'ops_per_call': {kind: count / calls for kind, count in ops.items()} if calls else None,
+                    'max_ops_per_call': {kind: self._max_ops[handler][kind] for kind in OP_KINDS},
+                    'firestore_ms': {kind: self._seconds[handler][kind] * 1000 for kind in OP_KINDS},
+                    'firestore_ms_per_call': seconds / calls * 1000 if calls else None,
+                    'over_budget': self._over_budget[handler],
+                    'budget': self.budgets.get(handler)
+                }
+        return dict(sorted(report.items(), key=lambda item: -sum(item[1]['ops'].values())))
+
+
+def _unwrap(reference):
+    return reference._target if isinstance(reference, _Proxy) else reference
+
+
+class _Proxy:
+    """Delegates everything that is not instrumented to the wrapped object"""
+
+    def __init__(self, target, accounting):
+        self._target = target
+        self._accounting = accounting
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def _timed(self, kind, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._accounting.record(kind, 1, time.perf_counter() - start)
+
+
+class _Query(_Proxy):
+    def _chain(name):
+        def method(self, *args, **kwargs):
+            return _Query(getattr(self._target, name)(*args, **kwargs), self._accounting)
+        method.__name__ = name
+        return method
+
+    where = _chain('where')
+    order_by = _chain('order_by')
+    limit = _chain('limit')
+    limit_to_last = _chain('limit_to_last')
+    offset = _chain('offset')
+    select = _chain('select')
+    start_at = _chain('start_at')
+    start_after = _chain('start_after')
+    end_at = _chain('end_at')
+    end_before = _chain('end_before')
+    del _chain
+
+    def stream(self, *args, **kwargs):
+        accounting = self._accounting
+        # Documents may be consumed after the handler moved on; keep the caller's call
+        call = accounting._current_call()
+        seconds = 0.0
+        streamed = 0
+        start = time.perf_counter()
+        try:
+            documents = iter(self._target.stream(*args, **kwargs))
+            seconds += time.perf_counter() - start
+            while True:
+                start = time.perf_counter()
+                try:
+                    document = next(documents)
+                except StopIteration:
+                    break
+                finally:
+                    seconds += time.perf_counter() - start
+                streamed += 1
+                yield document
+        finally:
+            accounting.record('query', 1, seconds, call)
+            accounting.record('streamed', streamed, 0.0, call)
+
+    def get(self, *args, **kwargs):
+        return list(self.stream(*args, **kwargs))
+
+
+class _Collection(_Query):
+    def document(self, *args, **kwargs):
+        return _Document(self._target.document(*args, **kwargs), self._accounting)
+
+    def add(self, *args, **kwargs):
+        return self._timed('write', self._target.add, *args, **kwargs)
+
+
+class _Document(_Proxy):
+    def get(self, *args, **kwargs):
+        return self._timed('read', self._target.get, *args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        return self._timed('write', self._target.set, *args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        return self._timed('write', self._target.update, *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._timed('write', self._target.delete, *args, **kwargs)
+
+    def collection(self, *args, **kwargs):
+        return _Collection(self._target.collection(*args, **kwargs), self._accounting)
+
+
+class _Batch(_Proxy):
+    def __init__(self, target, accounting):
+        super().__init__(target, accounting)
+        self._writes = 0
+
+    def set(self, reference, *args, **kwargs):
+        self._writes += 1
+        return self._target.set(_unwrap(reference), *args, **kwargs)
+
+    def update(self, reference, *args, **kwargs):
+        self._writes += 1
+        return self._target.update(_unwrap(reference), *args, **kwargs)
+
+    def delete(self, reference, *args, **kwargs):
+        self._writes += 1
+        return self._target.delete(_unwrap(reference), *args, **kwargs)
+
+    def commit(self, *args, **kwargs):
+        writes, self._writes = self._writes, 0
+        result = self._timed('batch_commit', self._target.commit, *args, **kwargs)
+        self._accounting.record('write', writes)
+        return result
+
+
+class InstrumentedClient(_Proxy):
+    """Firestore client wrapper that records every operation in a FirestoreAccounting"""
+
+    def collection(self, *args, **kwargs):
+        return _Collection(self._target.collection(*args, **kwargs), self._accounting)
+
+    def document(self, *args, **kwargs):
+        return _Document(self._target.document(*args, **kwargs), self._accounting)
+
+    def batch(self, *args, **kwargs):
+        return _Batch(self._target.batch(*args, **kwargs), self._accounting)
+
+    def get_all(self, references, *args, **kwargs):
+        references = [_unwrap(reference) for reference in references]
+        start = time.perf_counter()
+        snapshots = list(self._target.get_all(references, *args, **kwargs))
+        self._accounting.record('read', len(references), time.perf_counter() - start)
+        return snapshots
@@ -5,6 +5,43 @@ import time
 # This will be initialized in app.py
 db = None
 
+# Firestore allows at most 500 writes in one batch
+MAX_BATCH_WRITES = 500
+
+def write_in_batches(operations):
+    """
+    Apply write operations with as few WriteBatch commits as possible
+    
+    :param operations: Iterable of (kind, document_reference, data) where kind is 'set', 'merge' (set with merge=True), 'update' or 'delete'
+    :return: Number of writes applied
+    """
+    batch = db.batch()
+    pending = 0
+    written = 0
+    for kind, doc_ref, data in operations:
+        if kind == 'set':
+            batch.set(doc_ref, data)
+        elif kind == 'merge':
+            batch.set(doc_ref, data, merge=True)
+        elif kind == 'update':
+            batch.update(doc_ref, data)
+        elif kind == 'delete':
+            batch.delete(doc_ref)
+        else:
+            raise ValueError(f"Unknown write operation: {kind}")
+        pending += 1
+        
+        if pending == MAX_BATCH_WRITES:
+            batch.commit()
+            written += pending
+            batch = db.batch()
+            pending = 0
+    
+    if pending:
+        batch.commit()
+        written += pending
+    return written
+
 # Simple timestamp serialization - just convert to string
 def serialize_timestamp(value):
     """Convert any timestamp to a string representation"""
@@ -83,6 +120,26 @@ class Player:
         # Return updated player
         return Player.get(player_id)
     
+    @staticmethod
+    def merge(player_id, **data):
+        """Write player fields with set(merge=True): no re-read, and the document is created if missing"""
+        data['updated_at'] = time.time()
+        Player.collection().document(player_id).set(data, merge=True)
+    
+    @staticmethod
+    def bulk_update(updates_by_id):
+        """
+        Update many players with batched writes (no re-read)
+        
+        :param updates_by_id: Dictionary of player ID -> fields to update
+        :return: Number of players updated
+        """
+        now = time.time()
+        return write_in_batches(
+            ('update', Player.collection().document(player_id), {**updates, 'updated_at': now})
+            for player_id, updates in updates_by_id.items()
+        )
+    
     @staticmethod
     def delete(player_id):
         """Delete player"""
@@ -208,6 +265,41 @@ class Island:
         # Return the created island
         return Island.get(island_id)
     
+    @staticmethod
+    def new_id():
+        """
+        Generate an island ID (client-side, no round trip)
+        
+        Auto IDs have no underscore, so they never collide with procedural IDs (island_<x>_<z>)
+        """
+        return f"island_{Island.collection().document().id}"
+    
+    @staticmethod
+    def bulk_create(islands_by_id):
+        """
+        Write many islands with known IDs using batched writes (no re-read)
+        
+        :param islands_by_id: Dictionary of island ID -> island data (defaults as in create)
+        :return: Dictionary of island ID -> created island, same shape as get
+        """
+        now = time.time()
+        created = {
+            island_id: {'position': {'x': 0, 'y': 0, 'z': 0}, 'radius': 50, 'type': 'default', 'created_at': now, **data}
+            for island_id, data in islands_by_id.items()
+        }
+        write_in_batches(
+            ('set', Island.collection().document(island_id), data)
+            for island_id, data in created.items()
+        )
+        return {
+            island_id: {
+                **data,
+                'id': island_id,
+                **{field: serialize_timestamp(data[field]) for field in ('created_at', 'updated_at') if field in data}
+            }
+            for island_id, data in created.items()
+        }
+    
     @staticmethod
     def update(island_id, **updates):
         """Update island fields"""
@@ -345,6 +437,53 @@ class Message:
         return messages
 
 
+class Inventory:
+    """Player inventory model for Firestore (one document per player, keyed by player ID)"""
+    collection_name = 'inventories'
+
+    @staticmethod
+    def collection():
+        return db.collection(Inventory.collection_name)
+
+    @staticmethod
+    def get(player_id):
+        """
+        Get a player's inventory
+
+        :return: (version, dictionary of item name -> count), (0, {}) if the player has none
+        """
+        doc = Inventory.collection().document(player_id).get()
+        if not doc.exists:
+            return 0, {}
+        data = doc.to_dict()
+        return data.get('version', 0), data.get('items', {})
+
+    @staticmethod
+    def put(player_id, version, items):
+        """Replace a player's whole inventory (one write)"""
+        Inventory.collection().document(player_id).set({'version': version, 'items': items, 'updated_at': time.time()})
+
+    @staticmethod
+    def bulk_merge(changes_by_id):
+        """
+        Write changed item counts with batched writes
+
+        Only the given items are written (merged into the items map), so a
+        change to one item of a large inventory stays a small write. Items
+        whose count dropped to zero are deleted from the map.
+
+        :param changes_by_id: Dictionary of player ID -> (version, dictionary of item name -> new count)
+        :return: Number of inventories written
+        """
+        now = time.time()
+        return write_in_batches(
+            ('merge', Inventory.collection().document(player_id),
+             {'version': version, 'updated_at': now,
+              'items': {name: count if count else firestore.DELETE_FIELD for name, count in items.items()}})
+            for player_id, (version, items) in changes_by_id.items()
+        )
+
+
 # Initialize Firebase in your app.py file
 def init_firestore(firestore_client):
     """Initialize the Firestore client for all models to use"""
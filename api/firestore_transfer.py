@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Streaming export and import of the game's Firestore collections
+
+Each collection is split into document ID ranges that are exported in
+parallel, one page (ordered by document ID, continued with a start_after
+cursor) at a time, so memory use does not depend on the collection size.
+Every finished page is recorded in a checkpoint file; an interrupted export
+or import run again with the same directory continues where it stopped.
+Imports write each page with batched writes. migrate-chat copies the
+legacy messages collection into the hourly chat buckets of chat_storage.
+
+    python firestore_transfer.py export backup/ --partitions 8
+    python firestore_transfer.py export backup/ --collections players islands --format columnar --gzip
+    python firestore_transfer.py import backup/ --workers 8
+    python firestore_transfer.py migrate-chat
+
+Formats (one file per collection partition, optionally gzip-compressed):
+  ndjson    one {"id", "data"} document per line
+  columnar  one row group per line: {"ids": [...], "columns": {field: [values]}, "missing": {field: [rows]}}
+
+Values JSON cannot hold are tagged: timestamps as {"$timestamp": ISO 8601},
+bytes as {"$bytes": base64} and document references as {"$ref": path}.
+"""
+import os
+import gzip
+import json
+import time
+import base64
+import logging
+import argparse
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import serialization
+import firestore_models
+
+logger = logging.getLogger(__name__)
+
+# Collections of the game (players, islands, chat, presence)
+DEFAULT_COLLECTIONS = ['players', 'islands', 'inventories', 'chat_buckets', 'chat_channels', 'messages', 'socket_sessions']
+
+FORMATS = ('ndjson', 'columnar')
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_PARTITIONS = 4
+DEFAULT_WORKERS = 8
+
+CHECKPOINT_FILE = 'checkpoint.json'
+MANIFEST_FILE = 'manifest.json'
+
+
+# ---- Values ----
+
+def encode_value(value):
+    """Firestore value -> JSON-compatible value"""
+    if isinstance(value, dict):
+        return {key: encode_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(item) for item in value]
+    if isinstance(value, datetime.datetime):
+        return {'$timestamp': value.isoformat()}
+    if isinstance(value, bytes):
+        return {'$bytes': base64.b64encode(value).decode('ascii')}
+    if hasattr(value, 'path') and hasattr(value, 'parent') and hasattr(value, 'id'):
+        return {'$ref': value.path}
+    return value
+
+
+def decode_value(value, client):
+    """JSON value written by encode_value -> Firestore value"""
+    if isinstance(value, dict):
+        if len(value) == 1:
+            (tag, item), = value.items()
+            if tag == '$timestamp':
+                return datetime.datetime.fromisoformat(item)
+            if tag == '$bytes':
+                return base64.b64decode(item)
+            if tag == '$ref':
+                return client.document(item)
+        return {key: decode_value(item, client) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_value(item, client) for item in value]
+    return value
+
+
+# ---- Files ----
+
+def part_name(collection, index, fmt, compressed):
+    return f"{collection}.{index:03d}.{fmt}{'.gz' if compressed else ''}"
+
+
+def open_part(path, mode):
+    """Open a part file for text in mode 'r' or 'a' (gzip by extension)"""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def encode_page(fmt, page):
+    """Lines for a page of (document ID, data)"""
+    if fmt == 'ndjson':
+        return ''.join(serialization.dumps({'id': doc_id, 'data': encode_value(data)}) + '\n' for doc_id, data in page)
+
+    fields = []
+    for _, data in page:
+        for field in data:
+            if field not in fields:
+                fields.append(field)
+    columns = {field: [] for field in fields}
+    missing = {}
+    for row, (_, data) in enumerate(page):
+        for field in fields:
+            if field in data:
+                columns[field].append(encode_value(data[field]))
+            else:
+                columns[field].append(None)
+                missing.setdefault(field, []).append(row)
+    return serialization.dumps({'ids': [doc_id for doc_id, _ in page], 'columns': columns, 'missing': missing}) + '\n'
+
+
+def decode_lines(fmt, lines):
+    """Yield (document ID, encoded data) from the lines of a part file"""
+    for line in lines:
+        if not line.strip():
+            continue
+        record = serialization.loads(line)
+        if fmt == 'ndjson':
+            yield record['id'], record['data']
+            continue
+        missing = {field: set(rows) for field, rows in record['missing'].items()}
+        for row, doc_id in enumerate(record['ids']):
+            yield doc_id, {
+                field: values[row] for field, values in record['columns'].items()
+                if row not in missing.get(field, ())
+            }
+
+
+class Checkpoint:
+    """Progress of a transfer, saved atomically after every page"""
+
+    def __init__(self, directory, name=CHECKPOINT_FILE):
+        self.path = os.path.join(directory, name)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path) as f:
+                self.state = json.load(f)
+        except FileNotFoundError:
+            self.state = {}
+
+    def get(self, key):
+        return self.state.get(key)
+
+    def set(self, key, value):
+        with self._lock:
+            self.state[key] = value
+            temporary = self.path + '.tmp'
+            with open(temporary, 'w') as f:
+                json.dump(self.state, f)
+            os.replace(temporary, self.path)
+
+
+# ---- Export ----
+
+def document_id_bounds(collection):
+    """First and last document ID of a collection (two single-document queries), or None if it is empty"""
+    first = list(collection.order_by('__name__').limit(1).stream())
+    if not first:
+        return None
+    last = list(collection.order_by('__name__', direction='DESCENDING').limit(1).stream())
+    return first[0].id, last[0].id
+
+
+def split_points(first_id, last_id, partitions):
+    """
+    Document IDs splitting [first_id, last_id] into up to partitions ranges
+
+    The split is on the first character after the IDs' common prefix. That is
+    even for random IDs (auto IDs, Firebase UIDs, the part after 'island_')
+    and still correct, only less balanced, for anything else.
+    """
+    prefix = os.path.commonprefix([first_id, last_id])
+    if len(prefix) == len(last_id):
+        return []
+    low = ord(first_id[len(prefix)]) if len(first_id) > len(prefix) else 0
+    high = ord(last_id[len(prefix)])
+    points = []
+    for index in range(1, partitions):
+        code = low + (high - low + 1) * index // partitions
+        if low < code <= high and prefix + chr(code) not in points:
+            points.append(prefix + chr(code))
+    return points
+
+
+def export_partition(db, directory, collection_name, index, start, end, fmt, compressed, page_size, checkpoint):
+    """Export the documents with start <= ID < end (None: unbounded) of one collection"""
+    key = f"export:{collection_name}:{index}"
+    progress = checkpoint.get(key) or {'last_id': None, 'offset': 0, 'documents': 0, 'done': False}
+    if progress['done']:
+        return progress['documents']
+
+    path = os.path.join(directory, part_name(collection_name, index, fmt, compressed))
+    # Drop anything written after the last checkpointed page
+    if os.path.exists(path) and os.path.getsize(path) > progress['offset']:
+        with open(path, 'r+b') as f:
+            f.truncate(progress['offset'])
+    # An empty range still gets its (empty) part file
+    open(path, 'ab').close()
+
+    collection = db.collection(collection_name)
+    while True:
+        query = collection.order_by('__name__')
+        if progress['last_id'] is not None:
+            query = query.start_after({'__name__': progress['last_id']})
+        elif start is not None:
+            query = query.start_at({'__name__': start})
+        if end is not None:
+            query = query.end_before({'__name__': end})
+        page = [(snapshot.id, snapshot.to_dict()) for snapshot in query.limit(page_size).stream()]
+
+        if page:
+            # gzip members can be appended to, so each page is its own member
+            with open_part(path, 'a') as f:
+                f.write(encode_page(fmt, page))
+            progress['last_id'] = page[-1][0]
+            progress['documents'] += len(page)
+            progress['offset'] = os.path.getsize(path)
+        progress['done'] = len(page) < page_size
+        checkpoint.set(key, progress)
+        if progress['done']:
+            logger.info(f"Exported {collection_name} partition {index}: {progress['documents']} documents")
+            return progress['documents']
+
+
+def export_collections(db, directory, collections=DEFAULT_COLLECTIONS, fmt='ndjson', compressed=False,
+                       partitions=DEFAULT_PARTITIONS, workers=DEFAULT_WORKERS, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Export collections to part files in directory (resuming an earlier export there)
+
+    :return: Dictionary of collection -> documents exported
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of: {', '.join(FORMATS)}")
+    os.makedirs(directory, exist_ok=True)
+    checkpoint = Checkpoint(directory)
+    manifest = checkpoint.get('manifest')
+    if manifest is None:
+        manifest = {'format': fmt, 'compressed': compressed, 'started_at': time.time(), 'collections': {}}
+        for name in collections:
+            bounds = document_id_bounds(db.collection(name))
+            points = split_points(*bounds, partitions) if bounds else []
+            manifest['collections'][name] = [None] + points + [None] if bounds else []
+        checkpoint.set('manifest', manifest)
+    elif (manifest['format'], manifest['compressed']) != (fmt, compressed):
+        raise ValueError(f"{directory} holds a {manifest['format']} export, resume it with the same options")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(export_partition, db, directory, name, index, bounds[index], bounds[index + 1],
+                            manifest['format'], manifest['compressed'], page_size, checkpoint)
+            for name, bounds in manifest['collections'].items()
+            for index in range(len(bounds) - 1)
+        ]
+        for future in futures:
+            future.result()
+
+    counts = {name: 0 for name in manifest['collections']}
+    for key, progress in checkpoint.state.items():
+        if key.startswith('export:'):
+            counts[key.split(':')[1]] += progress['documents']
+    with open(os.path.join(directory, MANIFEST_FILE), 'w') as f:
+        json.dump({**manifest, 'finished_at': time.time(), 'documents': counts}, f, indent=2)
+    return counts
+
+
+# ---- Import ----
+
+def import_part(db, path, collection_name, fmt, page_size, checkpoint):
+    """Write the documents of one part file with batched writes, skipping pages already imported"""
+    key = f"import:{os.path.basename(path)}"
+    done = checkpoint.get(key) or 0
+    seen = 0
+    page = []
+
+    def flush():
+        nonlocal done
+        firestore_models.write_in_batches(
+            ('set', db.collection(collection_name).document(doc_id), decode_value(data, db))
+            for doc_id, data in page
+        )
+        done += len(page)
+        checkpoint.set(key, done)
+        page.clear()
+
+    with open_part(path, 'r') as f:
+        for doc_id, data in decode_lines(fmt, f):
+            seen += 1
+            if seen <= done:
+                continue
+            page.append((doc_id, data))
+            if len(page) >= page_size:
+                flush()
+    if page:
+        flush()
+    logger.info(f"Imported {os.path.basename(path)}: {done} documents")
+    return done
+
+
+def import_collections(db, directory, collections=None, workers=DEFAULT_WORKERS, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Import an export directory (resuming an earlier import of it)
+
+    Documents are written with set(), replacing documents with the same ID.
+
+    :return: Dictionary of collection -> documents imported
+    """
+    firestore_models.init_firestore(db)
+
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    fmt, compressed = manifest['format'], manifest['compressed']
+    names = [name for name in manifest['collections'] if collections is None or name in collections]
+    checkpoint = Checkpoint(directory, 'import_' + CHECKPOINT_FILE)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(import_part, db, os.path.join(directory, part_name(name, index, fmt, compressed)),
+                            name, fmt, page_size, checkpoint)
+            for name in names
+            for index in range(max(len(manifest['collections'][name]) - 1, 0))
+        ]
+        for future in futures:
+            future.result()
+    return {name: sum(checkpoint.get(f"import:{part_name(name, index, fmt, compressed)}") or 0
+                      for index in range(max(len(manifest['collections'][name]) - 1, 0)))
+            for name in names}
+
+
+# ---- Legacy chat ----
+
+def legacy_timestamp(value):
+    """UNIX timestamp of a legacy message's timestamp field (float or Firestore timestamp), or None"""
+    if isinstance(value, datetime.datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return None
+
+
+def migrate_legacy_chat(db, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Copy the legacy messages collection into hourly chat buckets
+
+    Messages keep their document IDs, and IDs already in a bucket are
+    skipped, so the migration can be run again (or interrupted and
+    restarted) without duplicating anything. Sender names and colors are
+    looked up once per sender. The messages collection itself is left
+    untouched.
+
+    :return: Dictionary with the number of messages migrated, already
+        migrated and skipped (malformed)
+    """
+    import chat_storage
+
+    firestore_models.init_firestore(db)
+    store = chat_storage.ChatStore()
+    migrated = {
+        record['i']
+        for snapshot in store.buckets().stream()
+        for record in snapshot.to_dict().get('messages', [])
+    }
+    senders = {}
+    counts = {'messages': 0, 'existing': 0, 'skipped': 0}
+    last_id = None
+    while True:
+        query = db.collection(firestore_models.Message.collection_name).order_by('__name__')
+        if last_id is not None:
+            query = query.start_after({'__name__': last_id})
+        page = [(snapshot.id, snapshot.to_dict()) for snapshot in query.limit(page_size).stream()]
+        if not page:
+            break
+        last_id = page[-1][0]
+
+        messages_by_id = {}
+        for message_id, data in page:
+            if message_id in migrated:
+                counts['existing'] += 1
+                continue
+            timestamp = legacy_timestamp(data.get('timestamp'))
+            if timestamp is None or data.get('sender_id') is None or data.get('content') is None:
+                counts['skipped'] += 1
+                continue
+            sender_id = data['sender_id']
+            if sender_id not in senders:
+                senders[sender_id] = firestore_models.Player.get(sender_id) or {}
+            messages_by_id[message_id] = {
+                'sender_id': sender_id,
+                'content': data['content'],
+                'timestamp': timestamp,
+                'message_type': data.get('message_type', 'global'),
+                'sender_name': senders[sender_id].get('name', 'Unknown'),
+                'sender_color': senders[sender_id].get('color')
+            }
+        if messages_by_id:
+            counts['messages'] += store.append(messages_by_id)
+        logger.info(f"Migrated {counts['messages']} legacy chat messages")
+        if len(page) < page_size:
+            break
+    return counts
+
+
+def connect():
+    """Firestore client from FIREBASE_CREDENTIALS, like app.py"""
+    from dotenv import load_dotenv
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    load_dotenv()
+    firebase_admin.initialize_app(credentials.Certificate(os.environ.get('FIREBASE_CREDENTIALS', 'firebasekey.json')))
+    return firestore.client()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stream Firestore collections to and from local files')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='Export collections (resumes an unfinished export)')
+    export_parser.add_argument('directory')
+    export_parser.add_argument('--collections', nargs='+', default=DEFAULT_COLLECTIONS)
+    export_parser.add_argument('--format', choices=FORMATS, default='ndjson')
+    export_parser.add_argument('--gzip', action='store_true', help='Compress the part files')
+    export_parser.add_argument('--partitions', type=int, default=DEFAULT_PARTITIONS, help='Document ID ranges per collection')
+    export_parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Partitions exported at once')
+    export_parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE)
+
+    import_parser = subparsers.add_parser('import', help='Import an export (resumes an unfinished import)')
+    import_parser.add_argument('directory')
+    import_parser.add_argument('--collections', nargs='+', help='Only these collections (default: all exported)')
+    import_parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Part files imported at once')
+    import_parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE, help='Documents per batched write')
+
+    migrate_parser = subparsers.add_parser(
+        'migrate-chat', help='Copy the legacy messages collection into chat buckets (safe to run again)')
+    migrate_parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    client = connect()
+    start = time.perf_counter()
+    if args.command == 'migrate-chat':
+        counts = migrate_legacy_chat(client, args.page_size)
+        print(f"Migrated {counts['messages']} messages ({counts['existing']} already migrated, "
+              f"{counts['skipped']} malformed) in {time.perf_counter() - start:.1f}s")
+        raise SystemExit(0)
+    if args.command == 'export':
+        counts = export_collections(client, args.directory, args.collections, args.format, args.gzip,
+                                    args.partitions, args.workers, args.page_size)
+    else:
+        counts = import_collections(client, args.directory, args.collections, args.workers, args.page_size)
+    for name, count in counts.items():
+        print(f"{name:<20} {count:>10} documents")
+    print(f"{args.command.capitalize()}ed {sum(counts.values())} documents in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,206 @@
+import time
+import logging
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Players with no update for this many seconds are disconnected
+DEFAULT_IDLE_TIMEOUT = 60.0
+# Seconds between sweeps; also the resolution of the timer wheel
+SWEEP_INTERVAL = 1.0
+
+# Timer wheel geometry: 3 levels of 64 slots cover 64^3 ticks (~3 days at 1s)
+WHEEL_SLOT_BITS = 6
+WHEEL_LEVELS = 3
+
+
+class TimerWheel:
+    """
+    Hierarchical timer wheel
+
+    Level 0 has one slot per tick; each higher level has slots covering a
+    whole revolution of the level below. Scheduling, rescheduling and
+    cancelling are O(1); entries in a higher level are moved down when the
+    wheel reaches their slot. Deadlines beyond the wheel's span are parked in
+    the last slot of the top level and placed again when it is reached.
+    """
+
+    def __init__(self, resolution=SWEEP_INTERVAL, slot_bits=WHEEL_SLOT_BITS, levels=WHEEL_LEVELS, now=None):
+        self.resolution = resolution
+        self.slot_bits = slot_bits
+        self.levels = levels
+        self._mask = (1 << slot_bits) - 1
+        # Ticks covered by each level: 64, 64^2, 64^3
+        self._spans = [1 << (slot_bits * (level + 1)) for level in range(levels)]
+        self._slots = [[set() for _ in range(1 << slot_bits)] for _ in range(levels)]
+        self._current = self._tick(time.time() if now is None else now)
+        # key -> (tick, level, index)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _tick(self, when):
+        return int(when // self.resolution)
+
+    def _place(self, key, tick):
+        delta = tick - self._current
+        if delta < self._spans[0]:
+            # Common case: due within one revolution of the lowest level
+            level = 0
+            index = tick & self._mask
+        else:
+            level = 1
+            while level < self.levels - 1 and delta >= self._spans[level]:
+                level += 1
+            slot_tick = min(tick, self._current + self._spans[-1] - 1)
+            index = (slot_tick >> (self.slot_bits * level)) & self._mask
+        self._slots[level][index].add(key)
+        self._entries[key] = (tick, level, index)
+
+    def _unlink(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._slots[entry[1]][entry[2]].discard(key)
+        return entry
+
+    def schedule(self, key, deadline):
+        """Schedule (or move) a key so it is due at deadline; it never fires early"""
+        self.schedule_many(((key, deadline),))
+
+    def schedule_many(self, items):
+        """Schedule (or move) many (key, deadline) pairs under one lock"""
+        resolution = self.resolution
+        with self._lock:
+            earliest = self._current + 1
+            for key, deadline in items:
+                # Rounded up: the slot of tick t is processed once time >= t * resolution
+                tick = -int(-deadline // resolution)
+                if key in self._entries:
+                    self._unlink(key)
+                self._place(key, tick if tick > earliest else earliest)
+
+    def cancel(self, key):
+        """Remove a key; returns True if it was scheduled"""
+        with self._lock:
+            return self._unlink(key) is not None
+
+    def _cascade(self):
+        """Move entries of higher-level slots that start at the current tick down the wheel"""
+        for level in range(self.levels - 1, 0, -1):
+            if self._current & (self._spans[level - 1] - 1):
+                continue
+            index = (self._current >> (self.slot_bits * level)) & self._mask
+            slot = self._slots[level][index]
+            if slot:
+                self._slots[level][index] = set()
+                for key in slot:
+                    self._place(key, self._entries[key][0])
+
+    def advance(self, now=None):
+        """Move the wheel to now and return every key that became due"""
+        target = self._tick(time.time() if now is None else now)
+        due = []
+        with self._lock:
+            if not self._entries:
+                self._current = max(self._current, target)
+                return due
+
+            while self._current < target:
+                self._current += 1
+                self._cascade()
+
+                index = self._current & self._mask
+                slot = self._slots[0][index]
+                if not slot:
+                    continue
+                self._slots[0][index] = set()
+                for key in slot:
+                    tick = self._entries[key][0]
+                    if tick > self._current:
+                        # Parked beyond the wheel's span
+                        self._place(key, tick)
+                    else:
+                        del self._entries[key]
+                        due.append(key)
+        return due
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class IdleSweeper:
+    """
+    Disconnects players whose last_update is older than the idle timeout
+
+    Each tracked player has one timer in a TimerWheel. Player updates do not
+    touch the wheel: they only refresh last_update (which the update handler
+    sets anyway). When a player's timer fires, last_seen(player_id) is
+    checked and the timer is moved to the new deadline if the player was
+    active since, so an active player costs one O(1) reschedule per timeout
+    period. Players that really went idle are passed to on_idle(player_ids)
+    in one call per sweep.
+    """
+
+    def __init__(self, last_seen, on_idle, timeout=DEFAULT_IDLE_TIMEOUT, wheel=None):
+        self.last_seen = last_seen
+        self.on_idle = on_idle
+        self.timeout = timeout
+        self.wheel = wheel if wheel is not None else TimerWheel()
+        self.stats = Counter()
+
+    def track(self, player_id, now=None):
+        """Start (or restart) the idle timer of a player"""
+        seen = self.last_seen(player_id)
+        if seen is None:
+            seen = time.time() if now is None else now
+        self.wheel.schedule(player_id, seen + self.timeout)
+
+    def untrack(self, player_id):
+        """Stop tracking a player that went away by other means"""
+        self.wheel.cancel(player_id)
+
+    def sweep(self, now=None):
+        """
+        Expire idle players
+
+        :return: List of player IDs that went idle
+        """
+        now = time.time() if now is None else now
+        idle = []
+        active = []
+        for player_id in self.wheel.advance(now):
+            seen = self.last_seen(player_id)
+            if seen is None:
+                # No longer an active player
+                continue
+            deadline = seen + self.timeout
+            if deadline > now:
+                active.append((player_id, deadline))
+            else:
+                idle.append(player_id)
+
+        # Players that sent updates since their timer was set get a new deadline
+        if active:
+            self.wheel.schedule_many(active)
+            self.stats['rescheduled'] += len(active)
+
+        self.stats['sweeps'] += 1
+        if idle:
+            self.stats['idle'] += len(idle)
+            self.on_idle(idle)
+        return idle
+
+    def run(self, sleep):
+        """Sweep loop for a background task"""
+        while True:
+            sleep(self.wheel.resolution)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Error in idle sweep: {e}")
+
+    def __len__(self):
+        return len(self.wheel)
@@ -0,0 +1,181 @@
+import threading
+from collections import Counter, namedtuple
+
+# Limits on one inventory: distinct items, count of one item, item name length
+MAX_ITEMS = 1000
+MAX_COUNT = 1000000
+MAX_NAME_LENGTH = 64
+# Item changes accepted in one inventory_update
+MAX_CHANGES = 100
+
+# One applied change: the inventory went from version base to version, and
+# items holds the new (absolute) counts of the changed items
+Delta = namedtuple('Delta', ['player_id', 'base', 'version', 'items'])
+
+
+class InvalidChange(ValueError):
+    """An inventory change that cannot be applied (nothing was changed)"""
+
+
+class InventoryManager:
+    """
+    Server-side player inventories, kept in memory and synced by item deltas
+
+    An inventory is a dictionary of item name -> count plus a version that
+    grows by one with every applied change. Clients send relative changes
+    ({'Tuna': 1, 'Cod': -2}) together with the version they were made
+    against; apply() checks them (no negative counts, limits on names and
+    sizes), bumps the version and returns a Delta holding the absolute counts
+    of only the changed items. Absolute counts make deltas idempotent, so they
+    can be journaled and merged into Firestore item by item.
+
+    A client whose version matches the base only needs the Delta (or, for
+    its own change, just the new version). Anything else is a divergence and
+    is answered with the full inventory.
+
+    Inventories are loaded with loader(player_id) -> (version, items) the
+    first time a player's inventory is used. The inventory of a player who
+    went away is dropped once every change to it is in the store: journaled()
+    records the journal sequence number of each Delta, and evict() drops the
+    expired inventories whose last change is at or before the written sequence
+    number.
+    """
+
+    def __init__(self, loader, max_items=MAX_ITEMS, max_count=MAX_COUNT):
+        self.loader = loader
+        self.max_items = max_items
+        self.max_count = max_count
+        self.stats = Counter()
+        self._inventories = {}
+        self._expired = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._inventories)
+
+    def _inventory(self, player_id):
+        # A player using the inventory again is no longer expired
+        self._expired.discard(player_id)
+        inventory = self._inventories.get(player_id)
+        if inventory is None:
+            # Loaded outside the lock; a concurrent first use keeps whichever came first
+            version, items = self.loader(player_id) or (0, {})
+            loaded = self._entry(version, {name: count for name, count in items.items() if count > 0})
+            self.stats['loads'] += 1
+            with self._lock:
+                inventory = self._inventories.setdefault(player_id, loaded)
+        return inventory
+
+    @staticmethod
+    def _entry(version, items):
+        # journaled_version and journal_seq: the newest change in the journal and its sequence number
+        return {'version': version, 'items': items, 'journaled_version': version, 'journal_seq': 0}
+
+    def version(self, player_id):
+        return self._inventory(player_id)['version']
+
+    def snapshot(self, player_id):
+        """The full inventory: {'version', 'items'} (what a diverged client is sent)"""
+        inventory = self._inventory(player_id)
+        with self._lock:
+            self.stats['full_syncs'] += 1
+            return {'version': inventory['version'], 'items': dict(inventory['items'])}
+
+    def in_sync(self, player_id, version):
+        """Whether a client holding version has the current inventory"""
+        return self.version(player_id) == version
+
+    def _validate(self, changes):
+        if not isinstance(changes, dict) or not changes or len(changes) > MAX_CHANGES:
+            raise InvalidChange(f"changes must map 1 to {MAX_CHANGES} item names to amounts")
+        for name, amount in changes.items():
+            if not isinstance(name, str) or not 0 < len(name) <= MAX_NAME_LENGTH:
+                raise InvalidChange(f"Item names must be 1 to {MAX_NAME_LENGTH} characters")
+            if not isinstance(amount, int) or isinstance(amount, bool) or amount == 0:
+                raise InvalidChange(f"Amount of {name} must be a non-zero integer")
+
+    def apply(self, player_id, changes):
+        """
+        Apply relative item changes (all or nothing)
+
+        :param changes: Dictionary of item name -> amount to add (negative to remove)
+        :return: The Delta
+        :raises InvalidChange: If a change is malformed, would make a count
+            negative or exceed the limits
+        """
+        try:
+            self._validate(changes)
+        except InvalidChange:
+            self.stats['rejected'] += 1
+            raise
+        inventory = self._inventory(player_id)
+        with self._lock:
+            items = inventory['items']
+            counts = {name: items.get(name, 0) + amount for name, amount in changes.items()}
+            for name, count in counts.items():
+                if count < 0:
+                    self.stats['rejected'] += 1
+                    raise InvalidChange(f"Not enough {name}")
+                if count > self.max_count:
+                    self.stats['rejected'] += 1
+                    raise InvalidChange(f"At most {self.max_count} {name}")
+            added = sum(1 for name, count in counts.items() if count and name not in items)
+            removed = sum(1 for name, count in counts.items() if not count and name in items)
+            if len(items) + added - removed > self.max_items:
+                self.stats['rejected'] += 1
+                raise InvalidChange(f"At most {self.max_items} different items")
+
+            for name, count in counts.items():
+                if count:
+                    items[name] = count
+                else:
+                    items.pop(name, None)
+            base = inventory['version']
+            inventory['version'] = base + 1
+            self.stats['changes'] += 1
+            return Delta(player_id, base, base + 1, counts)
+
+    def journaled(self, delta, seq):
+        """Record that a Delta was appended to the journal as record seq"""
+        with self._lock:
+            inventory = self._inventories.get(delta.player_id)
+            if inventory is not None and delta.version > inventory['journaled_version']:
+                inventory['journaled_version'] = delta.version
+                inventory['journal_seq'] = seq
+
+    def expire(self, player_ids):
+        """Mark the inventories of players who went away for eviction"""
+        with self._lock:
+            self._expired.update(player_id for player_id in player_ids if player_id in self._inventories)
+
+    def evict(self, written_seq):
+        """
+        Drop expired inventories whose changes are all written
+
+        :param written_seq: Sequence number up to which the journal is applied to the store
+        :return: Number of inventories dropped
+        """
+        evicted = 0
+        with self._lock:
+            for player_id in list(self._expired):
+                inventory = self._inventories.get(player_id)
+                if inventory is None:
+                    self._expired.discard(player_id)
+                elif inventory['journaled_version'] == inventory['version'] and inventory['journal_seq'] <= written_seq:
+                    del self._inventories[player_id]
+                    self._expired.discard(player_id)
+                    evicted += 1
+        self.stats['evictions'] += evicted
+        return evicted
+
+    def release(self, player_id):
+        """
+        Drop a player's inventory from memory (the player moved to another shard,
+        which reads it from the store)
+
+        :return: The inventory as {'version', 'items'} if it was loaded, else None
+        """
+        with self._lock:
+            inventory = self._inventories.pop(player_id, None)
+            self._expired.discard(player_id)
+        return None if inventory is None else {'version': inventory['version'], 'items': inventory['items']}
@@ -0,0 +1,129 @@
+import math
+
+import serialization
+
+# Islands accepted per import request
+MAX_IMPORT_ISLANDS = 10000
+# Validation errors reported back (the import is rejected if there are any)
+MAX_REPORTED_ERRORS = 50
+
+DEFAULT_RADIUS = 50
+MAX_RADIUS = 5000
+MAX_TYPE_LENGTH = 64
+
+
+class InvalidImport(ValueError):
+    """Raised when an import body cannot be parsed or holds invalid islands"""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+def parse(body, content_type=''):
+    """
+    Parse an import body: a JSON array of islands, {"islands": [...]}, or
+    NDJSON (one island per line, for application/x-ndjson or when the body
+    is not a single JSON document)
+
+    :return: List of (line or index, island dictionary)
+    """
+    try:
+        text = body.decode('utf-8') if isinstance(body, bytes) else body
+    except UnicodeDecodeError:
+        raise InvalidImport("Body is not UTF-8 text")
+    if 'ndjson' not in content_type:
+        try:
+            document = serialization.loads(text)
+        except ValueError:
+            document = None
+        if isinstance(document, dict) and isinstance(document.get('islands'), list):
+            document = document['islands']
+        if isinstance(document, list):
+            return list(enumerate(document, 1))
+        if isinstance(document, dict):
+            return [(1, document)]
+
+    records = []
+    for line_number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            records.append((line_number, serialization.loads(line)))
+        except ValueError as e:
+            raise InvalidImport(f"Invalid JSON on line {line_number}: {e}")
+    return records
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def validate(data):
+    """
+    Check and normalize one island
+
+    :return: (island ID or None, island data without the ID)
+    :raises ValueError: If the island is invalid
+    """
+    if not isinstance(data, dict):
+        raise ValueError("island must be an object")
+    position = data.get('position')
+    if not isinstance(position, dict) or not _number(position.get('x')) or not _number(position.get('z')):
+        raise ValueError("position must have numeric x and z")
+    if 'y' in position and not _number(position['y']):
+        raise ValueError("position.y must be a number")
+    radius = data.get('radius', DEFAULT_RADIUS)
+    if not _number(radius) or not 0 < radius <= MAX_RADIUS:
+        raise ValueError(f"radius must be a number between 0 and {MAX_RADIUS}")
+    island_type = data.get('type', 'default')
+    if not isinstance(island_type, str) or not island_type or len(island_type) > MAX_TYPE_LENGTH:
+        raise ValueError(f"type must be a string of at most {MAX_TYPE_LENGTH} characters")
+    island_id = data.get('id')
+    if island_id is not None and (not isinstance(island_id, str) or not island_id or '/' in island_id):
+        raise ValueError("id must be a non-empty string without '/'")
+
+    island = {key: value for key, value in data.items() if key != 'id'}
+    island['position'] = {'x': position['x'], 'y': position.get('y', 0), 'z': position['z']}
+    island['radius'] = radius
+    island['type'] = island_type
+    return island_id, island
+
+
+def prepare(records, new_id):
+    """
+    Validate parsed records and assign IDs to islands without one
+
+    Islands with an explicit "id" overwrite that island, so an import can be
+    repeated. Everything is validated before anything is written: any error
+    rejects the whole import.
+
+    :param new_id: Function returning a new collision-free island ID
+    :return: Dictionary of island ID -> island data, in import order
+    :raises InvalidImport: With the list of {'line', 'error'} problems
+    """
+    if not records:
+        raise InvalidImport("No islands to import")
+    if len(records) > MAX_IMPORT_ISLANDS:
+        raise InvalidImport(f"At most {MAX_IMPORT_ISLANDS} islands can be imported at once")
+
+    islands = {}
+    errors = []
+    seen_ids = set()
+    for line, data in records:
+        try:
+            if isinstance(data, dict) and isinstance(data.get('id'), str):
+                if data['id'] in seen_ids:
+                    raise ValueError(f"duplicate id '{data['id']}'")
+                seen_ids.add(data['id'])
+            island_id, island = validate(data)
+        except ValueError as e:
+            errors.append({'line': line, 'error': str(e)})
+            if len(errors) >= MAX_REPORTED_ERRORS:
+                break
+            continue
+        islands[island_id or new_id()] = island
+
+    if errors:
+        raise InvalidImport("Invalid islands, nothing was imported", errors)
+    return islands
@@ -0,0 +1,90 @@
+import threading
+from collections import Counter
+
+from serialization import RawJSON
+
+# Number of chat messages sent to a joining player
+CHAT_HISTORY_LIMIT = 20
+
+
+class JoinSnapshotCache:
+    """
+    Shared parts of the welcome payload, kept pre-assembled and pre-serialized
+
+    Each section (leaderboard, chat history) is loaded from Firestore once and
+    stored as RawJSON, so every join reuses the same encoded text. Sections are
+    invalidated when their source changes and rebuilt lazily on the next read;
+    the chat history is updated incrementally instead of being reloaded.
+
+    Rebuilds never hold the lock while talking to Firestore. A version counter
+    makes sure a rebuild that raced with an invalidation is not stored.
+    """
+
+    def __init__(self, leaderboard_loader, chat_history_loader, chat_history_limit=CHAT_HISTORY_LIMIT):
+        self._loaders = {
+            'leaderboard': leaderboard_loader,
+            'chat_history': chat_history_loader
+        }
+        self.chat_history_limit = chat_history_limit
+        self._encoded = {}
+        self._values = {}
+        self._versions = Counter()
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.builds = Counter()
+
+    def get(self, section):
+        """Get the pre-serialized section, rebuilding it if it was invalidated"""
+        encoded = self._encoded.get(section)
+        if encoded is not None:
+            self.hits[section] += 1
+            return encoded
+
+        version = self._versions[section]
+        value = self._loaders[section]()
+        encoded = RawJSON.encode(value)
+        self.builds[section] += 1
+
+        with self._lock:
+            if self._versions[section] == version:
+                self._values[section] = value
+                self._encoded[section] = encoded
+        return encoded
+
+    def invalidate(self, section):
+        """Drop a section so it is rebuilt on the next read"""
+        with self._lock:
+            self._versions[section] += 1
+            self._encoded.pop(section, None)
+            self._values.pop(section, None)
+
+    def add_chat_message(self, message):
+        """Append a new message to the cached chat history without reloading it"""
+        with self._lock:
+            history = self._values.get('chat_history')
+            if history is None:
+                # Not loaded yet, the next read will include the message
+                return
+            history = (history + [message])[-self.chat_history_limit:]
+            self._versions['chat_history'] += 1
+            self._values['chat_history'] = history
+            self._encoded['chat_history'] = RawJSON.encode(history)
+
+    def sections(self):
+        """Get all sections, keyed by section name"""
+        return {section: self.get(section) for section in self._loaders}
+
+    def warm(self):
+        """Build every section, e.g. on startup before the first reconnect storm"""
+        for section in self._loaders:
+            self.get(section)
+
+    def stats(self):
+        """Return hit and build counts per section"""
+        return {
+            section: {
+                'hits': self.hits[section],
+                'builds': self.builds[section],
+                'bytes': len(self._encoded[section]) if section in self._encoded else 0
+            } for section in self._loaders
+        }
@@ -0,0 +1,344 @@
+import os
+import time
+import zlib
+import struct
+import logging
+import threading
+from collections import Counter
+
+import serialization
+
+logger = logging.getLogger(__name__)
+
+# Record header: payload length, CRC-32 of sequence number + payload, sequence number
+HEADER = struct.Struct('<IIQ')
+SEQUENCE = struct.Struct('<Q')
+
+# A new segment is started once the current one reaches this size
+DEFAULT_SEGMENT_BYTES = 16 * 1024 * 1024
+
+# fsync policies: every append, at most every fsync_interval seconds, or never
+# (left to the OS). Every append is flushed to the OS either way, so a crash of
+# the server process loses nothing; fsync only matters for power loss.
+FSYNC_POLICIES = ('always', 'interval', 'never')
+DEFAULT_FSYNC_INTERVAL = 1.0
+
+# Seconds between replays, and records applied per call to apply_batch
+REPLAY_INTERVAL = 1.0
+REPLAY_BATCH_SIZE = 500
+# A failed replay is retried after REPLAY_INTERVAL, doubling per failure in a
+# row up to MAX_RETRY_BACKOFF seconds
+MAX_RETRY_BACKOFF = 60.0
+# Errors that mean a record can never be applied (a malformed record), as
+# opposed to an outage. Anything else is retried until it goes through.
+PERMANENT_ERRORS = (KeyError, TypeError, ValueError)
+
+SEGMENT_PREFIX = 'journal-'
+SEGMENT_SUFFIX = '.log'
+CHECKPOINT_FILE = 'checkpoint.json'
+# Subdirectory holding records that failed with a permanent error
+QUARANTINE_DIR = 'quarantine'
+
+
+def _segment_name(first_seq):
+    return f"{SEGMENT_PREFIX}{first_seq:020d}{SEGMENT_SUFFIX}"
+
+
+def _read_records(path, offset=0):
+    """
+    Yield (seq, payload, end offset) for each intact record of a segment
+
+    Stops at the first incomplete or corrupt record (a torn write at the tail).
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            length, crc, seq = HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload, zlib.crc32(SEQUENCE.pack(seq))) != crc:
+                return
+            offset += HEADER.size + length
+            yield seq, payload, offset
+
+
+class Journal:
+    """
+    Segmented append-only journal of records on local disk
+
+    Records are dictionaries, stored as length-prefixed JSON with a CRC and a
+    sequence number. Segments are named after their first sequence number and
+    rotated at segment_bytes. A checkpoint file holds the sequence number of
+    the last record applied downstream; segments that only hold older records
+    are deleted by compact(). A torn record at the end of the last segment
+    (a crash mid-write) is truncated when the journal is opened.
+    """
+
+    def __init__(self, directory, fsync='interval', fsync_interval=DEFAULT_FSYNC_INTERVAL,
+                 segment_bytes=DEFAULT_SEGMENT_BYTES):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}', expected one of: {', '.join(FSYNC_POLICIES)}")
+        self.directory = directory
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.segment_bytes = segment_bytes
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self._last_sync = time.monotonic()
+        self._unsynced = False
+        # (seq, segment path, end offset) of the last record read, so the
+        # next read continues there instead of scanning the segment again
+        self._cursor = None
+
+        os.makedirs(directory, exist_ok=True)
+        self.checkpoint = self._read_checkpoint()
+        self.next_seq = self.checkpoint + 1
+        self._recover()
+
+    def _segments(self):
+        """(first seq, path) of every segment, oldest first"""
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                first_seq = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+                segments.append((first_seq, os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def _recover(self):
+        """Find the next sequence number and cut a torn record off the last segment"""
+        segments = self._segments()
+        if not segments:
+            return
+        first_seq, path = segments[-1]
+        last_seq, valid_size = first_seq - 1, 0
+        for seq, _, end in _read_records(path):
+            last_seq, valid_size = seq, end
+        if os.path.getsize(path) > valid_size:
+            logger.warning(f"Truncating torn journal record in {path} at offset {valid_size}")
+            with open(path, 'r+b') as f:
+                f.truncate(valid_size)
+        self.next_seq = max(self.next_seq, last_seq + 1)
+        self._file = open(path, 'ab')
+        self._size = valid_size
+
+    def _read_checkpoint(self):
+        try:
+            with open(os.path.join(self.directory, CHECKPOINT_FILE)) as f:
+                return int(serialization.loads(f.read())['seq'])
+        except FileNotFoundError:
+            return 0
+
+    def _rotate(self):
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+        self._file = open(os.path.join(self.directory, _segment_name(self.next_seq)), 'ab')
+        self._size = 0
+        self.stats['segments'] += 1
+
+    def _sync(self):
+        if self._unsynced and self.fsync != 'never':
+            os.fsync(self._file.fileno())
+            self.stats['fsyncs'] += 1
+        self._unsynced = False
+        self._last_sync = time.monotonic()
+
+    def append(self, record):
+        """
+        Write a record and flush it to the OS (fsync per the policy)
+
+        :return: The record's sequence number
+        """
+        payload = serialization.dumps(record).encode('utf-8')
+        with self._lock:
+            if self._file is None or self._size >= self.segment_bytes:
+                self._rotate()
+            seq = self.next_seq
+            crc = zlib.crc32(payload, zlib.crc32(SEQUENCE.pack(seq)))
+            self._file.write(HEADER.pack(len(payload), crc, seq) + payload)
+            self._file.flush()
+            self.next_seq += 1
+            self._size += HEADER.size + len(payload)
+            self._unsynced = True
+            if self.fsync == 'always' or (
+                    self.fsync == 'interval' and time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync()
+        self.stats['appended'] += 1
+        return seq
+
+    def sync(self):
+        """fsync pending appends now (no-op with the 'never' policy)"""
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+
+    def read(self, after_seq=None, limit=None):
+        """
+        Records after a sequence number (the checkpoint by default)
+
+        :return: List of (seq, record), oldest first
+        """
+        after_seq = self.checkpoint if after_seq is None else after_seq
+        segments = self._segments()
+        cursor = self._cursor
+        records = []
+        for index, (first_seq, path) in enumerate(segments):
+            # Skip segments that end before after_seq
+            if index + 1 < len(segments) and segments[index + 1][0] <= after_seq + 1:
+                continue
+            offset = 0
+            if cursor is not None and cursor[0] == after_seq and cursor[1] == path:
+                offset = cursor[2]
+            for seq, payload, end in _read_records(path, offset):
+                if seq <= after_seq:
+                    continue
+                records.append((seq, serialization.loads(payload)))
+                self._cursor = (seq, path, end)
+                if limit is not None and len(records) >= limit:
+                    return records
+        return records
+
+    def pending(self):
+        """Number of records not yet checkpointed"""
+        return self.next_seq - 1 - self.checkpoint
+
+    def set_checkpoint(self, seq):
+        """Record that everything up to seq has been applied, then drop old segments"""
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as f:
+            f.write(serialization.dumps({'seq': seq}))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+        self.checkpoint = seq
+        self.compact()
+
+    def compact(self):
+        """Delete segments whose records are all checkpointed (never the active one)"""
+        with self._lock:
+            active = self._file.name if self._file is not None else None
+            segments = self._segments()
+            for (first_seq, path), (next_first_seq, _) in zip(segments, segments[1:]):
+                if next_first_seq <= self.checkpoint + 1 and path != active:
+                    os.remove(path)
+                    self.stats['segments_deleted'] += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+
+class JournalReplayer:
+    """
+    Applies journal records downstream in bulk and checkpoints the progress
+
+    apply_batch(records) receives lists of up to batch_size record
+    dictionaries in order (or of (seq, record) pairs if sequenced) and must be
+    idempotent: records after the last checkpoint are applied again after a
+    crash. The checkpoint never moves past a record that was not applied.
+
+    A failing batch is retried with exponential backoff for as long as it
+    fails, so an outage of any length only delays the records. Only when a
+    batch fails with one of permanent_errors is it applied record by record,
+    and the records that fail that way are moved to the quarantine journal
+    (QUARANTINE_DIR inside the journal directory) instead of being dropped,
+    so one bad record cannot block the journal forever.
+    """
+
+    def __init__(self, journal, apply_batch, batch_size=REPLAY_BATCH_SIZE,
+                 permanent_errors=PERMANENT_ERRORS, clock=time.monotonic, sequenced=False):
+        self.journal = journal
+        self.apply_batch = apply_batch
+        self.sequenced = sequenced
+        self.batch_size = batch_size
+        self.permanent_errors = permanent_errors
+        self.clock = clock
+        self.stats = Counter()
+        self._failures = 0
+        self._retry_at = None
+        self._quarantine = None
+        self._lock = threading.Lock()
+
+    @property
+    def quarantine(self):
+        """Journal of quarantined records: {'seq', 'error', 'record'} (opened on first use)"""
+        if self._quarantine is None:
+            self._quarantine = Journal(os.path.join(self.journal.directory, QUARANTINE_DIR), fsync='always')
+        return self._quarantine
+
+    def replay(self, max_batches=None):
+        """
+        Apply pending records (nothing while backing off after a failure)
+
+        :return: Number of records applied
+        """
+        applied = 0
+        with self._lock:
+            if self._retry_at is not None and self.clock() < self._retry_at:
+                return 0
+            batches = 0
+            while max_batches is None or batches < max_batches:
+                records = self.journal.read(limit=self.batch_size)
+                if not records:
+                    break
+                done = self._apply(records)
+                if done:
+                    self.journal.set_checkpoint(records[done - 1][0])
+                    applied += done
+                if done < len(records):
+                    self._back_off()
+                    break
+                batches += 1
+        return applied
+
+    def _back_off(self):
+        self._failures += 1
+        delay = min(MAX_RETRY_BACKOFF, REPLAY_INTERVAL * 2 ** (self._failures - 1))
+        self._retry_at = self.clock() + delay
+        self.stats['retries'] += 1
+
+    def _apply(self, records):
+        """Apply records, returning how many of them (from the start) are done"""
+        try:
+            self.apply_batch(records if self.sequenced else [record for _, record in records])
+        except Exception as e:
+            self.stats['failed_batches'] += 1
+            if not isinstance(e, self.permanent_errors):
+                logger.error(f"Error replaying {len(records)} journal records "
+                             f"(attempt {self._failures + 1}, will retry): {e}")
+                return 0
+            logger.error(f"Malformed record in {len(records)} journal records, applying them one by one: {e}")
+            for done, (seq, record) in enumerate(records):
+                try:
+                    self.apply_batch([(seq, record)] if self.sequenced else [record])
+                except self.permanent_errors as e:
+                    self.quarantine.append({'seq': seq, 'error': repr(e), 'record': record})
+                    self.stats['quarantined'] += 1
+                    logger.error(f"Quarantined journal record {seq}: {e}")
+                except Exception as e:
+                    logger.error(f"Error replaying journal record {seq} (will retry): {e}")
+                    self.stats['replayed'] += done
+                    return done
+        self._failures = 0
+        self._retry_at = None
+        self.stats['batches'] += 1
+        self.stats['replayed'] += len(records)
+        return len(records)
+
+    def run(self, sleep):
+        """Replay loop for a background task"""
+        while True:
+            sleep(REPLAY_INTERVAL)
+            try:
+                self.journal.sync()
+                self.replay()
+            except Exception as e:
+                logger.error(f"Error in journal replay: {e}")
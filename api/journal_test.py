@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+import tempfile
+
+import journal
+
+
+class Clock:
+    """Manually advanced clock for the replayer's backoff"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Downstream:
+    """Stands in for Firestore: applies records unless it is down or a record is malformed"""
+
+    def __init__(self):
+        self.down = False
+        self.applied = []
+
+    def apply_batch(self, records):
+        if self.down:
+            raise ConnectionError("Firestore unavailable")
+        for record in records:
+            if 'player_id' not in record:
+                raise KeyError('player_id')
+        self.applied.extend(record['n'] for record in records)
+
+
+def check(condition, message):
+    print(f"  {'ok  ' if condition else 'FAIL'} {message}")
+    return condition
+
+
+def check_outage(ticks):
+    """Records survive an outage of any length and are applied once it ends"""
+    print(f"\n=== OUTAGE ({ticks} replay intervals) ===")
+    with tempfile.TemporaryDirectory() as directory:
+        log = journal.Journal(directory, fsync='never')
+        downstream, clock = Downstream(), Clock()
+        replayer = journal.JournalReplayer(log, downstream.apply_batch, batch_size=2, clock=clock)
+        for n in range(5):
+            log.append({'player_id': 'p', 'n': n})
+
+        downstream.down = True
+        attempts = 0
+        for _ in range(ticks):
+            clock.now += journal.REPLAY_INTERVAL
+            before = replayer.stats['failed_batches']
+            replayer.replay()
+            attempts += replayer.stats['failed_batches'] - before
+        ok = check(log.checkpoint == 0, f"checkpoint stays at 0 during the outage ({log.checkpoint})")
+        ok &= check(attempts < ticks, f"retries back off ({attempts} attempts in {ticks} intervals)")
+        ok &= check(replayer.stats['quarantined'] == 0, "nothing quarantined")
+
+        downstream.down = False
+        clock.now += journal.MAX_RETRY_BACKOFF
+        replayer.replay()
+        ok &= check(downstream.applied == list(range(5)), f"all records applied in order ({downstream.applied})")
+        ok &= check(log.checkpoint == 5 and log.pending() == 0, f"checkpoint at the last record ({log.checkpoint})")
+        log.close()
+        return ok
+
+
+def check_malformed():
+    """A malformed record is quarantined and the records around it are applied"""
+    print("\n=== MALFORMED RECORD ===")
+    with tempfile.TemporaryDirectory() as directory:
+        log = journal.Journal(directory, fsync='never')
+        downstream = Downstream()
+        replayer = journal.JournalReplayer(log, downstream.apply_batch)
+        log.append({'player_id': 'p', 'n': 0})
+        log.append({'n': 1})
+        log.append({'player_id': 'p', 'n': 2})
+
+        replayer.replay()
+        quarantined = replayer.quarantine.read(after_seq=0)
+        ok = check(downstream.applied == [0, 2], f"valid records applied ({downstream.applied})")
+        ok &= check([record['record'] for _, record in quarantined] == [{'n': 1}],
+                    f"malformed record quarantined ({quarantined})")
+        ok &= check(log.checkpoint == 3, f"checkpoint past the quarantined record ({log.checkpoint})")
+        log.close()
+        return ok
+
+
+def check_outage_while_isolating():
+    """An outage while records are applied one by one stops the checkpoint before the failed record"""
+    print("\n=== OUTAGE WHILE ISOLATING A MALFORMED RECORD ===")
+    with tempfile.TemporaryDirectory() as directory:
+        log = journal.Journal(directory, fsync='never')
+        downstream, clock = Downstream(), Clock()
+        calls = []
+
+        def apply_batch(records):
+            calls.append(len(records))
+            # Down from the third single-record call on
+            downstream.down = len(calls) >= 4
+            downstream.apply_batch(records)
+
+        replayer = journal.JournalReplayer(log, apply_batch, clock=clock)
+        log.append({'player_id': 'p', 'n': 0})
+        log.append({'n': 1})
+        log.append({'player_id': 'p', 'n': 2})
+        log.append({'player_id': 'p', 'n': 3})
+
+        replayer.replay()
+        ok = check(log.checkpoint == 2, f"checkpoint stops before the unapplied record ({log.checkpoint})")
+        downstream.down = False
+        calls.clear()
+        clock.now += journal.MAX_RETRY_BACKOFF
+        replayer.replay()
+        ok &= check(downstream.applied == [0, 2, 3], f"remaining records applied after recovery ({downstream.applied})")
+        ok &= check(log.checkpoint == 4, f"checkpoint at the last record ({log.checkpoint})")
+        log.close()
+        return ok
+
+
+if __name__ == "__main__":
+    print("\n===== JOURNAL REPLAY TEST =====")
+    results = [check_outage(4), check_outage(120), check_malformed(), check_outage_while_isolating()]
+    print("\n===== TEST COMPLETE =====")
+    raise SystemExit(0 if all(results) else 1)
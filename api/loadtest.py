@@ -0,0 +1,873 @@
+#!/usr/bin/env python3
+"""
+Load test for the Socket.IO server with simulated clients
+
+Starts app.py against the in-memory Firestore (fake_firestore.py) in a
+separate process, connects simulated sailors that speak the real protocol
+(player_join, player_update at a fixed rate along boat-like paths,
+player_action, chat_message) and reports throughput, move-to-broadcast
+latency, server CPU/RSS and dropped events as JSON.
+
+    python loadtest.py run --clients 200 --hz 10 --duration 30 --output run.json
+    python loadtest.py run --url http://localhost:5001 --server-pid 1234
+    python loadtest.py serve --port 5002   # just the server with a fake Firestore
+    python loadtest.py shards --shards 4 --clients 40   # sail across local shards
+"""
+
+# eventlet is optional: with it, one process can hold thousands of clients
+# (and the server uses it too); without it every client uses real threads
+try:
+    import eventlet
+    eventlet.monkey_patch()
+except ImportError:
+    eventlet = None
+
+import os
+import sys
+import json
+import math
+import time
+import re
+import random
+import socket
+import logging
+import argparse
+import platform
+import threading
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import socketio
+from engineio import payload as engineio_payload
+
+# Long-polling responses carry every packet queued since the last poll; the
+# Python client rejects more than 16 by default, browsers have no such limit
+engineio_payload.Payload.max_decode_packets = 100000
+
+# Boat handling from src/core/main.js at 60 frames per second
+BOAT_SPEED = 12.0  # units per second
+TURN_RATE = 1.8  # radians per second
+
+CHAT_PREFIX = 'loadtest'
+
+# Receipts are matched to sends for this long
+SEND_REGISTRY_WINDOW = 30.0
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Latency percentiles in milliseconds"""
+    if not samples:
+        return None
+    return {
+        'count': len(samples),
+        'p50': percentile(samples, 50) * 1000,
+        'p90': percentile(samples, 90) * 1000,
+        'p99': percentile(samples, 99) * 1000,
+        'max': max(samples) * 1000
+    }
+
+
+def read_process_stats(pid):
+    """CPU seconds and RSS bytes of a process (Linux /proc), or None"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f'/proc/{pid}/status') as f:
+            rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+    except (OSError, StopIteration, IndexError, ValueError):
+        return None
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    return cpu_seconds, rss_kb * 1024
+
+
+class ProcessMonitor:
+    """Samples CPU and RSS of a process once per interval"""
+
+    def __init__(self, pid, interval=1.0):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.pid is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        previous = read_process_stats(self.pid)
+        previous_time = time.perf_counter()
+        while previous is not None and not self._stop.wait(self.interval):
+            current = read_process_stats(self.pid)
+            now = time.perf_counter()
+            if current is None:
+                break
+            cpu_percent = (current[0] - previous[0]) / (now - previous_time) * 100
+            self.samples.append((cpu_percent, current[1]))
+            previous, previous_time = current, now
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def summary(self):
+        if not self.samples:
+            return None
+        cpu = [sample[0] for sample in self.samples]
+        rss = [sample[1] for sample in self.samples]
+        return {
+            'cpu_percent_mean': sum(cpu) / len(cpu),
+            'cpu_percent_max': max(cpu),
+            'rss_mb_start': rss[0] / 2 ** 20,
+            'rss_mb_max': max(rss) / 2 ** 20
+        }
+
+
+class SendRegistry:
+    """
+    Send times of moves and chat messages, so receipts can be timed
+
+    Two generations of entries are kept and rotated every
+    SEND_REGISTRY_WINDOW seconds; lookups from receiving threads need no lock.
+    """
+
+    def __init__(self):
+        self._current = {}
+        self._previous = {}
+        self._rotated_at = time.perf_counter()
+
+    def add(self, key, sent_at):
+        self._current[key] = sent_at
+        if sent_at - self._rotated_at > SEND_REGISTRY_WINDOW:
+            self._previous, self._current = self._current, {}
+            self._rotated_at = sent_at
+
+    def get(self, key):
+        sent_at = self._current.get(key)
+        return sent_at if sent_at is not None else self._previous.get(key)
+
+
+class Metrics:
+    """Counters and latency samples shared by every simulated client"""
+
+    def __init__(self):
+        self.counters = Counter()
+        self.latencies = {'connect': [], 'join': [], 'move_to_broadcast': [], 'chat': [], 'handoff': []}
+        self._lock = threading.Lock()
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def sample(self, kind, seconds):
+        # list.append is atomic
+        self.latencies[kind].append(seconds)
+
+
+class Sailor:
+    """One simulated player: a Socket.IO client steering a boat"""
+
+    def __init__(self, index, config, metrics, moves, chats, observer):
+        self.index = index
+        self.config = config
+        self.metrics = metrics
+        self.moves = moves
+        self.chats = chats
+        self.observer = observer
+        self.rng = random.Random(config['seed'] * 100003 + index)
+
+        # Spawn somewhere in the configured area, heading anywhere
+        angle = self.rng.uniform(0, 2 * math.pi)
+        distance = config['spread'] * math.sqrt(self.rng.random())
+        self.x = math.cos(angle) * distance
+        self.z = math.sin(angle) * distance
+        self.rotation = self.rng.uniform(-math.pi, math.pi)
+        self.keys = (True, 0)  # (forward, turn direction)
+        self.keys_until = 0
+
+        self.player_id = None
+        self.connected = False
+        self.welcomed = threading.Event()
+        self.received = Counter()
+        self.sent = Counter()
+        self.client = socketio.Client(reconnection=False)
+        self._register_handlers()
+
+    def _register_handlers(self):
+        client = self.client
+
+        @client.on('welcome')
+        def on_welcome(data):
+            self.player_id = data['id']
+            self.welcomed.set()
+
+        @client.on('player_moved')
+        def on_player_moved(data):
+            self.received['player_moved'] += 1
+            if self.observer:
+                position = data.get('position') or {}
+                sent_at = self.moves.get((data.get('id'), position.get('x'), position.get('z')))
+                if sent_at is not None:
+                    self.metrics.sample('move_to_broadcast', time.perf_counter() - sent_at)
+
+        @client.on('chat_message')
+        def on_chat_message(data):
+            self.received['chat_message'] += 1
+            if self.observer:
+                sent_at = self.chats.get(data.get('content'))
+                if sent_at is not None:
+                    self.metrics.sample('chat', time.perf_counter() - sent_at)
+
+        @client.on('*')
+        def on_other(event, *args):
+            self.received[event] += 1
+
+        @client.on('disconnect')
+        def on_disconnect():
+            if self.connected:
+                self.connected = False
+                self.metrics.count('unexpected_disconnects')
+
+    def position(self):
+        return {'x': self.x, 'y': 0, 'z': self.z}
+
+    def join(self):
+        """Connect and join; returns True once the welcome payload arrived"""
+        start = time.perf_counter()
+        try:
+            self.client.connect(self.config['url'], wait_timeout=self.config['join_timeout'])
+        except socketio.exceptions.ConnectionError as e:
+            self.metrics.count('connect_errors')
+            logging.debug(f"Sailor {self.index} failed to connect: {e}")
+            return False
+        self.connected = True
+        connected_at = time.perf_counter()
+        self.metrics.sample('connect', connected_at - start)
+
+        self.client.emit('player_join', {
+            'name': f'Load Sailor {self.index}',
+            'color': {'r': self.rng.random(), 'g': self.rng.random(), 'b': self.rng.random()},
+            'position': self.position(),
+            'rotation': self.rotation,
+            'mode': 'boat'
+        })
+        if not self.welcomed.wait(self.config['join_timeout']):
+            self.metrics.count('join_timeouts')
+            return False
+        self.metrics.sample('join', time.perf_counter() - start)
+        return True
+
+    def steer(self, now, dt):
+        """Advance along a boat-like path: mostly ahead, with turns and stops"""
+        if now >= self.keys_until:
+            forward = self.rng.random() < 0.9
+            turn = self.rng.choice((0, 0, 0, -1, 1))
+            self.keys = (forward, turn)
+            self.keys_until = now + self.rng.uniform(1.0, 6.0)
+
+        forward, turn = self.keys
+        self.rotation += turn * TURN_RATE * dt
+        if forward:
+            self.x -= math.sin(self.rotation) * BOAT_SPEED * dt
+            self.z -= math.cos(self.rotation) * BOAT_SPEED * dt
+
+    def send_update(self):
+        position = self.position()
+        self.moves.add((self.player_id, position['x'], position['z']), time.perf_counter())
+        self.client.emit('player_update', {'position': position, 'rotation': self.rotation, 'mode': 'boat'})
+        self.sent['player_update'] += 1
+
+    def send_action(self):
+        # As src/core/network.js reports a catch (kills and money go through entity events)
+        self.client.emit('player_action', {'action': 'fish_caught'})
+        self.sent['player_action'] += 1
+
+    def send_chat(self):
+        content = f"{CHAT_PREFIX} {self.index} {self.sent['chat_message']}"
+        self.chats.add(content, time.perf_counter())
+        self.client.emit('chat_message', {'content': content})
+        self.sent['chat_message'] += 1
+
+    def close(self):
+        self.connected = False
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+
+
+class ShardSailor:
+    """
+    A sailor on a straight course across shard borders
+
+    It joins a random shard (which hands it on if it does not own the spawn
+    point) and follows every shard_handoff: it joins the new shard with the
+    ticket and leaves the old one once welcomed. Players seen in
+    player_joined/player_moved that are on another shard at the time were
+    mirrored across a border.
+    """
+
+    def __init__(self, index, config, metrics, shard_of):
+        self.index = index
+        self.config = config
+        self.metrics = metrics
+        self.shard_of = shard_of
+        self.rng = random.Random(config['seed'] * 100003 + index)
+
+        # Spawn around the origin, where regions of several shards meet
+        self.x = self.rng.uniform(-config['spread'], config['spread'])
+        self.z = self.rng.uniform(-config['spread'], config['spread'])
+        self.rotation = self.rng.uniform(-math.pi, math.pi)
+
+        self.player_id = None
+        self.shard = None
+        self.client = None
+        self.connected = False
+        self.switching = False
+        self.joined = threading.Event()
+        self.seen_across = set()
+        self.sent = Counter()
+
+    def position(self):
+        return {'x': self.x, 'y': 0, 'z': self.z}
+
+    def _join_data(self, ticket=None):
+        data = {'name': f'Shard Sailor {self.index}', 'position': self.position(), 'rotation': self.rotation, 'mode': 'boat'}
+        if ticket:
+            data['handoffTicket'] = ticket
+        return data
+
+    def _open(self, shard, join_data):
+        """Connect to a shard and join; returns (client, event set on welcome)"""
+        client = socketio.Client(reconnection=False)
+        welcomed = threading.Event()
+
+        @client.on('welcome')
+        def on_welcome(data):
+            self.player_id = data['id']
+            self.shard = shard
+            self.shard_of[self.player_id] = shard
+            welcomed.set()
+            self.joined.set()
+
+        @client.on('shard_handoff')
+        def on_shard_handoff(data):
+            threading.Thread(target=self.hand_off, args=(data,), daemon=True).start()
+
+        @client.on('player_joined')
+        def on_player_joined(data):
+            self.seen(data.get('id'))
+
+        @client.on('player_moved')
+        def on_player_moved(data):
+            self.seen(data.get('id'))
+
+        @client.on('position_corrected')
+        def on_position_corrected(data):
+            self.metrics.count('position_corrections')
+
+        @client.on('disconnect')
+        def on_disconnect():
+            # Leaving the previous shard after a handoff is expected
+            if client is self.client and self.connected:
+                self.connected = False
+                self.metrics.count('unexpected_disconnects')
+
+        client.connect(self.config['urls'][shard], wait_timeout=self.config['join_timeout'])
+        client.emit('player_join', join_data)
+        return client, welcomed
+
+    def seen(self, player_id):
+        shard = self.shard_of.get(player_id)
+        if player_id != self.player_id and shard is not None and shard != self.shard:
+            self.seen_across.add(player_id)
+
+    def join(self):
+        shard = self.rng.choice(sorted(self.config['urls']))
+        try:
+            self.client, _ = self._open(shard, self._join_data())
+        except socketio.exceptions.ConnectionError:
+            self.metrics.count('connect_errors')
+            return False
+        self.connected = True
+        # Welcomed by the first shard, or by the owner it handed us to
+        if not self.joined.wait(self.config['join_timeout']):
+            self.metrics.count('join_timeouts')
+            return False
+        return True
+
+    def hand_off(self, data):
+        """Join the shard named by a shard_handoff, then leave the current one"""
+        started = time.perf_counter()
+        self.switching = True
+        try:
+            client, welcomed = self._open(data['shard'], self._join_data(data['ticket']))
+            if not welcomed.wait(self.config['join_timeout']):
+                raise socketio.exceptions.ConnectionError('no welcome')
+        except socketio.exceptions.ConnectionError as e:
+            logging.debug(f"Shard sailor {self.index} failed to hand off: {e}")
+            self.metrics.count('handoff_failures')
+            self.connected = False
+            return
+        finally:
+            self.switching = False
+        previous, self.client = self.client, client
+        self.metrics.sample('handoff', time.perf_counter() - started)
+        self.metrics.count('handoffs')
+        try:
+            previous.disconnect()
+        except Exception:
+            pass
+
+    def sail(self, dt):
+        self.x -= math.sin(self.rotation) * self.config['speed'] * dt
+        self.z -= math.cos(self.rotation) * self.config['speed'] * dt
+        if not self.switching:
+            self.client.emit('player_update', {'position': self.position(), 'rotation': self.rotation, 'mode': 'boat'})
+            self.sent['player_update'] += 1
+
+    def close(self):
+        self.connected = False
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+
+
+class LoadTest:
+    """Runs the phases of a load test: ramp-up, steady state, drain"""
+
+    def __init__(self, config):
+        self.config = config
+        self.metrics = Metrics()
+        self.moves = SendRegistry()
+        self.chats = SendRegistry()
+        self.sailors = []
+        self.tick_lag = []
+
+    def ramp_up(self):
+        """Connect and join every sailor at the configured rate"""
+        config = self.config
+        observers = set(random.Random(config['seed']).sample(range(config['clients']), min(config['observers'], config['clients'])))
+        sailors = [
+            Sailor(i, config, self.metrics, self.moves, self.chats, observer=i in observers)
+            for i in range(config['clients'])
+        ]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=config['join_concurrency']) as pool:
+            futures = []
+            for i, sailor in enumerate(sailors):
+                # Pace the joins at ramp_rate per second
+                delay = start + i / config['ramp_rate'] - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(sailor.join))
+            joined = [sailor for sailor, future in zip(sailors, futures) if future.result()]
+
+        self.metrics.count('joined', len(joined))
+        self.sailors = joined
+        return time.perf_counter() - start
+
+    def _drive(self, sailors, stop_at):
+        """Send updates, actions and chat for a slice of the sailors"""
+        config = self.config
+        interval = 1.0 / config['hz']
+        action_chance = config['action_rate'] / 60.0 * interval
+        chat_chance = config['chat_rate'] / 60.0 * interval
+        rng = random.Random()
+
+        next_tick = time.perf_counter()
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                return
+            self.tick_lag.append(max(0.0, now - next_tick))
+            for sailor in sailors:
+                if not sailor.connected:
+                    continue
+                try:
+                    sailor.steer(now, interval)
+                    sailor.send_update()
+                    if rng.random() < action_chance:
+                        sailor.send_action()
+                    if rng.random() < chat_chance:
+                        sailor.send_chat()
+                except socketio.exceptions.SocketIOError:
+                    self.metrics.count('send_errors')
+
+            next_tick += interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Too slow to keep up, skip the missed ticks
+                next_tick = time.perf_counter()
+
+    def steady_state(self):
+        """Drive every sailor for the configured duration"""
+        config = self.config
+        stop_at = time.perf_counter() + config['duration']
+        drivers = max(1, min(config['drivers'], len(self.sailors)))
+        threads = [
+            threading.Thread(target=self._drive, args=(self.sailors[i::drivers], stop_at), daemon=True)
+            for i in range(drivers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def delivery(self, event, sent_event, include_self):
+        """Expected vs received broadcasts of one event over every sailor"""
+        total_sent = sum(sailor.sent[sent_event] for sailor in self.sailors)
+        expected = sum(total_sent - (0 if include_self else sailor.sent[sent_event]) for sailor in self.sailors)
+        delivered = sum(sailor.received[event] for sailor in self.sailors)
+        dropped = max(0, expected - delivered)
+        return {
+            'sent': total_sent,
+            'expected': expected,
+            'delivered': delivered,
+            'dropped': dropped,
+            'drop_rate': dropped / expected if expected else 0.0
+        }
+
+    def run(self, server_pid=None):
+        config = self.config
+        monitor = ProcessMonitor(server_pid)
+        harness_cpu_start = time.process_time()
+        monitor.start()
+
+        ramp_seconds = self.ramp_up()
+        steady_start = time.perf_counter()
+        self.steady_state()
+        steady_seconds = time.perf_counter() - steady_start
+
+        # Give in-flight broadcasts time to arrive before counting drops
+        time.sleep(config['drain'])
+        monitor.stop()
+        harness_cpu = time.process_time() - harness_cpu_start
+
+        sent = Counter()
+        received = Counter()
+        for sailor in self.sailors:
+            sent.update(sailor.sent)
+            received.update(sailor.received)
+
+        results = {
+            'config': {key: value for key, value in config.items() if key != 'url'},
+            'environment': {
+                'python': platform.python_version(),
+                'eventlet': eventlet is not None,
+                'cpus': os.cpu_count()
+            },
+            'clients': {
+                'requested': config['clients'],
+                'joined': len(self.sailors),
+                'connect_errors': self.metrics.counters['connect_errors'],
+                'join_timeouts': self.metrics.counters['join_timeouts'],
+                'unexpected_disconnects': self.metrics.counters['unexpected_disconnects'],
+                'send_errors': self.metrics.counters['send_errors']
+            },
+            'phases': {
+                'ramp_seconds': ramp_seconds,
+                'steady_seconds': steady_seconds
+            },
+            'throughput': {
+                'sent_per_second': {event: count / steady_seconds for event, count in sent.items()},
+                'received_per_second': {event: count / steady_seconds for event, count in received.items()},
+                'sent_total': sum(sent.values()),
+                'received_total': sum(received.values())
+            },
+            'latency_ms': {kind: summarize(samples) for kind, samples in self.metrics.latencies.items()},
+            'delivery': {
+                'player_moved': self.delivery('player_moved', 'player_update', include_self=False),
+                'chat_message': self.delivery('chat_message', 'chat_message', include_self=True)
+            },
+            'server': monitor.summary(),
+            'harness': {
+                'cpu_percent': harness_cpu / (time.perf_counter() - steady_start + ramp_seconds) * 100,
+                'tick_lag_ms': summarize(self.tick_lag)
+            }
+        }
+
+        for sailor in self.sailors:
+            sailor.close()
+        return results
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f'{url}/api/players', timeout=1).ok:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def spawn_server(args, port=None, env=None, output_path=None):
+    """Start `loadtest.py serve` in a child process; returns (process, url)"""
+    port = port or free_port()
+    output_path = output_path or args.server_output
+    output = open(output_path, 'w') if output_path else subprocess.DEVNULL
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), 'serve', '--port', str(port), '--log-level', args.server_log_level],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=output,
+        stderr=subprocess.STDOUT,
+        env={**os.environ, **(env or {})}
+    )
+    url = f'http://127.0.0.1:{port}'
+    if not wait_until_ready(url, timeout=60):
+        process.kill()
+        raise RuntimeError("Load test server did not start (use --server-output to see its log)")
+    return process, url
+
+
+def serve(args):
+    """Run app.py against an in-memory Firestore"""
+    from fake_firestore import FakeFirestore, patch_firebase
+    patch_firebase(FakeFirestore())
+
+    # Must come after patching: app.py connects to Firestore at import time
+    import app as server
+
+    logging.disable(getattr(logging, args.log_level) - 1)
+    server.socketio.run(server.app, host=args.host, port=args.port, allow_unsafe_werkzeug=True)
+
+
+def run(args):
+    config = {
+        'url': args.url,
+        'clients': args.clients,
+        'hz': args.hz,
+        'duration': args.duration,
+        'action_rate': args.action_rate,
+        'chat_rate': args.chat_rate,
+        'spread': args.spread,
+        'observers': args.observers,
+        'ramp_rate': args.ramp_rate,
+        'join_concurrency': args.join_concurrency,
+        'join_timeout': args.join_timeout,
+        'drivers': args.drivers,
+        'drain': args.drain,
+        'seed': args.seed
+    }
+
+    process = None
+    server_pid = args.server_pid
+    if not config['url']:
+        process, config['url'] = spawn_server(args)
+        server_pid = process.pid
+
+    try:
+        results = LoadTest(config).run(server_pid=server_pid)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    results['config']['spawned_server'] = process is not None
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.json:
+        print(json.dumps(results))
+    else:
+        print_report(results)
+
+
+def read_shard_metrics(url):
+    """Handoff and border counters, ghosts and active players of one shard (from /metrics)"""
+    text = requests.get(f'{url}/metrics', timeout=5).text
+    stats = {event: float(value) for event, value in re.findall(r'^shard_events_total\{event="(\w+)"\} (\S+)$', text, re.M)}
+    for name in ('shard_ghost_players', 'game_active_players'):
+        match = re.search(rf'^{name} (\S+)$', text, re.M)
+        stats[name] = float(match.group(1)) if match else 0.0
+    return stats
+
+
+def run_shards(args):
+    """Start several shards on this machine and sail clients across their borders"""
+    ports = {f'shard{i}': free_port() for i in range(args.shards)}
+    urls = {shard_id: f'http://127.0.0.1:{port}' for shard_id, port in ports.items()}
+    spec = ','.join(f'{shard_id}={url}' for shard_id, url in urls.items())
+    processes = []
+    try:
+        for shard_id, port in ports.items():
+            env = {'SHARDS': spec, 'SHARD_ID': shard_id, 'SHARD_SECRET': 'loadtest',
+                   'SHARD_REGION_CHUNKS': str(args.region_chunks), 'SHARD_OVERLAP_CHUNKS': str(args.overlap_chunks)}
+            output_path = f'{args.server_output}.{shard_id}' if args.server_output else None
+            processes.append(spawn_server(args, port=port, env=env, output_path=output_path)[0])
+
+        config = {'urls': urls, 'speed': args.speed, 'spread': args.spread, 'join_timeout': args.join_timeout,
+                  'seed': args.seed}
+        metrics = Metrics()
+        shard_of = {}
+        sailors = [ShardSailor(i, config, metrics, shard_of) for i in range(args.clients)]
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            sailors = [sailor for sailor, joined in zip(sailors, pool.map(ShardSailor.join, sailors)) if joined]
+
+        interval = 1.0 / args.hz
+        stop_at = time.perf_counter() + args.duration
+        while time.perf_counter() < stop_at:
+            tick_start = time.perf_counter()
+            for sailor in sailors:
+                if not sailor.connected:
+                    continue
+                try:
+                    sailor.sail(interval)
+                except socketio.exceptions.SocketIOError:
+                    metrics.count('send_errors')
+            time.sleep(max(0.0, interval - (time.perf_counter() - tick_start)))
+        time.sleep(args.drain)
+
+        shards = {shard_id: read_shard_metrics(url) for shard_id, url in urls.items()}
+        results = {
+            'config': {'shards': args.shards, 'clients': args.clients, 'joined': len(sailors), 'hz': args.hz,
+                       'duration': args.duration, 'speed': args.speed, 'region_chunks': args.region_chunks,
+                       'overlap_chunks': args.overlap_chunks},
+            'handoffs': metrics.counters['handoffs'],
+            'handoff_failures': metrics.counters['handoff_failures'],
+            'handoff_ms': summarize(metrics.latencies['handoff']),
+            'cross_shard_sightings': sum(len(sailor.seen_across) for sailor in sailors),
+            'errors': {name: metrics.counters[name] for name in
+                       ('connect_errors', 'join_timeouts', 'unexpected_disconnects', 'send_errors')},
+            'position_corrections': metrics.counters['position_corrections'],
+            'shards': shards
+        }
+        for sailor in sailors:
+            sailor.close()
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=10)
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    config = results['config']
+    print(f"\n===== SHARD TEST ({config['shards']} shards, {config['joined']}/{config['clients']} clients, "
+          f"{config['duration']:.0f}s at {config['speed']:.0f} units/s) =====")
+    handoff_ms = results['handoff_ms']
+    print(f"Handoffs: {results['handoffs']} ({results['handoff_failures']} failed)"
+          + (f", p50 {handoff_ms['p50']:.1f} ms, p99 {handoff_ms['p99']:.1f} ms" if handoff_ms else ''))
+    print(f"Players seen across a border: {results['cross_shard_sightings']} (observer, player) pairs")
+    errors = results['errors']
+    print(f"Errors: {errors['connect_errors']} connect, {errors['join_timeouts']} join timeouts, "
+          f"{errors['unexpected_disconnects']} disconnects, {errors['send_errors']} send errors; "
+          f"{results['position_corrections']} position corrections")
+    for shard_id, stats in shards.items():
+        print(f"  {shard_id}: {stats['game_active_players']:.0f} players, {stats['shard_ghost_players']:.0f} ghosts, "
+              f"handoffs {stats.get('handoffs_issued', 0):.0f} out / {stats.get('handoffs_redeemed', 0):.0f} in, "
+              f"{stats.get('border_sent', 0):.0f} border messages sent")
+
+
+def print_report(results):
+    clients = results['clients']
+    print(f"\n===== LOAD TEST ({clients['joined']}/{clients['requested']} clients joined, "
+          f"{results['config']['hz']} Hz, {results['phases']['steady_seconds']:.1f}s) =====")
+    print(f"Errors: {clients['connect_errors']} connect, {clients['join_timeouts']} join timeouts, "
+          f"{clients['unexpected_disconnects']} disconnects, {clients['send_errors']} send errors")
+
+    throughput = results['throughput']
+    print("\nThroughput (events/s):")
+    for event, rate in sorted(throughput['sent_per_second'].items()):
+        print(f"  sent     {event:<22} {rate:10.1f}")
+    for event, rate in sorted(throughput['received_per_second'].items()):
+        print(f"  received {event:<22} {rate:10.1f}")
+
+    print("\nLatency (ms):")
+    for kind, stats in results['latency_ms'].items():
+        if stats:
+            print(f"  {kind:<18} p50 {stats['p50']:8.2f}  p90 {stats['p90']:8.2f}  "
+                  f"p99 {stats['p99']:8.2f}  max {stats['max']:8.2f}  (n={stats['count']})")
+
+    print("\nDelivery:")
+    for event, stats in results['delivery'].items():
+        print(f"  {event:<16} {stats['delivered']}/{stats['expected']} delivered, "
+              f"{stats['dropped']} dropped ({stats['drop_rate'] * 100:.2f}%)")
+
+    server = results['server']
+    if server:
+        print(f"\nServer: CPU {server['cpu_percent_mean']:.0f}% mean / {server['cpu_percent_max']:.0f}% max, "
+              f"RSS {server['rss_mb_max']:.0f} MB max")
+    harness = results['harness']
+    print(f"Harness: CPU {harness['cpu_percent']:.0f}%, tick lag p99 "
+          f"{harness['tick_lag_ms']['p99'] if harness['tick_lag_ms'] else 0:.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test the Socket.IO server with simulated clients')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Run a load test')
+    run_parser.add_argument('--url', help='Server to test (default: start one with an in-memory Firestore)')
+    run_parser.add_argument('--server-pid', type=int, help='PID of the --url server, for CPU/RSS sampling')
+    run_parser.add_argument('--clients', type=int, default=100)
+    run_parser.add_argument('--hz', type=float, default=10, help='player_update rate per client')
+    run_parser.add_argument('--duration', type=float, default=30, help='Seconds of steady state')
+    run_parser.add_argument('--action-rate', type=float, default=1, help='player_action per client per minute')
+    run_parser.add_argument('--chat-rate', type=float, default=0.5, help='chat_message per client per minute')
+    run_parser.add_argument('--spread', type=float, default=3000, help='Radius of the spawn area')
+    run_parser.add_argument('--observers', type=int, default=20, help='Clients that record broadcast latency')
+    run_parser.add_argument('--ramp-rate', type=float, default=50, help='Joins per second')
+    run_parser.add_argument('--join-concurrency', type=int, default=32)
+    run_parser.add_argument('--join-timeout', type=float, default=15)
+    run_parser.add_argument('--drivers', type=int, default=4, help='Threads sending client events')
+    run_parser.add_argument('--drain', type=float, default=3, help='Seconds to wait for in-flight events')
+    run_parser.add_argument('--seed', type=int, default=1)
+    run_parser.add_argument('--server-log-level', default='WARNING')
+    run_parser.add_argument('--server-output', help='File for the spawned server output')
+    run_parser.add_argument('--output', help='Write the JSON results to this file')
+    run_parser.add_argument('--json', action='store_true', help='Print machine-readable JSON only')
+
+    serve_parser = subparsers.add_parser('serve', help='Run the server against an in-memory Firestore')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=5002)
+    serve_parser.add_argument('--log-level', default='WARNING')
+
+    shards_parser = subparsers.add_parser('shards', help='Sail clients across several local shards')
+    shards_parser.add_argument('--shards', type=int, default=4)
+    shards_parser.add_argument('--clients', type=int, default=40)
+    shards_parser.add_argument('--hz', type=float, default=10, help='player_update rate per client')
+    shards_parser.add_argument('--duration', type=float, default=30)
+    shards_parser.add_argument('--speed', type=float, default=40, help='Boat speed in units per second')
+    shards_parser.add_argument('--spread', type=float, default=600, help='Spawn within this distance of the origin')
+    shards_parser.add_argument('--region-chunks', type=int, default=1, help='Region size (small, so borders come quickly)')
+    shards_parser.add_argument('--overlap-chunks', type=int, default=1)
+    shards_parser.add_argument('--join-timeout', type=float, default=15)
+    shards_parser.add_argument('--drain', type=float, default=2)
+    shards_parser.add_argument('--seed', type=int, default=1)
+    shards_parser.add_argument('--server-log-level', default='WARNING')
+    shards_parser.add_argument('--server-output', help='Prefix of the files for the shard outputs')
+    shards_parser.add_argument('--json', action='store_true', help='Print machine-readable JSON only')
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        serve(args)
+    elif args.command == 'shards':
+        run_shards(args)
+    else:
+        run(args)
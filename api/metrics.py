@@ -0,0 +1,250 @@
+import time
+import logging
+import threading
+from bisect import bisect_left
+from functools import wraps
+
+import flask
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [(self.name, labels, value) for labels, value in values]
+
+
+class Histogram:
+    """Fixed-bucket histogram with optional labels"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (last one is +Inf), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labelvalues)
+            if entry is None:
+                entry = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        samples = []
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((f'{self.name}_bucket', labels, cumulative, (('le', _format_value(bound)),)))
+            samples.append((f'{self.name}_sum', labels, total))
+            samples.append((f'{self.name}_count', labels, cumulative))
+        return samples
+
+
+class Callback:
+    """
+    Metric read from existing state at scrape time
+
+    fn returns a number, or a dictionary of label values (a tuple) -> number.
+    """
+
+    def __init__(self, kind, name, documentation, fn, labelnames=()):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def samples(self):
+        value = self.fn()
+        if not isinstance(value, dict):
+            return [(self.name, (), value)]
+        return [(self.name, labels, sample) for labels, sample in value.items()]
+
+
+class Registry:
+    """Set of metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(self, name, documentation, fn, labelnames=()):
+        return self.register(Callback('gauge', name, documentation, fn, labelnames))
+
+    def counter_callback(self, name, documentation, fn, labelnames=()):
+        return self.register(Callback('counter', name, documentation, fn, labelnames))
+
+    def render(self):
+        """Text exposition format 0.0.4"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for sample in metric.samples():
+                name, labels, value = sample[:3]
+                extra = sample[3] if len(sample) > 3 else ()
+                lines.append(f'{name}{_format_labels(metric.labelnames, labels, extra)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class ServerMetrics:
+    """
+    Event rates and latencies of the Socket.IO events and HTTP routes
+
+    Socket.IO events are timed around Flask-SocketIO's event dispatch and
+    HTTP requests between before_request and after_request (labelled by
+    route rule, not path). Outbound packets and bytes are counted where
+    python-socketio hands encoded packets to Engine.IO, so both emit() and
+    serialization.broadcast are included. Other gauges and counters (such as
+    cache hits) are registered by the application as callbacks.
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry or Registry()
+        self.events = self.registry.counter(
+            'socketio_events_total', 'Socket.IO events handled', ('event',))
+        self.event_errors = self.registry.counter(
+            'socketio_event_errors_total', 'Socket.IO event handlers that raised', ('event',))
+        self.event_seconds = self.registry.histogram(
+            'socketio_event_duration_seconds', 'Socket.IO event handler time', ('event',))
+        self.requests = self.registry.counter(
+            'http_requests_total', 'HTTP requests', ('route', 'method', 'status'))
+        self.request_seconds = self.registry.histogram(
+            'http_request_duration_seconds', 'HTTP request handling time', ('route',))
+        self.packets_sent = self.registry.counter(
+            'socketio_packets_sent_total', 'Socket.IO packets sent to clients (one per recipient)')
+        self.bytes_sent = self.registry.counter(
+            'socketio_bytes_sent_total', 'Encoded size of the Socket.IO packets sent to clients')
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    @staticmethod
+    def _route():
+        rule = flask.request.url_rule
+        return rule.rule if rule is not None else 'unmatched'
+
+    def _before_request(self):
+        flask.request._metrics_start = time.perf_counter()
+
+    def _after_request(self, response):
+        start = getattr(flask.request, '_metrics_start', None)
+        if start is not None:
+            route = self._route()
+            self.request_seconds.observe(time.perf_counter() - start, route)
+            self.requests.inc(route, flask.request.method, str(response.status_code))
+        return response
+
+    def instrument_socketio(self, socketio):
+        """Time every Socket.IO event and count outbound packets"""
+        handle_event = socketio._handle_event
+
+        @wraps(handle_event)
+        def timed_handle_event(handler, message, namespace, sid, *args):
+            start = time.perf_counter()
+            try:
+                return handle_event(handler, message, namespace, sid, *args)
+            except Exception:
+                self.event_errors.inc(message)
+                raise
+            finally:
+                self.event_seconds.observe(time.perf_counter() - start, message)
+                self.events.inc(message)
+
+        socketio._handle_event = timed_handle_event
+
+        eio = socketio.server.eio
+        send = eio.send
+
+        @wraps(send)
+        def counted_send(sid, data, *args, **kwargs):
+            self.packets_sent.inc()
+            self.bytes_sent.inc(amount=len(data))
+            return send(sid, data, *args, **kwargs)
+
+        eio.send = counted_send
+
+    def render(self):
+        return self.registry.render()
+
+
+class LogSampler:
+    """
+    Logs one in every `every` calls at DEBUG level
+
+    For per-frame logging: when the logger is not enabled for DEBUG, sample()
+    returns False before doing anything else, so callers skip formatting the
+    message entirely.
+
+        if update_log.sample():
+            logger.debug("Player update: %s", data)
+    """
+
+    def __init__(self, logger, every=100):
+        self.logger = logger
+        self.every = max(1, int(every))
+        self._calls = 0
+
+    def sample(self):
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return False
+        self._calls += 1
+        return self._calls % self.every == 1 or self.every == 1
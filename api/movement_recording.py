@@ -0,0 +1,299 @@
+import os
+import json
+import math
+import mmap
+import time
+import bisect
+import struct
+import logging
+import threading
+from collections import Counter, namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Segment header: magic, format version, record size, base time (UNIX seconds)
+MAGIC = b'MVRC'
+VERSION = 1
+HEADER = struct.Struct('<4sHHd')
+# Record: milliseconds since the segment's base time, player handle,
+# quantized x/y/z, quantized rotation, mode code, padding (24 bytes)
+RECORD = struct.Struct('<IIiiihBx')
+
+# Positions are stored in hundredths of a unit, rotations in 1/65536 turns
+POSITION_SCALE = 100
+ROTATION_SCALE = 32767 / math.pi
+INT32_MAX = 2 ** 31 - 1
+
+# A new segment is started every SEGMENT_SECONDS (the 32-bit millisecond
+# offset would overflow after 49 days) or once a segment reaches SEGMENT_BYTES
+SEGMENT_SECONDS = 3600
+SEGMENT_BYTES = 64 * 1024 * 1024
+SEGMENT_PREFIX = 'movement-'
+SEGMENT_SUFFIX = '.bin'
+# Player IDs of the handles and names of the mode codes
+METADATA_FILE = 'recording.json'
+
+# Buffered records are written at least this often, or when the buffer is full
+FLUSH_INTERVAL = 1.0
+FLUSH_BYTES = 1024 * 1024
+DEFAULT_RETENTION_HOURS = 24
+
+Frame = namedtuple('Frame', ['timestamp', 'player_id', 'position', 'rotation', 'mode'])
+
+
+def quantize_position(value):
+    return max(-INT32_MAX, min(INT32_MAX, int(round((value or 0) * POSITION_SCALE))))
+
+
+def quantize_rotation(value):
+    wrapped = ((value or 0) + math.pi) % (2 * math.pi) - math.pi
+    return max(-32767, min(32767, int(round(wrapped * ROTATION_SCALE))))
+
+
+def _segment_name(base_time):
+    return f"{SEGMENT_PREFIX}{int(base_time * 1000):013d}{SEGMENT_SUFFIX}"
+
+
+def _read_metadata(directory):
+    try:
+        with open(os.path.join(directory, METADATA_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'version': VERSION, 'handles': [], 'modes': []}
+
+
+class MovementRecorder:
+    """
+    Records accepted player_update frames into fixed-width binary segments
+
+    Each frame is one 24-byte record: time, player handle, quantized
+    position, rotation and mode. Player IDs and mode names are stored once,
+    in recording.json, as a handle -> player ID list and a mode code -> name
+    list. Records are packed into an in-memory buffer by record() (no I/O in
+    the handler) and written by flush(), which run() calls every second; the
+    run loop also deletes segments older than the retention period.
+    Timestamps within a segment never go backwards, so readers can binary
+    search them.
+    """
+
+    def __init__(self, directory, retention_hours=DEFAULT_RETENTION_HOURS, clock=time.time):
+        self.directory = directory
+        self.retention_hours = retention_hours
+        self.clock = clock
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._buffer = bytearray()
+        self._file = None
+        self._base_time = None
+        self._size = 0
+        self._last_ms = 0
+
+        os.makedirs(directory, exist_ok=True)
+        metadata = _read_metadata(directory)
+        self._handles = {player_id: handle for handle, player_id in enumerate(metadata['handles'])}
+        self._modes = {mode: code for code, mode in enumerate(metadata['modes'], 1)}
+
+    def _save_metadata(self):
+        path = os.path.join(self.directory, METADATA_FILE)
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({
+                'version': VERSION,
+                'handles': sorted(self._handles, key=self._handles.get),
+                'modes': sorted(self._modes, key=self._modes.get)
+            }, f)
+        os.replace(temporary, path)
+
+    def _handle(self, player_id):
+        handle = self._handles.get(player_id)
+        if handle is None:
+            handle = self._handles[player_id] = len(self._handles)
+            self._save_metadata()
+        return handle
+
+    def _mode(self, mode):
+        if mode is None:
+            return 0
+        code = self._modes.get(mode)
+        if code is None:
+            if len(self._modes) >= 255:
+                return 0
+            code = self._modes[mode] = len(self._modes) + 1
+            self._save_metadata()
+        return code
+
+    def _open_segment(self, now):
+        self._write_buffer()
+        if self._file is not None:
+            self._file.close()
+        self._base_time = now
+        self._last_ms = 0
+        self._file = open(os.path.join(self.directory, _segment_name(now)), 'ab')
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, now))
+        self._file.flush()
+        self._size = HEADER.size
+        self.stats['segments'] += 1
+
+    def _write_buffer(self):
+        if self._buffer and self._file is not None:
+            self._file.write(self._buffer)
+            self._file.flush()
+            self._size += len(self._buffer)
+            self._buffer = bytearray()
+
+    def record(self, player_id, player, now=None):
+        """Record a player's position, rotation and mode after an accepted update"""
+        now = self.clock() if now is None else now
+        position = player.get('position') or {}
+        with self._lock:
+            if (self._file is None or now - self._base_time >= SEGMENT_SECONDS
+                    or self._size + len(self._buffer) >= SEGMENT_BYTES):
+                self._open_segment(now)
+            elapsed_ms = max(self._last_ms, int((now - self._base_time) * 1000))
+            self._last_ms = elapsed_ms
+            self._buffer += RECORD.pack(
+                elapsed_ms,
+                self._handle(player_id),
+                quantize_position(position.get('x')),
+                quantize_position(position.get('y')),
+                quantize_position(position.get('z')),
+                quantize_rotation(player.get('rotation')),
+                self._mode(player.get('mode'))
+            )
+            if len(self._buffer) >= FLUSH_BYTES:
+                self._write_buffer()
+        self.stats['frames'] += 1
+
+    def flush(self):
+        """Write buffered records to the current segment"""
+        with self._lock:
+            self._write_buffer()
+
+    def expire(self, now=None):
+        """Delete segments that only hold frames older than the retention period"""
+        cutoff = (self.clock() if now is None else now) - self.retention_hours * 3600
+        active = self._file.name if self._file is not None else None
+        for base_time, path in list_segments(self.directory):
+            if base_time + SEGMENT_SECONDS < cutoff and path != active:
+                os.remove(path)
+                self.stats['segments_deleted'] += 1
+
+    def close(self):
+        with self._lock:
+            self._write_buffer()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def run(self, sleep):
+        """Flush loop for a background task"""
+        while True:
+            sleep(FLUSH_INTERVAL)
+            try:
+                self.flush()
+                self.expire()
+            except Exception as e:
+                logger.error(f"Error writing movement recording: {e}")
+
+
+def list_segments(directory):
+    """(base time, path) of every segment, oldest first"""
+    segments = []
+    for name in os.listdir(directory):
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+            base_ms = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+            segments.append((base_ms / 1000, os.path.join(directory, name)))
+    return sorted(segments)
+
+
+class _Segment:
+    """A memory-mapped segment; records are indexed by position"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError(f"Truncated movement segment: {path}")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, self.base_time = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            raise ValueError(f"Not a version {VERSION} movement segment: {path}")
+        # A record cut short by a crash is ignored
+        self.count = (size - HEADER.size) // RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        """Milliseconds since the base time of a record (what bisect searches)"""
+        return struct.unpack_from('<I', self._map, HEADER.size + index * RECORD.size)[0]
+
+    def records(self, first, last):
+        """Unpacked records first..last-1"""
+        return RECORD.iter_unpack(self._map[HEADER.size + first * RECORD.size:HEADER.size + last * RECORD.size])
+
+    def close(self):
+        self._map.close()
+
+
+class MovementReader:
+    """
+    Random access to a recording by time range and player
+
+    Segments are memory-mapped; the first and last frame of a time range are
+    found by binary search on the sorted record times, so reading a short
+    window of a long recording only touches that window.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        metadata = _read_metadata(directory)
+        self.player_ids = metadata['handles']
+        self.modes = [None] + metadata['modes']
+        self.segments = []
+        for _, path in list_segments(directory):
+            try:
+                self.segments.append(_Segment(path))
+            except ValueError as e:
+                logger.warning(f"Skipping movement segment: {e}")
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+
+    def time_range(self):
+        """(first, last) frame timestamp, or None for an empty recording"""
+        segments = [segment for segment in self.segments if len(segment)]
+        if not segments:
+            return None
+        return (segments[0].base_time + segments[0][0] / 1000,
+                segments[-1].base_time + segments[-1][len(segments[-1]) - 1] / 1000)
+
+    def frames(self, start=None, end=None, player_id=None):
+        """Frames with start <= timestamp < end (None: unbounded), optionally of one player, in time order"""
+        handle = None
+        if player_id is not None:
+            if player_id not in self.player_ids:
+                return
+            handle = self.player_ids.index(player_id)
+
+        for index, segment in enumerate(self.segments):
+            segment_end = self.segments[index + 1].base_time if index + 1 < len(self.segments) else math.inf
+            if (end is not None and segment.base_time >= end) or (start is not None and segment_end <= start):
+                continue
+            first = 0 if start is None else bisect.bisect_left(segment, math.ceil((start - segment.base_time) * 1000))
+            last = len(segment) if end is None else bisect.bisect_left(segment, math.ceil((end - segment.base_time) * 1000))
+            for elapsed_ms, record_handle, x, y, z, rotation, mode in segment.records(first, last):
+                if handle is not None and record_handle != handle:
+                    continue
+                yield Frame(
+                    segment.base_time + elapsed_ms / 1000,
+                    self.player_ids[record_handle],
+                    {'x': x / POSITION_SCALE, 'y': y / POSITION_SCALE, 'z': z / POSITION_SCALE},
+                    rotation / ROTATION_SCALE,
+                    self.modes[mode] if mode < len(self.modes) else None
+                )
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Inspect movement recordings and replay them into a server
+
+A recording is made by the server when MOVEMENT_RECORDING_DIR is set (see
+movement_recording.py). Replaying connects one Socket.IO client per
+recorded player, joins at the player's first recorded position and sends
+every frame as a player_update at its recorded time, divided by --speed
+(0 sends as fast as possible). The report gives the achieved frame rate and
+how far sends fell behind schedule.
+
+    python movement_replay.py info recording/
+    python movement_replay.py dump recording/ --player <id> --start 1718000000 --end 1718000060
+    python movement_replay.py replay recording/ --speed 10
+    python movement_replay.py replay recording/ --url http://localhost:5000 --players 50 --speed 0
+"""
+
+# Same as loadtest.py: with eventlet, one process can hold thousands of clients
+try:
+    import eventlet
+    eventlet.monkey_patch()
+except ImportError:
+    eventlet = None
+
+import sys
+import json
+import time
+import logging
+import argparse
+import datetime
+from collections import Counter
+
+import socketio
+
+import loadtest
+from movement_recording import MovementReader
+
+
+def format_time(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat()
+
+
+def info(args):
+    reader = MovementReader(args.directory)
+    time_range = reader.time_range()
+    frames_by_player = Counter(frame.player_id for frame in reader.frames())
+    print(f"{len(reader)} frames of {len(frames_by_player)} players in {len(reader.segments)} segments")
+    if time_range:
+        print(f"From {format_time(time_range[0])} to {format_time(time_range[1])} "
+              f"({time_range[1] - time_range[0]:.1f}s)")
+    for player_id, count in frames_by_player.most_common(args.top):
+        print(f"  {player_id:<40} {count:>10} frames")
+
+
+def dump(args):
+    reader = MovementReader(args.directory)
+    for frame in reader.frames(args.start, args.end, args.player):
+        print(json.dumps(frame._asdict()))
+
+
+class ReplayClient:
+    """A Socket.IO client standing in for one recorded player"""
+
+    def __init__(self, url, player_id, first_frame, join_timeout):
+        self.player_id = player_id
+        self.welcomed = False
+        self.client = socketio.Client(reconnection=False)
+        self.client.on('welcome', self._on_welcome)
+        self.client.connect(url, wait_timeout=join_timeout)
+        self.client.emit('player_join', {
+            'name': f'Replay {player_id[:12]}',
+            'position': first_frame.position,
+            'rotation': first_frame.rotation,
+            'mode': first_frame.mode
+        })
+
+    def _on_welcome(self, data):
+        self.welcomed = True
+
+    def send(self, frame):
+        self.client.emit('player_update', {'position': frame.position, 'rotation': frame.rotation, 'mode': frame.mode})
+
+    def close(self):
+        self.client.disconnect()
+
+
+def replay(args):
+    reader = MovementReader(args.directory)
+
+    # First pass: the players with the most frames (up to --players) and where each starts
+    counts = Counter()
+    first_frames = {}
+    for frame in reader.frames(args.start, args.end):
+        counts[frame.player_id] += 1
+        first_frames.setdefault(frame.player_id, frame)
+    if not counts:
+        sys.exit("No frames to replay")
+    chosen = [player_id for player_id, _ in counts.most_common(args.players)]
+
+    process = None
+    url = args.url
+    if not url:
+        process, url = loadtest.spawn_server(args)
+    clients = {}
+    sent = 0
+    lags = []
+    try:
+        for player_id in chosen:
+            clients[player_id] = ReplayClient(url, player_id, first_frames[player_id], args.join_timeout)
+        deadline = time.time() + args.join_timeout
+        while not all(client.welcomed for client in clients.values()) and time.time() < deadline:
+            time.sleep(0.05)
+
+        # Second pass: send the frames on schedule, streaming them from the recording
+        origin = min(first_frames[player_id].timestamp for player_id in chosen)
+        last = origin
+        start = time.perf_counter()
+        for frame in reader.frames(args.start, args.end):
+            client = clients.get(frame.player_id)
+            if client is None:
+                continue
+            due = (frame.timestamp - origin) / args.speed if args.speed else 0.0
+            delay = due - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+            lags.append(max(0.0, time.perf_counter() - start - due))
+            client.send(frame)
+            sent += 1
+            last = frame.timestamp
+        elapsed = time.perf_counter() - start
+    finally:
+        for client in clients.values():
+            client.close()
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    results = {
+        'frames': sent,
+        'players': len(clients),
+        'joined': sum(1 for client in clients.values() if client.welcomed),
+        'recorded_seconds': last - origin,
+        'replay_seconds': elapsed,
+        'speed': args.speed,
+        'frames_per_second': sent / elapsed if elapsed else None,
+        'schedule_lag_ms': loadtest.summarize(lags)
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect movement recordings and replay them into a server')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    info_parser = subparsers.add_parser('info', help='Summarize a recording')
+    info_parser.add_argument('directory')
+    info_parser.add_argument('--top', type=int, default=10, help='Players to list')
+
+    dump_parser = subparsers.add_parser('dump', help='Print frames as JSON lines')
+    dump_parser.add_argument('directory')
+    dump_parser.add_argument('--player', help='Only this player ID')
+    dump_parser.add_argument('--start', type=float, help='UNIX time of the first frame')
+    dump_parser.add_argument('--end', type=float, help='UNIX time after the last frame')
+
+    replay_parser = subparsers.add_parser('replay', help='Send a recording to a server as player_update events')
+    replay_parser.add_argument('directory')
+    replay_parser.add_argument('--url', help='Server to replay into (default: start one with an in-memory Firestore)')
+    replay_parser.add_argument('--speed', type=float, default=1.0, help='Time acceleration (0: as fast as possible)')
+    replay_parser.add_argument('--players', type=int, default=100, help='Replay the players with the most frames')
+    replay_parser.add_argument('--start', type=float, help='UNIX time of the first frame')
+    replay_parser.add_argument('--end', type=float, help='UNIX time after the last frame')
+    replay_parser.add_argument('--join-timeout', type=float, default=15)
+    replay_parser.add_argument('--server-log-level', default='WARNING')
+    replay_parser.add_argument('--server-output', help='File for the spawned server output')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    {'info': info, 'dump': dump, 'replay': replay}[args.command](args)
@@ -0,0 +1,307 @@
+import math
+import time
+import array
+import logging
+import threading
+from collections import Counter, namedtuple
+
+# NumPy validates a whole tick in one vectorized pass; without it the same
+# checks run in a Python loop
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Units per second. The client moves the boat 0.2 units per frame, so its
+# speed depends on the frame rate (12 at 60 Hz, 48 at 240 Hz)
+MAX_SPEEDS = {'boat': 50.0, 'character': 20.0}
+# Moves are allowed SPEED_TOLERANCE times the mode's speed over the time since
+# the last accepted move, plus SPEED_SLACK units (network jitter bunches updates)
+SPEED_TOLERANCE = 1.5
+SPEED_SLACK = 5.0
+# A move longer than this is a teleport and is rejected outright
+TELEPORT_DISTANCE = 500.0
+# Positions are kept within |x|, |z| <= WORLD_EXTENT and MIN_Y <= y <= MAX_Y
+WORLD_EXTENT = 1000000.0
+MIN_Y = -50.0
+MAX_Y = 500.0
+# Seconds between validation ticks
+MOVEMENT_TICK = 0.05
+
+ACCEPTED = 'accepted'
+CLAMPED = 'clamped'
+REJECTED = 'rejected'
+# Verdict statuses by the codes the validation passes return
+STATUSES = (ACCEPTED, CLAMPED, REJECTED)
+
+# One validated player_update: the position and mode to apply and the
+# payload given to propose()
+Verdict = namedtuple('Verdict', ['player_id', 'position', 'mode', 'status', 'payload'])
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+class MovementValidator:
+    """
+    Server-authoritative movement checks, batched per tick
+
+    Every tracked player has a slot in flat arrays holding the last accepted
+    position, time and mode and the latest proposed ones. propose() (the
+    player_update handler) only writes the proposal into the slot, so many
+    updates of one player within a tick cost one check. tick() validates every
+    pending proposal in one pass:
+
+    - a move longer than teleport_distance is rejected (the player stays at
+      the last accepted position)
+    - a move faster than the mode's max speed (the higher of the old and new
+      mode, so switching between boat and character is allowed) is clamped
+      to the allowed distance along its direction
+    - positions outside the world bounds are clamped to the bounds
+
+    on_validated(verdicts) is then called once with every verdict. Results
+    and reasons are counted in stats.
+    """
+
+    def __init__(self, on_validated=None, max_speeds=None, tolerance=SPEED_TOLERANCE, slack=SPEED_SLACK,
+                 teleport_distance=TELEPORT_DISTANCE, extent=WORLD_EXTENT, min_y=MIN_Y, max_y=MAX_Y,
+                 clock=time.time):
+        self.on_validated = on_validated
+        self.max_speeds = dict(max_speeds or MAX_SPEEDS)
+        self.tolerance = tolerance
+        self.slack = slack
+        self.teleport_distance = teleport_distance
+        self.low = (-extent, min_y, -extent)
+        self.high = (extent, max_y, extent)
+        self.clock = clock
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+        # Mode code 0 is a player without a known mode: the fastest mode applies
+        self._modes = [None] + list(self.max_speeds)
+        self._mode_codes = {mode: code for code, mode in enumerate(self._modes) if mode is not None}
+        self._speeds = [max(self.max_speeds.values(), default=0.0)] + list(self.max_speeds.values())
+
+        self._slots = {}
+        self._player_ids = []
+        self._free = []
+        self._pending = {}
+        self._accepted = array.array('d')
+        self._accepted_time = array.array('d')
+        self._accepted_mode = array.array('B')
+        self._proposed = array.array('d')
+        self._proposed_time = array.array('d')
+        self._proposed_mode = array.array('B')
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _clamp(self, x, y, z):
+        return (min(max(x, self.low[0]), self.high[0]),
+                min(max(y, self.low[1]), self.high[1]),
+                min(max(z, self.low[2]), self.high[2]))
+
+    def track(self, player_id, position, mode=None, now=None):
+        """
+        Start (or restart) validating a player from a position, on join
+
+        :return: The position clamped to the world bounds (non-numeric coordinates become 0)
+        """
+        now = self.clock() if now is None else now
+        position = position if isinstance(position, dict) else {}
+        x, y, z = self._clamp(*(float(position[axis]) if _number(position.get(axis)) else 0.0 for axis in 'xyz'))
+        code = self._mode_codes.get(mode, 0)
+        with self._lock:
+            slot = self._slots.get(player_id)
+            if slot is None:
+                if self._free:
+                    slot = self._free.pop()
+                    self._player_ids[slot] = player_id
+                else:
+                    slot = len(self._player_ids)
+                    self._player_ids.append(player_id)
+                    self._accepted.extend((0.0, 0.0, 0.0))
+                    self._proposed.extend((0.0, 0.0, 0.0))
+                    self._accepted_time.append(0.0)
+                    self._proposed_time.append(0.0)
+                    self._accepted_mode.append(0)
+                    self._proposed_mode.append(0)
+                self._slots[player_id] = slot
+            self._pending.pop(slot, None)
+            self._accepted[slot * 3:slot * 3 + 3] = array.array('d', (x, y, z))
+            self._accepted_time[slot] = now
+            self._accepted_mode[slot] = code
+        return {'x': x, 'y': y, 'z': z}
+
+    def untrack(self, player_id):
+        """Stop validating a player (its pending proposal is dropped)"""
+        with self._lock:
+            slot = self._slots.pop(player_id, None)
+            if slot is not None:
+                self._pending.pop(slot, None)
+                self._player_ids[slot] = None
+                self._free.append(slot)
+
+    def propose(self, player_id, position, mode=None, payload=None, now=None):
+        """
+        Stage a player's new position for the next tick (replacing any earlier proposal)
+
+        A missing y keeps the last accepted height and a missing mode the
+        current mode.
+
+        :param payload: Returned with the verdict (e.g. the socket and rotation)
+        :return: False if the player is not tracked or the update is malformed
+        """
+        if (not isinstance(position, dict) or not _number(position.get('x')) or not _number(position.get('z'))
+                or ('y' in position and not _number(position['y']))
+                or (mode is not None and mode not in self._mode_codes)):
+            self.stats['malformed'] += 1
+            return False
+        now = self.clock() if now is None else now
+        with self._lock:
+            slot = self._slots.get(player_id)
+            if slot is None:
+                return False
+            y = position['y'] if 'y' in position else self._accepted[slot * 3 + 1]
+            self._proposed[slot * 3:slot * 3 + 3] = array.array('d', (position['x'], y, position['z']))
+            self._proposed_time[slot] = now
+            self._proposed_mode[slot] = self._mode_codes[mode] if mode is not None else self._accepted_mode[slot]
+            self._pending[slot] = payload
+        return True
+
+    def position(self, player_id):
+        """Last accepted position of a tracked player, or None"""
+        slot = self._slots.get(player_id)
+        if slot is None:
+            return None
+        x, y, z = self._accepted[slot * 3:slot * 3 + 3]
+        return {'x': x, 'y': y, 'z': z}
+
+    def snapshot(self):
+        """
+        Last accepted positions of every slot
+
+        :return: (player IDs, flat x/y/z list), both indexed by slot; free slots have a None player ID
+        """
+        with self._lock:
+            return list(self._player_ids), self._accepted.tolist()
+
+    def validate(self):
+        """
+        Validate every pending proposal and make the results the accepted state
+
+        :return: List of Verdicts, one per player with a proposal
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return []
+            slots = list(pending)
+            if np is not None:
+                positions, statuses = self._validate_arrays(slots)
+            else:
+                positions, statuses = self._validate_loop(slots)
+
+            player_ids, modes, accepted_mode = self._player_ids, self._modes, self._accepted_mode
+            verdicts = [
+                Verdict(player_ids[slot], {'x': x, 'y': y, 'z': z}, modes[accepted_mode[slot]], STATUSES[status], payload)
+                for (slot, payload), (x, y, z), status in zip(pending.items(), positions, statuses)
+            ]
+        for status, count in Counter(statuses).items():
+            self.stats[STATUSES[status]] += count
+        return verdicts
+
+    def _validate_arrays(self, slots):
+        """One vectorized pass over the slots (called with the lock held); statuses are STATUSES codes"""
+        index = np.fromiter(slots, dtype=np.intp, count=len(slots))
+        accepted = np.frombuffer(self._accepted, dtype=np.float64).reshape(-1, 3)
+        proposed = np.frombuffer(self._proposed, dtype=np.float64).reshape(-1, 3)
+        accepted_time = np.frombuffer(self._accepted_time, dtype=np.float64)
+        proposed_time = np.frombuffer(self._proposed_time, dtype=np.float64)
+        accepted_mode = np.frombuffer(self._accepted_mode, dtype=np.uint8)
+        proposed_mode = np.frombuffer(self._proposed_mode, dtype=np.uint8)
+        speeds = np.array(self._speeds)
+
+        old = accepted[index]
+        delta = proposed[index] - old
+        distance = np.sqrt(np.einsum('ij,ij->i', delta, delta))
+        elapsed = np.maximum(proposed_time[index] - accepted_time[index], 0.0)
+        speed = np.maximum(speeds[accepted_mode[index]], speeds[proposed_mode[index]])
+        allowed = speed * elapsed * self.tolerance + self.slack
+
+        rejected = distance > self.teleport_distance
+        too_fast = ~rejected & (distance > allowed)
+        scale = np.where(too_fast, allowed / np.maximum(distance, 1e-9), 1.0)
+        scale[rejected] = 0.0
+        moved = old + delta * scale[:, None]
+        result = np.clip(moved, self.low, self.high)
+        out_of_bounds = np.any(result != moved, axis=1)
+
+        self.stats['teleport'] += int(np.count_nonzero(rejected))
+        self.stats['speed'] += int(np.count_nonzero(too_fast))
+        self.stats['bounds'] += int(np.count_nonzero(out_of_bounds))
+
+        # Rejected players stay where they were, but their clock moves on
+        accepted[index] = result
+        accepted_time[index] = proposed_time[index]
+        keep = index[~rejected]
+        accepted_mode[keep] = proposed_mode[keep]
+
+        statuses = np.where(rejected, 2, (too_fast | out_of_bounds).astype(np.int8))
+        return result.tolist(), statuses.tolist()
+
+    def _validate_loop(self, slots):
+        """The same checks one slot at a time (called with the lock held); statuses are STATUSES codes"""
+        positions = []
+        statuses = []
+        for slot in slots:
+            old = self._accepted[slot * 3:slot * 3 + 3]
+            new = self._proposed[slot * 3:slot * 3 + 3]
+            delta = [new[axis] - old[axis] for axis in range(3)]
+            distance = math.sqrt(sum(d * d for d in delta))
+            elapsed = max(self._proposed_time[slot] - self._accepted_time[slot], 0.0)
+            speed = max(self._speeds[self._accepted_mode[slot]], self._speeds[self._proposed_mode[slot]])
+            allowed = speed * elapsed * self.tolerance + self.slack
+
+            status = 0
+            scale = 1.0
+            if distance > self.teleport_distance:
+                status = 2
+                scale = 0.0
+                self.stats['teleport'] += 1
+            elif distance > allowed:
+                status = 1
+                scale = allowed / max(distance, 1e-9)
+                self.stats['speed'] += 1
+            moved = [old[axis] + delta[axis] * scale for axis in range(3)]
+            result = self._clamp(*moved)
+            if list(result) != moved:
+                self.stats['bounds'] += 1
+                status = max(status, 1)
+
+            self._accepted[slot * 3:slot * 3 + 3] = array.array('d', result)
+            self._accepted_time[slot] = self._proposed_time[slot]
+            if status != 2:
+                self._accepted_mode[slot] = self._proposed_mode[slot]
+            positions.append(result)
+            statuses.append(status)
+        return positions, statuses
+
+    def tick(self):
+        """Validate pending proposals and hand the verdicts to on_validated"""
+        verdicts = self.validate()
+        if verdicts and self.on_validated is not None:
+            self.on_validated(verdicts)
+        return len(verdicts)
+
+    def run(self, sleep, interval=MOVEMENT_TICK):
+        """Tick loop for a background task"""
+        while True:
+            sleep(interval)
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Error in movement tick: {e}")
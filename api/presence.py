@@ -0,0 +1,218 @@
+import time
+import logging
+import threading
+from collections import Counter, defaultdict
+
+from google.api_core import exceptions as google_exceptions
+
+import firestore_models
+
+logger = logging.getLogger(__name__)
+
+# Seconds a disconnected player stays active, so a quick reconnect costs nothing
+DISCONNECT_GRACE_PERIOD = 10.0
+# Seconds between presence ticks (expiring disconnects, flushing writes)
+PRESENCE_TICK = 1.0
+
+SESSIONS_COLLECTION = 'socket_sessions'
+
+
+class PresenceManager:
+    """
+    Socket-to-player presence with a disconnect grace period and batched writes
+
+    Sessions are tracked in memory, so looking up the player of a socket does
+    not need a Firestore read. A disconnect only takes effect after
+    DISCONNECT_GRACE_PERIOD; if the player rejoins before that, nothing is
+    written or broadcast. Each tick, expired players are marked inactive and
+    socket_sessions documents are written/deleted with batched writes, then
+    on_expired(player_ids) is called once with every player that went away.
+    Writes that fail are retried on the next tick.
+    """
+
+    def __init__(self, on_expired, grace_period=DISCONNECT_GRACE_PERIOD):
+        self.on_expired = on_expired
+        self.grace_period = grace_period
+        self._sid_player = {}
+        self._player_sids = defaultdict(set)
+        self._pending = {}
+        self._session_writes = {}
+        # Player ID -> time it went inactive, until the inactive write succeeds
+        self._inactive_writes = {}
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def player_for(self, sid):
+        """Get the player ID of a connected socket"""
+        return self._sid_player.get(sid)
+
+    def sids_for(self, player_id):
+        """Get the connected sockets of a player"""
+        return set(self._player_sids.get(player_id, ()))
+
+    def is_online(self, player_id):
+        """True if the player has a connected socket or is within the grace period"""
+        return bool(self._player_sids.get(player_id)) or player_id in self._pending
+
+    def register(self, sid, player_id):
+        """
+        Map a socket to a player on join
+
+        :return: True if the player was still within its disconnect grace period
+        """
+        with self._lock:
+            self._sid_player[sid] = player_id
+            self._player_sids[player_id].add(sid)
+            self._session_writes[sid] = {
+                'player_id': player_id,
+                'socket_id': sid,
+                'last_update': time.time()
+            }
+            resumed = self._pending.pop(player_id, None) is not None
+            # Back before its inactive write went through: nothing to write
+            self._inactive_writes.pop(player_id, None)
+        if resumed:
+            self.stats['resumed'] += 1
+        return resumed
+
+    def disconnect(self, sid, legacy_player_id=None):
+        """
+        Start the grace period for the player of a disconnected socket
+
+        :param legacy_player_id: Player to use if the socket never registered
+        :return: The player ID, or None if the socket had no player
+        """
+        with self._lock:
+            player_id = self._sid_player.pop(sid, None) or legacy_player_id
+            self._session_writes[sid] = None
+            if player_id is None:
+                return None
+
+            sids = self._player_sids.get(player_id)
+            if sids is not None:
+                sids.discard(sid)
+                if sids:
+                    # The player is still connected through another socket
+                    return player_id
+                del self._player_sids[player_id]
+
+            self._pending[player_id] = time.time() + self.grace_period
+        self.stats['disconnects'] += 1
+        return player_id
+
+    def release(self, sid):
+        """
+        Drop a socket's player mapping at once, without a grace period or an
+        inactive write (its player was handed over to another shard)
+
+        :return: The player ID, or None if the socket had no player
+        """
+        with self._lock:
+            player_id = self._sid_player.pop(sid, None)
+            self._session_writes[sid] = None
+            if player_id is None:
+                return None
+            sids = self._player_sids.get(player_id)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self._player_sids[player_id]
+        self.stats['released'] += 1
+        return player_id
+
+    def expire(self, player_ids):
+        """End the grace period of disconnected players so the next tick expires them"""
+        with self._lock:
+            for player_id in player_ids:
+                if player_id in self._pending:
+                    self._pending[player_id] = 0
+                    self.stats['forced'] += 1
+
+    def tick(self, now=None):
+        """
+        Expire disconnects whose grace period is over and flush batched writes
+
+        :return: List of player IDs that became inactive
+        """
+        now = now or time.time()
+        with self._lock:
+            expired = [player_id for player_id, deadline in self._pending.items() if deadline <= now]
+            for player_id in expired:
+                del self._pending[player_id]
+                self._inactive_writes[player_id] = now
+            inactive_writes = self._inactive_writes
+            self._inactive_writes = {}
+            session_writes = self._session_writes
+            self._session_writes = {}
+
+        sessions = firestore_models.db.collection(SESSIONS_COLLECTION)
+        operations = [
+            (('inactive', player_id), ('update', firestore_models.Player.collection().document(player_id),
+                                       {'active': False, 'last_update': when, 'updated_at': now}))
+            for player_id, when in inactive_writes.items()
+        ]
+        operations += [
+            (('session', sid), ('delete', sessions.document(sid), None) if mapping is None
+             else ('set', sessions.document(sid), mapping))
+            for sid, mapping in session_writes.items()
+        ]
+
+        if operations:
+            failed = self._write(operations)
+            if failed:
+                # Retry next tick, unless a rejoin or a newer session write replaced them
+                with self._lock:
+                    for kind, key in failed:
+                        if kind == 'session':
+                            self._session_writes.setdefault(key, session_writes[key])
+                        elif not self._player_sids.get(key) and key not in self._pending:
+                            self._inactive_writes.setdefault(key, inactive_writes[key])
+
+        if expired:
+            self.stats['expired'] += len(expired)
+            self.on_expired(expired)
+        return expired
+
+    def _write(self, operations):
+        """
+        Apply (key, operation) pairs with batched writes
+
+        A batch fails as a whole, so if a player document was deleted (the
+        inactive update raises NotFound) the writes are applied one by one and
+        only the missing documents are skipped.
+
+        :return: Keys of the operations to retry
+        """
+        try:
+            firestore_models.write_in_batches(operation for _, operation in operations)
+            self.stats['writes'] += len(operations)
+            return []
+        except google_exceptions.NotFound:
+            pass
+        except Exception as e:
+            logger.error(f"Error writing presence batch ({len(operations)} writes): {e}")
+            self.stats['failed_writes'] += len(operations)
+            return [key for key, _ in operations]
+
+        failed = []
+        for key, operation in operations:
+            try:
+                firestore_models.write_in_batches([operation])
+                self.stats['writes'] += 1
+            except google_exceptions.NotFound:
+                logger.warning(f"Skipping presence write of a deleted document: {key}")
+                self.stats['missing'] += 1
+            except Exception as e:
+                logger.error(f"Error writing presence update {key}: {e}")
+                self.stats['failed_writes'] += 1
+                failed.append(key)
+        return failed
+
+    def run(self, sleep):
+        """Tick loop for a background task"""
+        while True:
+            sleep(PRESENCE_TICK)
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Error in presence tick: {e}")
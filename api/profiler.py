@@ -0,0 +1,230 @@
+import os
+import gc
+import sys
+import math
+import time
+import threading
+from collections import Counter
+
+# Green threads are sampled too when eventlet/greenlet are in use; the sampler
+# itself must run on a real OS thread so it is not scheduled by the hub
+try:
+    import greenlet
+except ImportError:
+    greenlet = None
+
+try:
+    from eventlet import patcher as eventlet_patcher
+except ImportError:
+    eventlet_patcher = None
+
+DEFAULT_HZ = 100
+MAX_HZ = 1000
+MAX_SECONDS = 60
+# Seconds between two scans of the heap for live greenlets
+GREENLET_RESCAN_INTERVAL = 1.0
+
+# Frames from these files mean the stack is inside a Firestore call: the
+# instrumented client wraps every operation (see firestore_accounting.py)
+FIRESTORE_MARKERS = (
+    'firestore_accounting.py',
+    os.path.join('google', 'cloud', 'firestore'),
+    os.path.join('google', 'api_core'),
+    'grpc'
+)
+
+
+def _real_threading():
+    if eventlet_patcher is not None and eventlet_patcher.is_monkey_patched('thread'):
+        return eventlet_patcher.original('threading'), eventlet_patcher.original('time')
+    return threading, time
+
+
+def _thread_cpu_clock(ident):
+    """CPU clock of another thread (Linux/BSD), or None where unsupported"""
+    try:
+        return time.pthread_getcpuclockid(ident)
+    except (AttributeError, OSError):
+        return None
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling the Python stacks of every thread and greenlet
+
+    A sampler thread wakes `hz` times per second and records the stack of
+    every thread (from sys._current_frames) and of every suspended greenlet.
+    Each sample is classified:
+
+    - firestore: the stack is inside a Firestore call (waiting on the RPC or
+      serializing for it)
+    - cpu: the thread used CPU since the previous sample (per-thread CPU
+      clocks); greenlets running on the hub thread count as cpu
+    - wait: blocked or idle otherwise
+
+    Samples without a frame from handler_file (idle server threads, the
+    background task loops between runs) are dropped unless include_idle is
+    set, so the output shows where request and event handling spends its time.
+
+    Results are collapsed stacks ("category;outer;...;inner count"), the
+    input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, handler_file, hz=DEFAULT_HZ, include_idle=False):
+        self.handler_file = os.path.abspath(handler_file)
+        self.interval = 1.0 / min(max(hz, 1), MAX_HZ)
+        self.include_idle = include_idle
+        self.stacks = Counter()
+        self.categories = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._stop = None
+        self._thread = None
+        self._cpu_times = {}
+        self._greenlets = []
+        self._greenlets_scanned = 0.0
+
+    @staticmethod
+    def _label(code):
+        return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+    def _stack(self, frame):
+        """
+        Frame labels from outermost to innermost, plus whether it is in a handler / Firestore
+
+        :return: None for the stacks of the profiler itself (the sampler and the waiting caller)
+        """
+        labels = []
+        in_handler = False
+        in_firestore = False
+        while frame is not None:
+            code = frame.f_code
+            labels.append(self._label(code))
+            filename = code.co_filename
+            if filename == __file__:
+                return None
+            if not in_firestore and any(marker in filename for marker in FIRESTORE_MARKERS):
+                in_firestore = True
+            if not in_handler and filename == self.handler_file:
+                in_handler = True
+            frame = frame.f_back
+        labels.reverse()
+        return labels, in_handler, in_firestore
+
+    def _record(self, frame, on_cpu):
+        stack = self._stack(frame)
+        if stack is None:
+            return
+        labels, in_handler, in_firestore = stack
+        if not in_handler and not self.include_idle:
+            return
+        if in_firestore:
+            category = 'firestore'
+        elif on_cpu:
+            category = 'cpu'
+        else:
+            category = 'wait'
+        self.categories[category] += 1
+        self.stacks[';'.join([category] + labels)] += 1
+
+    def _on_cpu(self, ident, wall_elapsed):
+        """True if the thread ran for at least half of the time since its last sample"""
+        clock = _thread_cpu_clock(ident)
+        if clock is None:
+            return True
+        try:
+            cpu = time.clock_gettime(clock)
+        except OSError:
+            return False
+        previous = self._cpu_times.get(ident)
+        self._cpu_times[ident] = cpu
+        return previous is not None and cpu - previous >= wall_elapsed * 0.5
+
+    def _suspended_greenlets(self, now):
+        if greenlet is None:
+            return []
+        if now - self._greenlets_scanned >= GREENLET_RESCAN_INTERVAL:
+            self._greenlets = [obj for obj in gc.get_objects() if isinstance(obj, greenlet.greenlet)]
+            self._greenlets_scanned = now
+        # gr_frame is None for the running greenlet (seen through its thread) and dead ones
+        return [g.gr_frame for g in self._greenlets if g.gr_frame is not None]
+
+    def _sample(self, own_ident, wall_elapsed, now):
+        for ident, frame in sys._current_frames().items():
+            if ident != own_ident:
+                self._record(frame, self._on_cpu(ident, wall_elapsed))
+        for frame in self._suspended_greenlets(now):
+            self._record(frame, False)
+        self.samples += 1
+
+    def _run(self, sleep, clock):
+        own_ident = threading.get_ident()
+        start = last = clock()
+        while not self._stop.is_set():
+            sleep(self.interval)
+            now = clock()
+            self._sample(own_ident, now - last, now)
+            last = now
+        self.duration = clock() - start
+
+    def start(self):
+        real_threading, real_time = _real_threading()
+        self._stop = real_threading.Event()
+        self._thread = real_threading.Thread(
+            target=self._run, args=(real_time.sleep, real_time.monotonic),
+            name='sampling-profiler', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        """Collapsed stacks, most frequent first"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self):
+        """Sample counts and estimated seconds per category"""
+        # The sampler may wake late (it needs the GIL), so use the real time per sample
+        period = self.duration / self.samples if self.samples else self.interval
+        return {
+            'samples': self.samples,
+            'duration': self.duration,
+            'interval': self.interval,
+            'categories': {
+                category: {'samples': count, 'seconds': count * period}
+                for category, count in self.categories.most_common()
+            },
+            'top_stacks': [
+                {'stack': stack, 'samples': count} for stack, count in self.stacks.most_common(20)
+            ]
+        }
+
+
+# Only one profile runs at a time
+_active_lock = threading.Lock()
+
+
+def profile(handler_file, seconds, sleep, hz=DEFAULT_HZ, include_idle=False):
+    """
+    Profile the whole process for `seconds`, waiting with sleep()
+
+    :param handler_file: Source file of the handlers (app.py) whose stacks are kept
+    :return: The finished SamplingProfiler, or None if a profile is already running
+    :raises ValueError: If seconds is not a finite number
+    """
+    if not math.isfinite(seconds):
+        raise ValueError(f"seconds must be finite: {seconds}")
+    if not _active_lock.acquire(blocking=False):
+        return None
+    try:
+        profiler = SamplingProfiler(handler_file, hz=hz, include_idle=include_idle)
+        profiler.start()
+        try:
+            sleep(min(max(seconds, 0), MAX_SECONDS))
+        finally:
+            profiler.stop()
+        return profiler
+    finally:
+        _active_lock.release()
@@ -0,0 +1,123 @@
+import gzip
+import hashlib
+import threading
+from collections import Counter, namedtuple
+
+from flask import Response, request
+
+import serialization
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+# Keep the gzip variant only if it is at most 90% of the body
+MIN_COMPRESSION_RATIO = 0.9
+
+# One encoded response body: its source version, JSON bytes, gzip variant
+# (None if not worth it) and content-hash ETag
+CachedBody = namedtuple('CachedBody', ['version', 'body', 'gzipped', 'etag'])
+
+
+def cache_control(shared_max_age, stale_while_revalidate):
+    """
+    Cache-Control for a cached endpoint
+
+    Browsers revalidate every time (a 304 when unchanged), while a CDN serves
+    the response for shared_max_age seconds and a stale copy for another
+    stale_while_revalidate seconds while it refetches in the background.
+    """
+    return f'public, max-age=0, s-maxage={shared_max_age}, stale-while-revalidate={stale_while_revalidate}'
+
+
+class ResponseCache:
+    """
+    Encoded JSON bodies of read endpoints, rebuilt only when their data changes
+
+    Each key (one per endpoint) has a version that the code changing the
+    underlying data bumps with invalidate(). The body is built, encoded,
+    hashed and gzipped once per version and then served from memory to every
+    request. The ETag is the content hash, so a rebuild that produces the
+    same JSON still answers If-None-Match with 304 Not Modified.
+
+    Builds never hold the lock; a build that raced with an invalidation is
+    served to its request but not stored.
+    """
+
+    def __init__(self, min_compress_size=MIN_COMPRESS_SIZE):
+        self.min_compress_size = min_compress_size
+        self._entries = {}
+        self._versions = Counter()
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.builds = Counter()
+        self.not_modified = Counter()
+
+    def invalidate(self, key):
+        """Drop a body so it is rebuilt on the next request"""
+        with self._lock:
+            self._versions[key] += 1
+            self._entries.pop(key, None)
+
+    def _encode(self, version, data):
+        body = serialization.dumps(data).encode('utf-8')
+        gzipped = None
+        if len(body) >= self.min_compress_size:
+            gzipped = gzip.compress(body, compresslevel=6, mtime=0)
+            if len(gzipped) > len(body) * MIN_COMPRESSION_RATIO:
+                gzipped = None
+        return CachedBody(version, body, gzipped, hashlib.sha256(body).hexdigest()[:20])
+
+    def get(self, key, build):
+        """Get the CachedBody of a key, calling build() (JSON-serializable data) only after an invalidation"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits[key] += 1
+            return entry
+
+        version = self._versions[key]
+        entry = self._encode(version, build())
+        self.builds[key] += 1
+        with self._lock:
+            if self._versions[key] == version:
+                self._entries[key] = entry
+        return entry
+
+    def respond(self, key, build, cache_control_header):
+        """
+        Build the response of a cached endpoint for the current request
+
+        Handles If-None-Match (304) and serves the gzip variant to clients
+        that accept it.
+        """
+        entry = self.get(key, build)
+        use_gzip = entry.gzipped is not None and request.accept_encodings['gzip']
+        etag = f"{entry.etag}-gzip" if use_gzip else entry.etag
+
+        response = Response(mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control_header
+        if entry.gzipped is not None:
+            response.vary.add('Accept-Encoding')
+
+        # If-None-Match uses the weak comparison (CDNs weaken ETags they recompress)
+        if request.if_none_match.contains_weak(etag):
+            self.not_modified[key] += 1
+            response.status_code = 304
+            return response
+
+        if use_gzip:
+            response.set_data(entry.gzipped)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response.set_data(entry.body)
+        return response
+
+    def stats(self):
+        """Return hit, build and 304 counts and the cached size per key"""
+        return {
+            key: {
+                'hits': self.hits[key],
+                'builds': self.builds[key],
+                'not_modified': self.not_modified[key],
+                'bytes': len(self._entries[key].body) if key in self._entries else 0
+            } for key in set(self.builds) | set(self.hits)
+        }
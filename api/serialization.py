@@ -0,0 +1,207 @@
+import os
+import json
+import secrets
+import threading
+from collections import Counter
+
+from socketio import packet as socketio_packet
+from socketio import PubSubManager
+
+# orjson is optional, the standard library encoder is used without it
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _stdlib_encode(obj, default):
+    return json.dumps(obj, default=default, separators=(',', ':'))
+
+
+def _orjson_encode(obj, default):
+    return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+
+# Available encoders: name -> function(obj, default) returning compact JSON text
+ENCODERS = {'json': _stdlib_encode}
+if orjson is not None:
+    ENCODERS['orjson'] = _orjson_encode
+
+DEFAULT_ENCODER = 'orjson' if orjson is not None else 'json'
+_encoder_name = None
+_encode = None
+
+
+def set_encoder(name):
+    """Select the JSON encoder used for every outbound payload"""
+    global _encoder_name, _encode
+    if name not in ENCODERS:
+        raise ValueError(f"Unknown JSON encoder '{name}', available: {', '.join(ENCODERS)}")
+    _encoder_name = name
+    _encode = ENCODERS[name]
+
+
+def register_encoder(name, encode):
+    """Add an encoder: encode(obj, default) must return compact JSON text"""
+    ENCODERS[name] = encode
+
+
+def get_encoder():
+    """Name of the active encoder"""
+    return _encoder_name
+
+
+set_encoder(os.environ.get('JSON_ENCODER', DEFAULT_ENCODER))
+
+
+class RawJSON:
+    """Already-serialized JSON that is spliced verbatim into outgoing payloads"""
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+    @classmethod
+    def encode(cls, value):
+        """Serialize a value once so it can be reused in many payloads"""
+        return cls(dumps(value))
+
+    def __len__(self):
+        return len(self.text)
+
+
+def dumps(obj, **kwargs):
+    """
+    json.dumps replacement that understands RawJSON values
+
+    RawJSON values are first written as unique placeholder strings, then the
+    placeholders are replaced with the pre-serialized text. Payloads without
+    RawJSON values take the normal encoder path with no extra cost. Output is
+    always compact; formatting options other than separators fall back to
+    the standard library.
+    """
+    raw_values = []
+    nonce = None
+
+    def default(value):
+        nonlocal nonce
+        if isinstance(value, RawJSON):
+            if nonce is None:
+                nonce = secrets.token_hex(8)
+            raw_values.append(value.text)
+            return f"\x00{nonce}:{len(raw_values) - 1}"
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    kwargs.pop('separators', None)
+    if kwargs:
+        text = json.dumps(obj, default=default, **kwargs)
+    else:
+        text = _encode(obj, default)
+
+    for index, raw in enumerate(raw_values):
+        text = text.replace(f'"\\u0000{nonce}:{index}"', raw, 1)
+
+    return text
+
+
+def loads(text, **kwargs):
+    """Same as json.loads, provided so this module can be used as a json module"""
+    if orjson is not None and not kwargs:
+        return orjson.loads(text)
+    return json.loads(text, **kwargs)
+
+
+class EncodedPayloadCache:
+    """
+    Encoded forms of immutable shared payloads
+
+    Entries are keyed by an arbitrary key plus a version; a new version
+    replaces the old encoding, so callers only need to bump the version when
+    the underlying data changes.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version, build):
+        """Get the RawJSON of a payload, calling build() only when the version changed"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+
+        encoded = RawJSON.encode(build())
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (version, encoded)
+        return encoded
+
+    def discard(self, key):
+        """Forget a payload"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        """Return cache statistics"""
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+# Shared cache for payloads reused across many recipients
+encoded_payloads = EncodedPayloadCache()
+
+
+class EncodedPacket(socketio_packet.Packet):
+    """Socket.IO event packet that is encoded once, however many times it is sent"""
+
+    def __init__(self, event, data, namespace=None):
+        super().__init__(socketio_packet.EVENT, data=[event, data], namespace=namespace)
+        self._encoded = super().encode()
+
+    def encode(self):
+        return self._encoded
+
+    @property
+    def size(self):
+        """Encoded size in characters (binary attachments not included)"""
+        encoded = self._encoded[0] if isinstance(self._encoded, list) else self._encoded
+        return len(encoded)
+
+
+# Outbound broadcast counters: broadcasts, recipients, bytes
+broadcast_stats = Counter()
+
+
+def broadcast(server, event, data, namespace='/', room=None, skip_sid=None):
+    """
+    Send an event to every client of a room with a single encoding
+
+    python-socketio encodes a packet once per recipient; this builds the
+    packet once and hands the same encoded text to every participant.
+    Message-queue managers fan out across processes themselves, so they use
+    the regular emit path.
+
+    :return: Number of recipients
+    """
+    if isinstance(server.manager, PubSubManager):
+        server.emit(event, data, namespace=namespace, to=room, skip_sid=skip_sid)
+        return 0
+
+    if namespace not in server.manager.rooms:
+        return 0
+
+    pkt = EncodedPacket(event, data, namespace=namespace)
+    skip = skip_sid if isinstance(skip_sid, list) else [skip_sid]
+
+    recipients = 0
+    for sid, eio_sid in server.manager.get_participants(namespace, room):
+        if sid not in skip:
+            server._send_packet(eio_sid, pkt)
+            recipients += 1
+
+    broadcast_stats['broadcasts'] += 1
+    broadcast_stats['recipients'] += recipients
+    broadcast_stats['bytes'] += pkt.size * recipients
+    return recipients
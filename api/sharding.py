@@ -0,0 +1,364 @@
+import os
+import hmac
+import time
+import base64
+import hashlib
+import logging
+import threading
+from collections import Counter, defaultdict
+
+import requests
+
+import worldgen
+import serialization
+
+logger = logging.getLogger(__name__)
+
+# A region is REGION_CHUNKS x REGION_CHUNKS client chunks, owned by one shard
+REGION_CHUNKS = 8
+# Players within this many chunks of a region owned by another shard are
+# mirrored to that shard, so players on both sides of a border see each other
+OVERLAP_CHUNKS = 2
+# Seconds between border messages to each neighbouring shard
+BORDER_SYNC_INTERVAL = 0.1
+# A mirrored player that is not refreshed for this long is dropped (its shard went away)
+GHOST_TTL = 5.0
+# Seconds a handoff ticket can be redeemed
+HANDOFF_TTL = 30.0
+
+BORDER_PATH = '/api/shard/border'
+SECRET_HEADER = 'X-Shard-Secret'
+
+# Player fields other clients need to show a player of another shard
+GHOST_FIELDS = ('name', 'color', 'position', 'rotation', 'mode')
+# Player fields a handoff ticket carries; everything else (stats, inventory)
+# is read from Firestore, where the old shard wrote it before the handoff
+HANDOFF_FIELDS = ('position', 'rotation', 'mode')
+
+# Multipliers of the region hash (any large odd primes; every shard must use the same)
+_HASH_X = 73856093
+_HASH_Z = 19349663
+# Cached neighbour sets per chunk are dropped past this many chunks
+MAX_CACHED_CHUNKS = 65536
+
+
+def parse_shards(spec):
+    """Parse SHARDS, e.g. 'a=http://10.0.0.1:5001,b=http://10.0.0.2:5001', into {shard ID: URL}"""
+    shards = {}
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        shard_id, separator, url = entry.partition('=')
+        if not separator or not shard_id.strip() or not url.strip():
+            raise ValueError(f"Shard entries must look like id=url: {entry!r}")
+        shards[shard_id.strip()] = url.strip().rstrip('/')
+    return shards
+
+
+def ghost_state(player_id, player):
+    """What a neighbouring shard gets of a player near its border"""
+    return {'id': player_id, **{field: player.get(field) for field in GHOST_FIELDS}}
+
+
+def authorized(provided, secret):
+    """Check the shared secret sent with a shard-to-shard request"""
+    return bool(secret) and hmac.compare_digest((provided or '').encode('utf-8'), secret.encode('utf-8'))
+
+
+class ShardMap:
+    """
+    Which shard owns which part of the ocean
+
+    The ocean is cut into square regions of region_chunks x region_chunks
+    client chunks (worldgen.CHUNK_SIZE units). Each region belongs to one
+    shard, picked by a hash of the region coordinates, so every shard computes
+    the same map from the shard list alone. With a single shard it owns
+    everything and sharded is False.
+    """
+
+    def __init__(self, shards, shard_id, region_chunks=REGION_CHUNKS, overlap_chunks=OVERLAP_CHUNKS):
+        if shard_id not in shards:
+            raise ValueError(f"SHARD_ID {shard_id!r} is not one of the shards ({', '.join(shards)})")
+        self.shards = dict(shards)
+        self.shard_id = shard_id
+        self.region_chunks = region_chunks
+        self.overlap_chunks = overlap_chunks
+        # Sorted so the hash picks the same shard everywhere
+        self.ids = sorted(self.shards)
+        self._index = self.ids.index(shard_id)
+        self._neighbors = {}
+
+    @classmethod
+    def from_spec(cls, spec, shard_id, **kwargs):
+        """Build the map from SHARDS; without one this process is the only shard"""
+        shards = parse_shards(spec or '')
+        return cls(shards or {shard_id: None}, shard_id, **kwargs)
+
+    @property
+    def sharded(self):
+        return len(self.ids) > 1
+
+    def url(self, shard_id):
+        return self.shards[shard_id]
+
+    def _owner_index(self, cx, cz):
+        # Works on ints and on NumPy integer arrays alike (floor division and modulo)
+        rx = cx // self.region_chunks
+        rz = cz // self.region_chunks
+        return ((rx * _HASH_X) ^ (rz * _HASH_Z)) % len(self.ids)
+
+    def owns_chunk(self, cx, cz):
+        """Whether this shard owns a chunk (or, for NumPy arrays, a mask of the chunks it owns)"""
+        return self._owner_index(cx, cz) == self._index
+
+    def chunk_owner(self, cx, cz):
+        return self.ids[self._owner_index(cx, cz)]
+
+    def owner(self, position):
+        """Shard that owns the region containing a position dictionary"""
+        return self.chunk_owner(*worldgen.get_chunk_coords(position.get('x') or 0, position.get('z') or 0))
+
+    def owns(self, position):
+        return not self.sharded or self.owner(position) == self.shard_id
+
+    def neighbors(self, position):
+        """Other shards owning a chunk within overlap_chunks of a position (they mirror a player there)"""
+        chunk = worldgen.get_chunk_coords(position.get('x') or 0, position.get('z') or 0)
+        shards = self._neighbors.get(chunk)
+        if shards is None:
+            cx, cz = chunk
+            low_x, high_x = (cx - self.overlap_chunks) // self.region_chunks, (cx + self.overlap_chunks) // self.region_chunks
+            low_z, high_z = (cz - self.overlap_chunks) // self.region_chunks, (cz + self.overlap_chunks) // self.region_chunks
+            shards = frozenset(
+                self.chunk_owner(rx * self.region_chunks, rz * self.region_chunks)
+                for rx in range(low_x, high_x + 1) for rz in range(low_z, high_z + 1)
+            ) - {self.shard_id}
+            if len(self._neighbors) >= MAX_CACHED_CHUNKS:
+                self._neighbors.clear()
+            self._neighbors[chunk] = shards
+        return shards
+
+
+class HandoffTickets:
+    """
+    Signed tickets that carry a player from one shard to another
+
+    The shard a player sails away from issues a ticket holding the player's
+    identity and position, and the client presents it when it joins the new
+    shard, so the player needs no second login. Tickets are HMAC-signed with
+    the shared secret, name the shard they are for, expire after ttl seconds
+    and can be redeemed once.
+    """
+
+    def __init__(self, secret, ttl=HANDOFF_TTL, clock=time.time):
+        self._key = hashlib.sha256(secret.encode('utf-8')).digest()
+        self.ttl = ttl
+        self.clock = clock
+        self.stats = Counter()
+        self._redeemed = {}
+        self._lock = threading.Lock()
+
+    def _sign(self, body):
+        return base64.urlsafe_b64encode(hmac.new(self._key, body, hashlib.sha256).digest()).rstrip(b'=')
+
+    def issue(self, target, player_id, state):
+        """Ticket for the target shard (a string)"""
+        body = base64.urlsafe_b64encode(serialization.dumps({
+            'target': target,
+            'player_id': player_id,
+            'expires': self.clock() + self.ttl,
+            'nonce': os.urandom(8).hex(),
+            'state': state
+        }).encode('utf-8')).rstrip(b'=')
+        self.stats['issued'] += 1
+        return (body + b'.' + self._sign(body)).decode('ascii')
+
+    def redeem(self, ticket, shard_id):
+        """
+        Check a ticket presented to this shard
+
+        :return: (player ID, state), or None if the ticket is forged, expired,
+            already used or meant for another shard
+        """
+        try:
+            body, signature = ticket.encode('ascii').split(b'.')
+            if not hmac.compare_digest(signature, self._sign(body)):
+                raise ValueError("bad signature")
+            data = serialization.loads(base64.urlsafe_b64decode(body + b'=' * (-len(body) % 4)))
+        except (AttributeError, ValueError, TypeError) as e:
+            logger.warning(f"Rejected handoff ticket: {e}")
+            self.stats['rejected'] += 1
+            return None
+
+        now = self.clock()
+        with self._lock:
+            # Forget used nonces once their tickets could no longer be redeemed anyway
+            self._redeemed = {nonce: expires for nonce, expires in self._redeemed.items() if expires > now}
+            if data['target'] != shard_id or data['expires'] <= now or data['nonce'] in self._redeemed:
+                self.stats['rejected'] += 1
+                return None
+            self._redeemed[data['nonce']] = data['expires']
+        self.stats['redeemed'] += 1
+        return data['player_id'], data['state']
+
+
+class HttpTransport:
+    """Sends border messages to another shard with a POST to its BORDER_PATH"""
+
+    def __init__(self, shard_map, secret, timeout=1.0):
+        self.shard_map = shard_map
+        self.secret = secret
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def __call__(self, shard_id, message):
+        response = self.session.post(
+            self.shard_map.url(shard_id) + BORDER_PATH,
+            data=serialization.dumps(message),
+            headers={'Content-Type': 'application/json', SECRET_HEADER: self.secret},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+
+
+class BorderSync:
+    """
+    Players near region borders, mirrored between neighbouring shards
+
+    Local players: publish() (every accepted move) queues the player's
+    ghost_state for each neighbouring shard whose regions are within the
+    overlap, and a removal for shards it left the overlap of. tick() sends
+    one message per shard with everything queued since the last tick, via
+    send(shard ID, message), and resends every mirrored player a few times
+    per ghost TTL so players that stand still stay visible.
+
+    Ghosts (players of other shards): receive() applies a message from a
+    neighbour and hands new or moved ghosts to on_ghosts(states by player ID)
+    and removed ones to on_ghosts_removed(player IDs). Ghosts that are not
+    refreshed for ghost_ttl seconds are removed by tick(). Messages about
+    players that is_local(player_id) claims are ignored: those were handed
+    over to this shard already.
+    """
+
+    def __init__(self, shard_map, send, on_ghosts, on_ghosts_removed, is_local=lambda player_id: False,
+                 ghost_ttl=GHOST_TTL, clock=time.time):
+        self.shard_map = shard_map
+        self.send = send
+        self.on_ghosts = on_ghosts
+        self.on_ghosts_removed = on_ghosts_removed
+        self.is_local = is_local
+        self.ghost_ttl = ghost_ttl
+        self.clock = clock
+        self.stats = Counter()
+        self._outbox = defaultdict(dict)
+        self._mirrored = {}
+        self._ghosts = {}
+        self._refreshed = clock()
+        self._lock = threading.Lock()
+
+    def ghost_count(self):
+        return len(self._ghosts)
+
+    def is_ghost(self, player_id):
+        return player_id in self._ghosts
+
+    def publish(self, player_id, state):
+        """Queue a local player's state for the neighbouring shards near it"""
+        shards = self.shard_map.neighbors(state['position'])
+        with self._lock:
+            previous = self._mirrored[player_id][0] if player_id in self._mirrored else frozenset()
+            if not shards and not previous:
+                return
+            for shard in shards:
+                self._outbox[shard][player_id] = state
+            for shard in previous - shards:
+                self._outbox[shard][player_id] = None
+            if shards:
+                self._mirrored[player_id] = (shards, state)
+            else:
+                del self._mirrored[player_id]
+
+    def withdraw(self, player_id, keep=None):
+        """Stop mirroring a local player that left (or was handed over to the shard keep)"""
+        with self._lock:
+            shards, _ = self._mirrored.pop(player_id, (frozenset(), None))
+            for shard in shards - {keep}:
+                self._outbox[shard][player_id] = None
+
+    def forget(self, player_id):
+        """Drop a ghost without announcing it (the player was handed over to this shard)"""
+        with self._lock:
+            self._ghosts.pop(player_id, None)
+
+    def receive(self, message):
+        """Apply a border message from a neighbouring shard: {'from', 'players': {id: state}, 'removed': [ids]}"""
+        sender = message['from']
+        expires = self.clock() + self.ghost_ttl
+        states = {}
+        removed = []
+        with self._lock:
+            for player_id, state in (message.get('players') or {}).items():
+                if self.is_local(player_id):
+                    continue
+                self._ghosts[player_id] = (sender, expires)
+                states[player_id] = state
+            for player_id in message.get('removed') or ():
+                # Only the shard the ghost last came from can remove it
+                if player_id in self._ghosts and self._ghosts[player_id][0] == sender:
+                    del self._ghosts[player_id]
+                    removed.append(player_id)
+        self.stats['received'] += 1
+        if states:
+            self.on_ghosts(states)
+        if removed:
+            self.stats['ghosts_removed'] += len(removed)
+            self.on_ghosts_removed(removed)
+
+    def tick(self):
+        """
+        Send the queued border messages and drop ghosts that were not refreshed
+
+        :return: Number of messages sent
+        """
+        now = self.clock()
+        with self._lock:
+            if now - self._refreshed >= self.ghost_ttl / 3:
+                self._refreshed = now
+                for player_id, (shards, state) in self._mirrored.items():
+                    for shard in shards:
+                        self._outbox[shard].setdefault(player_id, state)
+            outbox, self._outbox = self._outbox, defaultdict(dict)
+            expired = [player_id for player_id, (_, expires) in self._ghosts.items() if expires <= now]
+            for player_id in expired:
+                del self._ghosts[player_id]
+
+        sent = 0
+        for shard, entries in outbox.items():
+            message = {
+                'from': self.shard_map.shard_id,
+                'players': {player_id: state for player_id, state in entries.items() if state is not None},
+                'removed': [player_id for player_id, state in entries.items() if state is None]
+            }
+            try:
+                self.send(shard, message)
+                sent += 1
+            except Exception as e:
+                # Ghosts on the other side expire if this keeps failing
+                logger.warning(f"Border message to shard {shard} failed: {e}")
+                self.stats['send_errors'] += 1
+        self.stats['sent'] += sent
+
+        if expired:
+            self.stats['ghosts_expired'] += len(expired)
+            self.on_ghosts_removed(expired)
+        return sent
+
+    def run(self, sleep, interval=BORDER_SYNC_INTERVAL):
+        """Tick loop for a background task"""
+        while True:
+            sleep(interval)
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Error in border sync: {e}")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import subprocess
+
+import sharding
+
+SECRET = 'test-secret'
+
+# Runs in a fresh process (app.py reads its configuration at import time):
+# a player with modest stats joins with a ticket claiming a fortune, and the
+# joined player's ID and stats are printed as JSON
+JOIN_SCRIPT = """
+import sys, json
+import bench_suite
+from fake_firestore import FakeFirestore, patch_firebase
+db = patch_firebase(FakeFirestore())
+import app as server
+import sharding
+
+server.firestore_models.Player.create('firebase_victim', money=5, monsterKills=1)
+server.firestore_models.Inventory.put('firebase_victim', 3, {'Tuna': 2})
+
+# A spawn point this process owns
+x = next(x for x in range(0, 10 ** 6, 600) if server.shard_map.owns({'x': x, 'y': 0, 'z': 0}))
+position = {'x': x, 'y': 0, 'z': 0}
+tickets = sharding.HandoffTickets(sys.argv[1])
+ticket = tickets.issue(server.shard_map.shard_id, 'firebase_victim', {
+    'position': position, 'money': 10 ** 9, 'monsterKills': 10 ** 6,
+    'player': {'money': 10 ** 9}, 'inventory': {'version': 99, 'items': {'Gold': 10 ** 6}}
+})
+
+ctx = bench_suite.BenchContext(server, db, 0)
+sid = ctx.connect()
+ctx.call(server.handle_player_join, sid, {'name': 'Forger', 'position': position, 'handoffTicket': ticket})
+player_id = server.presence_manager.player_for(sid)
+player = server.players[player_id]
+print(json.dumps({'player_id': player_id, 'money': player.get('money'), 'monsterKills': player.get('monsterKills'),
+                  'inventory': server.inventories.snapshot(player_id)}))
+"""
+
+# Runs as shard a: a player with unreplayed stats and inventory records is
+# handed over to shard b, which scores more before a's journal is replayed.
+# Prints what Firestore holds afterwards as JSON.
+HANDOFF_SCRIPT = """
+import json
+import bench_suite
+from fake_firestore import FakeFirestore, patch_firebase
+db = patch_firebase(FakeFirestore())
+import app as server
+
+def owned_by(shard):
+    x = next(x for x in range(0, 10 ** 6, 600) if server.shard_map.owner({'x': x, 'y': 0, 'z': 0}) == shard)
+    return {'x': x, 'y': 0, 'z': 0}
+
+ctx = bench_suite.BenchContext(server, db, 0)
+
+def join(name):
+    sid = ctx.connect()
+    ctx.call(server.handle_player_join, sid, {'name': name, 'position': owned_by('a')})
+    return server.presence_manager.player_for(sid)
+
+player_id, bystander = join('Sailor'), join('Bystander')
+
+# Journaled on a, not yet in Firestore
+server.credit_stat(player_id, 'money', 10, 'Found 10 coins')
+server.journal_inventory_change(server.inventories.apply(player_id, {'Tuna': 2}))
+server.players[player_id]['position'] = owned_by('b')
+server.hand_off(player_id)
+server.credit_stat(bystander, 'money', 7, 'Found 7 coins')
+
+# Shard b loaded the handed-over values and wrote newer ones
+loaded = server.firestore_models.Player.get(player_id)['money'], server.firestore_models.Inventory.get(player_id)
+server.firestore_models.Player.merge(player_id, money=25)
+server.firestore_models.Inventory.put(player_id, 2, {'Tuna': 3})
+
+server.journal_replayer.replay()
+print(json.dumps({'loaded_money': loaded[0], 'loaded_inventory': list(loaded[1]),
+                  'money': server.firestore_models.Player.get(player_id)['money'],
+                  'inventory': list(server.firestore_models.Inventory.get(player_id)),
+                  'bystander_money': server.firestore_models.Player.get(bystander)['money'],
+                  'pending': server.action_journal.pending(), 'handed_off': len(server.handed_off_through)}))
+"""
+
+
+def check(condition, message):
+    print(f"  {'ok  ' if condition else 'FAIL'} {message}")
+    return condition
+
+
+class Clock:
+    """Manually advanced clock for ticket expiry"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def check_tickets():
+    """Only an untampered, unexpired ticket signed with the secret is redeemed, once, by its target"""
+    print("\n=== HANDOFF TICKETS ===")
+    clock = Clock()
+    tickets = sharding.HandoffTickets(SECRET, clock=clock)
+    state = {'position': {'x': 1, 'y': 0, 'z': 2}}
+
+    ticket = tickets.issue('b', 'p1', state)
+    ok = check(tickets.redeem(ticket, 'b') == ('p1', state), "valid ticket redeemed by its target")
+    ok &= check(tickets.redeem(ticket, 'b') is None, "ticket redeemed only once")
+    ok &= check(tickets.redeem(tickets.issue('b', 'p1', state), 'a') is None, "ticket for another shard rejected")
+
+    forged = sharding.HandoffTickets('ship_game_secret_key').issue('b', 'p1', state)
+    ok &= check(tickets.redeem(forged, 'b') is None, "ticket signed with another secret rejected")
+
+    signature = tickets.issue('a', 'p1', state).split('.')[1]
+    retargeted = sharding.HandoffTickets(SECRET).issue('b', 'p1', state).split('.')[0]
+    ok &= check(tickets.redeem(f'{retargeted}.{signature}', 'b') is None, "body swapped under a signature rejected")
+    ok &= check(tickets.redeem('not a ticket', 'b') is None, "garbage rejected")
+
+    expiring = tickets.issue('b', 'p1', state)
+    clock.now += sharding.HANDOFF_TTL
+    ok &= check(tickets.redeem(expiring, 'b') is None, "expired ticket rejected")
+    return ok
+
+
+def run_script(script, env, *args):
+    environment = {key: value for key, value in os.environ.items() if not key.startswith('SHARD')}
+    environment.update(env)
+    return subprocess.run([sys.executable, '-c', script, *args], env=environment,
+                          cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+
+
+def run_join(env, secret):
+    return run_script(JOIN_SCRIPT, env, secret)
+
+
+def check_unsharded_join():
+    """A single process takes no tickets, whatever they are signed with"""
+    print("\n=== TICKET AT AN UNSHARDED SERVER ===")
+    ok = True
+    for secret in ('', 'ship_game_secret_key'):
+        result = run_join({}, secret)
+        if not check(result.returncode == 0, f"join ran (secret {secret!r})"):
+            print(result.stderr[-2000:])
+            return False
+        joined = json.loads(result.stdout.strip().splitlines()[-1])
+        ok &= check(joined['player_id'] != 'firebase_victim',
+                    f"ticket ignored, joined as a new player ({joined['player_id']})")
+        ok &= check(joined['money'] == 0, f"no money from the ticket ({joined['money']})")
+    return ok
+
+
+def check_sharded_join():
+    """A shard takes the identity and position from a ticket, but stats and inventory from Firestore"""
+    print("\n=== TICKET AT A SHARD ===")
+    env = {'SHARDS': 'a=http://127.0.0.1:9,b=http://127.0.0.1:10', 'SHARD_ID': 'b', 'SHARD_SECRET': SECRET}
+    result = run_join(env, SECRET)
+    if not check(result.returncode == 0, "join ran"):
+        print(result.stderr[-2000:])
+        return False
+    joined = json.loads(result.stdout.strip().splitlines()[-1])
+    ok = check(joined['player_id'] == 'firebase_victim', f"handed-over player joined ({joined['player_id']})")
+    ok &= check((joined['money'], joined['monsterKills']) == (5, 1),
+                f"stats from Firestore ({joined['money']} money, {joined['monsterKills']} kills)")
+    ok &= check(joined['inventory'] == {'version': 3, 'items': {'Tuna': 2}},
+                f"inventory from Firestore ({joined['inventory']})")
+
+    forged = run_join(env, 'ship_game_secret_key')
+    joined = json.loads(forged.stdout.strip().splitlines()[-1]) if forged.returncode == 0 else {}
+    ok &= check(joined.get('player_id') not in (None, 'firebase_victim'),
+                f"ticket signed with another secret rejected ({joined.get('player_id')})")
+    return ok
+
+
+def check_handoff_with_pending_journal():
+    """Journal records the handoff already wrote are not replayed over the new shard's values"""
+    print("\n=== HANDOFF WITH A PENDING JOURNAL ===")
+    env = {'SHARDS': 'a=http://127.0.0.1:9,b=http://127.0.0.1:10', 'SHARD_ID': 'a', 'SHARD_SECRET': SECRET}
+    result = run_script(HANDOFF_SCRIPT, env)
+    if not check(result.returncode == 0, "handoff ran"):
+        print(result.stderr[-2000:])
+        return False
+    state = json.loads(result.stdout.strip().splitlines()[-1])
+    ok = check((state['loaded_money'], state['loaded_inventory']) == (10, [1, {'Tuna': 2}]),
+               f"new shard loads the unreplayed values ({state['loaded_money']} money, {state['loaded_inventory']})")
+    ok &= check(state['money'] == 25, f"stats not rolled back by the replay ({state['money']})")
+    ok &= check(state['inventory'] == [2, {'Tuna': 3}], f"inventory not rolled back by the replay ({state['inventory']})")
+    ok &= check(state['bystander_money'] == 7, f"other players' records still replayed ({state['bystander_money']})")
+    ok &= check(state['pending'] == 0 and state['handed_off'] == 0,
+                f"journal replayed and handoff forgotten ({state['pending']} pending, {state['handed_off']} handed off)")
+    return ok
+
+
+def check_sharded_without_secret():
+    """A shard does not start without SHARD_SECRET"""
+    print("\n=== SHARD WITHOUT A SECRET ===")
+    result = run_join({'SHARDS': 'a=http://127.0.0.1:9,b=http://127.0.0.1:10', 'SHARD_ID': 'b'}, SECRET)
+    return check(result.returncode != 0 and 'SHARD_SECRET' in result.stderr, "refuses to start")
+
+
+if __name__ == "__main__":
+    print("\n===== SHARDING TEST =====")
+    results = [check_tickets(), check_unsharded_join(), check_sharded_join(), check_handoff_with_pending_journal(),
+               check_sharded_without_secret()]
+    print("\n===== TEST COMPLETE =====")
+    raise SystemExit(0 if all(results) else 1)
@@ -0,0 +1,304 @@
+import io
+import os
+import gzip
+import time
+import hashlib
+import logging
+import mimetypes
+import threading
+from collections import OrderedDict
+
+from flask import request, send_file
+
+# brotli is optional, only gzip variants are generated without it
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Cache-Control for URLs that carry the content hash (?v=<hash>)
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Cache-Control for plain URLs: cache, but revalidate with the ETag
+REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+
+# Seconds between checks of the static directory for added/removed files
+MANIFEST_CHECK_INTERVAL = 2.0
+
+# Files up to this size are kept in memory once requested
+HOT_FILE_MAX_SIZE = 256 * 1024
+HOT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Precompression settings
+MIN_COMPRESS_SIZE = 1024
+MIN_COMPRESSION_RATIO = 0.9  # Keep a variant only if it is at most 90% of the original
+COMPRESSIBLE_TYPES = (
+    'text/', 'model/', 'application/json', 'application/javascript',
+    'application/xml', 'image/svg+xml', 'application/wasm'
+)
+
+# Supported content encodings in order of preference
+ENCODING_SUFFIXES = OrderedDict([('br', '.br'), ('gzip', '.gz')])
+
+
+def file_hash(path):
+    """Content hash of a file (truncated SHA-256)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()[:20]
+
+
+def is_compressible(mime):
+    return mime is not None and mime.startswith(COMPRESSIBLE_TYPES)
+
+
+class HotFileCache:
+    """LRU of small file contents bounded by total size"""
+
+    def __init__(self, max_bytes=HOT_CACHE_MAX_BYTES, max_file_size=HOT_FILE_MAX_SIZE):
+        self.max_bytes = max_bytes
+        self.max_file_size = max_file_size
+        self._files = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, path, size):
+        """Get file contents, reading and caching them if small enough"""
+        if size > self.max_file_size:
+            return None
+
+        with self._lock:
+            data = self._files.get(key)
+            if data is not None:
+                self._files.move_to_end(key)
+                self.hits += 1
+                return data
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        with self._lock:
+            self.misses += 1
+            if key not in self._files:
+                self._files[key] = data
+                self._bytes += len(data)
+            while self._bytes > self.max_bytes and self._files:
+                _, evicted = self._files.popitem(last=False)
+                self._bytes -= len(evicted)
+        return data
+
+    def stats(self):
+        with self._lock:
+            return {'files': len(self._files), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+class AssetStore:
+    """
+    Static files with a cached manifest, content-hash ETags and precompressed variants
+
+    The manifest is built once and reused; it is rebuilt when a directory
+    changes (files added or removed), checked at most every
+    MANIFEST_CHECK_INTERVAL seconds. A file modified in place is re-hashed
+    the next time it is requested.
+    """
+
+    def __init__(self, root, cache_dir):
+        self.root = root
+        self.cache_dir = cache_dir
+        self.hot_files = HotFileCache()
+        self._manifest = {}
+        self._signature = None
+        self._last_check = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _directory_signature(self):
+        """Modification times of every directory, which change when files are added or removed"""
+        signature = []
+        for root, dirs, _ in os.walk(self.root):
+            signature.append((root, os.stat(root).st_mtime_ns))
+        return tuple(signature)
+
+    def _precompress(self, path, content_hash, mime, size):
+        """Create compressed variants of a file, returning {encoding: path}"""
+        if size < MIN_COMPRESS_SIZE or not is_compressible(mime):
+            return {}
+
+        variants = {}
+        data = None
+        for encoding, suffix in ENCODING_SUFFIXES.items():
+            if encoding == 'br' and brotli is None:
+                continue
+
+            variant_path = os.path.join(self.cache_dir, content_hash + suffix)
+            skipped_path = variant_path + '.skip'
+            if os.path.exists(skipped_path):
+                continue
+
+            if not os.path.exists(variant_path):
+                if data is None:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                compressed = brotli.compress(data) if encoding == 'br' else gzip.compress(data, compresslevel=9, mtime=0)
+
+                # Remember files that do not compress well so they are not retried
+                if len(compressed) > size * MIN_COMPRESSION_RATIO:
+                    open(skipped_path, 'wb').close()
+                    continue
+
+                tmp_path = variant_path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(compressed)
+                os.replace(tmp_path, variant_path)
+
+            variants[encoding] = variant_path
+        return variants
+
+    def _make_entry(self, rel_path, path, stat, previous=None):
+        """Manifest entry for one file, reusing the previous hash if the file did not change"""
+        if previous and previous['size'] == stat.st_size and previous['mtime_ns'] == stat.st_mtime_ns:
+            return previous
+
+        mime = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        content_hash = file_hash(path)
+        return {
+            'path': rel_path,
+            'abs_path': path,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'mtime_ns': stat.st_mtime_ns,
+            'mime': mime,
+            'hash': content_hash,
+            'variants': self._precompress(path, content_hash, mime, stat.st_size)
+        }
+
+    def rebuild(self):
+        """Walk the static directory and rebuild the manifest"""
+        start = time.time()
+        previous = self._manifest
+        manifest = {}
+        for root, dirs, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                rel_path = os.path.relpath(path, self.root).replace(os.sep, '/')
+                try:
+                    manifest[rel_path] = self._make_entry(rel_path, path, os.stat(path), previous.get(rel_path))
+                except OSError as e:
+                    logger.warning(f"Skipping static file {rel_path}: {e}")
+
+        with self._lock:
+            self._manifest = manifest
+            self._signature = self._directory_signature()
+            self._last_check = time.time()
+
+        logger.info(f"Built static manifest: {len(manifest)} files in {time.time() - start:.2f}s")
+        return manifest
+
+    def manifest(self):
+        """Get the manifest, rebuilding it if the directory changed"""
+        now = time.time()
+        if now - self._last_check >= MANIFEST_CHECK_INTERVAL:
+            self._last_check = now
+            if self._directory_signature() != self._signature:
+                return self.rebuild()
+        return self._manifest
+
+    def lookup(self, rel_path):
+        """Get the manifest entry for a file, re-hashing it if it changed on disk"""
+        entry = self.manifest().get(rel_path)
+        if entry is None:
+            return None
+
+        try:
+            stat = os.stat(entry['abs_path'])
+        except OSError:
+            return None
+
+        if stat.st_size != entry['size'] or stat.st_mtime_ns != entry['mtime_ns']:
+            entry = self._make_entry(rel_path, entry['abs_path'], stat)
+            with self._lock:
+                self._manifest = {**self._manifest, rel_path: entry}
+        return entry
+
+    @staticmethod
+    def _negotiate(entry):
+        """Pick the best precompressed variant the client accepts"""
+        # Ranges are only served from the identity representation
+        if not entry['variants'] or request.range is not None:
+            return None
+        for encoding in ENCODING_SUFFIXES:
+            if encoding in entry['variants'] and request.accept_encodings[encoding]:
+                return encoding
+        return None
+
+    def serve(self, rel_path):
+        """
+        Build the response for a static file (None if it does not exist)
+
+        Handles If-None-Match (304), Range requests, precompressed variants
+        and immutable caching for hashed URLs.
+        """
+        entry = self.lookup(rel_path)
+        if entry is None:
+            return None
+
+        encoding = self._negotiate(entry)
+        if encoding:
+            path = entry['variants'][encoding]
+            etag = f"{entry['hash']}-{encoding}"
+            size = os.path.getsize(path)
+        else:
+            path = entry['abs_path']
+            etag = entry['hash']
+            size = entry['size']
+
+        data = self.hot_files.get((path, etag), path, size)
+        body = io.BytesIO(data) if data is not None else path
+
+        response = send_file(
+            body,
+            mimetype=entry['mime'],
+            download_name=os.path.basename(entry['path']),
+            etag=etag,
+            last_modified=entry['mtime'],
+            conditional=True
+        )
+
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if entry['variants']:
+            response.vary.add('Accept-Encoding')
+
+        # Hashed URLs never change, everything else is revalidated with the ETag
+        if request.args.get('v') == entry['hash']:
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers['Cache-Control'] = REVALIDATE_CACHE_CONTROL
+        response.headers.pop('Expires', None)
+
+        return response
+
+    def url_for(self, rel_path):
+        """Hashed URL of a file, cacheable forever"""
+        entry = self.manifest().get(rel_path)
+        if entry is None:
+            return None
+        return f"/files/{rel_path}?v={entry['hash']}"
+
+    def file_list(self):
+        """Public description of every file in the manifest"""
+        return [
+            {
+                'path': entry['path'],
+                'url': f"/files/{entry['path']}?v={entry['hash']}",
+                'mime': entry['mime'],
+                'size': entry['size'],
+                'hash': entry['hash'],
+                'encodings': sorted(entry['variants'])
+            } for entry in sorted(self.manifest().values(), key=lambda e: e['path'])
+        ]
@@ -0,0 +1,262 @@
+import threading
+from collections import defaultdict
+
+import worldgen
+import serialization
+
+# Chunks around the spawn point sent in the first payload (1 = 3x3 chunks)
+INNER_RADIUS = 1
+# Chunks streamed in total around the player, same as the client's view distance
+VIEW_DISTANCE = worldgen.MAX_VIEW_DISTANCE
+# Chunks further than this are forgotten and will be sent again if revisited
+EVICT_DISTANCE = VIEW_DISTANCE + 1
+# Size caps for each streamed batch
+MAX_BATCH_CHUNKS = 16
+MAX_BATCH_ENTITIES = 200
+
+
+def position_to_chunk(position):
+    """Return the chunk coordinates of a position dictionary (missing values count as 0)"""
+    position = position or {}
+    return worldgen.get_chunk_coords(position.get('x') or 0, position.get('z') or 0)
+
+
+def position_chunk(entity):
+    """Return the chunk coordinates of an entity with a position dictionary"""
+    return position_to_chunk(entity.get('position'))
+
+
+def chunk_distance(a, b):
+    """Chebyshev distance between two chunks (the client's view area is square)"""
+    return max(abs(a[0] - b[0]), abs(a[1] - b[1]))
+
+
+class SpatialIndex:
+    """Entities bucketed by the chunk that contains their position"""
+
+    def __init__(self):
+        self._cells = defaultdict(dict)
+        self._chunk_of = {}
+        self._versions = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def upsert(self, entity_id, entity):
+        """
+        Add or move an entity
+
+        :return: True if the entity changed chunk (or is new), False otherwise
+        """
+        chunk = position_chunk(entity)
+        with self._lock:
+            previous = self._chunk_of.get(entity_id)
+            if previous is not None and previous != chunk:
+                cell = self._cells[previous]
+                cell.pop(entity_id, None)
+                if not cell:
+                    del self._cells[previous]
+                self._versions[previous] += 1
+            self._cells[chunk][entity_id] = entity
+            self._versions[chunk] += 1
+            self._chunk_of[entity_id] = chunk
+            return previous != chunk
+
+    def upsert_many(self, entities_by_id):
+        """Add or move many entities under one lock, bumping each touched chunk's version once"""
+        touched = set()
+        with self._lock:
+            for entity_id, entity in entities_by_id.items():
+                chunk = position_chunk(entity)
+                previous = self._chunk_of.get(entity_id)
+                if previous is not None and previous != chunk:
+                    cell = self._cells[previous]
+                    cell.pop(entity_id, None)
+                    if not cell:
+                        del self._cells[previous]
+                    touched.add(previous)
+                self._cells[chunk][entity_id] = entity
+                self._chunk_of[entity_id] = chunk
+                touched.add(chunk)
+            for chunk in touched:
+                self._versions[chunk] += 1
+        return len(touched)
+
+    def remove(self, entity_id):
+        """Remove an entity from the index"""
+        with self._lock:
+            chunk = self._chunk_of.pop(entity_id, None)
+            if chunk is None:
+                return
+            cell = self._cells[chunk]
+            cell.pop(entity_id, None)
+            if not cell:
+                del self._cells[chunk]
+            self._versions[chunk] += 1
+
+    def get(self, chunk):
+        """Get the entities in a chunk"""
+        with self._lock:
+            cell = self._cells.get(chunk)
+            return list(cell.values()) if cell else []
+
+    def count(self, chunk):
+        """Number of entities in a chunk"""
+        cell = self._cells.get(chunk)
+        return len(cell) if cell else 0
+
+    def version(self, chunk):
+        """Counter bumped whenever an entity is added to, moved in or removed from a chunk"""
+        return self._versions.get(chunk, 0)
+
+    def chunk_of(self, entity_id):
+        """Get the chunk an entity is indexed in"""
+        return self._chunk_of.get(entity_id)
+
+    def __len__(self):
+        return len(self._chunk_of)
+
+
+class ClientSync:
+    """What has been streamed to one connected client"""
+
+    def __init__(self, player_id, center):
+        self.player_id = player_id
+        self.center = center
+        self.sent = set()
+        self.pending = []
+
+
+class WorldSync:
+    """
+    Region-streamed world sync
+
+    A joining client gets the chunks around its spawn point first, then the
+    outer rings are streamed nearest-first in size-capped batches as it moves.
+    The cost of a join only depends on what is near the player, not on the
+    total size of the world.
+    """
+
+    def __init__(self, islands_index, players_index):
+        self.islands_index = islands_index
+        self.players_index = players_index
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _chunk_islands(self, chunk):
+        """Islands of a chunk, encoded once and shared by every client it is sent to"""
+        if not self.islands_index.count(chunk):
+            return []
+        return serialization.encoded_payloads.get(
+            ('chunk_islands', chunk),
+            self.islands_index.version(chunk),
+            lambda: self.islands_index.get(chunk)
+        )
+
+    def _chunk_payload(self, chunk, exclude_id):
+        return {
+            'key': worldgen.get_chunk_key(*chunk),
+            'islands': self._chunk_islands(chunk),
+            'players': [p for p in self.players_index.get(chunk) if p.get('id') != exclude_id]
+        }
+
+    @staticmethod
+    def _wanted_chunks(center, radius):
+        """Chunks around center ordered by ring, then by distance within the ring"""
+        chunks = [
+            (center[0] + x_offset, center[1] + z_offset)
+            for x_offset in range(-radius, radius + 1)
+            for z_offset in range(-radius, radius + 1)
+        ]
+        chunks.sort(key=lambda c: (chunk_distance(c, center), (c[0] - center[0]) ** 2 + (c[1] - center[1]) ** 2))
+        return chunks
+
+    def _replan(self, client):
+        """Queue the missing chunks around the client's current center"""
+        client.pending = [c for c in self._wanted_chunks(client.center, VIEW_DISTANCE) if c not in client.sent]
+
+    def join(self, sid, player_id, position):
+        """
+        Start streaming to a client
+
+        :return: The first payload, containing the region around the spawn point
+        """
+        center = position_to_chunk(position)
+        client = ClientSync(player_id, center)
+
+        inner = self._wanted_chunks(center, INNER_RADIUS)
+        chunks = [self._chunk_payload(chunk, player_id) for chunk in inner]
+        client.sent.update(inner)
+        self._replan(client)
+
+        with self._lock:
+            self._clients[sid] = client
+
+        return {
+            'center': worldgen.get_chunk_key(*center),
+            'chunks': chunks,
+            'complete': not client.pending
+        }
+
+    def move(self, sid, position):
+        """
+        Update a client's center after it moved
+
+        :return: Keys of the chunks the client no longer needs (may be empty)
+        """
+        client = self._clients.get(sid)
+        if client is None:
+            return []
+
+        center = position_to_chunk(position)
+        if center == client.center:
+            return []
+
+        client.center = center
+        evicted = [c for c in client.sent if chunk_distance(c, center) > EVICT_DISTANCE]
+        client.sent.difference_update(evicted)
+        self._replan(client)
+        return [worldgen.get_chunk_key(*c) for c in evicted]
+
+    def next_batch(self, sid):
+        """
+        Take the next size-capped batch of pending chunks for a client
+
+        :return: A payload, or None if the client is up to date
+        """
+        client = self._clients.get(sid)
+        if client is None or not client.pending:
+            return None
+
+        chunks = []
+        entities = 0
+        while client.pending and len(chunks) < MAX_BATCH_CHUNKS:
+            chunk = client.pending[0]
+            payload = self._chunk_payload(chunk, client.player_id)
+            size = self.islands_index.count(chunk) + len(payload['players'])
+
+            # Always send at least one chunk so oversized chunks still go out
+            if chunks and entities + size > MAX_BATCH_ENTITIES:
+                break
+
+            client.sent.add(client.pending.pop(0))
+            chunks.append(payload)
+            entities += size
+
+        return {
+            'center': worldgen.get_chunk_key(*client.center),
+            'chunks': chunks,
+            'complete': not client.pending
+        }
+
+    def leave(self, sid):
+        """Stop tracking a client"""
+        with self._lock:
+            self._clients.pop(sid, None)
+
+    def stats(self):
+        """Return sync statistics"""
+        return {
+            'clients': len(self._clients),
+            'pending_chunks': sum(len(c.pending) for c in list(self._clients.values())),
+            'indexed_islands': len(self.islands_index),
+            'indexed_players': len(self.players_index)
+        }
@@ -0,0 +1,220 @@
+import math
+import threading
+from collections import OrderedDict
+
+# These values must stay in sync with src/world/islands.js
+CHUNK_SIZE = 600  # Size of each "chunk" of ocean
+ISLANDS_PER_CHUNK = 3  # Islands per chunk
+ISLAND_MARGIN = 100  # Margin from chunk edges
+ISLAND_RADIUS = 50  # Collider radius used by the client
+MAX_VIEW_DISTANCE = 5  # How many chunks the client renders around the boat
+
+# Names for the client's mega structure switch (createIsland, cases 0-3)
+MEGA_STRUCTURE_TYPES = ['ancient_temple', 'lighthouse', 'giant_statue', 'ruined_tower']
+
+# Default number of generated chunks kept in memory
+DEFAULT_CACHE_SIZE = 4096
+
+
+def _to_int32(value):
+    """Apply the JavaScript ToInt32 conversion used by bitwise operators"""
+    value = int(value) & 0xFFFFFFFF
+    if value >= 0x80000000:
+        value -= 0x100000000
+    return value
+
+
+def seeded_random(seed):
+    """
+    Return the client's deterministic random function for a seed
+
+    Arithmetic is done on floats with math.fmod so that negative seeds keep the
+    sign of the dividend exactly like JavaScript's % operator.
+    """
+    state = [float(seed)]
+
+    def random():
+        state[0] = math.fmod(state[0] * 9301 + 49297, 233280)
+        return state[0] / 233280
+
+    return random
+
+
+def chunk_seed(chunk_x, chunk_z):
+    """Seed used by generateChunk: Math.abs(chunkX * 73856093 ^ chunkZ * 19349663)"""
+    return abs(_to_int32(float(chunk_x) * 73856093) ^ _to_int32(float(chunk_z) * 19349663))
+
+
+def get_chunk_key(chunk_x, chunk_z):
+    """Chunk key in the same format as the client"""
+    return f"{chunk_x},{chunk_z}"
+
+
+def get_chunk_coords(x, z):
+    """Return the chunk coordinates containing a world position"""
+    return math.floor(x / CHUNK_SIZE), math.floor(z / CHUNK_SIZE)
+
+
+def generate_island(x, z, seed):
+    """
+    Reproduce the deterministic layout of a single island
+
+    Only the random draws that decide the island layout are replayed; cosmetic
+    colors are skipped but still consumed so the sequence stays aligned.
+
+    :return: Island dictionary compatible with the Island model
+    """
+    random = seeded_random(seed)
+
+    # Beach color and the three palette colors
+    for _ in range(4):
+        random()
+
+    # Roughly 20% of islands get a mega structure. Negative seeds produce
+    # negative draws on the client, which always take this branch and pick a
+    # structure index outside 0-3 (no structure is built in that case).
+    has_mega_structure = random() < 0.2
+    structure_type = math.floor(random() * 4) if has_mega_structure else None
+
+    if not has_mega_structure:
+        island_type = 'temple'
+    elif 0 <= structure_type < len(MEGA_STRUCTURE_TYPES):
+        island_type = MEGA_STRUCTURE_TYPES[structure_type]
+    else:
+        island_type = 'bare'
+
+    chunk_x, chunk_z = get_chunk_coords(x, z)
+
+    return {
+        'id': f"island_{math.floor(x)}_{math.floor(z)}",
+        'position': {'x': x, 'y': 0, 'z': z},
+        'radius': ISLAND_RADIUS,
+        'type': island_type,
+        'seed': seed,
+        'hasMegaStructure': has_mega_structure,
+        'structureType': structure_type,
+        'chunk': get_chunk_key(chunk_x, chunk_z),
+        'procedural': True
+    }
+
+
+def generate_chunk(chunk_x, chunk_z):
+    """
+    Generate the islands of a chunk exactly like the client's generateChunk
+
+    :return: Dictionary with the chunk key, coordinates and its islands
+    """
+    random = seeded_random(chunk_seed(chunk_x, chunk_z))
+    span = CHUNK_SIZE - 2 * ISLAND_MARGIN
+
+    islands = []
+    for _ in range(ISLANDS_PER_CHUNK):
+        # Keep the client's evaluation order so float results match exactly
+        island_x = (chunk_x * CHUNK_SIZE) + ISLAND_MARGIN + random() * span
+        island_z = (chunk_z * CHUNK_SIZE) + ISLAND_MARGIN + random() * span
+
+        # Seed for this specific island based on its coordinates
+        island_seed = math.floor(island_x * 13371 + island_z * 92717)
+
+        islands.append(generate_island(island_x, island_z, island_seed))
+
+    return {
+        'key': get_chunk_key(chunk_x, chunk_z),
+        'x': chunk_x,
+        'z': chunk_z,
+        'islands': islands
+    }
+
+
+class ChunkCache:
+    """Thread-safe LRU cache of generated chunks"""
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._chunks = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, chunk_x, chunk_z):
+        """Get a chunk, generating it on a cache miss"""
+        key = (chunk_x, chunk_z)
+        with self._lock:
+            chunk = self._chunks.get(key)
+            if chunk is not None:
+                self._chunks.move_to_end(key)
+                self.hits += 1
+                return chunk
+
+        # Generate outside the lock, generation is pure
+        chunk = generate_chunk(chunk_x, chunk_z)
+
+        with self._lock:
+            self.misses += 1
+            self._chunks[key] = chunk
+            self._chunks.move_to_end(key)
+            while len(self._chunks) > self.max_size:
+                self._chunks.popitem(last=False)
+
+        return chunk
+
+    def clear(self):
+        """Drop all cached chunks and reset the counters"""
+        with self._lock:
+            self._chunks.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return cache statistics"""
+        with self._lock:
+            return {
+                'size': len(self._chunks),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+# Shared cache used by the server
+chunk_cache = ChunkCache()
+
+
+def get_chunk(chunk_x, chunk_z):
+    """Get a chunk from the shared cache"""
+    return chunk_cache.get(chunk_x, chunk_z)
+
+
+def get_chunks_around(x, z, view_distance=MAX_VIEW_DISTANCE):
+    """Get all chunks within view_distance chunks of a world position"""
+    center_x, center_z = get_chunk_coords(x, z)
+    return [
+        get_chunk(center_x + x_offset, center_z + z_offset)
+        for x_offset in range(-view_distance, view_distance + 1)
+        for z_offset in range(-view_distance, view_distance + 1)
+    ]
+
+
+def islands_near(x, z, distance):
+    """
+    Get procedural islands whose center is within distance of a position
+
+    :return: List of (distance, island) tuples sorted by distance
+    """
+    view_distance = int(math.ceil(distance / CHUNK_SIZE))
+    nearby = []
+    for chunk in get_chunks_around(x, z, view_distance):
+        for island in chunk['islands']:
+            d = math.hypot(island['position']['x'] - x, island['position']['z'] - z)
+            if d <= distance:
+                nearby.append((d, island))
+    nearby.sort(key=lambda item: item[0])
+    return nearby
+
+
+def check_island_collision(x, z, extra_radius=2):
+    """Same check as the client's checkIslandCollision, against procedural islands"""
+    for d, island in islands_near(x, z, ISLAND_RADIUS + extra_radius):
+        if d < island['radius'] + extra_radius:
+            return island
+    return None
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import argparse
+
+import worldgen
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'worldgen_client_fixture.json')
+
+
+def check_parity():
+    """Compare generated chunks against outputs recorded from the client"""
+    print("\n=== CLIENT PARITY ===")
+    with open(FIXTURE_PATH) as f:
+        fixture = json.load(f)
+
+    mismatches = 0
+    for recorded in fixture['chunks']:
+        chunk_x, chunk_z = recorded['chunk']
+        chunk = worldgen.generate_chunk(chunk_x, chunk_z)
+
+        for expected, island in zip(recorded['islands'], chunk['islands']):
+            actual = {
+                'id': island['id'],
+                'x': island['position']['x'],
+                'z': island['position']['z'],
+                'seed': island['seed'],
+                'hasMegaStructure': island['hasMegaStructure'],
+                'structureType': island['structureType']
+            }
+            if actual != expected:
+                mismatches += 1
+                print(f"Mismatch in chunk {chunk['key']}:")
+                print(f"  client: {expected}")
+                print(f"  server: {actual}")
+
+    print(f"Checked {len(fixture['chunks'])} chunks, {mismatches} mismatches")
+    return mismatches == 0
+
+
+def benchmark(radius, cache_size):
+    """Measure raw generation and cached lookup throughput"""
+    print("\n=== BENCHMARK ===")
+    coords = [(x, z) for x in range(-radius, radius + 1) for z in range(-radius, radius + 1)]
+
+    start = time.perf_counter()
+    for chunk_x, chunk_z in coords:
+        worldgen.generate_chunk(chunk_x, chunk_z)
+    elapsed = time.perf_counter() - start
+    print(f"Generation: {len(coords)} chunks in {elapsed:.3f}s ({len(coords) / elapsed:,.0f} chunks/s)")
+
+    cache = worldgen.ChunkCache(max_size=cache_size)
+    for chunk_x, chunk_z in coords:
+        cache.get(chunk_x, chunk_z)
+
+    start = time.perf_counter()
+    for chunk_x, chunk_z in coords:
+        cache.get(chunk_x, chunk_z)
+    elapsed = time.perf_counter() - start
+    print(f"Cached lookups: {len(coords)} chunks in {elapsed:.3f}s ({len(coords) / elapsed:,.0f} chunks/s)")
+    print(f"Cache stats: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='World generation parity check and benchmark')
+    parser.add_argument('--radius', type=int, default=50, help='Benchmark chunks in a square of this radius')
+    parser.add_argument('--cache-size', type=int, default=worldgen.DEFAULT_CACHE_SIZE * 4)
+    args = parser.parse_args()
+
+    print("\n===== WORLD GENERATION TEST =====")
+    ok = check_parity()
+    benchmark(args.radius, args.cache_size)
+    print("\n===== TEST COMPLETE =====")
+    raise SystemExit(0 if ok else 1)
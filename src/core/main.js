@@ -10,7 +10,8 @@ import { scene, camera, renderer, updateTime, getTime, boat, getWindData, boatVe
 import { setupSkybox, updateSkybox, setupSky, updateTimeOfDay, updateSunPosition, getTimeOfDay } from '../environment/skybox.js';
 import { setupClouds, updateClouds } from '../environment/clouds.js';
 import { setupBirds, updateBirds } from '../entities/birds.js';
-import { setupSeaMonsters, updateSeaMonsters, getMonsters, updateLurkingMonster, updateHuntingMonster, updateSurfacingMonster, updateAttackingMonster, updateDivingMonster, updateDyingMonster, updateSpecialMonsterBehaviors } from '../entities/seaMonsters.js';
+import { setupSeaMonsters, updateSeaMonsters, getMonsters } from '../entities/seaMonsters.js';
+import { setupTreasure, updateTreasure } from '../world/treasure.js';
 import { initFishing, updateFishing, getFishCount } from '../gameplay/fishing.js';
 import { initCannons, updateCannons } from '../gameplay/cannons.js';
 import { animateSail } from '../animations/animations.js';
@@ -1100,6 +1101,9 @@ function animate() {
     // Update sea monsters with delta time
     updateSeaMonsters(deltaTime);
 
+    // Update treasure floating on the sea
+    updateTreasure();
+
     // Update fishing
     updateFishing();
 
@@ -1226,6 +1230,9 @@ const birds = setupBirds(activeIslands, boat);
 // Initialize sea monsters
 const seaMonsters = setupSeaMonsters(boat);
 
+// Initialize treasure
+setupTreasure(boat);
+
 // Initialize fishing system
 initFishing(boat);
 
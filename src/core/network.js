@@ -5,6 +5,8 @@ import { getAuth } from 'firebase/auth';
 // Network configuration
 const SERVER_URL = 'http://localhost:5001';
 //const SERVER_URL = 'https://boat-game-python.onrender.com';
+// Keeps the connection alive while the player is not moving (server idle timeout is 60s)
+const HEARTBEAT_INTERVAL = 15000;
 
 // Network state
 let socket;
@@ -12,6 +14,7 @@ let playerId;
 let firebaseUid = null; // Store Firebase UID if available
 let otherPlayers = new Map(); // Map to store other players' meshes
 let isConnected = false;
+let heartbeatTimer = null;
 let playerName = "Sailor_" + Math.floor(Math.random() * 1000);
 let playerColor;
 let playerStats = {
@@ -32,6 +35,29 @@ let activeIslandsRef;
 let chatMessageCallback = null;
 let recentMessagesCallback = null;
 let messageHistory = [];
+
+// Server-simulated sea monsters, fish schools and pickups, by chunk key
+let serverEntities = new Map();
+let entityHitCallback = null;
+let entityCollectedCallback = null;
+let monsterAttackCallback = null;
+let fishCaughtCallback = null;
+
+// Names behind the indexes of replicated entities (KINDS, TYPE_NAMES and
+// STATES in api/entity_simulation.py)
+const ENTITY_KINDS = ['monster', 'fish_school', 'pickup'];
+const ENTITY_TYPES = {
+    monster: ['yellowBeast', 'kraken', 'seaSerpent', 'phantomJellyfish'],
+    fish_school: ['Anchovy', 'Cod', 'Salmon', 'Tuna', 'Swordfish', 'Shark', 'Golden Fish'],
+    pickup: ['chest', 'jewel', 'coin', 'monsterScale']
+};
+const MONSTER_STATES = ['lurking', 'hunting', 'attacking', 'diving'];
+
+// Server-backed inventory: item name -> count and the version it matches.
+// Local changes are applied at once and sent as deltas (see sendInventoryChange)
+let inventoryItems = {};
+let inventoryVersion = 0;
+let inventoryChangedCallback = null;
 const DEFAULT_MESSAGE_LIMIT = 50;
 
 // Initialize the network connection
@@ -97,6 +123,37 @@ export async function initializeNetwork(
             firebaseUid: userId,            // Send Firebase UID
             firebaseToken: firebaseToken    // Send Firebase token for verification
         });
+
+        clearInterval(heartbeatTimer);
+        heartbeatTimer = setInterval(() => socket.emit('heartbeat'), HEARTBEAT_INTERVAL);
+    });
+}
+
+// Join the shard named in a shard_handoff with its ticket (which carries our
+// identity and state), and leave the current one once the new one welcomed us
+function switchShard(data) {
+    const previous = socket;
+    console.log(`Handing over to shard ${data.shard}`);
+
+    socket = io(data.url);
+    setupSocketEvents();
+
+    socket.on('connect', () => {
+        const activeObject = playerStateRef.mode === 'boat' ? boatRef : character;
+        socket.emit('player_join', {
+            name: playerName,
+            color: playerColor,
+            position: activeObject.position,
+            rotation: activeObject.rotation.y,
+            mode: playerStateRef.mode,
+            handoffTicket: data.ticket
+        });
+    });
+
+    socket.once('welcome', () => {
+        // Without its handlers, leaving does not clear the players we can still see
+        previous.off();
+        previous.disconnect();
     });
 }
 
@@ -222,6 +279,7 @@ function setupSocketEvents() {
     socket.on('disconnect', () => {
         console.log('Disconnected from game server');
         isConnected = false;
+        clearInterval(heartbeatTimer);
 
         // Clean up other players
         otherPlayers.forEach((player, id) => {
@@ -268,6 +326,131 @@ function setupSocketEvents() {
         });
     });
 
+    // Everything needed after joining arrives in a single event
+    socket.on('welcome', (data) => {
+        playerId = data.id;
+
+        // Catch up on inventory changes made while we were away
+        socket.emit('inventory_sync', { version: inventoryVersion });
+
+        // Region around the spawn point
+        handleWorldRegion(data.region);
+
+        // Leaderboard
+        if (typeof updateLeaderboardData === 'function') {
+            updateLeaderboardData(data.leaderboard);
+        }
+
+        // Chat history (already in chronological order)
+        messageHistory = data.chat_history;
+        if (recentMessagesCallback) {
+            recentMessagesCallback(messageHistory);
+        }
+    });
+
+    // Inventory: the server answers with the full inventory only if ours is out of date
+    socket.on('inventory_ack', (data) => {
+        inventoryVersion = data.version;
+    });
+
+    socket.on('inventory_delta', (data) => {
+        // A change made on another connection of ours
+        if (data.base !== inventoryVersion) {
+            socket.emit('inventory_sync', { version: inventoryVersion });
+            return;
+        }
+        Object.entries(data.items).forEach(([name, count]) => setInventoryCount(name, count));
+        inventoryVersion = data.version;
+        notifyInventoryChanged();
+    });
+
+    socket.on('inventory_full', (data) => {
+        if (data.error) {
+            console.warn('Inventory change rejected:', data.error);
+        }
+        inventoryItems = { ...data.items };
+        inventoryVersion = data.version;
+        notifyInventoryChanged();
+    });
+
+    // Handle region-streamed world sync (nearest chunks first)
+    socket.on('world_region', handleWorldRegion);
+
+    // Chunks the server stopped tracking for us
+    socket.on('world_region_evicted', (data) => {
+        const evicted = new Set(data.chunks);
+        otherPlayers.forEach((player, id) => {
+            const position = player.mesh.position;
+            const chunkKey = `${Math.floor(position.x / 600)},${Math.floor(position.z / 600)}`;
+            if (evicted.has(chunkKey)) {
+                removeOtherPlayerFromScene(id);
+            }
+        });
+    });
+
+    // We sailed into a region owned by another server shard: move over to it
+    socket.on('shard_handoff', switchShard);
+
+    // The server clamped or rejected our last move: snap to its position
+    socket.on('position_corrected', (data) => {
+        const activeObject = playerStateRef.mode === 'boat' ? boatRef : character;
+        activeObject.position.set(data.position.x, data.position.y, data.position.z);
+    });
+
+    // Simulated entities of one chunk around us (replaces that chunk's previous state)
+    socket.on('entities', (data) => {
+        serverEntities.set(data.chunk, data);
+
+        // Monster attacks on us since the last update
+        data.hits.forEach(([monsterId, targetId]) => {
+            if (targetId === playerId && monsterAttackCallback) {
+                monsterAttackCallback(monsterId);
+            }
+        });
+    });
+
+    // Chunks we are no longer near
+    socket.on('entities_evicted', (data) => {
+        data.chunks.forEach(chunkKey => serverEntities.delete(chunkKey));
+    });
+
+    // Our cannonball hit a monster (the server credits the kill)
+    socket.on('entity_hit', (data) => {
+        if (data.killed) {
+            playerStats.monsterKills += 1;
+            if (window.gameUI && typeof window.gameUI.updatePlayerStats === 'function') {
+                window.gameUI.updatePlayerStats();
+            }
+        }
+        if (entityHitCallback) {
+            entityHitCallback(data);
+        }
+    });
+
+    // We picked up a treasure or monster drop (the server credits the money)
+    socket.on('entity_collected', (data) => {
+        playerStats.money += data.value;
+        if (window.gameUI && typeof window.gameUI.updatePlayerStats === 'function') {
+            window.gameUI.updatePlayerStats();
+        }
+        if (entityCollectedCallback) {
+            entityCollectedCallback(data);
+        }
+    });
+
+    // Result of our reportFishCatch: { caught, id, type } (the server adds the fish to our inventory)
+    socket.on('fish_caught', (data) => {
+        if (data.caught) {
+            playerStats.fishCount += 1;
+            if (window.gameUI && typeof window.gameUI.updatePlayerStats === 'function') {
+                window.gameUI.updatePlayerStats();
+            }
+        }
+        if (fishCaughtCallback) {
+            fishCaughtCallback(data);
+        }
+    });
+
     // Player events
     socket.on('player_joined', (data) => {
         console.log('New player joined:', data.name);
@@ -293,6 +476,11 @@ function setupSocketEvents() {
         removeOtherPlayerFromScene(data.id);
     });
 
+    // Disconnects are coalesced by the server into one event per tick
+    socket.on('players_disconnected', (data) => {
+        data.ids.forEach(id => removeOtherPlayerFromScene(id));
+    });
+
     // Island events
     socket.on('island_registered', (data) => {
         // This could be used to sync islands across clients
@@ -363,6 +551,17 @@ function setupSocketEvents() {
     });
 }
 
+// Add the players of streamed world chunks to the scene
+function handleWorldRegion(data) {
+    data.chunks.forEach(chunk => {
+        chunk.players.forEach(playerData => {
+            if (playerData.id !== playerId) {
+                addOtherPlayerToScene(playerData);
+            }
+        });
+    });
+}
+
 // Send player position update to the server
 export function updatePlayerPosition() {
     if (!isConnected || !socket || !playerId) return;
@@ -682,67 +881,111 @@ export function getPlayerStats() {
     return { ...playerStats };
 }
 
-// Call this when a player catches a fish
-export function onFishCaught(value = 1) {
-    if (!isConnected || !socket) return;
-
-    // Update local stats
-    playerStats.fishCount += value;
-
-    console.log(`Fish caught! New count: ${playerStats.fishCount}`);
+// Simulated entities around the player: one { chunk, tick, entities, hits }
+// per chunk, where each entity is [id, kind, type, x, y, z, heading, state, value]
+export function getServerEntities() {
+    return serverEntities;
+}
 
-    // Send the fish caught action to server
-    socket.emit('player_action', {
-        action: 'fish_caught',
-        value: value
+// Simulated entities of one kind ('monster', 'fish_school' or 'pickup') around
+// the player, as { id, type, x, y, z, heading, state, value } with type and
+// state names (state is only set for monsters)
+export function getServerEntitiesOfKind(kind) {
+    const kindIndex = ENTITY_KINDS.indexOf(kind);
+    const entities = [];
+    serverEntities.forEach(chunk => {
+        chunk.entities.forEach(([id, entityKind, type, x, y, z, heading, state, value]) => {
+            if (entityKind !== kindIndex) return;
+            entities.push({
+                id,
+                type: ENTITY_TYPES[kind][type],
+                x, y, z, heading,
+                state: kind === 'monster' ? MONSTER_STATES[state] : null,
+                value
+            });
+        });
     });
+    return entities;
+}
 
-    // Update UI
-    if (window.gameUI && typeof window.gameUI.updatePlayerStats === 'function') {
-        window.gameUI.updatePlayerStats();
-    }
+// Report a cannonball hit on a server-simulated monster (answered with entity_hit)
+export function hitEntity(entityId) {
+    if (!isConnected || !socket) return;
+    socket.emit('entity_hit', { id: entityId });
 }
 
-// Call this when a player kills a monster
-export function onMonsterKilled(value = 1) {
+// Pick up a server-simulated treasure or monster drop (answered with entity_collected)
+export function collectEntity(entityId) {
     if (!isConnected || !socket) return;
+    socket.emit('entity_collect', { id: entityId });
+}
 
-    // Update local stats
-    playerStats.monsterKills += value;
+// Register a callback function called with the server's result of our hitEntity
+// ({ id, type, health, killed, drop })
+export function onEntityHit(callback) {
+    entityHitCallback = callback;
+}
 
-    console.log(`Monster killed! New count: ${playerStats.monsterKills}`);
+// Register a callback function called with { id, type, value } when our collectEntity succeeded
+export function onEntityCollected(callback) {
+    entityCollectedCallback = callback;
+}
 
-    // Send the monster killed action to server
-    socket.emit('player_action', {
-        action: 'monster_killed',
-        value: value
-    });
+// Register a callback function called with the monster's ID when a monster hits our boat
+export function onMonsterAttack(callback) {
+    monsterAttackCallback = callback;
+}
 
-    // Update UI
-    if (window.gameUI && typeof window.gameUI.updatePlayerStats === 'function') {
-        window.gameUI.updatePlayerStats();
+function setInventoryCount(name, count) {
+    if (count > 0) {
+        inventoryItems[name] = count;
+    } else {
+        delete inventoryItems[name];
     }
 }
 
-// Call this when a player earns money
-export function onMoneyEarned(value) {
+function notifyInventoryChanged() {
+    if (inventoryChangedCallback) {
+        inventoryChangedCallback({ ...inventoryItems });
+    }
+}
+
+// Change item counts (e.g. { 'Bluefin Tuna': 1 }); applied locally at once and
+// sent as a delta against our version. If the server's inventory differs it
+// answers with the full inventory, which replaces ours.
+export function sendInventoryChange(changes) {
+    Object.entries(changes).forEach(([name, amount]) => {
+        setInventoryCount(name, (inventoryItems[name] || 0) + amount);
+    });
+    notifyInventoryChanged();
+
     if (!isConnected || !socket) return;
+    socket.emit('inventory_update', { base: inventoryVersion, changes });
+    inventoryVersion += 1;
+}
 
-    // Update local stats
-    playerStats.money += value;
+// Register a callback function called with the item counts whenever the inventory changes
+export function onInventoryChanged(callback) {
+    inventoryChangedCallback = callback;
+}
 
-    console.log(`Money earned! New amount: ${playerStats.money}`);
+export function getInventory() {
+    return { ...inventoryItems };
+}
 
-    // Send the money earned action to server
-    socket.emit('player_action', {
-        action: 'money_earned',
-        value: value
-    });
+// Call this when the player wins the fishing minigame; the server takes the fish
+// from a school in reach and answers with fish_caught. Returns false when offline.
+export function reportFishCatch() {
+    if (!isConnected || !socket) return false;
 
-    // Update UI
-    if (window.gameUI && typeof window.gameUI.updatePlayerStats === 'function') {
-        window.gameUI.updatePlayerStats();
-    }
+    socket.emit('player_action', { action: 'fish_caught' });
+    return true;
+}
+
+// Register a callback function called with the server's result of our reportFishCatch:
+// { caught: true, id, type } or { caught: false } if no school was in reach
+export function onFishCaught(callback) {
+    fishCaughtCallback = callback;
 }
 
 // Add this new function to initialize player stats
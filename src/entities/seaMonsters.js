@@ -1,31 +1,26 @@
 import * as THREE from 'three';
 import { scene, getTime, boatVelocity } from '../core/gameState.js';
-import { getTimeOfDay } from '../environment/skybox.js'; // Import time of day function
 import { flashBoatDamage } from '../entities/character.js'; // Add this import
-import { getFishInventory } from '../gameplay/fishing.js'; // Import the fish inventory
+import { getServerEntitiesOfKind, onMonsterAttack } from '../core/network.js';
 
 // Sea monster configuration
-const MONSTER_COUNT = 15;
 const MONSTER_TYPES = {
     YELLOW_BEAST: 'yellowBeast',   // Original monster
     KRAKEN: 'kraken',              // New octopus-like monster
     SEA_SERPENT: 'seaSerpent',     // New serpent monster
     PHANTOM_JELLYFISH: 'phantomJellyfish' // New jellyfish monster
 };
-const MONSTER_TYPE_WEIGHTS = {
-    [MONSTER_TYPES.YELLOW_BEAST]: 0.4,    // 40% chance
-    [MONSTER_TYPES.KRAKEN]: 0.2,          // 20% chance
-    [MONSTER_TYPES.SEA_SERPENT]: 0.2,     // 20% chance 
-    [MONSTER_TYPES.PHANTOM_JELLYFISH]: 0.2 // 20% chance
-};
 const MONSTER_SPEED = 0.3;
-const MONSTER_DETECTION_RANGE = 200;
 const MONSTER_ATTACK_RANGE = 50;
-const MONSTER_DEPTH = -20;
-const MONSTER_SURFACE_TIME = 10; // seconds monster stays on surface
-const MONSTER_DIVE_TIME = 30; // seconds monster stays underwater before considering resurfacing
 
-// Monster states
+// Monsters are simulated by the server (api/entity_simulation.py) and only
+// rendered here. Each frame a monster closes this fraction per second of the
+// gap to its replicated position; farther than MONSTER_SNAP_DISTANCE it jumps.
+const MONSTER_FOLLOW_RATE = 5;
+const MONSTER_SNAP_DISTANCE = 100;
+const MONSTER_DEATH_TIME = 3; // seconds a killed monster sinks before it is removed
+
+// Monster states (the server's, plus dying while a killed monster sinks)
 const MONSTER_STATE = {
     LURKING: 'lurking',    // Deep underwater, moving randomly
     HUNTING: 'hunting',    // Detected player, moving toward them underwater
@@ -35,77 +30,92 @@ const MONSTER_STATE = {
     DYING: 'dying'         // Monster is dying
 };
 
-// Monster treasure drops - each monster type has a specific treasure it drops
-const MONSTER_TREASURES = {
-    yellowBeast: { name: "Monster Scale", value: 5, color: 0xFFD700, description: "A glimmering scale from a sea beast." },
-    blueDevil: { name: "Abyssal Pearl", value: 8, color: 0x00BFFF, description: "A mysterious pearl with swirling blue patterns." },
-    greenHorror: { name: "Emerald Fang", value: 12, color: 0x32CD32, description: "A razor-sharp tooth with verdant energy." },
-    redTerror: { name: "Crimson Crystal", value: 15, color: 0xFF4500, description: "A blood-red crystal that pulses with heat." }
-};
-
 // Monster state
 let monsters = [];
+let monstersById = new Map();
 let playerBoat = null;
-let lastNightSpawn = false; // Track if we've already spawned monsters this night
-let lastTimeOfDay = ""; // Track the previous time of day
-let treasureDrops = [];
-let treasureInventory = {}; // Treasures collected from monsters
-
-// Add a hit cooldown system to prevent constant damage
-const HIT_COOLDOWN = 1.5; // Seconds between possible hits
-let lastHitTime = -999; // Initialize to negative value to ensure first hit works
 
 export function setupSeaMonsters(boat) {
-    try {
-        playerBoat = boat;
-
-        // Reset hit cooldown to ensure monsters can hit on first approach
-        lastHitTime = -999; // Set to a very negative value to ensure first hit works
-
-        // Create monsters
-        for (let i = 0; i < MONSTER_COUNT; i++) {
-            // Determine monster type using weighted random selection
-            const monsterType = selectRandomMonsterType();
-
-            // Create monster based on type
-            switch (monsterType) {
-                case MONSTER_TYPES.KRAKEN:
-                    createKrakenMonster();
-                    break;
-                case MONSTER_TYPES.SEA_SERPENT:
-                    createSeaSerpentMonster();
-                    break;
-                case MONSTER_TYPES.PHANTOM_JELLYFISH:
-                    createPhantomJellyfishMonster();
-                    break;
-                case MONSTER_TYPES.YELLOW_BEAST:
-                default:
-                    createYellowBeastMonster(); // Original monster
-                    break;
-            }
-        }
+    playerBoat = boat;
 
-        return monsters;
-    } catch (error) {
-        console.error("Error in setupSeaMonsters:", error);
-        return [];
-    }
+    // The server tells us when a monster hits our boat
+    onMonsterAttack(handleMonsterAttack);
+
+    return monsters;
 }
 
-// Helper function to select random monster type based on weights
-export function selectRandomMonsterType() {
-    const random = Math.random();
-    let cumulativeWeight = 0;
+// Create, move and remove monsters to match the server's
+function syncServerMonsters(deltaTime) {
+    const seen = new Set();
 
-    for (const [type, weight] of Object.entries(MONSTER_TYPE_WEIGHTS)) {
-        cumulativeWeight += weight;
-        if (random < cumulativeWeight) {
-            return type;
+    getServerEntitiesOfKind('monster').forEach(entity => {
+        seen.add(entity.id);
+        let monster = monstersById.get(entity.id);
+        if (!monster) {
+            monster = createMonsterByType(entity.type);
+            monster.id = entity.id;
+            monster.mesh.position.set(entity.x, entity.y, entity.z);
+            monstersById.set(entity.id, monster);
         }
+        if (monster.state === MONSTER_STATE.DYING) return;
+
+        // Splash when it breaks the surface to attack
+        if (entity.state === MONSTER_STATE.ATTACKING && monster.state !== MONSTER_STATE.ATTACKING) {
+            createSplashEffect(new THREE.Vector3(entity.x, 0, entity.z));
+        }
+        monster.state = entity.state;
+        monster.targetPosition.set(entity.x, entity.y, entity.z);
+        monster.eyeGlow = entity.state === MONSTER_STATE.HUNTING || entity.state === MONSTER_STATE.ATTACKING ? 1 : 0;
+    });
+
+    // Monsters no longer replicated were killed by someone or left our area
+    monsters.forEach(monster => {
+        if (!seen.has(monster.id) && monster.state !== MONSTER_STATE.DYING) {
+            sinkMonster(monster);
+        }
+    });
+
+    monsters.forEach(monster => {
+        if (monster.state === MONSTER_STATE.DYING) return;
+        if (monster.mesh.position.distanceTo(monster.targetPosition) > MONSTER_SNAP_DISTANCE) {
+            monster.mesh.position.copy(monster.targetPosition);
+        }
+        monster.velocity.subVectors(monster.targetPosition, monster.mesh.position)
+            .multiplyScalar(Math.min(1, MONSTER_FOLLOW_RATE * deltaTime));
+    });
+}
+
+// A monster hit our boat (decided by the server)
+function handleMonsterAttack(monsterId) {
+    if (!playerBoat) return;
+    flashBoatDamage();
+
+    // Add some physical impact - push boat slightly
+    const monster = monstersById.get(monsterId);
+    if (monster && boatVelocity) {
+        const hitDirection = new THREE.Vector3()
+            .subVectors(playerBoat.position, monster.mesh.position)
+            .setY(0)
+            .normalize();
+        boatVelocity.add(hitDirection.multiplyScalar(0.5));
     }
+}
+
+// Let a monster sink and fade out, then remove it
+export function sinkMonster(monster) {
+    if (monster.state === MONSTER_STATE.DYING) return;
+    monster.state = MONSTER_STATE.DYING;
+    monster.stateTimer = MONSTER_DEATH_TIME;
+    monster.velocity.set(0, -0.2, 0); // Start sinking
+    monstersById.delete(monster.id);
+}
 
-    // Default to original monster if something goes wrong
-    return MONSTER_TYPES.YELLOW_BEAST;
+function removeMonster(monster) {
+    scene.remove(monster.mesh);
+    const index = monsters.indexOf(monster);
+    if (index > -1) {
+        monsters.splice(index, 1);
+    }
 }
 
 export function updateSeaMonsters(deltaTime) {
@@ -116,45 +126,18 @@ export function updateSeaMonsters(deltaTime) {
 
         if (!playerBoat) return;
 
-        // Get current time of day from skybox.js
-        const currentTimeOfDay = getTimeOfDay();
+        syncServerMonsters(deltaTime);
 
-        // Check if night has just started (transition from another time to night)
-        if (currentTimeOfDay === "Night" && lastTimeOfDay !== "Night") {
-            console.log("Night has fallen - preparing to respawn sea monsters");
-            respawnMonstersAtNight();
-        }
+        // Update existing monsters (backwards, sunk monsters are removed)
+        for (let index = monsters.length - 1; index >= 0; index--) {
+            const monster = monsters[index];
 
-        // Update last time of day
-        lastTimeOfDay = currentTimeOfDay;
-
-        // Debug current time and last hit time
-
-        // Update existing monsters
-        monsters.forEach((monster, index) => {
-            // Update state timer
-            monster.stateTimer -= deltaTime;
-
-            // Update monster based on current state
-            switch (monster.state) {
-                case MONSTER_STATE.LURKING:
-                    updateLurkingMonster(monster, deltaTime);
-                    break;
-                case MONSTER_STATE.HUNTING:
-                    updateHuntingMonster(monster, deltaTime);
-                    break;
-                case MONSTER_STATE.SURFACING:
-                    updateSurfacingMonster(monster, deltaTime);
-                    break;
-                case MONSTER_STATE.ATTACKING:
-                    updateAttackingMonster(monster, deltaTime);
-                    break;
-                case MONSTER_STATE.DIVING:
-                    updateDivingMonster(monster, deltaTime);
-                    break;
-                case MONSTER_STATE.DYING:
-                    updateDyingMonster(monster, deltaTime);
-                    break;
+            if (monster.state === MONSTER_STATE.DYING) {
+                updateDyingMonster(monster, deltaTime);
+                if (monster.stateTimer <= 0) {
+                    removeMonster(monster);
+                }
+                continue;
             }
 
             // Apply velocity to position
@@ -174,10 +157,6 @@ export function updateSeaMonsters(deltaTime) {
             if (monster.monsterType === MONSTER_TYPES.YELLOW_BEAST) {
                 animateTentacles(monster, deltaTime);
             }
-
-            // Ensure monster stays within world bounds
-            keepMonsterInWorld(monster);
-
             // Make fins always visible above water when surfacing or attacking
             if (monster.state === MONSTER_STATE.SURFACING || monster.state === MONSTER_STATE.ATTACKING) {
                 // Ensure dorsal fin sticks out of water
@@ -206,223 +185,12 @@ export function updateSeaMonsters(deltaTime) {
                     monster.rightFin.position.y = 2;
                 }
             }
-        });
-
-        // Also update treasure drops
-        updateTreasureDrops();
+        }
     } catch (error) {
         console.error("Error in updateSeaMonsters:", error);
     }
 }
 
-export function updateLurkingMonster(monster, deltaTime) {
-    // Random wandering movement underwater
-    if (Math.random() < 0.01) {
-        monster.velocity.x = (Math.random() - 0.5) * MONSTER_SPEED;
-        monster.velocity.z = (Math.random() - 0.5) * MONSTER_SPEED;
-    }
-
-    // Check if player is in detection range
-    const distanceToPlayer = monster.mesh.position.distanceTo(playerBoat.position);
-    if (distanceToPlayer < MONSTER_DETECTION_RANGE) {
-        // 20% chance to start hunting when player is detected
-        if (Math.random() < 0.2) {
-            monster.state = MONSTER_STATE.HUNTING;
-            monster.stateTimer = 10; // Hunt for 10 seconds before deciding to surface
-            monster.eyeGlow = 1; // Make eyes glow when hunting
-        }
-    }
-
-    // Occasionally consider surfacing even without player
-    if (monster.stateTimer <= 0 && Math.random() < 0.005) {
-        monster.state = MONSTER_STATE.SURFACING;
-        monster.stateTimer = 5; // Time to reach surface
-    }
-}
-
-export function updateHuntingMonster(monster, deltaTime) {
-    // Move toward player underwater
-    const directionToPlayer = new THREE.Vector3()
-        .subVectors(playerBoat.position, monster.mesh.position)
-        .normalize();
-
-    // Keep at depth while hunting
-    directionToPlayer.y = 0;
-
-    // Set velocity toward player
-    monster.velocity.copy(directionToPlayer.multiplyScalar(MONSTER_SPEED * 1.5));
-
-    // Check if close enough to attack
-    const distanceToPlayer = monster.mesh.position.distanceTo(playerBoat.position);
-    if (distanceToPlayer < MONSTER_ATTACK_RANGE) {
-        monster.state = MONSTER_STATE.SURFACING;
-        monster.stateTimer = 3; // Faster surfacing when attacking
-    }
-
-    // If hunting timer expires, decide whether to surface or return to lurking
-    if (monster.stateTimer <= 0) {
-        if (distanceToPlayer < MONSTER_ATTACK_RANGE * 2 && Math.random() < 0.7) {
-            // Close enough, surface to attack
-            monster.state = MONSTER_STATE.SURFACING;
-            monster.stateTimer = 3;
-        } else {
-            // Return to lurking
-            monster.state = MONSTER_STATE.LURKING;
-            monster.stateTimer = MONSTER_DIVE_TIME / 2;
-            monster.eyeGlow = 0; // Reset eye glow
-        }
-    }
-}
-
-export function updateSurfacingMonster(monster, deltaTime) {
-    // Move upward to surface
-    monster.velocity.y = MONSTER_SPEED;
-
-    // Continue moving toward player if in attack range
-    const distanceToPlayer = monster.mesh.position.distanceTo(playerBoat.position);
-    if (distanceToPlayer < MONSTER_ATTACK_RANGE * 2) {
-        const directionToPlayer = new THREE.Vector3()
-            .subVectors(playerBoat.position, monster.mesh.position)
-            .normalize();
-
-        // Keep y component for surfacing, but move toward player on xz plane
-        monster.velocity.x = directionToPlayer.x * MONSTER_SPEED;
-        monster.velocity.z = directionToPlayer.z * MONSTER_SPEED;
-    }
-
-    // Check if reached surface
-    if (monster.mesh.position.y >= 0) {
-        monster.mesh.position.y = 0; // Clamp to water surface
-        monster.state = MONSTER_STATE.ATTACKING;
-        monster.stateTimer = MONSTER_SURFACE_TIME;
-
-        // Create splash effect
-        createSplashEffect(monster.mesh.position);
-    }
-}
-
-export function updateAttackingMonster(monster, deltaTime) {
-    // Initialize sub-state for attacking if not present
-    if (!monster.attackSubState) {
-        monster.attackSubState = 'charging';
-        monster.chargeTarget = new THREE.Vector3();
-        monster.repositionTimer = 0; // Initialize reposition timer
-    }
-
-    // Keep at surface level with slight bobbing
-    monster.mesh.position.y = Math.sin(getTime() * 0.5) * 0.5;
-    monster.velocity.y = 0;
-
-    const distanceToPlayer = monster.mesh.position.distanceTo(playerBoat.position);
-
-    // Check if monster can hit the boat
-    const currentTime = getTime() / 1000; // Convert to seconds
-    const canHit = currentTime - lastHitTime > HIT_COOLDOWN;
-
-    // Debug monster distance
-
-    if (distanceToPlayer < 15) { // Increased hit range for better detection
-        // Monster hit the boat - trigger damage flash
-        flashBoatDamage();
-        lastHitTime = currentTime;
-
-        // Add some physical impact - push boat slightly
-        const hitDirection = new THREE.Vector3()
-            .subVectors(playerBoat.position, monster.mesh.position)
-            .normalize();
-
-        // Use the imported boatVelocity directly instead of window.boatVelocity
-        if (boatVelocity) {
-            boatVelocity.add(hitDirection.multiplyScalar(0.5));
-        }
-    }
-
-    if (monster.attackSubState === 'charging') {
-        // Set charge target as player position
-        monster.chargeTarget.copy(playerBoat.position);
-
-        // Calculate direction to the charge target
-        const directionToTarget = new THREE.Vector3()
-            .subVectors(monster.chargeTarget, monster.mesh.position)
-            .normalize();
-
-        // Set velocity to charge through player at increased speed
-        monster.velocity.x = directionToTarget.x * MONSTER_SPEED * 3;
-        monster.velocity.z = directionToTarget.z * MONSTER_SPEED * 3;
-
-        // Check if we've passed the player (dot product becomes negative)
-        const toPlayer = new THREE.Vector3().subVectors(playerBoat.position, monster.mesh.position);
-        const movingDirection = new THREE.Vector3(monster.velocity.x, 0, monster.velocity.z).normalize();
-        const dotProduct = toPlayer.dot(movingDirection);
-
-        // If passed player or gotten very close, switch to repositioning
-        if (dotProduct < -5 || distanceToPlayer < 5) {
-            monster.attackSubState = 'repositioning';
-
-            // Set a random reposition timer between 5-7 seconds
-            monster.repositionTimer = 5 + Math.random() * 2;
-
-            // Calculate a position to swim away to - not too far from player
-            const swimAwayDistance = MONSTER_ATTACK_RANGE * 1.5; // Not too far
-
-            // Calculate direction away from player
-            const awayFromPlayerDir = new THREE.Vector3()
-                .subVectors(monster.mesh.position, playerBoat.position)
-                .normalize();
-
-            // Set the target position to swim away to
-            monster.chargeTarget.set(
-                playerBoat.position.x + awayFromPlayerDir.x * swimAwayDistance,
-                0,
-                playerBoat.position.z + awayFromPlayerDir.z * swimAwayDistance
-            );
-        }
-    } else { // repositioning
-        // Update reposition timer
-        monster.repositionTimer -= deltaTime;
-
-        // During repositioning phase
-        if (monster.repositionTimer > 0) {
-            // Move toward reposition target at moderate speed
-            const directionToTarget = new THREE.Vector3()
-                .subVectors(monster.chargeTarget, monster.mesh.position)
-                .normalize();
-
-            monster.velocity.x = directionToTarget.x * MONSTER_SPEED * 1.2;
-            monster.velocity.z = directionToTarget.z * MONSTER_SPEED * 1.2;
-        } else {
-            // Timer expired, prepare for another charge
-            monster.attackSubState = 'charging';
-        }
-    }
-
-    // If attack time expires or player gets too far, dive
-    if (monster.stateTimer <= 0 || distanceToPlayer > MONSTER_ATTACK_RANGE * 3) {
-        monster.state = MONSTER_STATE.DIVING;
-        monster.stateTimer = 5; // Time to dive
-        delete monster.attackSubState; // Clean up attack sub-state
-        delete monster.chargeTarget;
-        delete monster.repositionTimer;
-    }
-}
-
-export function updateDivingMonster(monster, deltaTime) {
-    // Move downward
-    monster.velocity.y = -MONSTER_SPEED;
-
-    // Slow down horizontal movement
-    monster.velocity.x *= 0.95;
-    monster.velocity.z *= 0.95;
-
-    // Check if reached depth
-    if (monster.mesh.position.y <= MONSTER_DEPTH) {
-        monster.mesh.position.y = MONSTER_DEPTH; // Clamp to depth
-        monster.state = MONSTER_STATE.LURKING;
-        monster.stateTimer = MONSTER_DIVE_TIME;
-        monster.eyeGlow = 0; // Reset eye glow
-    }
-}
-
 export function updateDyingMonster(monster, deltaTime) {
     // Handle dying animation
     monster.mesh.position.y += monster.velocity.y;
@@ -439,14 +207,8 @@ export function updateDyingMonster(monster, deltaTime) {
         }
     });
 
-    // Update state timer
+    // Update state timer (removed by updateSeaMonsters when it runs out)
     monster.stateTimer -= deltaTime;
-    if (monster.stateTimer <= 0) {
-        // Monster has completed dying animation
-        // It will be removed by the timeout in hitMonster
-    }
-
-    return; // Skip other state handling
 }
 
 function animateTentacles(monster, deltaTime) {
@@ -524,25 +286,6 @@ function createSplashEffect(position) {
     }
 }
 
-function keepMonsterInWorld(monster) {
-    // Get distance from center
-    const distanceFromCenter = new THREE.Vector2(
-        monster.mesh.position.x,
-        monster.mesh.position.z
-    ).length();
-
-    // If monster is too far from center, add force toward center
-    if (distanceFromCenter > 5000) {
-        const towardCenter = new THREE.Vector3(
-            -monster.mesh.position.x,
-            0,
-            -monster.mesh.position.z
-        ).normalize().multiplyScalar(0.05);
-
-        monster.velocity.add(towardCenter);
-    }
-}
-
 // Export monsters array for other modules
 export function getMonsters() {
     return monsters;
@@ -642,59 +385,30 @@ function createYellowBeastMonster() {
     monster.add(rightFin);
 
     // Position and configure monster
-    setupMonsterPosition(monster, tentacles, dorsalFin, leftFin, rightFin, MONSTER_TYPES.YELLOW_BEAST);
+    return addMonster(monster, tentacles, dorsalFin, leftFin, rightFin, MONSTER_TYPES.YELLOW_BEAST);
 }
 
-function setupMonsterPosition(monster, tentacles, dorsalFin, leftFin, rightFin, monsterType) {
-    // Position monster randomly around the player
-    const randomAngle = Math.random() * Math.PI * 2;
-    const randomRadius = 200 + Math.random() * 800;
-
-    monster.position.set(
-        Math.cos(randomAngle) * randomRadius,
-        5, // Start above water
-        Math.sin(randomAngle) * randomRadius
-    );
-
-    // Set random velocity
-    const velocity = new THREE.Vector3(
-        (Math.random() - 0.5) * MONSTER_SPEED,
-        0,
-        (Math.random() - 0.5) * MONSTER_SPEED
-    );
-
-    // Add monster to scene
+// Add a created monster to the scene (positioned by syncServerMonsters)
+function addMonster(monster, tentacles, dorsalFin, leftFin, rightFin, monsterType) {
     scene.add(monster);
 
     // Store monster data
-    monsters.push({
+    const monsterData = {
+        id: null,
         mesh: monster,
-        velocity: velocity,
+        velocity: new THREE.Vector3(),
         tentacles: tentacles || [],
         dorsalFin: dorsalFin,
         leftFin: leftFin,
         rightFin: rightFin,
-        state: MONSTER_STATE.ATTACKING, // Start in attacking state
-        stateTimer: MONSTER_SURFACE_TIME + Math.random() * 20, // Stay visible longer
+        state: MONSTER_STATE.LURKING,
+        stateTimer: 0,
         targetPosition: new THREE.Vector3(),
         eyeGlow: 0,
-        monsterType: monsterType,
-        health: getMonsterHealth(monsterType)
-    });
-}
-
-function getMonsterHealth(monsterType) {
-    switch (monsterType) {
-        case MONSTER_TYPES.KRAKEN:
-            return 6; // Tougher than regular monster
-        case MONSTER_TYPES.SEA_SERPENT:
-            return 4; // Average toughness
-        case MONSTER_TYPES.PHANTOM_JELLYFISH:
-            return 3; // Fragile but dangerous
-        case MONSTER_TYPES.YELLOW_BEAST:
-        default:
-            return 3; // Original monster health
-    }
+        monsterType: monsterType
+    };
+    monsters.push(monsterData);
+    return monsterData;
 }
 
 function createKrakenMonster() {
@@ -792,7 +506,7 @@ function createKrakenMonster() {
     monster.add(rightSpike);
 
     // Setup position and add to scene
-    setupMonsterPosition(monster, tentacles, dorsalSpike, leftSpike, rightSpike, MONSTER_TYPES.KRAKEN);
+    return addMonster(monster, tentacles, dorsalSpike, leftSpike, rightSpike, MONSTER_TYPES.KRAKEN);
 }
 
 function createSeaSerpentMonster() {
@@ -911,7 +625,7 @@ function createSeaSerpentMonster() {
     monster.rotation.x = -Math.PI / 2;
 
     // Use segments as tentacles for animation system
-    setupMonsterPosition(monster, segments, dorsalFin, leftFin, rightFin, MONSTER_TYPES.SEA_SERPENT);
+    return addMonster(monster, segments, dorsalFin, leftFin, rightFin, MONSTER_TYPES.SEA_SERPENT);
 }
 
 function createPhantomJellyfishMonster() {
@@ -1018,11 +732,11 @@ function createPhantomJellyfishMonster() {
     // Add detection "eyes" - not visible but needed for system
     // We'll use the bell itself as the "fin" for surface detection
 
-    setupMonsterPosition(monster, tentacles, bell, bell, bell, MONSTER_TYPES.PHANTOM_JELLYFISH);
-
     // Add pulsating glow animation capability
     monster.userData.pulseTime = Math.random() * Math.PI * 2;
     monster.userData.chargeLevel = 0;
+
+    return addMonster(monster, tentacles, bell, bell, bell, MONSTER_TYPES.PHANTOM_JELLYFISH);
 }
 
 // Add special monster update functions based on type
@@ -1275,227 +989,17 @@ function createElectricDischargeEffect(position) {
     animateDischarge();
 }
 
-// Respawn monsters at night until we reach the maximum count
-function respawnMonstersAtNight() {
-    // Count how many monsters to spawn
-    const monstersToSpawn = MONSTER_COUNT - monsters.length;
-
-    if (monstersToSpawn <= 0) {
-        console.log("Monster population is already at maximum capacity");
-        return;
-    }
-
-    console.log(`Night has fallen. Respawning ${monstersToSpawn} sea monsters...`);
-
-    // Spawn monsters in positions away from the player
-    for (let i = 0; i < monstersToSpawn; i++) {
-        const monsterType = selectRandomMonsterType();
-        const spawnPosition = getRandomSpawnPosition();
-        createMonsterByType(monsterType, spawnPosition);
-    }
-
-    console.log(`Sea monsters have respawned (${monsters.length}/${MONSTER_COUNT})`);
-}
-
 // Helper function to create a monster by type
-function createMonsterByType(monsterType, position = null) {
+function createMonsterByType(monsterType) {
     switch (monsterType) {
         case MONSTER_TYPES.KRAKEN:
-            createKrakenMonster(position);
-            break;
+            return createKrakenMonster();
         case MONSTER_TYPES.SEA_SERPENT:
-            createSeaSerpentMonster(position);
-            break;
+            return createSeaSerpentMonster();
         case MONSTER_TYPES.PHANTOM_JELLYFISH:
-            createPhantomJellyfishMonster(position);
-            break;
+            return createPhantomJellyfishMonster();
         case MONSTER_TYPES.YELLOW_BEAST:
         default:
-            createYellowBeastMonster(position); // Original monster
-            break;
+            return createYellowBeastMonster(); // Original monster
     }
 }
-
-// Helper function to get a random spawn position away from player
-function getRandomSpawnPosition() {
-    // Get vector pointing in random direction
-    const angle = Math.random() * Math.PI * 2;
-    const direction = new THREE.Vector3(
-        Math.cos(angle),
-        0,
-        Math.sin(angle)
-    );
-
-    // Position the monster at least 300 units away from player
-    // but not more than 800 units away
-    const distance = 300 + Math.random() * 500;
-    const spawnPosition = new THREE.Vector3();
-
-    // If playerBoat exists, spawn relative to it
-    if (playerBoat) {
-        spawnPosition.copy(playerBoat.position);
-        spawnPosition.add(direction.multiplyScalar(distance));
-    } else {
-        // Fallback if no player boat
-        spawnPosition.set(
-            (Math.random() - 0.5) * 1000,
-            MONSTER_DEPTH,
-            (Math.random() - 0.5) * 1000
-        );
-    }
-
-    spawnPosition.y = MONSTER_DEPTH; // Always spawn at monster depth
-
-    return spawnPosition;
-}
-
-// When a monster is killed, create a treasure drop
-export function createTreasureDrop(monster) {
-    // Determine which treasure to drop based on monster type
-    const treasureType = MONSTER_TREASURES[monster.monsterType] || MONSTER_TREASURES.yellowBeast;
-
-    // Create glowing orb geometry for the treasure
-    const orbGeometry = new THREE.SphereGeometry(0.5, 12, 12);
-    const orbMaterial = new THREE.MeshStandardMaterial({
-        color: treasureType.color,
-        emissive: treasureType.color,
-        emissiveIntensity: 0.7,
-        transparent: true,
-        opacity: 0.8
-    });
-
-    const treasureOrb = new THREE.Mesh(orbGeometry, orbMaterial);
-    treasureOrb.position.copy(monster.mesh.position);
-    treasureOrb.position.y = 0.5; // Float slightly above water
-    treasureOrb.userData.treasureType = treasureType;
-    treasureOrb.userData.creationTime = getTime() / 1000;
-
-    // Add to scene and tracking array
-    scene.add(treasureOrb);
-    treasureDrops.push(treasureOrb);
-
-    // Add pulsing animation to make it more noticeable
-    const startScale = treasureOrb.scale.x;
-    const pulseAnimation = () => {
-        if (!treasureOrb.parent) return; // Stop if removed from scene
-
-        const time = getTime() / 1000;
-        const pulse = 1 + 0.2 * Math.sin(time * 3);
-        treasureOrb.scale.set(startScale * pulse, startScale * pulse, startScale * pulse);
-
-        requestAnimationFrame(pulseAnimation);
-    };
-
-    pulseAnimation();
-}
-
-// Update function for treasure drops - check for collection
-function updateTreasureDrops() {
-    //console.log("updateTreasureDrops: ", treasureDrops.length);
-    if (!playerBoat || treasureDrops.length === 0) return;
-
-    const currentTime = getTime() / 1000;
-    const boatPosition = playerBoat.position.clone();
-    boatPosition.y = 0.5; // Match Y level for better collision
-
-    // Collection distance threshold (how close boat needs to be)
-    const COLLECT_DISTANCE = 5;
-
-    // Process treasures in reverse order to safely remove while iterating
-    for (let i = treasureDrops.length - 1; i >= 0; i--) {
-        const treasureOrb = treasureDrops[i];
-
-
-        // Check if treasure should disappear due to timeout (30 seconds)
-        if (currentTime - treasureOrb.userData.creationTime > 30) {
-            scene.remove(treasureOrb);
-            treasureDrops.splice(i, 1);
-            continue;
-        }
-
-        // Check if boat is close enough to collect
-        if (treasureOrb.position.distanceTo(boatPosition) < COLLECT_DISTANCE) {
-            // Collect the treasure
-            collectTreasure(treasureOrb.userData.treasureType);
-
-            // Remove the orb
-
-            scene.remove(treasureOrb);
-            treasureDrops.splice(i, 1);
-        }
-    }
-}
-
-// Export treasure inventory for use in other modules
-export function getTreasureInventory() {
-    return treasureInventory;
-}
-
-// Make getTreasureInventory available globally for the UI
-window.getTreasureInventory = getTreasureInventory;
-
-// Update the treasure inventory in the UI when changes occur
-function updateTreasureInventoryDisplay() {
-    // If inventory UI exists and has a method for updating treasures, call it
-    if (window.inventoryUI && typeof window.inventoryUI.updateTreasureInventory === 'function') {
-        window.inventoryUI.updateTreasureInventory(treasureInventory);
-    }
-}
-
-// Modify the collectTreasure function to update the inventory display
-function collectTreasure(treasureType) {
-    // console.log("collectTreasure: ", treasureType);
-    const treasureName = treasureType.name;
-
-    // Add to inventory
-    if (!treasureInventory[treasureName]) {
-        treasureInventory[treasureName] = {
-            ...treasureType,
-            count: 1
-        };
-    } else {
-        treasureInventory[treasureName].count++;
-    }
-
-    // Remove from scene and tracking array
-    //treasureDrops = treasureDrops.filter(orb => orb !== treasureOrb);
-
-    // console.log(`Collected ${treasureName}!`, treasureInventory);
-
-    // Update the inventory UI
-    updateTreasureInventoryDisplay();
-
-    // Play collection sound
-    playCollectionSound();
-}
-
-// Simple sound effect for collecting treasures
-function playCollectionSound() {
-    // Create audio context if not already created
-    if (!window.audioContext) {
-        try {
-            window.audioContext = new (window.AudioContext || window.webkitAudioContext)();
-        } catch (e) {
-            console.warn('Web Audio API not supported in this browser');
-            return;
-        }
-    }
-
-    // Create oscillator for simple collection sound
-    const oscillator = window.audioContext.createOscillator();
-    const gainNode = window.audioContext.createGain();
-
-    oscillator.type = 'sine';
-    oscillator.frequency.setValueAtTime(600, window.audioContext.currentTime);
-    oscillator.frequency.exponentialRampToValueAtTime(1200, window.audioContext.currentTime + 0.2);
-
-    // Set volume (50% of typical sound)
-    gainNode.gain.setValueAtTime(0.15, window.audioContext.currentTime);
-    gainNode.gain.exponentialRampToValueAtTime(0.01, window.audioContext.currentTime + 0.3);
-
-    oscillator.connect(gainNode);
-    gainNode.connect(window.audioContext.destination);
-
-    oscillator.start();
-    oscillator.stop(window.audioContext.currentTime + 0.3);
-} 
\ No newline at end of file
@@ -1,13 +1,12 @@
 import * as THREE from 'three';
 import { scene, getTime } from '../core/gameState.js';
 import { gameUI } from '../ui/ui.js';
-import { onMonsterKilled } from '../core/network.js';
-import { createTreasureDrop } from '../entities/seaMonsters.js';
+import { hitEntity, onEntityHit } from '../core/network.js';
+import { sinkMonster } from '../entities/seaMonsters.js';
 
 // Cannon system configuration
 const CANNON_RANGE = 100; // Maximum range for cannons
 const CANNON_COOLDOWN = 3; // Seconds between cannon shots
-const CANNON_DAMAGE = 3; // Damage per cannon hit
 const CANNON_BALL_SPEED = 3; // Speed of cannonballs
 
 // Cannon state
@@ -41,6 +40,9 @@ export function initCannons(playerBoat, seaMonsters) {
 
     // Set up event listeners for cannon UI
     gameUI.elements.cannon.fireButton.addEventListener('click', fireCannons);
+
+    // The server decides what our hits did
+    onEntityHit(handleMonsterHit);
 }
 
 // Update cannon system
@@ -313,53 +315,30 @@ function fireAtMonsters(targets) {
     });
 }
 
-// Hit a monster with cannon
+// Hit a monster with cannon (the server checks the hit and answers with handleMonsterHit)
 function hitMonster(monster) {
-    // Apply damage
-    if (!monster.health) monster.health = 3; // Default health if not set
-    monster.health -= CANNON_DAMAGE;
-
     // Create hit effect
     createHitEffect(monster.mesh.position);
 
-    // Check if monster is defeated
-    if (monster.health <= 0) {
-        // Create treasure drop before monster disappears
-        createTreasureDrop(monster);
+    hitEntity(monster.id);
+}
 
-        // Monster is defeated, make it dive and eventually remove it
-        monster.state = 'dying';
-        monster.stateTimer = 3; // Time for death animation
-        monster.velocity.y = -0.2; // Start sinking
+// The server's result of one of our hits: { id, type, health, killed, drop }
+function handleMonsterHit(result) {
+    const monster = monsters.find(candidate => candidate.id === result.id);
+    if (!monster) return;
 
+    // Check if monster is defeated (the server credits the kill and drops its treasure)
+    if (result.killed) {
         // Create a more dramatic death effect
         createMonsterDeathEffect(monster.mesh.position);
 
-        onMonsterKilled(1);
-
         // Play death sound
         playMonsterDeathSound();
 
-        // Schedule removal after animation
-        setTimeout(() => {
-            if (monster.mesh && monster.mesh.parent) {
-                scene.remove(monster.mesh);
-                // Remove from monsters array
-                const index = monsters.indexOf(monster);
-                if (index > -1) {
-                    monsters.splice(index, 1);
-                }
-            }
-        }, 3000);
+        // Sinks, then is removed
+        sinkMonster(monster);
     } else {
-        // Monster is hit but not defeated, make it move away temporarily
-        const directionFromBoat = new THREE.Vector3()
-            .subVectors(monster.mesh.position, boat.position)
-            .normalize();
-
-        // Set velocity away from boat (faster retreat)
-        monster.velocity.copy(directionFromBoat.multiplyScalar(1.2));
-
         // Make monster flash red to indicate damage
         if (monster.mesh) {
             monster.mesh.traverse((child) => {
@@ -1,7 +1,7 @@
 import * as THREE from 'three';
 import { scene, camera } from '../core/gameState.js';
 import { gameUI } from '../ui/ui.js';
-import { onFishCaught, onMoneyEarned } from '../core/network.js';
+import { reportFishCatch, onFishCaught, sendInventoryChange, onInventoryChanged } from '../core/network.js';
 
 // Fishing system configuration
 const FISHING_CAST_DISTANCE = 15;
@@ -51,6 +51,27 @@ export function initFishing(playerBoat) {
 
     // Update fish counter
     updateFishCounter();
+
+    // The inventory is kept by the server; show its counts whenever they change
+    onInventoryChanged(setFishInventory);
+
+    // The server decides which fish we caught
+    onFishCaught(handleFishCaught);
+}
+
+// Rebuild the fish inventory from server-backed item counts
+function setFishInventory(items) {
+    fishInventory = {};
+    for (const fish of FISH_TYPES) {
+        if (items[fish.name]) {
+            fishInventory[fish.name] = {
+                count: items[fish.name],
+                value: fish.value,
+                color: fish.color
+            };
+        }
+    }
+    gameUI.updateInventory(fishInventory);
 }
 
 // Toggle fishing on/off
@@ -382,39 +403,51 @@ function resetFishingState() {
     }, biteTime * 1000);
 }
 
-// Catch a fish
+// Catch a fish: the server takes it from a school in reach and answers with
+// handleFishCaught. Offline, the fish is rolled here.
 function catchFish() {
-    // Determine which fish was caught based on rarity
+    gameUI.elements.fishing.status.textContent = 'Reeling it in...';
+    gameUI.elements.fishing.status.style.color = 'white';
+
+    if (!reportFishCatch()) {
+        // Update fish inventory (and its UI) ourselves
+        const caughtFish = rollFish();
+        sendInventoryChange({ [caughtFish.name]: 1 });
+        landFish(caughtFish);
+    }
+}
+
+// Determine which fish was caught based on rarity
+function rollFish() {
     const rand = Math.random();
     let cumulativeRarity = 0;
-    let caughtFish = FISH_TYPES[0]; // Default to most common fish
 
     for (const fish of FISH_TYPES) {
         cumulativeRarity += fish.rarity;
         if (rand <= cumulativeRarity) {
-            caughtFish = fish;
-            break;
+            return fish;
         }
     }
+    return FISH_TYPES[0]; // Default to most common fish
+}
 
-    // Update fish inventory
-    if (!fishInventory[caughtFish.name]) {
-        fishInventory[caughtFish.name] = {
-            count: 1,
-            value: caughtFish.value,
-            color: caughtFish.color
-        };
-    } else {
-        fishInventory[caughtFish.name].count++;
+// The server's answer to our catch; it already added the fish to our inventory
+function handleFishCaught(result) {
+    if (!result.caught) {
+        gameUI.elements.fishing.status.textContent = 'It got away! No school of fish nearby.';
+        gameUI.elements.fishing.status.style.color = 'rgba(255, 100, 100, 1)';
+        waitForNextBite(2000);
+        return;
     }
+    landFish(FISH_TYPES.find(fish => fish.name === result.type) || FISH_TYPES[0]);
+}
 
+// Show a caught fish
+function landFish(caughtFish) {
     // Increment fish counter
     fishCaught += caughtFish.value;
     updateFishCounter();
 
-    // Update inventory UI
-    gameUI.updateInventory(fishInventory);
-
     // Show success message
     gameUI.elements.fishing.status.textContent = `Caught a ${caughtFish.name}! (+${caughtFish.value})`;
     gameUI.elements.fishing.status.style.color = 'rgba(100, 255, 100, 1)';
@@ -422,12 +455,6 @@ function catchFish() {
     // Create a 3D fish model that jumps out of the water
     createCaughtFishEffect(caughtFish);
 
-    // Update player stats in network
-    onFishCaught(1);
-
-    // If different fish have different values
-    const fishValue = caughtFish.value; // Use the fish's value directly
-
     // IMPORTANT: Directly update the UI stats panel
     // This ensures the UI updates immediately without waiting for network responses
     gameUI.updatePlayerStats({
@@ -435,6 +462,11 @@ function catchFish() {
     });
 
     // Reset after a moment
+    waitForNextBite(3000);
+}
+
+// After a delay, go back to waiting for the next bite
+function waitForNextBite(delay) {
     setTimeout(() => {
         if (isFishing) {
             gameUI.elements.fishing.status.textContent = 'Waiting for a bite...';
@@ -448,7 +480,7 @@ function catchFish() {
                 }
             }, biteTime * 1000);
         }
-    }, 3000);
+    }, delay);
 }
 
 // Create visual effect for caught fish
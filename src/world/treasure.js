@@ -1,18 +1,159 @@
-import { onMoneyEarned } from '../core/network.js';
+import * as THREE from 'three';
+import { scene, getTime } from '../core/gameState.js';
+import { getServerEntitiesOfKind, collectEntity, onEntityCollected } from '../core/network.js';
 
-function handleTreasureFound(treasureType) {
-    // Your existing code for treasure collection
+// Treasure floating on the sea is simulated by the server (api/entity_simulation.py):
+// chests, jewels and coins spawned in each chunk, and the scales killed monsters drop.
+// Here it is only rendered; sailing over one asks the server for it, and the
+// server credits the coins to whoever reaches it first.
+const TREASURE_TYPES = {
+    chest: { name: "Treasure Chest", color: 0x8B4513, size: 1.2, description: "A sunken chest, heavy with coins." },
+    jewel: { name: "Sea Jewel", color: 0x00BFFF, size: 0.7, description: "A polished jewel lost by some sailor." },
+    coin: { name: "Gold Coin", color: 0xFFD700, size: 0.5, description: "A single gold coin bobbing on the waves." },
+    monsterScale: { name: "Monster Scale", color: 0xFFD700, size: 0.5, description: "A glimmering scale from a sea beast." }
+};
 
-    // Update player money stats in network
-    const treasureValue = getTreasureValue(treasureType);
-    onMoneyEarned(treasureValue);
+// Collection distance threshold (how close boat needs to be; the server allows 15)
+const COLLECT_DISTANCE = 10;
+// Seconds before asking again for a pickup the server did not give us
+const COLLECT_RETRY = 1;
+
+let playerBoat = null;
+let treasureOrbs = new Map(); // Pickup ID -> orb mesh
+let pendingCollects = new Map(); // Pickup ID -> when we asked the server for it
+let treasureInventory = {}; // Treasures collected
+
+export function setupTreasure(boat) {
+    playerBoat = boat;
+    onEntityCollected(collectTreasure);
 }
 
-function getTreasureValue(treasureType) {
-    switch (treasureType) {
-        case 'chest': return 500;
-        case 'jewel': return 200;
-        case 'coin': return 50;
-        default: return 100;
+// Create the glowing orb of a pickup
+function createTreasureOrb(pickup) {
+    const treasureType = TREASURE_TYPES[pickup.type] || TREASURE_TYPES.coin;
+
+    const orbGeometry = new THREE.SphereGeometry(treasureType.size, 12, 12);
+    const orbMaterial = new THREE.MeshStandardMaterial({
+        color: treasureType.color,
+        emissive: treasureType.color,
+        emissiveIntensity: 0.7,
+        transparent: true,
+        opacity: 0.8
+    });
+
+    const treasureOrb = new THREE.Mesh(orbGeometry, orbMaterial);
+    treasureOrb.position.set(pickup.x, 0.5, pickup.z); // Float slightly above water
+    treasureOrb.userData.pulseOffset = Math.random() * Math.PI * 2;
+
+    scene.add(treasureOrb);
+    treasureOrbs.set(pickup.id, treasureOrb);
+    return treasureOrb;
+}
+
+// Show the server's pickups around us and ask for the ones we sail over
+export function updateTreasure() {
+    if (!playerBoat) return;
+
+    const time = getTime() / 1000;
+    const seen = new Set();
+
+    getServerEntitiesOfKind('pickup').forEach(pickup => {
+        seen.add(pickup.id);
+        const treasureOrb = treasureOrbs.get(pickup.id) || createTreasureOrb(pickup);
+
+        // Pulse to make it more noticeable
+        const pulse = 1 + 0.2 * Math.sin(time * 3 + treasureOrb.userData.pulseOffset);
+        treasureOrb.scale.set(pulse, pulse, pulse);
+
+        const dx = pickup.x - playerBoat.position.x;
+        const dz = pickup.z - playerBoat.position.z;
+        const askedAt = pendingCollects.get(pickup.id);
+        const waiting = askedAt !== undefined && time - askedAt < COLLECT_RETRY;
+        if (!waiting && Math.sqrt(dx * dx + dz * dz) < COLLECT_DISTANCE) {
+            pendingCollects.set(pickup.id, time);
+            collectEntity(pickup.id);
+        }
+    });
+
+    // Collected (by anyone), sunk, or no longer near us
+    treasureOrbs.forEach((treasureOrb, id) => {
+        if (!seen.has(id)) {
+            scene.remove(treasureOrb);
+            treasureOrbs.delete(id);
+            pendingCollects.delete(id);
+        }
+    });
+}
+
+// Export treasure inventory for use in other modules
+export function getTreasureInventory() {
+    return treasureInventory;
+}
+
+// Make getTreasureInventory available globally for the UI
+window.getTreasureInventory = getTreasureInventory;
+
+// Update the treasure inventory in the UI when changes occur
+function updateTreasureInventoryDisplay() {
+    // If inventory UI exists and has a method for updating treasures, call it
+    if (window.inventoryUI && typeof window.inventoryUI.updateTreasureInventory === 'function') {
+        window.inventoryUI.updateTreasureInventory(treasureInventory);
     }
-} 
\ No newline at end of file
+}
+
+// The server gave us a pickup ({ id, type, value }); its coins are already credited
+function collectTreasure(data) {
+    const treasureType = TREASURE_TYPES[data.type] || TREASURE_TYPES.coin;
+    const treasureName = treasureType.name;
+
+    // Add to inventory
+    if (!treasureInventory[treasureName]) {
+        treasureInventory[treasureName] = {
+            ...treasureType,
+            value: data.value,
+            count: 1
+        };
+    } else {
+        treasureInventory[treasureName].count++;
+    }
+
+    // Ours: never ask again, its orb goes with the next entity update
+    pendingCollects.set(data.id, Infinity);
+
+    // Update the inventory UI
+    updateTreasureInventoryDisplay();
+
+    // Play collection sound
+    playCollectionSound();
+}
+
+// Simple sound effect for collecting treasures
+function playCollectionSound() {
+    // Create audio context if not already created
+    if (!window.audioContext) {
+        try {
+            window.audioContext = new (window.AudioContext || window.webkitAudioContext)();
+        } catch (e) {
+            console.warn('Web Audio API not supported in this browser');
+            return;
+        }
+    }
+
+    // Create oscillator for simple collection sound
+    const oscillator = window.audioContext.createOscillator();
+    const gainNode = window.audioContext.createGain();
+
+    oscillator.type = 'sine';
+    oscillator.frequency.setValueAtTime(600, window.audioContext.currentTime);
+    oscillator.frequency.exponentialRampToValueAtTime(1200, window.audioContext.currentTime + 0.2);
+
+    // Set volume (50% of typical sound)
+    gainNode.gain.setValueAtTime(0.15, window.audioContext.currentTime);
+    gainNode.gain.exponentialRampToValueAtTime(0.01, window.audioContext.currentTime + 0.3);
+
+    oscillator.connect(gainNode);
+    gainNode.connect(window.audioContext.destination);
+
+    oscillator.start();
+    oscillator.stop(window.audioContext.currentTime + 0.3);
+}